@@ -1,6 +1,7 @@
+import argparse
 from enum import IntEnum
-from nmigen import Elaboratable, Signal, Module
-from nmigen.back import rtlil
+from nmigen import Cat, Elaboratable, EnableInserter, Signal, Module
+from nmigen.back import pysim, rtlil
 
 
 class BlendRGB(IntEnum):
@@ -16,8 +17,15 @@ class BlendAlpha(IntEnum):
 
 
 class AlphaBlend(Elaboratable):
-    def __init__(self):
-        self.i_enable  = Signal()   # Whether to alpha blend; Off or On.
+    def __init__(self, latency=1):
+        # Blending selects its operands, multiplies and adds. With a latency of
+        # 1 that is all one stage; a latency of 2 registers the operands before
+        # the multiply, and 3 also registers the products before the add, which
+        # shortens the critical path of the pixel pipeline. The other fields
+        # are delayed to match, so the stage is the same to its neighbours but
+        # for taking `latency` clocks.
+        self.latency   = latency    # Clocks from a pixel entering to it leaving; 1, 2 or 3
+
         self.i_alphaen = Signal()   # Whether the high bit of the source alpha determines whether to alpha blend.
 
         self.i_fix     = Signal(8)  # Q8.0; Fixed alpha value
@@ -35,9 +43,14 @@ class AlphaBlend(Elaboratable):
         self.i_fbblue  = Signal(8)  # Q8.0; Framebuffer Blue Channel
         self.i_fbalpha = Signal(8)  # Q8.0; Framebuffer Alpha (Transparency) Channel
 
+        self.i_valid   = Signal()   # Input pixel is valid
+        self.o_ready   = Signal()   # Input pixel is accepted this cycle
+
         self.i_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
         self.i_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
         self.i_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.i_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.i_abe     = Signal()   # Whether to alpha blend this pixel (ABE); Off or On
 
         self.i_x_coord = Signal(16) # Q12.4; Pixel X Coordinate
         self.i_y_coord = Signal(16) # Q12.4; Pixel Y Coordinate
@@ -50,9 +63,13 @@ class AlphaBlend(Elaboratable):
 
         self.i_fbpxfmt = Signal(6)  # Framebuffer Pixel Format
 
+        self.o_valid   = Signal()   # Output pixel is valid
+        self.i_ready   = Signal()   # Output pixel is accepted this cycle
+
         self.o_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
         self.o_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
         self.o_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.o_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
 
         self.o_x_coord = Signal(16) # Output X Coordinate
         self.o_y_coord = Signal(16) # Output Y Coordinate
@@ -63,21 +80,42 @@ class AlphaBlend(Elaboratable):
         self.o_blue    = Signal(9)  # Output Blue Channel
         self.o_alpha   = Signal(8)  # Output Alpha Channel
 
+        self.o_fbred   = Signal(8)  # Output Framebuffer Red Channel
+        self.o_fbgreen = Signal(8)  # Output Framebuffer Green Channel
+        self.o_fbblue  = Signal(8)  # Output Framebuffer Blue Channel
+        self.o_fbalpha = Signal(8)  # Output Framebuffer Alpha Channel
+
+    def _register(self, m, values):
+        regs = [Signal(value.shape()) for value in values]
+        m.d.sync += [reg.eq(value) for reg, value in zip(regs, values)]
+        return regs
+
     def elaborate(self, platform):
         m = Module()
 
-        # Move the pipeline along
-        m.d.sync += [
-            self.o_rgbrndr.eq(self.i_rgbrndr),
-            self.o_arndr.eq(self.i_arndr),
-            self.o_zrndr.eq(self.i_zrndr),
-
-            self.o_x_coord.eq(self.i_x_coord),
-            self.o_y_coord.eq(self.i_y_coord),
-            self.o_z_coord.eq(self.i_z_coord),
+        # The stage holds its output until it is accepted; the registers inside
+        # it move along together, so a pixel leaves every clock once it is full.
+        m.d.comb += self.o_ready.eq(~self.o_valid | self.i_ready)
 
-            self.o_alpha.eq(self.i_alpha),
-        ]
+        # Move the pipeline along
+        sideband = Cat(
+            self.i_valid,
+            self.i_rgbrndr, self.i_arndr, self.i_zrndr,
+            self.i_ctxt,
+            self.i_x_coord, self.i_y_coord, self.i_z_coord,
+            self.i_fbred, self.i_fbgreen, self.i_fbblue, self.i_fbalpha,
+            self.i_alpha
+        )
+        for i in range(self.latency - 1):
+            sideband, = self._register(m, [sideband])
+        m.d.sync += Cat(
+            self.o_valid,
+            self.o_rgbrndr, self.o_arndr, self.o_zrndr,
+            self.o_ctxt,
+            self.o_x_coord, self.o_y_coord, self.o_z_coord,
+            self.o_fbred, self.o_fbgreen, self.o_fbblue, self.o_fbalpha,
+            self.o_alpha
+        ).eq(sideband)
 
         a_red = Signal(8)
         a_green = Signal(8)
@@ -139,38 +177,125 @@ class AlphaBlend(Elaboratable):
                 m.d.comb += d_green.eq(0)
                 m.d.comb += d_blue.eq(0)
 
-        with m.If(self.i_enable & (~self.i_alphaen | self.i_alpha[7])):
+        blend = Signal()
+        m.d.comb += blend.eq(self.i_abe & (~self.i_alphaen | self.i_alpha[7]))
+
+        operands = [blend, self.i_red, self.i_green, self.i_blue,
+                    a_red, a_green, a_blue, b_red, b_green, b_blue, c, d_red, d_green, d_blue]
+        if self.latency >= 2:
+            operands = self._register(m, operands)
+        (blend, red, green, blue,
+         a_red, a_green, a_blue, b_red, b_green, b_blue, c, d_red, d_green, d_blue) = operands
+
+        products = [blend, red, green, blue,
+                    (a_red - b_red) * c, (a_green - b_green) * c, (a_blue - b_blue) * c, d_red, d_green, d_blue]
+        if self.latency >= 3:
+            products = self._register(m, products)
+        blend, red, green, blue, p_red, p_green, p_blue, d_red, d_green, d_blue = products
+
+        with m.If(blend):
             m.d.sync += [
-                self.o_red.eq((((a_red - b_red) * c) >> 7) + d_red),
-                self.o_green.eq((((a_green - b_green) * c) >> 7) + d_green),
-                self.o_blue.eq((((a_blue - b_blue) * c) >> 7) + d_blue)
+                self.o_red.eq((p_red >> 7) + d_red),
+                self.o_green.eq((p_green >> 7) + d_green),
+                self.o_blue.eq((p_blue >> 7) + d_blue)
             ]
         with m.Else():
             m.d.sync += [
-                self.o_red.eq(self.i_red),
-                self.o_green.eq(self.i_green),
-                self.o_blue.eq(self.i_blue)
+                self.o_red.eq(red),
+                self.o_green.eq(green),
+                self.o_blue.eq(blue)
             ]
 
-        return m
+        return EnableInserter(self.o_ready)(m)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate an AlphaBlend as RTLIL, or test it.")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate each latency under random stalls, instead of generating RTLIL")
+    args = parser.parse_args()
+
     ablend = AlphaBlend()
 
     ports = [
-        ablend.i_enable, ablend.i_alphaen, ablend.i_fix,
+        ablend.i_alphaen, ablend.i_fix,
 
         ablend.i_blend_a, ablend.i_blend_b, ablend.i_blend_c, ablend.i_blend_d,
         ablend.i_fbred, ablend.i_fbgreen, ablend.i_fbblue, ablend.i_fbalpha,
 
-        ablend.i_rgbrndr, ablend.i_arndr, ablend.i_zrndr,
+        ablend.i_valid, ablend.o_ready,
+        ablend.i_rgbrndr, ablend.i_arndr, ablend.i_zrndr, ablend.i_ctxt, ablend.i_abe,
         ablend.i_x_coord, ablend.i_y_coord, ablend.i_z_coord,
         ablend.i_red, ablend.i_green, ablend.i_blue, ablend.i_alpha,
         ablend.i_fbpxfmt,
 
-        ablend.o_rgbrndr, ablend.o_arndr, ablend.o_zrndr,
+        ablend.o_valid, ablend.i_ready,
+        ablend.o_rgbrndr, ablend.o_arndr, ablend.o_zrndr, ablend.o_ctxt,
         ablend.o_x_coord, ablend.o_y_coord, ablend.o_z_coord,
         ablend.o_red, ablend.o_green, ablend.o_blue, ablend.o_alpha,
     ]
 
-    print(rtlil.convert(ablend, ports=ports))
+    if args.test:
+        import random
+
+        # Every latency gives the same results, in order, under random stalls.
+        count = 500
+        pixels = [[random.randint(0, 255) for i in range(10)] for i in range(count)]
+
+        def expected(pixel):
+            red, green, blue, alpha, fbred, fbgreen, fbblue, fbalpha, fix, blend = pixel
+            blend_a, blend_b, blend_c, blend_d = blend & 3, (blend >> 2) & 3, (blend >> 4) % 3, (blend >> 6) % 3
+            src, fb = [red, green, blue], [fbred, fbgreen, fbblue]
+            a = src if blend_a == BlendRGB.SRC else fb if blend_a == BlendRGB.FB else [0, 0, 0]
+            b = src if blend_b == BlendRGB.SRC else fb if blend_b == BlendRGB.FB else [0, 0, 0]
+            d = src if blend_d == BlendRGB.SRC else fb if blend_d == BlendRGB.FB else [0, 0, 0]
+            c = [alpha, fbalpha, fix][blend_c]
+            return [(((((a[k] - b[k]) % 512) * c) >> 7) + d[k]) % 512 for k in range(3)]
+
+        for latency in [1, 2, 3]:
+            ablend = AlphaBlend(latency=latency)
+            outputs = []
+
+            with pysim.Simulator(ablend) as sim:
+                def feed():
+                    yield ablend.i_abe.eq(1)
+                    sent = 0
+                    while sent < count:
+                        red, green, blue, alpha, fbred, fbgreen, fbblue, fbalpha, fix, blend = pixels[sent]
+                        valid = random.randint(0, 3) != 0
+                        yield ablend.i_valid.eq(valid)
+                        yield ablend.i_x_coord.eq(sent)
+                        yield ablend.i_red.eq(red)
+                        yield ablend.i_green.eq(green)
+                        yield ablend.i_blue.eq(blue)
+                        yield ablend.i_alpha.eq(alpha)
+                        yield ablend.i_fbred.eq(fbred)
+                        yield ablend.i_fbgreen.eq(fbgreen)
+                        yield ablend.i_fbblue.eq(fbblue)
+                        yield ablend.i_fbalpha.eq(fbalpha)
+                        yield ablend.i_fix.eq(fix)
+                        yield ablend.i_blend_a.eq(blend & 3)
+                        yield ablend.i_blend_b.eq((blend >> 2) & 3)
+                        yield ablend.i_blend_c.eq((blend >> 4) % 3)
+                        yield ablend.i_blend_d.eq((blend >> 6) % 3)
+                        yield
+                        if valid and (yield ablend.o_ready):
+                            sent += 1
+                    yield ablend.i_valid.eq(0)
+
+                def drain():
+                    while len(outputs) < count:
+                        ready = random.randint(0, 3) != 0
+                        yield ablend.i_ready.eq(ready)
+                        yield
+                        if ready and (yield ablend.o_valid):
+                            outputs.append(((yield ablend.o_x_coord),
+                                            [(yield ablend.o_red), (yield ablend.o_green), (yield ablend.o_blue)]))
+
+                sim.add_sync_process(feed)
+                sim.add_sync_process(drain)
+                sim.add_clock(1e-6)
+                sim.run()
+
+            assert outputs == [(n, expected(pixel)) for n, pixel in enumerate(pixels)]
+    else:
+        print(rtlil.convert(ablend, ports=ports))
@@ -1,5 +1,5 @@
 from enum import IntEnum
-from nmigen import Elaboratable, Signal, Module
+from nmigen import Elaboratable, EnableInserter, Signal, Module
 from nmigen.back import rtlil, verilog
 
 from common import PixelFormat
@@ -24,9 +24,14 @@ class AlphaFailMode(IntEnum):
 
 class AlphaTest(Elaboratable):
     def __init__(self):
+        self.i_valid   = Signal()   # Input pixel is valid
+        self.o_ready   = Signal()   # Input pixel is accepted this cycle
+
         self.i_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
         self.i_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
         self.i_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.i_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.i_abe     = Signal()   # Whether to alpha blend this pixel (ABE); Off or On
 
         self.i_enable  = Signal()   # Enable; Off or On
         self.i_test    = Signal(3)  # Which test to use; see AlphaTestMode
@@ -42,11 +47,21 @@ class AlphaTest(Elaboratable):
         self.i_blue    = Signal(8)  # Q8.0; Pixel Blue Channel
         self.i_alpha   = Signal(8)  # Q8.0; Pixel Alpha (Transparency) Channel
 
+        self.i_fbred   = Signal(8)  # Q8.0; Framebuffer Red Channel
+        self.i_fbgreen = Signal(8)  # Q8.0; Framebuffer Green Channel
+        self.i_fbblue  = Signal(8)  # Q8.0; Framebuffer Blue Channel
+        self.i_fbalpha = Signal(8)  # Q8.0; Framebuffer Alpha (Transparency) Channel
+
         self.i_fbpxfmt = Signal(6)  # Framebuffer Pixel Format
 
+        self.o_valid   = Signal()   # Output pixel is valid
+        self.i_ready   = Signal()   # Output pixel is accepted this cycle
+
         self.o_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
         self.o_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
         self.o_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.o_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.o_abe     = Signal()   # Whether to alpha blend this pixel (ABE); Off or On
 
         self.o_x_coord = Signal(16) # Output X Coordinate
         self.o_y_coord = Signal(16) # Output Y Coordinate
@@ -57,11 +72,24 @@ class AlphaTest(Elaboratable):
         self.o_blue    = Signal(8)  # Output Blue Channel
         self.o_alpha   = Signal(8)  # Output Alpha Channel
 
+        self.o_fbred   = Signal(8)  # Output Framebuffer Red Channel
+        self.o_fbgreen = Signal(8)  # Output Framebuffer Green Channel
+        self.o_fbblue  = Signal(8)  # Output Framebuffer Blue Channel
+        self.o_fbalpha = Signal(8)  # Output Framebuffer Alpha Channel
+
     def elaborate(self, platform):
         m = Module()
 
+        # The stage holds its output until it is accepted.
+        m.d.comb += self.o_ready.eq(~self.o_valid | self.i_ready)
+
         # Move the pipeline along
         m.d.sync += [
+            self.o_valid.eq(self.i_valid),
+
+            self.o_ctxt.eq(self.i_ctxt),
+            self.o_abe.eq(self.i_abe),
+
             self.o_x_coord.eq(self.i_x_coord),
             self.o_y_coord.eq(self.i_y_coord),
             self.o_z_coord.eq(self.i_z_coord),
@@ -69,7 +97,12 @@ class AlphaTest(Elaboratable):
             self.o_red.eq(self.i_red),
             self.o_green.eq(self.i_green),
             self.o_blue.eq(self.i_blue),
-            self.o_alpha.eq(self.i_alpha)
+            self.o_alpha.eq(self.i_alpha),
+
+            self.o_fbred.eq(self.i_fbred),
+            self.o_fbgreen.eq(self.i_fbgreen),
+            self.o_fbblue.eq(self.i_fbblue),
+            self.o_fbalpha.eq(self.i_fbalpha)
         ]
 
         # Alpha Test, relative to AREF.
@@ -131,7 +164,7 @@ class AlphaTest(Elaboratable):
                         self.o_zrndr.eq(self.i_zrndr & test)
                     ]
 
-        return m
+        return EnableInserter(self.o_ready)(m)
 
 if __name__ == "__main__":
     atst = AlphaTest()
@@ -139,12 +172,14 @@ if __name__ == "__main__":
     ports = [
         atst.i_enable, atst.i_test, atst.i_aref,
 
-        atst.i_rgbrndr, atst.i_arndr, atst.i_zrndr,
+        atst.i_valid, atst.o_ready,
+        atst.i_rgbrndr, atst.i_arndr, atst.i_zrndr, atst.i_ctxt, atst.i_abe,
         atst.i_x_coord, atst.i_y_coord, atst.i_z_coord,
         atst.i_red, atst.i_green, atst.i_blue, atst.i_alpha,
         atst.i_fbpxfmt,
 
-        atst.o_rgbrndr, atst.o_arndr, atst.o_zrndr,
+        atst.o_valid, atst.i_ready,
+        atst.o_rgbrndr, atst.o_arndr, atst.o_zrndr, atst.o_ctxt, atst.o_abe,
         atst.o_x_coord, atst.o_y_coord, atst.o_z_coord,
         atst.o_red, atst.o_green, atst.o_blue, atst.o_alpha,
     ]
@@ -1,5 +1,5 @@
 from enum import IntEnum
-from nmigen import Elaboratable, Signal, Module
+from nmigen import Elaboratable, EnableInserter, Signal, Module
 from nmigen.back import rtlil, verilog
 
 
@@ -13,9 +13,13 @@ class Clamp(Elaboratable):
         self.i_clamp   = Signal()   # Whether to saturate or mask colour channels.
         self.i_alphcor = Signal()   # Alpha correction value
 
+        self.i_valid   = Signal()   # Input pixel is valid
+        self.o_ready   = Signal()   # Input pixel is accepted this cycle
+
         self.i_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
         self.i_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
         self.i_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.i_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
 
         self.i_x_coord = Signal(16) # Q12.4; Pixel X Coordinate
         self.i_y_coord = Signal(16) # Q12.4; Pixel Y Coordinate
@@ -26,9 +30,18 @@ class Clamp(Elaboratable):
         self.i_blue    = Signal(9)  # Q9.0; Pixel Blue Channel
         self.i_alpha   = Signal(8)  # Q8.0; Pixel Alpha (Transparency) Channel
 
+        self.i_fbred   = Signal(8)  # Q8.0; Framebuffer Red Channel
+        self.i_fbgreen = Signal(8)  # Q8.0; Framebuffer Green Channel
+        self.i_fbblue  = Signal(8)  # Q8.0; Framebuffer Blue Channel
+        self.i_fbalpha = Signal(8)  # Q8.0; Framebuffer Alpha (Transparency) Channel
+
+        self.o_valid   = Signal()   # Output pixel is valid
+        self.i_ready   = Signal()   # Output pixel is accepted this cycle
+
         self.o_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
         self.o_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
         self.o_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.o_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
 
         self.o_x_coord = Signal(16) # Output X Coordinate
         self.o_y_coord = Signal(16) # Output Y Coordinate
@@ -39,6 +52,11 @@ class Clamp(Elaboratable):
         self.o_blue    = Signal(8)  # Output Blue Channel
         self.o_alpha   = Signal(8)  # Output Alpha Channel
 
+        self.o_fbred   = Signal(8)  # Output Framebuffer Red Channel
+        self.o_fbgreen = Signal(8)  # Output Framebuffer Green Channel
+        self.o_fbblue  = Signal(8)  # Output Framebuffer Blue Channel
+        self.o_fbalpha = Signal(8)  # Output Framebuffer Alpha Channel
+
     @staticmethod
     def _clamp(m, i, o):
         with m.If(i > 255):
@@ -49,15 +67,27 @@ class Clamp(Elaboratable):
     def elaborate(self, platform):
         m = Module()
 
+        # The stage holds its output until it is accepted.
+        m.d.comb += self.o_ready.eq(~self.o_valid | self.i_ready)
+
         # Move the pipeline along
         m.d.sync += [
+            self.o_valid.eq(self.i_valid),
+
             self.o_rgbrndr.eq(self.i_rgbrndr),
             self.o_arndr.eq(self.i_arndr),
-            self.o_zrndr.eq(self.o_zrndr),
+            self.o_zrndr.eq(self.i_zrndr),
+
+            self.o_ctxt.eq(self.i_ctxt),
 
             self.o_x_coord.eq(self.i_x_coord),
             self.o_y_coord.eq(self.i_y_coord),
             self.o_z_coord.eq(self.i_z_coord),
+
+            self.o_fbred.eq(self.i_fbred),
+            self.o_fbgreen.eq(self.i_fbgreen),
+            self.o_fbblue.eq(self.i_fbblue),
+            self.o_fbalpha.eq(self.i_fbalpha),
         ]
 
         # Colour clamping
@@ -67,15 +97,15 @@ class Clamp(Elaboratable):
             self._clamp(m, self.i_blue, self.o_blue)
         with m.Else():
             m.d.sync += [
-                self.o_red.eq(self.i_red[0:7]),
-                self.o_green.eq(self.i_green[0:7]),
-                self.o_blue.eq(self.i_blue[0:7])
+                self.o_red.eq(self.i_red[0:8]),
+                self.o_green.eq(self.i_green[0:8]),
+                self.o_blue.eq(self.i_blue[0:8])
             ]
 
         # Alpha correction
         m.d.sync += self.o_alpha.eq(self.i_alpha | (self.i_alphcor << 7))
 
-        return m
+        return EnableInserter(self.o_ready)(m)
 
 if __name__ == "__main__":
     clamp = Clamp()
@@ -83,11 +113,13 @@ if __name__ == "__main__":
     ports = [
         clamp.i_clamp, clamp.i_alphcor,
 
-        clamp.i_rgbrndr, clamp.i_arndr, clamp.i_zrndr,
+        clamp.i_valid, clamp.o_ready,
+        clamp.i_rgbrndr, clamp.i_arndr, clamp.i_zrndr, clamp.i_ctxt,
         clamp.i_x_coord, clamp.i_y_coord, clamp.i_z_coord,
         clamp.i_red, clamp.i_green, clamp.i_blue, clamp.i_alpha,
 
-        clamp.o_rgbrndr, clamp.o_arndr, clamp.o_zrndr,
+        clamp.o_valid, clamp.i_ready,
+        clamp.o_rgbrndr, clamp.o_arndr, clamp.o_zrndr, clamp.o_ctxt,
         clamp.o_x_coord, clamp.o_y_coord, clamp.o_z_coord,
         clamp.o_red, clamp.o_green, clamp.o_blue, clamp.o_alpha,
     ]
@@ -0,0 +1,383 @@
+import argparse
+from enum import IntEnum
+
+from nmigen import Cat, Elaboratable, Memory, Module, Mux, Record, Signal
+from nmigen.back import pysim, rtlil
+
+from common import PixelFormat
+
+
+class ClutLoad(IntEnum):
+    NONE         = 0 # Leave the CLUT as it is
+    LOAD         = 1 # Load the CLUT
+    LOAD_CBP0    = 2 # Load the CLUT, and copy CBP to CBP0
+    LOAD_CBP1    = 3 # Load the CLUT, and copy CBP to CBP1
+    CHANGED_CBP0 = 4 # Load the CLUT if CBP differs from CBP0, and copy CBP to CBP0
+    CHANGED_CBP1 = 5 # Load the CLUT if CBP differs from CBP1, and copy CBP to CBP1
+
+
+# One lane's CLUT read; the word is read a clock after its address.
+CLUTREAD = [
+    ("i_addr", 8),  # CLUT word to read
+    ("o_data", 32)  # CLUT word
+]
+
+
+class ClutBuffer(Elaboratable):
+    def __init__(self, lanes=16):
+        # Holds the CLUT of indexed textures on chip, and loads it from local
+        # memory when TEX0 or TEX2 is written, as CLD asks. Entries are laid
+        # out one after another, 32-bit entries a word each and 16-bit entries
+        # two to a word: from CBP in storage mode CSM1, and in CSM2 from column
+        # COU and row COV of a 16-bit buffer CBW wide at CBP, as TEXCLUT sets.
+        #
+        # The buffer is 256 words of two 16-bit halves, each half kept as two
+        # banks of even and odd words, so a word of two 16-bit entries loads in
+        # one clock. 32-bit entries fill whole words; 16-bit entries fill the
+        # low halves, or for 4-bit indices, the halves CSA picks. 8-bit indices
+        # load 256 entries, and 4-bit indices 16, from CSA on.
+        #
+        # A load asked for from the same place, with the same CPSM and index
+        # width as the last load, and for 4-bit indices the same CSA, is
+        # skipped, as the buffer already holds it; the GS would load it again.
+        # 8-bit indices load the whole buffer whatever CSA is. So, like the
+        # texel cache, the buffer must be flushed (TEXFLUSH) once the CLUT in
+        # memory has been written, after which the next load is always made.
+        #
+        # A load asked for during another waits for it; only the latest waits.
+        # A waiting load also waits while `i_hold` is set, which the pipelines
+        # keep set while any pixel which may still read the buffer is in
+        # flight, so entries never change under a pixel drawn before the load.
+        self.lanes    = lanes # CLUT reads per clock
+
+        self.reads    = [Record(CLUTREAD) for i in range(lanes)]
+
+        # TEX0 or TEX2 - Texture Settings, when written
+        self.i_load   = Signal()   # TEX0 or TEX2 is written this cycle
+        self.i_psm    = Signal(6)  # Texture pixel storage format; only indexed formats load
+        self.i_cbp    = Signal(14) # CLUT base pointer, in units of 64 words
+        self.i_cpsm   = Signal(4)  # CLUT pixel storage format; PSMCT32 or PSMCT16
+        self.i_csa    = Signal(5)  # CLUT entry offset of 4-bit textures, in units of 16 entries
+        self.i_cld    = Signal(3)  # CLUT load control; see ClutLoad
+        self.i_csm    = Signal()   # CLUT storage mode; CSM1 (0) or CSM2 (1)
+
+        # TEXCLUT - CLUT position in CSM2
+        self.i_cbw    = Signal(6)  # Width of the buffer holding it, in units of 64 texels
+        self.i_cou    = Signal(6)  # Column, in units of 16 texels
+        self.i_cov    = Signal(10) # Row
+
+        # Forget the last load, as after texture memory is written
+        self.i_invalidate = Signal()
+        self.i_hold   = Signal()   # Pixels may still read the buffer; a waiting load does not start
+        self.o_busy   = Signal()   # A load is under way or waiting; the buffer is not to be read
+
+        # Memory read requests, for loads
+        self.o_req_valid = Signal()   # Read request is valid
+        self.o_req_addr  = Signal(20) # Word address to read
+        self.i_req_ready = Signal()   # Read request is accepted this cycle
+
+        # Memory read responses, in request order and with any latency
+        self.i_resp_valid = Signal()   # Read data is valid
+        self.i_resp_data  = Signal(32) # Read data
+
+        self.r_cbp0   = Signal(14) # CBP0: CLUT base pointer kept for CHANGED_CBP0
+        self.r_cbp1   = Signal(14) # CBP1: CLUT base pointer kept for CHANGED_CBP1
+
+        # The last load made, or under way
+        self.r_loaded = Signal()   # Whether the buffer holds a load
+        self.r_start  = Signal(20) # Its first word
+        self.r_cpsm   = Signal(4)
+        self.r_csa    = Signal(5)
+        self.r_t4     = Signal()   # Whether it was for 4-bit indices
+
+        self.r_pending = Signal()  # A load is waiting for the one under way
+
+        # Each half's even and odd words
+        self.r_clut   = [[Memory(width=16, depth=128) for bank in range(2)] for half in range(2)]
+
+    def elaborate(self, platform):
+        m = Module()
+
+        writes = [[memory.write_port() for memory in half] for half in self.r_clut]
+        for half in range(2):
+            for bank in range(2):
+                m.submodules["write{}_{}".format(half, bank)] = writes[half][bank]
+
+        # Reads take the word's bank from both halves.
+        for k, rec in enumerate(self.reads):
+            r_bank = Signal()
+            m.d.sync += r_bank.eq(rec.i_addr[0])
+            data = []
+            for half in range(2):
+                ports = [memory.read_port() for memory in self.r_clut[half]]
+                for bank, port in enumerate(ports):
+                    m.submodules["read{}_{}_{}".format(k, half, bank)] = port
+                    m.d.comb += port.addr.eq(rec.i_addr[1:])
+                data.append(Mux(r_bank, ports[1].data, ports[0].data))
+            m.d.comb += rec.o_data.eq(Cat(*data))
+
+        # Whether a TEX0 or TEX2 write asks for a load, and whether it would be
+        # the last load over again
+        t8 = Signal()
+        t4 = Signal()
+        m.d.comb += [
+            t8.eq((self.i_psm == PixelFormat.PSMT8) | (self.i_psm == PixelFormat.PSMT8H)),
+            t4.eq((self.i_psm == PixelFormat.PSMT4) | (self.i_psm == PixelFormat.PSMT4HL) |
+                  (self.i_psm == PixelFormat.PSMT4HH))
+        ]
+
+        wanted = Signal()
+        with m.Switch(self.i_cld):
+            with m.Case(ClutLoad.LOAD, ClutLoad.LOAD_CBP0, ClutLoad.LOAD_CBP1):
+                m.d.comb += wanted.eq(1)
+            with m.Case(ClutLoad.CHANGED_CBP0):
+                m.d.comb += wanted.eq(self.i_cbp != self.r_cbp0)
+            with m.Case(ClutLoad.CHANGED_CBP1):
+                m.d.comb += wanted.eq(self.i_cbp != self.r_cbp1)
+
+        start = Signal(20)
+        m.d.comb += start.eq((self.i_cbp << 6) + Mux(self.i_csm, self.i_cov * (self.i_cbw << 5) + (self.i_cou << 3), 0))
+
+        redundant = Signal()
+        m.d.comb += redundant.eq(self.r_loaded & (start == self.r_start) & (self.i_cpsm == self.r_cpsm) &
+                                 (~t4 | (self.i_csa == self.r_csa)) & (t4 == self.r_t4))
+
+        # Loads, a word per response
+        r_ct16 = Signal()
+        r_words = Signal(9)
+        r_base = Signal(8)  # First entry written
+        r_half = Signal()   # Half written by 16-bit entries
+        r_addr = Signal(20)
+        r_req = Signal(9)
+        r_resp = Signal(8)
+
+        m.d.comb += self.o_req_addr.eq(r_addr + r_req)
+
+        with m.FSM() as fsm:
+            with m.State("IDLE"):
+                with m.If(self.r_pending & ~self.i_hold):
+                    ct16 = (self.r_cpsm == PixelFormat.PSMCT16) | (self.r_cpsm == PixelFormat.PSMCT16S)
+                    m.d.sync += [
+                        self.r_pending.eq(0),
+                        r_ct16.eq(ct16),
+                        r_words.eq(Mux(self.r_t4, Mux(ct16, 8, 16), Mux(ct16, 128, 256))),
+                        r_base.eq(Mux(self.r_t4, self.r_csa[0:4] << 4, 0)),
+                        r_half.eq(self.r_t4 & self.r_csa[4]),
+                        r_addr.eq(self.r_start),
+                        r_req.eq(0),
+                        r_resp.eq(0)
+                    ]
+                    m.next = "LOAD"
+
+            with m.State("LOAD"):
+                m.d.comb += self.o_req_valid.eq(r_req != r_words)
+                with m.If(self.o_req_valid & self.i_req_ready):
+                    m.d.sync += r_req.eq(r_req + 1)
+
+                with m.If(self.i_resp_valid):
+                    m.d.sync += r_resp.eq(r_resp + 1)
+                    with m.If(r_ct16):
+                        # Two entries, to both banks of a half
+                        word = r_base[1:] + r_resp
+                        for half in range(2):
+                            for bank in range(2):
+                                m.d.comb += [
+                                    writes[half][bank].en.eq(r_half == half),
+                                    writes[half][bank].addr.eq(word),
+                                    writes[half][bank].data.eq(self.i_resp_data[16 * bank:16 * bank + 16])
+                                ]
+                    with m.Else():
+                        # One entry, to both halves of a bank
+                        word = r_base + r_resp
+                        for half in range(2):
+                            for bank in range(2):
+                                m.d.comb += [
+                                    writes[half][bank].en.eq(word[0] == bank),
+                                    writes[half][bank].addr.eq(word[1:]),
+                                    writes[half][bank].data.eq(self.i_resp_data[16 * half:16 * half + 16])
+                                ]
+
+                    with m.If(r_resp == r_words - 1):
+                        m.next = "IDLE"
+
+        m.d.comb += self.o_busy.eq(self.r_pending | ~fsm.ongoing("IDLE"))
+
+        # A load asked for now waits, even if one is starting.
+        with m.If(self.i_load):
+            with m.Switch(self.i_cld):
+                with m.Case(ClutLoad.LOAD_CBP0, ClutLoad.CHANGED_CBP0):
+                    m.d.sync += self.r_cbp0.eq(self.i_cbp)
+                with m.Case(ClutLoad.LOAD_CBP1, ClutLoad.CHANGED_CBP1):
+                    m.d.sync += self.r_cbp1.eq(self.i_cbp)
+
+            with m.If(wanted & (t8 | t4) & ~redundant):
+                m.d.sync += [
+                    self.r_pending.eq(1),
+                    self.r_loaded.eq(1),
+                    self.r_start.eq(start),
+                    self.r_cpsm.eq(self.i_cpsm),
+                    self.r_csa.eq(self.i_csa),
+                    self.r_t4.eq(t4)
+                ]
+
+        with m.If(self.i_invalidate):
+            m.d.sync += self.r_loaded.eq(0)
+
+        return m
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a ClutBuffer as RTLIL, or test it.")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate random CLUT loads and read every word back, "
+                             "instead of generating RTLIL")
+    args = parser.parse_args()
+
+    clut = ClutBuffer(lanes=2)
+
+    ports = [
+        clut.i_load, clut.i_psm, clut.i_cbp, clut.i_cpsm, clut.i_csa, clut.i_cld, clut.i_csm,
+        clut.i_cbw, clut.i_cou, clut.i_cov,
+        clut.i_invalidate, clut.i_hold, clut.o_busy,
+        clut.o_req_valid, clut.o_req_addr, clut.i_req_ready, clut.i_resp_valid, clut.i_resp_data
+    ]
+    for rec in clut.reads:
+        ports += [rec.i_addr, rec.o_data]
+
+    if args.test:
+        import random
+
+        with pysim.Simulator(clut) as sim:
+            memory = {addr: random.randint(0, 2**32 - 1)
+                      for cbp in [0, 4, 9] for addr in range(cbp * 64, cbp * 64 + 256)}
+            requests = []
+            done = []
+
+            formats = [PixelFormat.PSMCT32, PixelFormat.PSMT8, PixelFormat.PSMT4, PixelFormat.PSMT8H,
+                       PixelFormat.PSMT4HL, PixelFormat.PSMT4HH]
+
+            def load(buffer, start, psm, cpsm, csa):
+                # Software model of a load into 256 words
+                t4 = psm in (PixelFormat.PSMT4, PixelFormat.PSMT4HL, PixelFormat.PSMT4HH)
+                base = (csa & 15) * 16 if t4 else 0
+                for i in range(16 if t4 else 256):
+                    if cpsm == PixelFormat.PSMCT32:
+                        buffer[base + i] = memory[start + i]
+                    else:
+                        entry = (memory[start + i // 2] >> (16 * (i & 1))) & 0xFFFF
+                        shift = 16 if t4 and csa >= 16 else 0
+                        buffer[base + i] = (buffer[base + i] & ~(0xFFFF << shift)) | (entry << shift)
+
+            def process():
+                # Random TEX0 writes from a few CLUTs, often asking for the last
+                # load over again, and some flushes after the CLUTs are rewritten;
+                # after each, every word is read back on both lanes. Some of the
+                # CLUTs are 16-bit, in CSM2, along a row of a buffer 64 texels wide.
+                buffer = [0] * 256
+                cbp0 = cbp1 = 0
+                last = None
+                for n in range(200):
+                    if random.randint(0, 7) == 0:
+                        for addr in memory:
+                            memory[addr] = random.randint(0, 2**32 - 1)
+                        yield clut.i_invalidate.eq(1)
+                        yield
+                        yield clut.i_invalidate.eq(0)
+                        last = None
+
+                    # Sometimes a second TEX0 write follows at once, and its load
+                    # waits for the first. Otherwise, the load is sometimes held.
+                    before = len(requests)
+                    loads = 0
+                    writes = random.choice([1, 1, 1, 2])
+                    hold = writes == 1 and random.randint(0, 2) == 0
+                    yield clut.i_hold.eq(hold)
+                    for write in range(writes):
+                        cbp = random.choice([0, 4, 9])
+                        psm = random.choice(formats)
+                        cpsm = random.choice([PixelFormat.PSMCT32, PixelFormat.PSMCT16])
+                        csa = random.randint(0, 31) if random.randint(0, 1) else 0
+                        cld = random.choice(list(ClutLoad))
+                        csm = random.randint(0, 3) == 0
+                        cou, cov = random.randint(0, 3), random.randint(0, 3)
+                        if csm:
+                            cpsm = PixelFormat.PSMCT16
+                            start = cbp * 64 + cov * 32 + cou * 8
+                        else:
+                            start = cbp * 64
+
+                        wanted = cld in (ClutLoad.LOAD, ClutLoad.LOAD_CBP0, ClutLoad.LOAD_CBP1) or \
+                            (cld == ClutLoad.CHANGED_CBP0 and cbp != cbp0) or \
+                            (cld == ClutLoad.CHANGED_CBP1 and cbp != cbp1)
+                        if cld in (ClutLoad.LOAD_CBP0, ClutLoad.CHANGED_CBP0):
+                            cbp0 = cbp
+                        if cld in (ClutLoad.LOAD_CBP1, ClutLoad.CHANGED_CBP1):
+                            cbp1 = cbp
+                        t4 = psm in (PixelFormat.PSMT4, PixelFormat.PSMT4HL, PixelFormat.PSMT4HH)
+                        indexed = psm != PixelFormat.PSMCT32
+                        if wanted and indexed and last != (start, cpsm, csa if t4 else None, t4):
+                            load(buffer, start, psm, cpsm, csa)
+                            last = (start, cpsm, csa if t4 else None, t4)
+                            loads += (16 if t4 else 256) // (2 if cpsm == PixelFormat.PSMCT16 else 1)
+
+                        yield clut.i_load.eq(1)
+                        yield clut.i_cbp.eq(cbp)
+                        yield clut.i_psm.eq(psm)
+                        yield clut.i_cpsm.eq(cpsm)
+                        yield clut.i_csa.eq(csa)
+                        yield clut.i_cld.eq(cld)
+                        yield clut.i_csm.eq(csm)
+                        yield clut.i_cbw.eq(1)
+                        yield clut.i_cou.eq(cou)
+                        yield clut.i_cov.eq(cov)
+                        yield
+                    yield clut.i_load.eq(0)
+
+                    # A load does not start while held.
+                    if hold:
+                        for i in range(8):
+                            yield
+                        assert len(requests) == before
+                        yield clut.i_hold.eq(0)
+
+                    # A redundant load costs nothing.
+                    yield pysim.Settle()
+                    assert (yield clut.o_busy) == (loads != 0)
+                    while (yield clut.o_busy):
+                        yield
+                    assert len(requests) - before == loads
+
+                    for addr in range(0, 256, 2):
+                        for k, rec in enumerate(clut.reads):
+                            yield rec.i_addr.eq(addr + k)
+                        yield
+                        yield pysim.Settle()
+                        for k, rec in enumerate(clut.reads):
+                            assert (yield rec.o_data) == buffer[addr + k], (n, addr + k)
+                done.append(True)
+
+            def memory_process():
+                # Memory which accepts requests at random and answers them in
+                # order after a random latency
+                responses = []
+                clock = 0
+                while not done:
+                    ready = random.randint(0, 2) != 0
+                    yield clut.i_req_ready.eq(ready)
+                    answer = responses and responses[0][0] <= clock
+                    yield clut.i_resp_valid.eq(bool(answer))
+                    if answer:
+                        yield clut.i_resp_data.eq(responses.pop(0)[1])
+                    yield
+                    clock += 1
+                    if ready and (yield clut.o_req_valid):
+                        addr = yield clut.o_req_addr
+                        requests.append(addr)
+                        responses.append((max([clock] + [t for t, d in responses]) + random.randint(1, 8),
+                                          memory[addr]))
+
+            sim.add_sync_process(process)
+            sim.add_sync_process(memory_process)
+            sim.add_clock(1e-6)
+            sim.run()
+    else:
+        print(rtlil.convert(clut, ports=ports))
@@ -0,0 +1,416 @@
+import argparse
+from nmigen import Cat, Const, Elaboratable, Memory, Module, Mux, Record, Signal
+from nmigen.back import pysim, rtlil
+
+
+# One lane's Z buffer write, by pixel position
+ZWRITE = [
+    ("i_valid", 1),
+    ("o_ready", 1),
+
+    ("i_x", 12), # Q12.0; Pixel X Coordinate
+    ("i_y", 12), # Q12.0; Pixel Y Coordinate
+    ("i_z", 32), # Z written
+    ("i_ahead", 1) # The write is still to come; Z moves the bounds, but the pixel is not counted as written
+]
+
+
+class CoarseZ(Elaboratable):
+    def __init__(self, lanes=16, tiles_x=128, tiles_y=64, bits=16, entries=3):
+        # Keeps a lower and an upper bound on the Z buffer over each 8x8 pixel
+        # tile, so the rasteriser can throw away pixels which are sure to fail a
+        # GEQUAL or GREATER Z test before they take a Z read; see
+        # TriangleRasteriser.
+        #
+        # The bounds follow the Z writes leaving the pipelines, and are only
+        # ever moved outward by a write, so they hold whatever order writes to a
+        # tile come in. Once every pixel of the tile has been written since the
+        # bounds were last drawn in, they are drawn in to the least and the
+        # greatest Z written in that time. Only the top `bits` bits of Z are
+        # kept, rounded down.
+        #
+        # Up to `lanes` writes are taken per clock, so long as they fall in at
+        # most two tiles; lanes writing to a third tile wait. Writes to a tile
+        # are gathered until a clock with none, and then added to its entry in
+        # the table, one tile per clock; queries see them while they are
+        # gathered, so a write counts as soon as it is taken. Writes outside the
+        # tiles_x by tiles_y tiles kept are dropped, and queries there give no
+        # bounds. While the table is being forgotten, writes are dropped too;
+        # a tile missing a write never has every pixel written, so its bounds
+        # stay where they are.
+        #
+        # A write may also be given ahead of time, as a pixel which may lower Z
+        # enters the pipelines. Its Z moves the bounds, and the least and
+        # greatest Z written, at once, but the pixel is not counted as written
+        # until the write itself comes, so bounds drawn in while it is in
+        # flight still hold it.
+        self.lanes    = lanes   # Writes taken per clock
+        self.tiles_x  = tiles_x # Tiles kept across; a power of two
+        self.tiles_y  = tiles_y # Tiles kept down; a power of two
+        self.bits     = bits    # Bits of Z kept
+        self.entries  = entries # Tiles gathered at once; more than two
+
+        self.writes   = [Record(ZWRITE) for i in range(lanes)]
+
+        # Bounds of the tile holding a pixel, one clock after it is asked for
+        self.i_x      = Signal(12)   # Q12.0; Pixel X Coordinate
+        self.i_y      = Signal(12)   # Q12.0; Pixel Y Coordinate
+        self.o_zmin   = Signal(bits) # No Z in the tile has less than this in the top bits
+        self.o_zmax   = Signal(bits) # No Z in the tile has more than this in the top bits
+
+        # Forget every bound, as when the Z buffer is moved or overwritten
+        self.i_invalidate = Signal()
+        self.o_busy   = Signal()     # Bounds are being forgotten; writes are dropped and queries give no bounds
+
+        self.r_sweep  = Signal(range(tiles_x * tiles_y + 1), reset=tiles_x * tiles_y) # Next tile to forget
+
+        # Each tile's entry: its bounds, the least and greatest Z written since
+        # they were last drawn in, and which of its pixels have been written since.
+        self.r_table  = Memory(width=4 * bits + 64, depth=tiles_x * tiles_y, init=[self._entry()] * (tiles_x * tiles_y))
+
+    def _entry(self):
+        # A tile about which nothing is known
+        ones = (1 << self.bits) - 1
+        return (ones << self.bits) | (ones << (2 * self.bits))
+
+    def _tile(self, x, y):
+        # Table index of the tile holding a pixel, and whether the table has it
+        tx = x[3:]
+        ty = y[3:]
+        kept = (tx < self.tiles_x) & (ty < self.tiles_y)
+        index = Cat(tx[:(self.tiles_x - 1).bit_length()], ty[:(self.tiles_y - 1).bit_length()])
+        return index, kept
+
+    def elaborate(self, platform):
+        m = Module()
+
+        bits = self.bits
+
+        m.submodules.query = query = self.r_table.read_port()
+        m.submodules.update = update = self.r_table.read_port(transparent=True)
+        m.submodules.write = write = self.r_table.write_port()
+
+        # Queries
+        index, kept = self._tile(self.i_x, self.i_y)
+        r_index = Signal(len(index))
+        r_kept = Signal()
+        m.d.comb += query.addr.eq(index)
+        m.d.sync += [
+            r_index.eq(index),
+            r_kept.eq(kept & ~self.o_busy)
+        ]
+
+        # Forgetting, one tile per clock
+        m.d.comb += self.o_busy.eq(self.r_sweep != self.tiles_x * self.tiles_y)
+        with m.If(self.i_invalidate):
+            m.d.sync += self.r_sweep.eq(0)
+        with m.Elif(self.o_busy):
+            m.d.sync += self.r_sweep.eq(self.r_sweep + 1)
+
+        # Writes are gathered by tile into a few entries, so that two tiles
+        # may be written to in the same clock, as when pixels enter and leave
+        # the pipelines in different tiles. The first lane writing chooses one
+        # tile, and the first lane writing to another tile the second; other
+        # lanes writing to either join them. A tile takes the entry already
+        # gathering it, or a free one; lanes writing to a tile with neither
+        # wait.
+        entries = self.entries
+        e_valid = [Signal(name="e_valid{}".format(j)) for j in range(entries)]
+        e_tile = [Signal(len(index), name="e_tile{}".format(j)) for j in range(entries)]
+        e_mask = [Signal(64, name="e_mask{}".format(j)) for j in range(entries)]
+        e_zmin = [Signal(bits, name="e_zmin{}".format(j)) for j in range(entries)]
+        e_zmax = [Signal(bits, name="e_zmax{}".format(j)) for j in range(entries)]
+
+        tiles = [self._tile(w.i_x, w.i_y) for w in self.writes]
+        wants = [w.i_valid & kept & ~self.o_busy for w, (tile, kept) in zip(self.writes, tiles)]
+        first = [Signal(len(index), name="first_tile0"), Signal(len(index), name="first_tile1")]
+        first_valid = [Signal(name="first_valid0"), Signal(name="first_valid1")]
+        for want, (tile, kept) in reversed(list(zip(wants, tiles))):
+            with m.If(want):
+                m.d.comb += [
+                    first[0].eq(tile),
+                    first_valid[0].eq(1)
+                ]
+        for want, (tile, kept) in reversed(list(zip(wants, tiles))):
+            with m.If(want & (tile != first[0])):
+                m.d.comb += [
+                    first[1].eq(tile),
+                    first_valid[1].eq(1)
+                ]
+
+        # The entry each chosen tile goes to, one-hot
+        free = [~v for v in e_valid]
+        alloc = [[Signal(name="alloc{}_{}".format(n, j)) for j in range(entries)] for n in range(2)]
+        for j in range(entries):
+            before = sum(free[i] for i in range(j))
+            m.d.comb += [
+                alloc[0][j].eq(free[j] & (before == 0)),
+                alloc[1][j].eq(free[j] & (before == 1))
+            ]
+        match = [[e_valid[j] & (e_tile[j] == first[n]) for j in range(entries)] for n in range(2)]
+        found = [Cat(*match[n]).any() for n in range(2)]
+        target = [[Signal(name="target{}_{}".format(n, j)) for j in range(entries)] for n in range(2)]
+        for j in range(entries):
+            # The second tile takes the second free entry if the first tile
+            # took the first.
+            second = Mux(first_valid[0] & ~found[0], alloc[1][j], alloc[0][j])
+            m.d.comb += [
+                target[0][j].eq(first_valid[0] & Mux(found[0], match[0][j], alloc[0][j])),
+                target[1][j].eq(first_valid[1] & Mux(found[1], match[1][j], second))
+            ]
+        placed = [Cat(*target[n]).any() for n in range(2)]
+
+        take = [Signal(name="take{}".format(k)) for k in range(self.lanes)]
+        for k, (w, want, (tile, kept)) in enumerate(zip(self.writes, wants, tiles)):
+            m.d.comb += [
+                take[k].eq(want & (((tile == first[0]) & placed[0]) | ((tile == first[1]) & placed[1]))),
+                w.o_ready.eq(take[k] | ~kept | ~w.i_valid | self.o_busy)
+            ]
+
+        # An entry not written to in a clock is left, one per clock, and its
+        # tile's entry in the table read.
+        hit = [Signal(name="hit{}".format(j)) for j in range(entries)]
+        leave = [Signal(name="leave{}".format(j)) for j in range(entries)]
+        for j in range(entries):
+            into = [take[k] & Mux(tile == first[0], target[0][j], target[1][j]) for k, (tile, kept) in enumerate(tiles)]
+            m.d.comb += hit[j].eq(Cat(*into).any())
+
+            # What this clock's writes add to the entry
+            mask = Mux(e_valid[j], e_mask[j], 0)
+            zmin = Mux(e_valid[j], e_zmin[j], (1 << bits) - 1)
+            zmax = Mux(e_valid[j], e_zmax[j], 0)
+            for k, w in enumerate(self.writes):
+                z = w.i_z[32 - bits:]
+                mask = mask | Mux(into[k] & ~w.i_ahead, 1 << Cat(w.i_x[0:3], w.i_y[0:3]), 0)
+                zmin = Mux(into[k] & (z < zmin), z, zmin)
+                zmax = Mux(into[k] & (z > zmax), z, zmax)
+
+            earlier = [leave[i] for i in range(j)]
+            m.d.comb += leave[j].eq(e_valid[j] & ~hit[j] & ~(Cat(*earlier).any() if earlier else 0))
+            with m.If(self.i_invalidate):
+                m.d.sync += e_valid[j].eq(0)
+            with m.Elif(hit[j]):
+                m.d.sync += [
+                    e_valid[j].eq(1),
+                    e_tile[j].eq(Mux(target[0][j], first[0], first[1])),
+                    e_mask[j].eq(mask),
+                    e_zmin[j].eq(zmin),
+                    e_zmax[j].eq(zmax)
+                ]
+            with m.Elif(leave[j]):
+                m.d.sync += e_valid[j].eq(0)
+
+        r_valid = Signal()
+        r_tile = Signal(len(index))
+        r_mask = Signal(64)
+        r_zmin = Signal(bits)
+        r_zmax = Signal(bits)
+        m.d.sync += r_valid.eq(Cat(*leave).any())
+        for j in range(entries):
+            with m.If(leave[j]):
+                m.d.comb += update.addr.eq(e_tile[j])
+                m.d.sync += [
+                    r_tile.eq(e_tile[j]),
+                    r_mask.eq(e_mask[j]),
+                    r_zmin.eq(e_zmin[j]),
+                    r_zmax.eq(e_zmax[j])
+                ]
+
+        # A query holds what is gathered, or on its way to the table, too.
+        zmin = query.data[0:bits]
+        zmax = query.data[bits:2 * bits]
+        for valid, tile, low, high in list(zip(e_valid, e_tile, e_zmin, e_zmax)) + [(r_valid, r_tile, r_zmin, r_zmax)]:
+            here = valid & (tile == r_index)
+            zmin = Mux(here & (low < zmin), low, zmin)
+            zmax = Mux(here & (high > zmax), high, zmax)
+        m.d.comb += [
+            self.o_zmin.eq(Mux(r_kept, zmin, 0)),
+            self.o_zmax.eq(Mux(r_kept, zmax, (1 << bits) - 1))
+        ]
+
+        # A clock later, with the tile's entry read, move its bounds out.
+        entry = update.data
+        old_min, old_max = entry[0:bits], entry[bits:2 * bits]
+        old_pmin, old_pmax = entry[2 * bits:3 * bits], entry[3 * bits:4 * bits]
+        old_mask = entry[4 * bits:]
+
+        new_min = Signal(bits)
+        new_max = Signal(bits)
+        new_pmin = Signal(bits)
+        new_pmax = Signal(bits)
+        new_mask = Signal(64)
+        m.d.comb += [
+            new_min.eq(Mux(r_zmin < old_min, r_zmin, old_min)),
+            new_max.eq(Mux(r_zmax > old_max, r_zmax, old_max)),
+            new_pmin.eq(Mux(r_zmin < old_pmin, r_zmin, old_pmin)),
+            new_pmax.eq(Mux(r_zmax > old_pmax, r_zmax, old_pmax)),
+            new_mask.eq(old_mask | r_mask)
+        ]
+
+        # Once every pixel has been written, none is below the least Z written
+        # or above the greatest.
+        full = Signal()
+        m.d.comb += full.eq(new_mask == (1 << 64) - 1)
+
+        with m.If(self.o_busy):
+            m.d.comb += [
+                write.en.eq(1),
+                write.addr.eq(self.r_sweep),
+                write.data.eq(self._entry())
+            ]
+        with m.Elif(r_valid & full):
+            m.d.comb += [
+                write.en.eq(1),
+                write.addr.eq(r_tile),
+                write.data.eq(Cat(new_pmin, new_pmax, Const((1 << bits) - 1, bits), Const(0, bits), Const(0, 64)))
+            ]
+        with m.Elif(r_valid):
+            m.d.comb += [
+                write.en.eq(1),
+                write.addr.eq(r_tile),
+                write.data.eq(Cat(new_min, new_max, new_pmin, new_pmax, new_mask))
+            ]
+
+        return m
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a CoarseZ table as RTLIL, or test it.")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate random writes and check every tile's bounds, "
+                             "instead of generating RTLIL")
+    args = parser.parse_args()
+
+    cz = CoarseZ(lanes=4, tiles_x=4, tiles_y=4)
+
+    ports = [cz.i_x, cz.i_y, cz.o_zmin, cz.o_zmax, cz.i_invalidate, cz.o_busy]
+    for w in cz.writes:
+        ports += [w.i_valid, w.o_ready, w.i_x, w.i_y, w.i_z, w.i_ahead]
+
+    if args.test:
+        import random
+
+        with pysim.Simulator(cz) as sim:
+            zbuf = {}
+            aheads = {}
+
+            def writes(count, low, ahead=False):
+                # Random writes of Z at least `low` to random pixels of a 40x40 area,
+                # some of it outside the table, until `count` have been taken. Some
+                # are given ahead of time if `ahead` is set, and are kept until the
+                # pixel is written again.
+                pending = [None] * 4
+                taken = 0
+                while taken < count:
+                    for k, w in enumerate(cz.writes):
+                        if pending[k] is None and random.randint(0, 1):
+                            pending[k] = (random.randint(0, 39), random.randint(0, 39), random.randint(low, 2**32 - 1),
+                                          ahead and random.randint(0, 3) == 0)
+                        yield w.i_valid.eq(pending[k] is not None)
+                        if pending[k] is not None:
+                            yield w.i_x.eq(pending[k][0])
+                            yield w.i_y.eq(pending[k][1])
+                            yield w.i_z.eq(pending[k][2])
+                            yield w.i_ahead.eq(pending[k][3])
+                    yield
+                    taken_now = []
+                    for k, w in enumerate(cz.writes):
+                        if pending[k] is not None and (yield w.o_ready):
+                            taken_now.append(pending[k])
+                            pending[k] = None
+                            taken += 1
+                    # Writes in a clock are counted before the ones ahead of time.
+                    for x, y, z, early in sorted(taken_now, key=lambda t: t[3]):
+                        if early:
+                            aheads.setdefault((x, y), []).append(z)
+                        else:
+                            zbuf[x, y] = z
+                            aheads.pop((x, y), None)
+                for w in cz.writes:
+                    yield w.i_valid.eq(0)
+                yield; yield
+
+            def check(raised=None, lowered=None):
+                # Every tile's bounds hold the Z of every written pixel, and of every
+                # write ahead of time to a pixel not written since; a tile which has
+                # been fully written has its lower bound raised to `raised` and its
+                # upper bound lowered to `lowered`.
+                for tx in range(5):
+                    for ty in range(5):
+                        yield cz.i_x.eq(8 * tx + random.randint(0, 7))
+                        yield cz.i_y.eq(8 * ty + random.randint(0, 7))
+                        yield; yield
+                        zmin, zmax = (yield cz.o_zmin), (yield cz.o_zmax)
+                        tile = [zbuf[x, y] >> 16 for x in range(8 * tx, 8 * tx + 8) for y in range(8 * ty, 8 * ty + 8)
+                                if (x, y) in zbuf]
+                        early = [z >> 16 for x in range(8 * tx, 8 * tx + 8) for y in range(8 * ty, 8 * ty + 8)
+                                 for z in aheads.get((x, y), [])]
+                        assert all(zmin <= z <= zmax for z in tile + early)
+                        if tx == 4 or ty == 4 or len(tile) < 64:
+                            continue
+                        assert raised is None or zmin >= raised
+                        assert lowered is None or zmax <= lowered
+
+            def process():
+                yield from writes(2000, 0)
+                yield from check()
+                # Every pixel written twice from 0x80000000 to 0xBFFFFFFF draws in
+                # each tile's bounds; the first time round may complete a tile
+                # holding older writes.
+                for x, y in [(x, y) for n in range(2) for x in range(32) for y in range(32)]:
+                    yield cz.writes[0].i_valid.eq(1)
+                    yield cz.writes[0].i_x.eq(x)
+                    yield cz.writes[0].i_y.eq(y)
+                    yield cz.writes[0].i_z.eq(random.randint(0x80000000, 0xBFFFFFFF))
+                    yield
+                    zbuf[x, y] = yield cz.writes[0].i_z
+                yield cz.writes[0].i_valid.eq(0)
+                yield; yield
+                yield from check(0x8000, 0xBFFF)
+                yield from writes(2000, 0x80000000)
+                yield from check(0x8000)
+                # Forgetting leaves no bounds, until the tiles are written again.
+                yield cz.i_invalidate.eq(1)
+                yield
+                yield cz.i_invalidate.eq(0)
+                while (yield cz.o_busy):
+                    yield
+                yield
+                zbuf.clear()
+                yield from check()
+                yield from writes(4000, 0x40000000)
+                yield from check()
+                # Writes ahead of time move the bounds, but do not raise them over
+                # the pixels they are still to write.
+                yield from writes(4000, 0x80000000, ahead=True)
+                yield from check()
+                # Nor does a pixel only ever written ahead of time count towards
+                # raising them.
+                yield cz.writes[0].i_valid.eq(1)
+                yield cz.writes[0].i_x.eq(5)
+                yield cz.writes[0].i_y.eq(5)
+                yield cz.writes[0].i_z.eq(0x40000000)
+                yield
+                zbuf[5, 5] = 0x40000000
+                aheads.pop((5, 5), None)
+                for x, y in [(x, y) for n in range(2) for x in range(32) for y in range(32)]:
+                    yield cz.writes[0].i_valid.eq(1)
+                    yield cz.writes[0].i_x.eq(x)
+                    yield cz.writes[0].i_y.eq(y)
+                    yield cz.writes[0].i_z.eq(random.randint(0xC0000000, 2**32 - 1))
+                    yield cz.writes[0].i_ahead.eq((x, y) == (5, 5))
+                    yield
+                    if (x, y) == (5, 5):
+                        aheads.setdefault((x, y), []).append((yield cz.writes[0].i_z))
+                    else:
+                        zbuf[x, y] = yield cz.writes[0].i_z
+                        aheads.pop((x, y), None)
+                yield cz.writes[0].i_valid.eq(0)
+                yield cz.writes[0].i_ahead.eq(0)
+                yield; yield
+                yield from check()
+
+            sim.add_sync_process(process)
+            sim.add_clock(1e-6)
+            sim.run()
+    else:
+        print(rtlil.convert(cz, ports=ports))
@@ -8,7 +8,73 @@ class PixelFormat(IntEnum):
     PSMCT16  = 2  # R5 G5 B5 A1
     PSMCT16S = 10 # R5 G5 B5 A1
 
+    # Indexed texture formats; texels are CLUT entries
+    PSMT8    = 19 # 8-bit index
+    PSMT4    = 20 # 4-bit index
+    PSMT8H   = 27 # 8-bit index in the top byte of a 32-bit word
+    PSMT4HL  = 36 # 4-bit index in bits 24 to 27 of a 32-bit word
+    PSMT4HH  = 44 # 4-bit index in bits 28 to 31 of a 32-bit word
+
     PSMZ32   = 48 # Z32
     PSMZ24   = 49 # Z24
     PSMZ16   = 50 # Z16
     PSMZ16S  = 58 # Z16
+
+
+class Register(IntEnum):
+    # General purpose registers, written with a register address; registers
+    # ending in _1 or _2 belong to drawing context 1 or 2.
+    PRIM       = 0x00 # Primitive type and attributes
+    RGBAQ      = 0x01 # Vertex colour and Q
+    ST         = 0x02 # Vertex texture coordinates
+    UV         = 0x03 # Vertex texel coordinates
+    XYZF2      = 0x04 # Vertex position and fog; kicks drawing
+    XYZ2       = 0x05 # Vertex position; kicks drawing
+    TEX0_1     = 0x06 # Texture settings
+    TEX0_2     = 0x07
+    CLAMP_1    = 0x08 # Texture wrap mode
+    CLAMP_2    = 0x09
+    FOG        = 0x0A # Vertex fog
+    XYZF3      = 0x0C # Vertex position and fog; no drawing kick
+    XYZ3       = 0x0D # Vertex position; no drawing kick
+    TEX1_1     = 0x14 # Texture LOD settings
+    TEX1_2     = 0x15
+    TEX2_1     = 0x16 # Texture format and CLUT settings
+    TEX2_2     = 0x17
+    XYOFFSET_1 = 0x18 # Primitive to window coordinate offset
+    XYOFFSET_2 = 0x19
+    PRMODECONT = 0x1A # Whether PRIM or PRMODE supplies primitive attributes
+    PRMODE     = 0x1B # Primitive attributes
+    TEXCLUT    = 0x1C # CLUT position
+    SCANMSK    = 0x22 # Raster line drawing mask
+    MIPTBP1_1  = 0x34 # Mipmap levels 1 to 3
+    MIPTBP1_2  = 0x35
+    MIPTBP2_1  = 0x36 # Mipmap levels 4 to 6
+    MIPTBP2_2  = 0x37
+    TEXA       = 0x3B # Texture alpha expansion
+    FOGCOL     = 0x3D # Fog colour
+    TEXFLUSH   = 0x3F # Texture page buffer flush
+    SCISSOR_1  = 0x40 # Scissoring area
+    SCISSOR_2  = 0x41
+    ALPHA_1    = 0x42 # Alpha blending settings
+    ALPHA_2    = 0x43
+    DIMX       = 0x44 # Dither matrix
+    DTHE       = 0x45 # Dither enable
+    COLCLAMP   = 0x46 # Colour clamp enable
+    TEST_1     = 0x47 # Pixel test settings
+    TEST_2     = 0x48
+    PABE       = 0x49 # Per-pixel alpha blending enable
+    FBA_1      = 0x4A # Alpha correction
+    FBA_2      = 0x4B
+    FRAME_1    = 0x4C # Framebuffer settings
+    FRAME_2    = 0x4D
+    ZBUF_1     = 0x4E # Z buffer settings
+    ZBUF_2     = 0x4F
+    BITBLTBUF  = 0x50 # Transfer buffer settings
+    TRXPOS     = 0x51 # Transfer position
+    TRXREG     = 0x52 # Transfer size
+    TRXDIR     = 0x53 # Transfer direction; starts the transfer
+    HWREG      = 0x54 # Transfer data
+    SIGNAL     = 0x60 # SIGNAL event
+    FINISH     = 0x61 # FINISH event
+    LABEL      = 0x62 # LABEL event
@@ -1,4 +1,4 @@
-from nmigen import Elaboratable, Module, Signal
+from nmigen import Elaboratable, EnableInserter, Module, Signal
 
 
 class Dither(Elaboratable):
@@ -22,9 +22,13 @@ class Dither(Elaboratable):
         self.i_dm32   = Signal((3, True))  # (2, 3) dither matrix
         self.i_dm33   = Signal((3, True))  # (3, 3) dither matrix
 
+        self.i_valid   = Signal()   # Input pixel is valid
+        self.o_ready   = Signal()   # Input pixel is accepted this cycle
+
         self.i_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
         self.i_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
         self.i_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.i_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
 
         self.i_x_coord = Signal(16) # Q12.4; Pixel X Coordinate
         self.i_y_coord = Signal(16) # Q12.4; Pixel Y Coordinate
@@ -35,12 +39,21 @@ class Dither(Elaboratable):
         self.i_blue    = Signal(9)  # Q9.0; Pixel Blue Channel
         self.i_alpha   = Signal(8)  # Q9.0; Pixel Alpha (Transparency) Channel
 
+        self.i_fbred   = Signal(8)  # Q8.0; Framebuffer Red Channel
+        self.i_fbgreen = Signal(8)  # Q8.0; Framebuffer Green Channel
+        self.i_fbblue  = Signal(8)  # Q8.0; Framebuffer Blue Channel
+        self.i_fbalpha = Signal(8)  # Q8.0; Framebuffer Alpha (Transparency) Channel
+
         self.i_fbpxfmt = Signal(6)  # Framebuffer Pixel Format
         self.i_zbfmt   = Signal(6)  # Z Buffer Format
 
+        self.o_valid   = Signal()   # Output pixel is valid
+        self.i_ready   = Signal()   # Output pixel is accepted this cycle
+
         self.o_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
         self.o_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
         self.o_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.o_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
 
         self.o_x_coord = Signal(16) # Output X Coordinate
         self.o_y_coord = Signal(16) # Output Y Coordinate
@@ -51,6 +64,11 @@ class Dither(Elaboratable):
         self.o_blue    = Signal(9)  # Output Blue Channel
         self.o_alpha   = Signal(8)  # Output Alpha Channel
 
+        self.o_fbred   = Signal(8)  # Output Framebuffer Red Channel
+        self.o_fbgreen = Signal(8)  # Output Framebuffer Green Channel
+        self.o_fbblue  = Signal(8)  # Output Framebuffer Blue Channel
+        self.o_fbalpha = Signal(8)  # Output Framebuffer Alpha Channel
+
     def _dither(self, m, dither0, dither1, dither2, dither3):
         with m.Switch(self.i_x_coord & 3):
             with m.Case(0):
@@ -81,27 +99,46 @@ class Dither(Elaboratable):
     def elaborate(self, platform):
         m = Module()
 
+        # The stage holds its output until it is accepted.
+        m.d.comb += self.o_ready.eq(~self.o_valid | self.i_ready)
+
         # Move the pipeline along
         m.d.sync += [
+            self.o_valid.eq(self.i_valid),
+
             self.o_rgbrndr.eq(self.i_rgbrndr),
             self.o_arndr.eq(self.i_arndr),
             self.o_zrndr.eq(self.i_zrndr),
 
+            self.o_ctxt.eq(self.i_ctxt),
+
             self.o_x_coord.eq(self.i_x_coord),
             self.o_y_coord.eq(self.i_y_coord),
             self.o_z_coord.eq(self.i_z_coord),
 
+            self.o_fbred.eq(self.i_fbred),
+            self.o_fbgreen.eq(self.i_fbgreen),
+            self.o_fbblue.eq(self.i_fbblue),
+            self.o_fbalpha.eq(self.i_fbalpha),
+
             self.o_alpha.eq(self.i_alpha),
         ]        
 
-        with m.Switch(self.i_y_coord & 3):
-            with m.Case(0):
-                self._dither(m, self.i_dm00, self.i_dm01, self.i_dm02, self.i_dm03)
-            with m.Case(1):
-                self._dither(m, self.i_dm10, self.i_dm11, self.i_dm12, self.i_dm13)
-            with m.Case(2):
-                self._dither(m, self.i_dm20, self.i_dm21, self.i_dm22, self.i_dm23)
-            with m.Case(3):
-                self._dither(m, self.i_dm30, self.i_dm31, self.i_dm32, self.i_dm33)
-
-        return m
+        with m.If(self.i_enable):
+            with m.Switch(self.i_y_coord & 3):
+                with m.Case(0):
+                    self._dither(m, self.i_dm00, self.i_dm01, self.i_dm02, self.i_dm03)
+                with m.Case(1):
+                    self._dither(m, self.i_dm10, self.i_dm11, self.i_dm12, self.i_dm13)
+                with m.Case(2):
+                    self._dither(m, self.i_dm20, self.i_dm21, self.i_dm22, self.i_dm23)
+                with m.Case(3):
+                    self._dither(m, self.i_dm30, self.i_dm31, self.i_dm32, self.i_dm33)
+        with m.Else():
+            m.d.sync += [
+                self.o_red.eq(self.i_red),
+                self.o_green.eq(self.i_green),
+                self.o_blue.eq(self.i_blue)
+            ]
+
+        return EnableInserter(self.o_ready)(m)
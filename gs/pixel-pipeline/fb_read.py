@@ -0,0 +1,259 @@
+import argparse
+from nmigen import Cat, Elaboratable, Module, Mux, Signal
+from nmigen.back import pysim, rtlil
+
+from common import PixelFormat
+from read_queue import ReadQueue
+
+
+class FramebufferRead(Elaboratable):
+    def __init__(self, depth=8):
+        # The framebuffer is read as soon as a pixel enters the pipeline, and the
+        # pixel waits here until its data returns; from then on the data travels
+        # with the pixel, so it is at hand when the destination alpha test and
+        # alpha blending need it.
+        self.i_enable  = Signal()   # Whether pixels need framebuffer data; Off or On
+
+        # FRAME - Framebuffer Settings
+        self.i_fbp     = Signal(9)  # Framebuffer base pointer, in units of 2048 words
+        self.i_fbw     = Signal(6)  # Framebuffer width, in units of 64 pixels
+        self.i_psm     = Signal(6)  # Framebuffer pixel storage format
+
+        self.i_valid   = Signal()   # Input pixel is valid
+        self.o_ready   = Signal()   # Input pixel is accepted this cycle
+
+        self.i_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
+        self.i_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
+        self.i_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.i_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.i_abe     = Signal()   # Whether to alpha blend this pixel (ABE); Off or On
+
+        self.i_x_coord = Signal(16) # Q12.4; Pixel X Coordinate
+        self.i_y_coord = Signal(16) # Q12.4; Pixel Y Coordinate
+        self.i_z_coord = Signal(32) # Float32; Pixel Z Coordinate
+
+        self.i_red     = Signal(8)  # Q8.0; Pixel Red Channel
+        self.i_green   = Signal(8)  # Q8.0; Pixel Green Channel
+        self.i_blue    = Signal(8)  # Q8.0; Pixel Blue Channel
+        self.i_alpha   = Signal(8)  # Q8.0; Pixel Alpha (Transparency) Channel
+
+        # Memory read requests; the buffer is laid out linearly, a row at a time.
+        self.o_req_valid = Signal()   # Read request is valid
+        self.o_req_addr  = Signal(20) # Word address to read
+        self.i_req_ready = Signal()   # Read request is accepted this cycle
+
+        # Memory read responses, in request order and with any latency
+        self.i_resp_valid = Signal()   # Read data is valid
+        self.i_resp_data  = Signal(32) # Read data
+
+        self.o_valid   = Signal()   # Output pixel is valid
+        self.i_ready   = Signal()   # Output pixel is accepted this cycle
+
+        self.o_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
+        self.o_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
+        self.o_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.o_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.o_abe     = Signal()   # Whether to alpha blend this pixel (ABE); Off or On
+
+        self.o_x_coord = Signal(16) # Output X Coordinate
+        self.o_y_coord = Signal(16) # Output Y Coordinate
+        self.o_z_coord = Signal(32) # Output Z Coordinate
+
+        self.o_red     = Signal(8)  # Output Red Channel
+        self.o_green   = Signal(8)  # Output Green Channel
+        self.o_blue    = Signal(8)  # Output Blue Channel
+        self.o_alpha   = Signal(8)  # Output Alpha Channel
+
+        # Framebuffer contents, expanded to 8 bits per channel; 0 if not read
+        self.o_fbred   = Signal(8)  # Output Framebuffer Red Channel
+        self.o_fbgreen = Signal(8)  # Output Framebuffer Green Channel
+        self.o_fbblue  = Signal(8)  # Output Framebuffer Blue Channel
+        self.o_fbalpha = Signal(8)  # Output Framebuffer Alpha Channel
+
+        # Pixels wait here for their framebuffer data, along with how to decode
+        # it; the settings may have moved on to another context's by the time
+        # the data returns.
+        self.r_queue   = ReadQueue(width=len(Cat(self._pixel("i"))) + 3, depth=depth)
+
+    def _pixel(self, d):
+        return [getattr(self, d + "_" + name) for name in [
+            "rgbrndr", "arndr", "zrndr", "ctxt", "abe",
+            "x_coord", "y_coord", "z_coord",
+            "red", "green", "blue", "alpha"
+        ]]
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.queue = queue = self.r_queue
+
+        upper = Signal()
+        o_half_width = Signal()
+        o_no_alpha = Signal()
+
+        half_width = Signal()
+        no_alpha = Signal()
+        m.d.comb += [
+            half_width.eq((self.i_psm == PixelFormat.PSMCT16) | (self.i_psm == PixelFormat.PSMCT16S)),
+            no_alpha.eq(self.i_psm == PixelFormat.PSMCT24)
+        ]
+
+        # Pixels that write nothing have no use for the framebuffer.
+        read = Signal()
+        m.d.comb += read.eq((self.i_rgbrndr | self.i_arndr | self.i_zrndr) & self.i_enable)
+
+        x = self.i_x_coord[4:]
+        y = self.i_y_coord[4:]
+        offset = Signal(20)
+        m.d.comb += offset.eq(y * (self.i_fbw << 6) + x)
+
+        m.d.comb += [
+            queue.i_valid.eq(self.i_valid),
+            self.o_ready.eq(queue.o_ready),
+            queue.i_read.eq(read),
+            queue.i_addr.eq((self.i_fbp << 11) + Mux(half_width, offset >> 1, offset)),
+            queue.i_data.eq(Cat(*self._pixel("i"), half_width & x[0], half_width, no_alpha)),
+
+            self.o_req_valid.eq(queue.o_req_valid),
+            self.o_req_addr.eq(queue.o_req_addr),
+            queue.i_req_ready.eq(self.i_req_ready),
+            queue.i_resp_valid.eq(self.i_resp_valid),
+            queue.i_resp_data.eq(self.i_resp_data),
+
+            self.o_valid.eq(queue.o_valid),
+            queue.i_ready.eq(self.i_ready),
+            Cat(*self._pixel("o"), upper, o_half_width, o_no_alpha).eq(queue.o_data)
+        ]
+
+        data = queue.o_resp
+        half = Signal(16)
+        m.d.comb += half.eq(Mux(upper, data[16:32], data[0:16]))
+
+        with m.If(~queue.o_read):
+            m.d.comb += [
+                self.o_fbred.eq(0),
+                self.o_fbgreen.eq(0),
+                self.o_fbblue.eq(0),
+                self.o_fbalpha.eq(0)
+            ]
+        with m.Elif(o_half_width):
+            # R5 G5 B5 A1; the alpha bit becomes the top bit of alpha.
+            m.d.comb += [
+                self.o_fbred.eq(half[0:5] << 3),
+                self.o_fbgreen.eq(half[5:10] << 3),
+                self.o_fbblue.eq(half[10:15] << 3),
+                self.o_fbalpha.eq(half[15] << 7)
+            ]
+        with m.Else():
+            # PSMCT24 has no alpha; it reads as 1.0.
+            m.d.comb += [
+                self.o_fbred.eq(data[0:8]),
+                self.o_fbgreen.eq(data[8:16]),
+                self.o_fbblue.eq(data[16:24]),
+                self.o_fbalpha.eq(Mux(o_no_alpha, 0x80, data[24:32]))
+            ]
+
+        return m
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a FramebufferRead as RTLIL, or test it.")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate reads against a fixed-latency memory, instead of generating RTLIL")
+    args = parser.parse_args()
+
+    fbrd = FramebufferRead()
+
+    ports = [
+        fbrd.i_enable,
+        fbrd.i_fbp, fbrd.i_fbw, fbrd.i_psm,
+
+        fbrd.i_valid, fbrd.o_ready,
+        fbrd.i_rgbrndr, fbrd.i_arndr, fbrd.i_zrndr, fbrd.i_ctxt, fbrd.i_abe,
+        fbrd.i_x_coord, fbrd.i_y_coord, fbrd.i_z_coord,
+        fbrd.i_red, fbrd.i_green, fbrd.i_blue, fbrd.i_alpha,
+
+        fbrd.o_req_valid, fbrd.o_req_addr, fbrd.i_req_ready,
+        fbrd.i_resp_valid, fbrd.i_resp_data,
+
+        fbrd.o_valid, fbrd.i_ready,
+        fbrd.o_rgbrndr, fbrd.o_arndr, fbrd.o_zrndr, fbrd.o_ctxt, fbrd.o_abe,
+        fbrd.o_x_coord, fbrd.o_y_coord, fbrd.o_z_coord,
+        fbrd.o_red, fbrd.o_green, fbrd.o_blue, fbrd.o_alpha,
+        fbrd.o_fbred, fbrd.o_fbgreen, fbrd.o_fbblue, fbrd.o_fbalpha,
+    ]
+
+    if args.test:
+        import random
+
+        # Framebuffer contents, one word per address
+        memory = {}
+        latency = 5
+
+        with pysim.Simulator(fbrd) as sim:
+            def pixel_test(psm, coords):
+                # Memory with a fixed read latency, answering one request per clock
+                responses = []
+                results = []
+                sent = 0
+                clock = 0
+
+                yield fbrd.i_enable.eq(1)
+                yield fbrd.i_fbp.eq(3)
+                yield fbrd.i_fbw.eq(2)
+                yield fbrd.i_psm.eq(psm)
+                yield fbrd.i_req_ready.eq(1)
+                yield fbrd.i_ready.eq(1)
+
+                while len(results) < len(coords):
+                    if sent < len(coords):
+                        x, y = coords[sent]
+                        yield fbrd.i_valid.eq(1)
+                        yield fbrd.i_rgbrndr.eq(1)
+                        yield fbrd.i_x_coord.eq(x << 4)
+                        yield fbrd.i_y_coord.eq(y << 4)
+                    else:
+                        yield fbrd.i_valid.eq(0)
+
+                    ready = responses and responses[0][0] <= clock
+                    yield fbrd.i_resp_valid.eq(bool(ready))
+                    if ready:
+                        yield fbrd.i_resp_data.eq(responses.pop(0)[1])
+
+                    yield
+                    clock += 1
+
+                    if (yield fbrd.o_req_valid) and (yield fbrd.i_req_ready):
+                        addr = yield fbrd.o_req_addr
+                        responses.append((clock + latency, memory.setdefault(addr, random.randint(0, 2**32 - 1))))
+                    if sent < len(coords) and (yield fbrd.o_ready):
+                        sent += 1
+                    if (yield fbrd.o_valid):
+                        results.append(((yield fbrd.o_x_coord) >> 4, (yield fbrd.o_y_coord) >> 4,
+                                        (yield fbrd.o_fbred), (yield fbrd.o_fbgreen),
+                                        (yield fbrd.o_fbblue), (yield fbrd.o_fbalpha)))
+
+                # After the memory latency has been filled, one pixel should leave per clock.
+                assert clock <= len(coords) + latency + 4
+
+                for (x, y), (o_x, o_y, *rgba) in zip(coords, results):
+                    assert (o_x, o_y) == (x, y)
+                    offset = y * 128 + x
+                    if psm in (PixelFormat.PSMCT32, PixelFormat.PSMCT24):
+                        word = memory[3 * 2048 + offset]
+                        alpha = 0x80 if psm == PixelFormat.PSMCT24 else word >> 24
+                        assert rgba == [word & 0xFF, (word >> 8) & 0xFF, (word >> 16) & 0xFF, alpha]
+                    else:
+                        half = memory[3 * 2048 + (offset >> 1)] >> (16 * (x & 1))
+                        assert rgba == [(half & 0x1F) << 3, ((half >> 5) & 0x1F) << 3,
+                                        ((half >> 10) & 0x1F) << 3, ((half >> 15) & 1) << 7]
+
+            def pixels():
+                for psm in [PixelFormat.PSMCT32, PixelFormat.PSMCT24, PixelFormat.PSMCT16, PixelFormat.PSMCT16S]:
+                    coords = [(random.randint(0, 127), random.randint(0, 63)) for i in range(32)]
+                    yield from pixel_test(psm, coords)
+
+            sim.add_sync_process(pixels)
+            sim.add_clock(1e-6)
+            sim.run()
+    else:
+        print(rtlil.convert(fbrd, ports=ports))
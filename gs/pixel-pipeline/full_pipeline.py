@@ -1,11 +1,45 @@
-from nmigen import Elaboratable, Module, Record, Signal
-from nmigen.back import verilog
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
 
-from common import Register
-from pixel_pipeline import PixelPipeline
+from nmigen import Cat, Elaboratable, Module, Mux, Record, Signal
+from nmigen.back import pysim, rtlil, verilog
+from nmigen.lib.fifo import SyncFIFO
+
+from alpha_blend import BlendAlpha, BlendRGB
+from clut import ClutBuffer, ClutLoad
+from coarse_z import CoarseZ
+from common import PixelFormat, Register
+from pixel_pipeline import CONTEXT, PixelPipeline
+from scoreboard import Scoreboard
+from skid_buffer import SkidBuffer
+from write_combiner import WriteCombiner
+from z_test import ZTestMode
+
+
+# Settings shared by every pixel in flight, as held while a write to them waits
+GLOBALS = [
+    ("texa_ta0", 8),     # TEXA: Alpha of 24-bit texels, and of 16-bit texels with A = 0
+    ("texa_aem", 1),     # TEXA: Whether texels with R = G = B = 0 are transparent
+    ("texa_ta1", 8),     # TEXA: Alpha of 16-bit texels with A = 1
+    ("pabe_pabe", 1),    # PABE: Whether to perform per-pixel alpha blending
+    ("dthe_dthe", 1),    # DTHE: Whether to perform dithering
+    ("colclamp", 1)      # COLCLAMP: Whether to saturate or overflow colour channels
+] + [
+    ("dimx_dm{}{}".format(x, y), 3) # DIMX: Dither matrix; see PipelineGroup.r_dimx_dm
+    for x in range(4) for y in range(4)
+]
 
 
 PIPE = [
+    ("i_valid", 1),
+    ("o_ready", 1),
+
     ("i_rgbrndr", 1),
     ("i_arndr", 1),
     ("i_zrndr", 1),
@@ -19,115 +53,250 @@ PIPE = [
     ("i_blue", 8),
     ("i_alpha", 8),
 
-    ("o_rgbrndr", 1),
-    ("o_arndr", 1),
-    ("o_zrndr", 1),
+    ("i_u", 16),
+    ("i_v", 16),
+
+    ("o_fbreq_valid", 1),
+    ("o_fbreq_addr", 20),
+    ("i_fbreq_ready", 1),
+    ("i_fbresp_valid", 1),
+    ("i_fbresp_data", 32),
 
-    ("o_x_coord", 16),
-    ("o_y_coord", 16),
-    ("o_z_coord", 32),
+    ("o_zreq_valid", 1),
+    ("o_zreq_addr", 20),
+    ("i_zreq_ready", 1),
+    ("i_zresp_valid", 1),
+    ("i_zresp_data", 32),
 
-    ("o_red", 8),
-    ("o_green", 8),
-    ("o_blue", 8),
-    ("o_alpha", 8)
+    ("o_texreq_valid", 1),
+    ("o_texreq_addr", 20),
+    ("i_texreq_ready", 1),
+    ("i_texresp_valid", 1),
+    ("i_texresp_data", 32)
 ]
 
 class PipelineGroup(Elaboratable):
-    def __init__(self, width):
-        self.width        = width
+    def __init__(self, width, depth=8, dither=True, blend=True, blend_latency=1, bypass=False, hazard_bits=10,
+                 coarse_z=False, coarse_z_tiles_x=128, coarse_z_tiles_y=64, texture=True, texture_ways=2,
+                 texture_lines=32, texture_filter=True):
+        self.width        = width   # Pipelines, and so pixels per clock
+        self.depth        = depth   # Pixels each pipeline can have waiting on each buffer read
+        self.dither       = dither  # Whether the pipelines dither; see PixelPipeline
+        self.blend        = blend   # Whether the pipelines alpha blend; see PixelPipeline
+        self.blend_latency = blend_latency # Clocks spent blending; see AlphaBlend
+        self.bypass       = bypass  # Whether pixels skip stages which would do nothing to them
+        self.hazard_bits  = hazard_bits # Hash width of the framebuffer and Z buffer scoreboards; see Scoreboard
+        self.coarse_z     = coarse_z # Whether to keep Z bounds per tile for the rasteriser; see CoarseZ
+        self.coarse_z_tiles_x = coarse_z_tiles_x # Tiles kept across by the coarse Z table; see CoarseZ
+        self.coarse_z_tiles_y = coarse_z_tiles_y # Tiles kept down by the coarse Z table; see CoarseZ
+        self.texture      = texture # Whether the pipelines texture; see PixelPipeline
+        self.texture_ways = texture_ways   # Lines per set of each pipeline's texel cache; see TextureUnit
+        self.texture_lines = texture_lines # Sets of each pipeline's texel cache; see TextureUnit
+        self.texture_filter = texture_filter # Whether the pipelines filter textures bilinearly; see TextureUnit
 
-        # ALPHA - Alpha Blending
-        self.i_blend_a    = Signal(2) # Blending Parameter A; see BlendRGB
-        self.i_blend_b    = Signal(2) # Blending Parameter B; see BlendRGB
-        self.i_blend_c    = Signal(2) # Blending Parameter C; see BlendAlpha
-        self.i_blend_d    = Signal(2) # Blending Parameter D; see BlendRGB
-        self.i_blend_fix  = Signal(8) # Q8.0; Fixed alpha value
-
-        # PABE - Per-Pixel Alpha Blending Enable
-        self.i_pabe_pabe  = Signal()  # Whether to perform per-pixel alpha blending
+        # Drawing contexts 1 and 2; see CONTEXT. Each context has two slots, and
+        # each pixel is tagged with the slot it was drawn with, so a context
+        # may be rewritten while pixels drawn with its old settings are still
+        # in the pipelines. A write to a context is held in its shadow, with
+        # new pixels of that context held back, until one of its slots has no
+        # pixel left in flight; the shadow is copied there, and new pixels use
+        # that slot from then on.
+        self.r_context    = [Record(CONTEXT) for i in range(4)] # Slot 2n + v holds a version of context n
+        self.r_current    = [Signal() for i in range(2)]        # The version new pixels of each context use
+        self.r_shadow     = [Record(CONTEXT) for i in range(2)] # Contexts as last written
+        self.r_shadow_valid = [Signal() for i in range(2)]      # They have yet to take effect
 
         # PRIM/PRMODE - Primitive Settings
-        self.i_prim_abe   = Signal()  # Whether to perform alpha blending
-
-        # TEST - Pixel Test Settings
-        self.i_test_ate   = Signal()  # Whether to perform alpha testing
-        self.i_test_atst  = Signal(3) # Alpha test to perform
-        self.i_test_aref  = Signal(8) # Reference alpha value
-        self.i_test_afail = Signal(2) # Action to perform on test failure
-        self.i_test_date  = Signal()  # Whether to perform destination alpha testing
-        self.i_test_datm  = Signal()  # Destination alpha test comparison value
-        self.i_test_zte   = Signal()  # Z test enable (buggy)
-        self.i_test_ztst  = Signal(2) # Z test type
+        self.r_prim_tme   = Signal()  # PRIM: Whether to perform texture mapping
+        self.r_prim_abe   = Signal()  # PRIM: Whether to perform alpha blending
+        self.r_prim_ctxt  = Signal()  # PRIM: Drawing context to use
+        self.r_prmode_tme = Signal()  # PRMODE: Whether to perform texture mapping
+        self.r_prmode_abe = Signal()  # PRMODE: Whether to perform alpha blending
+        self.r_prmode_ctxt = Signal() # PRMODE: Drawing context to use
+
+        # PRMODECONT - Primitive Settings Control
+        self.r_prmodecont_ac = Signal(reset=1) # Whether PRIM (1) or PRMODE (0) supplies the settings
+
+        # TEXA - Texture Alpha Expansion
+        self.r_texa_ta0   = Signal(8) # Alpha of 24-bit texels, and of 16-bit texels with A = 0
+        self.r_texa_aem   = Signal()  # Whether texels with R = G = B = 0 are transparent
+        self.r_texa_ta1   = Signal(8) # Alpha of 16-bit texels with A = 1
+
+        # PABE - Per-Pixel Alpha Blending Enable
+        self.r_pabe_pabe  = Signal()  # Whether to perform per-pixel alpha blending
 
         # DIMX - Dither Matrix
-        self.i_dimx_dm    = [[Signal((3, True)) for i in range(4)] for i in range(4)]
+        self.r_dimx_dm    = [[Signal((3, True)) for i in range(4)] for i in range(4)]
 
         # DTHE - Dither Enable
-        self.i_dthe_dthe  = Signal()  # Whether to perform dithering
+        self.r_dthe_dthe  = Signal()  # Whether to perform dithering
 
         # COLCLAMP - Colour Clamping Enable
-        self.i_colclamp   = Signal()  # Whether to saturate or overflow colour channels
+        self.r_colclamp   = Signal()  # Whether to saturate or overflow colour channels
 
-        # FBA - Framebuffer Alpha Correction value
-        self.i_fba_fba    = Signal()  # Value ORed with most significant bit of alpha channel.
+        # TEXCLUT - CLUT position in CSM2; see ClutBuffer
+        self.r_texclut_cbw = Signal(6)  # Width of the buffer holding it, in units of 64 texels
+        self.r_texclut_cou = Signal(6)  # Column, in units of 16 texels
+        self.r_texclut_cov = Signal(10) # Row
 
-        # FRAME - Framebuffer Settings
-        self.i_frame_psm  = Signal(6) # Framebuffer pixel storage format
+        # XYOFFSET and SCISSOR of each context. No pixel in flight depends on
+        # them, so writes take effect at once.
+        self.r_xyoffset_ofx  = [Signal(16) for i in range(2)]             # Q12.4; X offset
+        self.r_xyoffset_ofy  = [Signal(16) for i in range(2)]             # Q12.4; Y offset
+        self.r_scissor_scax0 = [Signal(11) for i in range(2)]             # Q11.0; leftmost column
+        self.r_scissor_scax1 = [Signal(11, reset=2047) for i in range(2)] # Q11.0; rightmost column
+        self.r_scissor_scay0 = [Signal(11) for i in range(2)]             # Q11.0; top row
+        self.r_scissor_scay1 = [Signal(11, reset=2047) for i in range(2)] # Q11.0; bottom row
 
-        # ZBUF - Z Buffer Settings
-        self.i_zbuf_psm   = Signal(4) # Z buffer pixel storage format
+        # The XYOFFSET and SCISSOR of the current primitive's context, for the
+        # rasterisers; see SpriteGenerator and TriangleRasteriser.
+        self.o_ofx        = Signal(16) # Q12.4; X offset
+        self.o_ofy        = Signal(16) # Q12.4; Y offset
+        self.o_scax0      = Signal(11) # Q11.0; leftmost column
+        self.o_scax1      = Signal(11) # Q11.0; rightmost column
+        self.o_scay0      = Signal(11) # Q11.0; top row
+        self.o_scay1      = Signal(11) # Q11.0; bottom row
+
+        # TEXA, PABE, DIMX, DTHE and COLCLAMP are not tagged per pixel like the
+        # contexts, so a write to them is held in r_next, with new pixels held
+        # back, until no pixel is left in flight to see the change.
+        self.r_next       = Record(GLOBALS) # Shared settings as last written
+        self.r_next_valid = Signal()        # They have yet to take effect
 
         self.pipes        = [Record(PIPE) for i in range(width)]
 
+        # Pixel writes leave as bursts of whole lines, framebuffer and Z buffer
+        # apart; see WriteCombiner.
+        self.i_flush      = Signal()  # Write out all pixels held for writing
+        self.o_idle       = Signal()  # No pixel is held for writing
+
+        self.r_pipes      = [PixelPipeline(depth=depth, dither=dither, blend=blend, blend_latency=blend_latency,
+                                           bypass=bypass, hazard_bits=0, texture=texture,
+                                           texture_ways=texture_ways, texture_lines=texture_lines,
+                                           texture_filter=texture_filter)
+                             for i in range(width)]
+
+        # Clocks from a pixel entering to its writes reaching the write
+        # combiners, without stalls or memory reads
+        self.latency      = self.r_pipes[0].latency + 1
+
+        # Pixels of each context slot in the pipelines
+        self.r_drawing    = [Signal(range(width * self.r_pipes[0].capacity + 1)) for i in range(4)]
+
+        # A pixel enters only once no pixel at the same position is in flight
+        # in any pipeline, as the rasterisers place pixels on lanes in
+        # different ways. Pixels are claimed as they enter, so the pixels of a
+        # span must be offered together, and the next span only once all of
+        # them have entered. A pixel leaves each scoreboard when the tests drop
+        # it, when it leaves its pipeline without a write to that buffer, or
+        # when that write reaches the write combiner, whose reads see it
+        # from then on.
+        #
+        # Only pixels whose context may read or write a buffer claim its
+        # scoreboard, or wait on it. Pixels which only write still claim it, so
+        # that a later read waits for their write, and writes from different
+        # lanes land in the order they were drawn.
+        self.r_fb_hazards = Scoreboard(bits=hazard_bits, claims=width, releases=4 * width)
+        self.r_z_hazards  = Scoreboard(bits=hazard_bits, claims=width, releases=4 * width)
+
+        self.r_fb_write   = WriteCombiner(lanes=width)
+        self.r_z_write    = WriteCombiner(lanes=width)
+
+        # Framebuffer memory burst writes
+        self.o_fbw_valid  = Signal()                            # Burst is valid
+        self.o_fbw_addr   = Signal.like(self.r_fb_write.o_addr) # Line address
+        self.o_fbw_data   = Signal.like(self.r_fb_write.o_data) # Line data
+        self.o_fbw_mask   = Signal.like(self.r_fb_write.o_mask) # Byte write mask
+        self.i_fbw_ready  = Signal()                            # Burst is accepted this cycle
+
+        # Z buffer memory burst writes
+        self.o_zw_valid   = Signal()                            # Burst is valid
+        self.o_zw_addr    = Signal.like(self.r_z_write.o_addr)  # Line address
+        self.o_zw_data    = Signal.like(self.r_z_write.o_data)  # Line data
+        self.o_zw_mask    = Signal.like(self.r_z_write.o_mask)  # Byte write mask
+        self.i_zw_ready   = Signal()                            # Burst is accepted this cycle
+
+        # Register writes
+        self.i_write      = Signal()   # Register write is valid
         self.i_address    = Signal(9)  # 8-bit address, plus "privilege" bit
         self.i_data       = Signal(64)
 
-    def _add_pipeline_settings(self, m, pipe, rec):
-        m.d.sync += [
-            pipe.i_blend_a.eq(self.i_blend_a),
-            pipe.i_blend_b.eq(self.i_blend_b),
-            pipe.i_blend_c.eq(self.i_blend_c),
-            pipe.i_blend_d.eq(self.i_blend_d),
-            pipe.i_blend_fix.eq(self.i_blend_fix),
-
-            pipe.i_pabe_pabe.eq(self.i_pabe_pabe),
-
-            pipe.i_prim_abe.eq(self.i_prim_abe),
-
-            pipe.i_test_ate.eq(self.i_test_ate),
-            pipe.i_test_atst.eq(self.i_test_atst),
-            pipe.i_test_aref.eq(self.i_test_aref),
-            pipe.i_test_afail.eq(self.i_test_afail),
-            pipe.i_test_date.eq(self.i_test_date),
-            pipe.i_test_datm.eq(self.i_test_datm),
-            pipe.i_test_zte.eq(self.i_test_zte),
-            pipe.i_test_ztst.eq(self.i_test_ztst),
-
-            pipe.i_dimx_dm00.eq(self.i_dimx_dm[0][0]),
-            pipe.i_dimx_dm01.eq(self.i_dimx_dm[0][1]),
-            pipe.i_dimx_dm02.eq(self.i_dimx_dm[0][2]),
-            pipe.i_dimx_dm03.eq(self.i_dimx_dm[0][3]),
-            pipe.i_dimx_dm10.eq(self.i_dimx_dm[1][0]),
-            pipe.i_dimx_dm11.eq(self.i_dimx_dm[1][1]),
-            pipe.i_dimx_dm12.eq(self.i_dimx_dm[1][2]),
-            pipe.i_dimx_dm13.eq(self.i_dimx_dm[1][3]),
-            pipe.i_dimx_dm20.eq(self.i_dimx_dm[2][0]),
-            pipe.i_dimx_dm21.eq(self.i_dimx_dm[2][1]),
-            pipe.i_dimx_dm22.eq(self.i_dimx_dm[2][2]),
-            pipe.i_dimx_dm23.eq(self.i_dimx_dm[2][3]),
-            pipe.i_dimx_dm30.eq(self.i_dimx_dm[3][0]),
-            pipe.i_dimx_dm31.eq(self.i_dimx_dm[3][1]),
-            pipe.i_dimx_dm32.eq(self.i_dimx_dm[3][2]),
-            pipe.i_dimx_dm33.eq(self.i_dimx_dm[3][3]),
-
-            pipe.i_dthe_dthe.eq(self.i_dthe_dthe),
-
-            pipe.i_colclamp.eq(self.i_colclamp),
-            pipe.i_fba_fba.eq(self.i_fba_fba),
-
-            pipe.i_frame_psm.eq(self.i_frame_psm),
-            pipe.i_zbuf_psm.eq(self.i_zbuf_psm),
+        # Coarse Z bounds of the tile holding a pixel, one clock after it is
+        # asked for. They follow the Z buffer of the current primitive's
+        # context; without coarse Z, or when nothing is known, the bounds are 0
+        # and all ones.
+        # Each lane gives the bounds its Z writes as they leave the pipeline,
+        # and, ahead of time, the Z of each pixel which may lower Z (ZTE off or
+        # ZTST ALWAYS) before it is let in, so pixels in flight are never
+        # missed.
+        self.i_coarse_x   = Signal(12) # Q12.0; Pixel X Coordinate
+        self.i_coarse_y   = Signal(12) # Q12.0; Pixel Y Coordinate
+        self.o_coarse_zmin = Signal(16) # No Z in the tile has less than this in the top 16 bits
+        self.o_coarse_zmax = Signal(16, reset=0xFFFF) # No Z in the tile has more than this in the top 16 bits
+
+        if coarse_z:
+            self.r_coarse_z = CoarseZ(lanes=2 * width, tiles_x=coarse_z_tiles_x, tiles_y=coarse_z_tiles_y)
+        self.r_coarse_zbp = Signal(9) # Z buffer the coarse Z bounds describe
+        self.r_coarse_psm = Signal(4) # Its format
+
+        # The CLUT, shared by every pipeline, is loaded on TEX0 and TEX2 writes;
+        # see ClutBuffer. A load waits until no pixel is left in flight to read
+        # the old entries, and new pixels are held until it is done.
+        if texture:
+            self.r_clut   = ClutBuffer(lanes=width)
+
+        # CLUT memory reads, in request order and with any latency
+        self.o_clutreq_valid = Signal()   # Read request is valid
+        self.o_clutreq_addr  = Signal(20) # Word address to read
+        self.i_clutreq_ready = Signal()   # Read request is accepted this cycle
+        self.i_clutresp_valid = Signal()   # Read data is valid
+        self.i_clutresp_data  = Signal(32) # Read data
+
+    def _add_pipeline_settings(self, m, pipe, rec, tme, abe, slot, hold, fb_read, z_read):
+        # The settings are held once, in the decoded registers, and shared by
+        # every pipeline. Each pipeline picks the context of each of its pixels
+        # itself, from the slot tag that goes in with the pixel; TME and ABE go
+        # in with the pixel too.
+        m.d.comb += [pipe.i_context[n].eq(ctx) for n, ctx in enumerate(self.r_context)]
+        m.d.comb += [
+            pipe.i_tme.eq(tme),
+            pipe.i_abe.eq(abe),
+            pipe.i_ctxt.eq(slot),
+
+            pipe.i_texa_ta0.eq(self.r_texa_ta0),
+            pipe.i_texa_aem.eq(self.r_texa_aem),
+            pipe.i_texa_ta1.eq(self.r_texa_ta1),
+            pipe.i_texflush.eq(self.i_write & (self.i_address == Register.TEXFLUSH)),
+
+            pipe.i_pabe_pabe.eq(self.r_pabe_pabe),
+
+            pipe.i_dimx_dm00.eq(self.r_dimx_dm[0][0]),
+            pipe.i_dimx_dm01.eq(self.r_dimx_dm[0][1]),
+            pipe.i_dimx_dm02.eq(self.r_dimx_dm[0][2]),
+            pipe.i_dimx_dm03.eq(self.r_dimx_dm[0][3]),
+            pipe.i_dimx_dm10.eq(self.r_dimx_dm[1][0]),
+            pipe.i_dimx_dm11.eq(self.r_dimx_dm[1][1]),
+            pipe.i_dimx_dm12.eq(self.r_dimx_dm[1][2]),
+            pipe.i_dimx_dm13.eq(self.r_dimx_dm[1][3]),
+            pipe.i_dimx_dm20.eq(self.r_dimx_dm[2][0]),
+            pipe.i_dimx_dm21.eq(self.r_dimx_dm[2][1]),
+            pipe.i_dimx_dm22.eq(self.r_dimx_dm[2][2]),
+            pipe.i_dimx_dm23.eq(self.r_dimx_dm[2][3]),
+            pipe.i_dimx_dm30.eq(self.r_dimx_dm[3][0]),
+            pipe.i_dimx_dm31.eq(self.r_dimx_dm[3][1]),
+            pipe.i_dimx_dm32.eq(self.r_dimx_dm[3][2]),
+            pipe.i_dimx_dm33.eq(self.r_dimx_dm[3][3]),
+
+            pipe.i_dthe_dthe.eq(self.r_dthe_dthe),
+
+            pipe.i_colclamp.eq(self.r_colclamp)
+        ]
+
+        # Pixels and memory handshakes must not be delayed; pixels wait while
+        # `hold` is set.
+        m.d.comb += [
+            pipe.i_valid.eq(rec.i_valid & ~hold),
+            rec.o_ready.eq(pipe.o_ready & ~hold),
 
             pipe.i_rgbrndr.eq(rec.i_rgbrndr),
             pipe.i_arndr.eq(rec.i_arndr),
@@ -142,68 +311,947 @@ class PipelineGroup(Elaboratable):
             pipe.i_blue.eq(rec.i_blue),
             pipe.i_alpha.eq(rec.i_alpha),
 
-            rec.o_rgbrndr.eq(pipe.o_rgbrndr),
-            rec.o_arndr.eq(pipe.o_arndr),
-            rec.o_zrndr.eq(pipe.o_zrndr),
+            pipe.i_u.eq(rec.i_u),
+            pipe.i_v.eq(rec.i_v),
 
-            rec.o_x_coord.eq(pipe.o_x_coord),
-            rec.o_y_coord.eq(pipe.o_y_coord),
-            rec.o_z_coord.eq(pipe.o_z_coord),
+            rec.o_fbreq_valid.eq(pipe.o_fbreq_valid),
+            rec.o_fbreq_addr.eq(pipe.o_fbreq_addr),
+            pipe.i_fbreq_ready.eq(rec.i_fbreq_ready),
+            pipe.i_fbresp_valid.eq(rec.i_fbresp_valid),
 
-            rec.o_red.eq(pipe.o_red),
-            rec.o_green.eq(pipe.o_green),
-            rec.o_blue.eq(pipe.o_blue),
-            rec.o_alpha.eq(pipe.o_alpha)
+            rec.o_zreq_valid.eq(pipe.o_zreq_valid),
+            rec.o_zreq_addr.eq(pipe.o_zreq_addr),
+            pipe.i_zreq_ready.eq(rec.i_zreq_ready),
+            pipe.i_zresp_valid.eq(rec.i_zresp_valid),
+
+            rec.o_texreq_valid.eq(pipe.o_texreq_valid),
+            rec.o_texreq_addr.eq(pipe.o_texreq_addr),
+            pipe.i_texreq_ready.eq(rec.i_texreq_ready),
+            pipe.i_texresp_valid.eq(rec.i_texresp_valid),
+            pipe.i_texresp_data.eq(rec.i_texresp_data)
+        ]
+
+        # Buffer reads are checked against the writes held for that buffer as
+        # memory accepts them, and the bytes of the word held there are laid
+        # over memory's answer. The pipeline has at most `depth` reads of each
+        # buffer waiting, so that many answers are kept.
+        for read, req_valid, req_addr, req_ready, resp_valid, resp_data, data in [
+            (fb_read, pipe.o_fbreq_valid, pipe.o_fbreq_addr, rec.i_fbreq_ready, rec.i_fbresp_valid,
+             rec.i_fbresp_data, pipe.i_fbresp_data),
+            (z_read, pipe.o_zreq_valid, pipe.o_zreq_addr, rec.i_zreq_ready, rec.i_zresp_valid,
+             rec.i_zresp_data, pipe.i_zresp_data)
+        ]:
+            held = SyncFIFO(width=len(read.o_data) + len(read.o_mask), depth=self.depth)
+            m.submodules += held
+            m.d.comb += [
+                read.i_addr.eq(req_addr),
+                held.w_en.eq(req_valid & req_ready),
+                held.w_data.eq(Cat(read.o_data, read.o_mask)),
+                held.r_en.eq(resp_valid),
+                data.eq(Cat(Mux(held.r_data[32 + b], held.r_data[8 * b:8 * b + 8], resp_data[8 * b:8 * b + 8])
+                            for b in range(4)))
+            ]
+
+    def _add_pipeline_writes(self, m, pipe, fb_lane, z_lane, cz_lane, fb_done, z_done):
+        # Each pixel forks into a framebuffer write and a Z buffer write, either
+        # of which may be absent; skid buffers let one go ahead while the other
+        # waits, without its ready depending on the other's. A Z write to the
+        # buffer the coarse Z bounds describe also goes to them, in the same
+        # clock as it enters its skid buffer.
+        #
+        # The pixel leaves each scoreboard through `fb_done` and `z_done`: the
+        # first as it leaves the pipeline without a write to that buffer, if
+        # it claimed it, the second as its write enters the write combiner.
+        fb_bits = self.r_fb_hazards.bits
+        z_bits = self.r_z_hazards.bits
+        ctx = self._context(m, pipe.o_ctxt)
+        fb_skid = SkidBuffer(len(Cat(fb_lane.i_addr, fb_lane.i_data, fb_lane.i_mask)) + fb_bits)
+        z_skid = SkidBuffer(len(Cat(z_lane.i_addr, z_lane.i_data, z_lane.i_mask)) + z_bits)
+        m.submodules += [fb_skid, z_skid]
+
+        fb_write = Signal()
+        z_write = Signal()
+        fb_ok = Signal()
+        z_ok = Signal()
+        cz_ok = Signal()
+
+        fb_pos = Signal(fb_bits)
+        z_pos = Signal(z_bits)
+        fb_index = Signal(fb_bits)
+        z_index = Signal(z_bits)
+        m.d.comb += [
+            fb_pos.eq(self.r_fb_hazards.index(pipe.o_x_coord, pipe.o_y_coord)),
+            z_pos.eq(self.r_z_hazards.index(pipe.o_x_coord, pipe.o_y_coord))
+        ]
+
+        m.d.comb += [
+            fb_write.eq(pipe.o_fbmask.any()),
+            z_write.eq(pipe.o_zmask.any()),
+
+            fb_ok.eq(fb_skid.o_ready | ~fb_write),
+            z_ok.eq(z_skid.o_ready | ~z_write),
+
+            fb_skid.i_valid.eq(pipe.o_valid & fb_write & z_ok & cz_ok),
+            z_skid.i_valid.eq(pipe.o_valid & z_write & fb_ok & cz_ok),
+            pipe.i_ready.eq(fb_ok & z_ok & cz_ok),
+
+            fb_skid.i_data.eq(Cat(pipe.o_fbaddr, pipe.o_fbdata, pipe.o_fbmask, fb_pos)),
+            z_skid.i_data.eq(Cat(pipe.o_zaddr, pipe.o_zdata, pipe.o_zmask, z_pos)),
+
+            fb_lane.i_valid.eq(fb_skid.o_valid),
+            fb_skid.i_ready.eq(fb_lane.o_ready),
+            Cat(fb_lane.i_addr, fb_lane.i_data, fb_lane.i_mask, fb_index).eq(fb_skid.o_data),
+
+            z_lane.i_valid.eq(z_skid.o_valid),
+            z_skid.i_ready.eq(z_lane.o_ready),
+            Cat(z_lane.i_addr, z_lane.i_data, z_lane.i_mask, z_index).eq(z_skid.o_data),
+
+            fb_done[0].i_valid.eq(pipe.o_valid & pipe.i_ready & ~fb_write & self._uses_fb(ctx)),
+            fb_done[0].i_index.eq(fb_pos),
+            fb_done[1].i_valid.eq(fb_lane.i_valid & fb_lane.o_ready),
+            fb_done[1].i_index.eq(fb_index),
+
+            z_done[0].i_valid.eq(pipe.o_valid & pipe.i_ready & ~z_write & self._uses_z(ctx)),
+            z_done[0].i_index.eq(z_pos),
+            z_done[1].i_valid.eq(z_lane.i_valid & z_lane.o_ready),
+            z_done[1].i_index.eq(z_index)
         ]
 
+        if cz_lane is None:
+            m.d.comb += cz_ok.eq(1)
+        else:
+            psm = ctx.zbuf_psm
+            counted = (ctx.zbuf_zbp == self.r_coarse_zbp) & (psm == self.r_coarse_psm)
+            m.d.comb += [
+                cz_ok.eq(cz_lane.o_ready),
+                cz_lane.i_valid.eq(pipe.o_valid & z_write & counted & fb_ok & z_skid.o_ready),
+                cz_lane.i_x.eq(pipe.o_x_coord[4:16]),
+                cz_lane.i_y.eq(pipe.o_y_coord[4:16]),
+                cz_lane.i_z.eq(self._stored_z(psm, pipe.o_z_coord))
+            ]
+
+    def _context(self, m, slot):
+        # The settings of context slot `slot`
+        ctx = Record(CONTEXT)
+        with m.Switch(slot):
+            for n, settings in enumerate(self.r_context):
+                with m.Case(n):
+                    m.d.comb += ctx.eq(settings)
+        return ctx
+
+    def _uses_fb(self, ctx):
+        # Whether pixels of a context may read or write the framebuffer; the
+        # framebuffer is only read for a test or for pixels it is written for.
+        return ctx.test_date | (ctx.frame_fbmsk != 0xFFFFFFFF)
+
+    def _uses_z(self, ctx):
+        # Whether pixels of a context may read or write the Z buffer
+        return ~ctx.zbuf_zmsk | (ctx.test_zte & ((ctx.test_ztst == ZTestMode.GEQUAL) |
+                                                 (ctx.test_ztst == ZTestMode.GREATER)))
+
+    def _stored_z(self, psm, z):
+        # The coarse Z bounds are of Z as stored, which is what the Z test
+        # reads back.
+        z16 = (psm == (PixelFormat.PSMZ16 & 0xF)) | (psm == (PixelFormat.PSMZ16S & 0xF))
+        z24 = psm == (PixelFormat.PSMZ24 & 0xF)
+        return Mux(z16, z[0:16], Mux(z24, z[0:24], z))
+
     def elaborate(self, platform):
         m = Module()
 
+        m.submodules.fb_write = fb_write = self.r_fb_write
+        m.submodules.z_write = z_write = self.r_z_write
+        m.submodules.fb_hazards = fb_hazards = self.r_fb_hazards
+        m.submodules.z_hazards = z_hazards = self.r_z_hazards
+
+        # No pixel is in any pipeline.
+        idle = Signal()
+        m.d.comb += idle.eq(Cat(drawing == 0 for drawing in self.r_drawing).all())
+
+        # PRMODECONT chooses whether PRIM or PRMODE supplies the settings.
+        # Pixels are drawn with the current version of their context.
+        tme = Signal()
+        abe = Signal()
+        ctxt = Signal()
+        slot = Signal(2)
+        m.d.comb += [
+            tme.eq(Mux(self.r_prmodecont_ac, self.r_prim_tme, self.r_prmode_tme)),
+            abe.eq(Mux(self.r_prmodecont_ac, self.r_prim_abe, self.r_prmode_abe)),
+            ctxt.eq(Mux(self.r_prmodecont_ac, self.r_prim_ctxt, self.r_prmode_ctxt)),
+            slot.eq(Cat(Mux(ctxt, self.r_current[1], self.r_current[0]), ctxt))
+        ]
+
+        if self.texture:
+            m.submodules.clut = clut = self.r_clut
+
+            # Every TEX0 and TEX2 write may load the CLUT, and TEXFLUSH forgets
+            # which CLUT was loaded last.
+            m.d.comb += [
+                clut.i_load.eq(self.i_write & ((self.i_address == Register.TEX0_1) |
+                                               (self.i_address == Register.TEX0_2) |
+                                               (self.i_address == Register.TEX2_1) |
+                                               (self.i_address == Register.TEX2_2))),
+                clut.i_psm.eq(self.i_data[20:26]),
+                clut.i_cbp.eq(self.i_data[37:51]),
+                clut.i_cpsm.eq(self.i_data[51:55]),
+                clut.i_csm.eq(self.i_data[55]),
+                clut.i_csa.eq(self.i_data[56:61]),
+                clut.i_cld.eq(self.i_data[61:64]),
+                clut.i_cbw.eq(self.r_texclut_cbw),
+                clut.i_cou.eq(self.r_texclut_cou),
+                clut.i_cov.eq(self.r_texclut_cov),
+                clut.i_invalidate.eq(self.i_write & (self.i_address == Register.TEXFLUSH)),
+                clut.i_hold.eq(~idle),
+
+                self.o_clutreq_valid.eq(clut.o_req_valid),
+                self.o_clutreq_addr.eq(clut.o_req_addr),
+                clut.i_req_ready.eq(self.i_clutreq_ready),
+                clut.i_resp_valid.eq(self.i_clutresp_valid),
+                clut.i_resp_data.eq(self.i_clutresp_data)
+            ]
+
+        m.d.comb += [
+            self.o_ofx.eq(Mux(ctxt, self.r_xyoffset_ofx[1], self.r_xyoffset_ofx[0])),
+            self.o_ofy.eq(Mux(ctxt, self.r_xyoffset_ofy[1], self.r_xyoffset_ofy[0])),
+            self.o_scax0.eq(Mux(ctxt, self.r_scissor_scax0[1], self.r_scissor_scax0[0])),
+            self.o_scax1.eq(Mux(ctxt, self.r_scissor_scax1[1], self.r_scissor_scax1[0])),
+            self.o_scay0.eq(Mux(ctxt, self.r_scissor_scay0[1], self.r_scissor_scay0[0])),
+            self.o_scay1.eq(Mux(ctxt, self.r_scissor_scay1[1], self.r_scissor_scay1[0]))
+        ]
+
+        # The settings of pixels entering, and which buffers they claim
+        ctx = self._context(m, slot)
+        uses_fb = Signal()
+        uses_z = Signal()
+        m.d.comb += [
+            uses_fb.eq(self._uses_fb(ctx)),
+            uses_z.eq(self._uses_z(ctx))
+        ]
+
+        entered = [[] for n in range(4)]
+        left = [[] for n in range(4)]
         for i in range(self.width):
-            m.submodules["pipe{:02}".format(i)] = pipe = PixelPipeline()
-            self._add_pipeline_settings(m, pipe, self.pipes[i])
-
-        with m.FSM():
-            with m.State("READ"):
-                with m.Switch(self.i_address):
-                    with m.Case(Register.ALPHA_1):
-                        # TODO: Multiple rendering contexts
-                    with m.Case(Register.DIMX):
-                        for x in range(4):
-                            for y in range(4):
-                                index = 16*x + 4*y
-                                m.d.sync += self.i_dimx_dm[x][y].eq(self.i_data[index:index+3])
+            m.submodules["pipe{:02}".format(i)] = pipe = self.r_pipes[i]
+            rec = self.pipes[i]
+            fb_claim = fb_hazards.claim[i]
+            z_claim = z_hazards.claim[i]
+            fb_release = fb_hazards.release[4 * i:4 * i + 4]
+            z_release = z_hazards.release[4 * i:4 * i + 4]
 
-        return m
+            # New pixels wait while a write to the shared settings, or to their
+            # context, is waiting to take effect, and while a pixel at the same
+            # position is in flight.
+            hold = Signal(name="hold{:02}".format(i))
+            busy = Signal(name="busy{:02}".format(i))
+            ahead = Signal(name="ahead{:02}".format(i))
+            m.d.comb += [
+                hold.eq((clut.o_busy if self.texture else 0) | self.r_next_valid |
+                        Mux(ctxt, self.r_shadow_valid[1], self.r_shadow_valid[0])),
+                busy.eq((uses_fb & fb_claim.o_busy) | (uses_z & z_claim.o_busy) | ~ahead)
+            ]
 
+            self._add_pipeline_settings(m, pipe, rec, tme, abe, slot, hold | busy,
+                                        fb_write.reads[i], z_write.reads[i])
+            self._add_pipeline_writes(m, pipe, fb_write.writes[i], z_write.writes[i],
+                                      self.r_coarse_z.writes[i] if self.coarse_z else None,
+                                      fb_release[2:], z_release[2:])
 
-if __name__ == '__main__':
-    width = 16
-    pipe = PipelineGroup(width)
+            # A pixel which may lower Z waits until the coarse Z bounds have
+            # taken its Z; it is given whether or not the pixel goes in that
+            # clock, which at worst lowers them again.
+            if self.coarse_z:
+                early = self.r_coarse_z.writes[self.width + i]
+                lower = ~ctx.zbuf_zmsk & (~ctx.test_zte | (ctx.test_ztst == ZTestMode.ALWAYS))
+                m.d.comb += [
+                    ahead.eq(early.o_ready),
+                    early.i_valid.eq(rec.i_valid & rec.i_zrndr & lower),
+                    early.i_x.eq(rec.i_x_coord[4:16]),
+                    early.i_y.eq(rec.i_y_coord[4:16]),
+                    early.i_z.eq(self._stored_z(ctx.zbuf_psm, rec.i_z_coord)),
+                    early.i_ahead.eq(1)
+                ]
+            else:
+                m.d.comb += ahead.eq(1)
+
+            # Pixels are counted into their context slot as they enter, and out
+            # as they leave or are dropped.
+            for n in range(4):
+                entered[n].append(pipe.i_valid & pipe.o_ready & (slot == n))
+                left[n].append(pipe.o_valid & pipe.i_ready & (pipe.o_ctxt == n))
+                left[n] += [drop.o_valid & (drop.o_ctxt == n) for drop in pipe.o_drop]
+
+            # Each pixel claims its position in the scoreboards of the buffers
+            # it uses as it enters, and gives them back if the tests drop it.
+            drop_ctx = [self._context(m, drop.o_ctxt) for drop in pipe.o_drop]
+            for hazards, claim, release, uses, used in [(fb_hazards, fb_claim, fb_release, self._uses_fb, uses_fb),
+                                                        (z_hazards, z_claim, z_release, self._uses_z, uses_z)]:
+                m.d.comb += [
+                    claim.i_valid.eq(rec.i_valid & ~hold & used),
+                    claim.i_index.eq(hazards.index(rec.i_x_coord, rec.i_y_coord)),
+                    claim.i_claim.eq(pipe.i_valid & pipe.o_ready & used)
+                ]
+                for drop, dctx, dropped in zip(pipe.o_drop, drop_ctx, release[:2]):
+                    m.d.comb += [
+                        dropped.i_valid.eq(drop.o_valid & uses(dctx)),
+                        dropped.i_index.eq(hazards.index(drop.o_x_coord, drop.o_y_coord))
+                    ]
+            if self.texture:
+                m.d.comb += [
+                    clut.reads[i].i_addr.eq(pipe.o_clut_addr),
+                    pipe.i_clut_data.eq(clut.reads[i].o_data)
+                ]
+
+        if self.coarse_z:
+            m.submodules.coarse_z = coarse_z = self.r_coarse_z
+
+            # The bounds follow the current primitive's Z buffer, and are
+            # forgotten whenever it changes, by a ZBUF write or a change of
+            # context; writes to any other Z buffer are not counted.
+            zbp = Signal(9)
+            psm = Signal(4)
+            m.d.comb += [
+                zbp.eq(ctx.zbuf_zbp),
+                psm.eq(ctx.zbuf_psm),
+                coarse_z.i_invalidate.eq((zbp != self.r_coarse_zbp) | (psm != self.r_coarse_psm))
+            ]
+            m.d.sync += [
+                self.r_coarse_zbp.eq(zbp),
+                self.r_coarse_psm.eq(psm)
+            ]
+
+            m.d.comb += [
+                coarse_z.i_x.eq(self.i_coarse_x),
+                coarse_z.i_y.eq(self.i_coarse_y),
+                self.o_coarse_zmin.eq(coarse_z.o_zmin),
+                self.o_coarse_zmax.eq(coarse_z.o_zmax)
+            ]
+
+        m.d.comb += [
+            fb_write.i_flush.eq(self.i_flush),
+            z_write.i_flush.eq(self.i_flush),
+            self.o_idle.eq(fb_write.o_idle & z_write.o_idle),
+
+            self.o_fbw_valid.eq(fb_write.o_valid),
+            self.o_fbw_addr.eq(fb_write.o_addr),
+            self.o_fbw_data.eq(fb_write.o_data),
+            self.o_fbw_mask.eq(fb_write.o_mask),
+            fb_write.i_ready.eq(self.i_fbw_ready),
+
+            self.o_zw_valid.eq(z_write.o_valid),
+            self.o_zw_addr.eq(z_write.o_addr),
+            self.o_zw_data.eq(z_write.o_data),
+            self.o_zw_mask.eq(z_write.o_mask),
+            z_write.i_ready.eq(self.i_zw_ready)
+        ]
+
+        for drawing, n_entered, n_left in zip(self.r_drawing, entered, left):
+            m.d.sync += drawing.eq(drawing + sum(n_entered) - sum(n_left))
+
+        # A context written to takes its shadow in its current slot if no pixel
+        # drawn with that is left in flight, and otherwise in its other slot,
+        # once no pixel drawn with that is. A write in the same clock waits for
+        # the next time.
+        for n, (current, shadow, valid) in enumerate(zip(self.r_current, self.r_shadow, self.r_shadow_valid)):
+            for version in range(2):
+                with m.If(valid & (current == version)):
+                    now, other = 2 * n + version, 2 * n + 1 - version
+                    with m.If(self.r_drawing[now] == 0):
+                        m.d.sync += [
+                            self.r_context[now].eq(shadow),
+                            valid.eq(0)
+                        ]
+                    with m.Elif(self.r_drawing[other] == 0):
+                        m.d.sync += [
+                            self.r_context[other].eq(shadow),
+                            current.eq(1 - version),
+                            valid.eq(0)
+                        ]
+
+        # Once no pixel of either context is in the pipelines, none is left to
+        # see the shared settings change. A write in the same clock waits for
+        # the next time.
+        with m.If(self.r_next_valid & idle):
+            m.d.sync += [
+                self.r_texa_ta0.eq(self.r_next.texa_ta0),
+                self.r_texa_aem.eq(self.r_next.texa_aem),
+                self.r_texa_ta1.eq(self.r_next.texa_ta1),
+                self.r_pabe_pabe.eq(self.r_next.pabe_pabe),
+                self.r_dthe_dthe.eq(self.r_next.dthe_dthe),
+                self.r_colclamp.eq(self.r_next.colclamp),
+                self.r_next_valid.eq(0)
+            ]
+            for x in range(4):
+                for y in range(4):
+                    m.d.sync += self.r_dimx_dm[x][y].eq(self.r_next["dimx_dm{}{}".format(x, y)])
+
+        with m.If(self.i_write):
+            with m.Switch(self.i_address):
+                with m.Case(Register.PRIM):
+                    m.d.sync += [
+                        self.r_prim_tme.eq(self.i_data[4]),
+                        self.r_prim_abe.eq(self.i_data[6]),
+                        self.r_prim_ctxt.eq(self.i_data[9])
+                    ]
+                with m.Case(Register.PRMODE):
+                    m.d.sync += [
+                        self.r_prmode_tme.eq(self.i_data[4]),
+                        self.r_prmode_abe.eq(self.i_data[6]),
+                        self.r_prmode_ctxt.eq(self.i_data[9])
+                    ]
+                with m.Case(Register.PRMODECONT):
+                    m.d.sync += self.r_prmodecont_ac.eq(self.i_data[0])
+                with m.Case(Register.TEXA):
+                    m.d.sync += [
+                        self.r_next.texa_ta0.eq(self.i_data[0:8]),
+                        self.r_next.texa_aem.eq(self.i_data[15]),
+                        self.r_next.texa_ta1.eq(self.i_data[32:40]),
+                        self.r_next_valid.eq(1)
+                    ]
+                with m.Case(Register.PABE):
+                    m.d.sync += [
+                        self.r_next.pabe_pabe.eq(self.i_data[0]),
+                        self.r_next_valid.eq(1)
+                    ]
+                with m.Case(Register.DIMX):
+                    for x in range(4):
+                        for y in range(4):
+                            index = 16*x + 4*y
+                            m.d.sync += self.r_next["dimx_dm{}{}".format(x, y)].eq(self.i_data[index:index+3])
+                    m.d.sync += self.r_next_valid.eq(1)
+                with m.Case(Register.DTHE):
+                    m.d.sync += [
+                        self.r_next.dthe_dthe.eq(self.i_data[0]),
+                        self.r_next_valid.eq(1)
+                    ]
+                with m.Case(Register.COLCLAMP):
+                    m.d.sync += [
+                        self.r_next.colclamp.eq(self.i_data[0]),
+                        self.r_next_valid.eq(1)
+                    ]
+                with m.Case(Register.TEXCLUT):
+                    m.d.sync += [
+                        self.r_texclut_cbw.eq(self.i_data[0:6]),
+                        self.r_texclut_cou.eq(self.i_data[6:12]),
+                        self.r_texclut_cov.eq(self.i_data[12:22])
+                    ]
+
+                for n, (xyoffset, scissor) in enumerate([(Register.XYOFFSET_1, Register.SCISSOR_1),
+                                                         (Register.XYOFFSET_2, Register.SCISSOR_2)]):
+                    with m.Case(xyoffset):
+                        m.d.sync += [
+                            self.r_xyoffset_ofx[n].eq(self.i_data[0:16]),
+                            self.r_xyoffset_ofy[n].eq(self.i_data[32:48])
+                        ]
+                    with m.Case(scissor):
+                        m.d.sync += [
+                            self.r_scissor_scax0[n].eq(self.i_data[0:11]),
+                            self.r_scissor_scax1[n].eq(self.i_data[16:27]),
+                            self.r_scissor_scay0[n].eq(self.i_data[32:43]),
+                            self.r_scissor_scay1[n].eq(self.i_data[48:59])
+                        ]
+
+                registers = [
+                    (Register.TEX0_1, Register.TEX1_1, Register.TEX2_1, Register.CLAMP_1, Register.ALPHA_1,
+                     Register.TEST_1, Register.FBA_1, Register.FRAME_1, Register.ZBUF_1),
+                    (Register.TEX0_2, Register.TEX1_2, Register.TEX2_2, Register.CLAMP_2, Register.ALPHA_2,
+                     Register.TEST_2, Register.FBA_2, Register.FRAME_2, Register.ZBUF_2)
+                ]
+                for ctx, valid, (tex0, tex1, tex2, clamp, alpha, test, fba, frame, zbuf) in zip(
+                        self.r_shadow, self.r_shadow_valid, registers):
+                    with m.Case(tex0):
+                        m.d.sync += [
+                            ctx.tex0_tbp0.eq(self.i_data[0:14]),
+                            ctx.tex0_tbw.eq(self.i_data[14:20]),
+                            ctx.tex0_psm.eq(self.i_data[20:26]),
+                            ctx.tex0_tw.eq(self.i_data[26:30]),
+                            ctx.tex0_th.eq(self.i_data[30:34]),
+                            ctx.tex0_tcc.eq(self.i_data[34]),
+                            ctx.tex0_tfx.eq(self.i_data[35:37]),
+                            ctx.tex0_cpsm.eq(self.i_data[51:55]),
+                            ctx.tex0_csa.eq(self.i_data[56:61]),
+                            valid.eq(1)
+                        ]
+                    with m.Case(tex1):
+                        m.d.sync += [
+                            ctx.tex1_mmag.eq(self.i_data[5]),
+                            valid.eq(1)
+                        ]
+                    with m.Case(tex2):
+                        m.d.sync += [
+                            ctx.tex0_psm.eq(self.i_data[20:26]),
+                            ctx.tex0_cpsm.eq(self.i_data[51:55]),
+                            ctx.tex0_csa.eq(self.i_data[56:61]),
+                            valid.eq(1)
+                        ]
+                    with m.Case(clamp):
+                        m.d.sync += [
+                            ctx.clamp_wms.eq(self.i_data[0:2]),
+                            ctx.clamp_wmt.eq(self.i_data[2:4]),
+                            ctx.clamp_minu.eq(self.i_data[4:14]),
+                            ctx.clamp_maxu.eq(self.i_data[14:24]),
+                            ctx.clamp_minv.eq(self.i_data[24:34]),
+                            ctx.clamp_maxv.eq(self.i_data[34:44]),
+                            valid.eq(1)
+                        ]
+                    with m.Case(alpha):
+                        m.d.sync += [
+                            ctx.blend_a.eq(self.i_data[0:2]),
+                            ctx.blend_b.eq(self.i_data[2:4]),
+                            ctx.blend_c.eq(self.i_data[4:6]),
+                            ctx.blend_d.eq(self.i_data[6:8]),
+                            ctx.blend_fix.eq(self.i_data[32:40]),
+                            valid.eq(1)
+                        ]
+                    with m.Case(test):
+                        m.d.sync += [
+                            ctx.test_ate.eq(self.i_data[0]),
+                            ctx.test_atst.eq(self.i_data[1:4]),
+                            ctx.test_aref.eq(self.i_data[4:12]),
+                            ctx.test_afail.eq(self.i_data[12:14]),
+                            ctx.test_date.eq(self.i_data[14]),
+                            ctx.test_datm.eq(self.i_data[15]),
+                            ctx.test_zte.eq(self.i_data[16]),
+                            ctx.test_ztst.eq(self.i_data[17:19]),
+                            valid.eq(1)
+                        ]
+                    with m.Case(fba):
+                        m.d.sync += [
+                            ctx.fba_fba.eq(self.i_data[0]),
+                            valid.eq(1)
+                        ]
+                    with m.Case(frame):
+                        m.d.sync += [
+                            ctx.frame_fbp.eq(self.i_data[0:9]),
+                            ctx.frame_fbw.eq(self.i_data[16:22]),
+                            ctx.frame_psm.eq(self.i_data[24:30]),
+                            ctx.frame_fbmsk.eq(self.i_data[32:64]),
+                            valid.eq(1)
+                        ]
+                    with m.Case(zbuf):
+                        m.d.sync += [
+                            ctx.zbuf_zbp.eq(self.i_data[0:9]),
+                            ctx.zbuf_psm.eq(self.i_data[24:28]),
+                            ctx.zbuf_zmsk.eq(self.i_data[32]),
+                            valid.eq(1)
+                        ]
 
+        return m
+
+
+def group_ports(group):
     ports = [
-        pipe.i_blend_a, pipe.i_blend_b, pipe.i_blend_c, pipe.i_blend_d, pipe.i_blend_fix,
-        pipe.i_prim_abe,
-        pipe.i_test_ate, pipe.i_test_atst, pipe.i_test_aref, pipe.i_test_afail,
-        pipe.i_test_date, pipe.i_test_datm,
-        pipe.i_test_zte, pipe.i_test_ztst,
-        pipe.i_colclamp,
-        pipe.i_fba_fba,
-        pipe.i_frame_psm, pipe.i_zbuf_psm,
-        pipe.i_address,
-        pipe.i_data,
+        group.i_write, group.i_address, group.i_data,
+        group.i_flush, group.o_idle,
+        group.i_coarse_x, group.i_coarse_y, group.o_coarse_zmin, group.o_coarse_zmax,
+        group.o_fbw_valid, group.o_fbw_addr, group.o_fbw_data, group.o_fbw_mask, group.i_fbw_ready,
+        group.o_zw_valid, group.o_zw_addr, group.o_zw_data, group.o_zw_mask, group.i_zw_ready,
+        group.o_ofx, group.o_ofy, group.o_scax0, group.o_scax1, group.o_scay0, group.o_scay1,
+        group.o_clutreq_valid, group.o_clutreq_addr, group.i_clutreq_ready,
+        group.i_clutresp_valid, group.i_clutresp_data,
     ]
 
-    for i in range(width):
+    for rec in group.pipes:
         ports += [
-            pipe.pipes[i].i_rgbrndr, pipe.pipes[i].i_arndr, pipe.pipes[i].i_zrndr,
-            pipe.pipes[i].i_x_coord, pipe.pipes[i].i_y_coord, pipe.pipes[i].i_z_coord,
-            pipe.pipes[i].i_red, pipe.pipes[i].i_green, pipe.pipes[i].i_blue, pipe.pipes[i].i_alpha,
-            pipe.pipes[i].o_rgbrndr, pipe.pipes[i].o_arndr, pipe.pipes[i].o_zrndr,
-            pipe.pipes[i].o_x_coord, pipe.pipes[i].o_y_coord, pipe.pipes[i].o_z_coord,
-            pipe.pipes[i].o_red, pipe.pipes[i].o_green, pipe.pipes[i].o_blue, pipe.pipes[i].o_alpha,
+            rec.i_valid, rec.o_ready,
+            rec.i_rgbrndr, rec.i_arndr, rec.i_zrndr,
+            rec.i_x_coord, rec.i_y_coord, rec.i_z_coord,
+            rec.i_red, rec.i_green, rec.i_blue, rec.i_alpha,
+            rec.i_u, rec.i_v,
+            rec.o_fbreq_valid, rec.o_fbreq_addr, rec.i_fbreq_ready,
+            rec.i_fbresp_valid, rec.i_fbresp_data,
+            rec.o_zreq_valid, rec.o_zreq_addr, rec.i_zreq_ready,
+            rec.i_zresp_valid, rec.i_zresp_data,
+            rec.o_texreq_valid, rec.o_texreq_addr, rec.i_texreq_ready,
+            rec.i_texresp_valid, rec.i_texresp_data,
         ]
 
-    # print(ports)
+    return ports
+
+
+# Yosys synthesis commands for each FPGA family, and the cells (by name
+# prefix) counted as LUTs, flip-flops and DSP blocks
+FAMILIES = {
+    "ecp5":   ("synth_ecp5",       ["LUT4"],    ["TRELLIS_FF"], ["MULT18X18D"]),
+    "ice40":  ("synth_ice40 -dsp", ["SB_LUT4"], ["SB_DFF"],     ["SB_MAC16"]),
+    "xilinx": ("synth_xilinx",     ["LUT"],     ["FD"],         ["DSP48"]),
+}
+
+
+def synthesis_report(group, family):
+    # Synthesise the group with yosys, and return its LUT, flip-flop and DSP
+    # counts, and the levels of logic on its longest register-to-register
+    # path. Placement and routing are not run, so there is no timing; the
+    # logic levels only compare configurations with each other.
+    synth, luts, ffs, dsps = FAMILIES[family]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "top.il"), "w") as f:
+            f.write(rtlil.convert(group, ports=group_ports(group)))
+
+        subprocess.run([os.environ.get("YOSYS", "yosys"), "-q", "-p", "; ".join([
+            "read_ilang top.il",
+            "{} -top top".format(synth),
+            "tee -q -o stat.json stat -json",
+            "tee -q -o ltp.txt ltp -noff"
+        ])], cwd=tmp, check=True)
+
+        with open(os.path.join(tmp, "stat.json")) as f:
+            cells = json.load(f)["design"]["num_cells_by_type"]
+        with open(os.path.join(tmp, "ltp.txt")) as f:
+            levels = int(re.search(r"length=(\d+)", f.read()).group(1))
+
+    def count(prefixes):
+        return sum(n for cell, n in cells.items() if cell.startswith(tuple(prefixes)))
+
+    return count(luts), count(ffs), count(dsps), levels
+
+
+def group_test(lanes, script, latency, random_latency=False, texture=False, coarse_z=False):
+    # Simulates a group drawing `script` against a software model of memory,
+    # and returns the clocks its spans took to go in, the CLUT words loaded,
+    # and the coarse Z bounds of each tile of the first eight rows, with the Z
+    # written there. The script is a list of register writes, ("reg",
+    # address, data), spans, ("span", pixels), where a pixel is (x, y, z,
+    # colour) or None, and pauses, ("idle", clocks). Only 32-bit buffers 64
+    # pixels wide, and blends which keep the framebuffer (KEEP) or go halfway
+    # to the pixel (HALF), are modelled. Buffer reads are answered in order,
+    # after `latency` clocks, or a random number of clocks up to it if
+    # `random_latency` is set.
+    # The coarse Z table is kept small enough to simulate.
+    group = PipelineGroup(lanes, texture=texture, coarse_z=coarse_z, coarse_z_tiles_x=8, coarse_z_tiles_y=4)
+
+    memory = {}
+    for zbp in [4, 5]:
+        for addr in range(zbp * 2048, zbp * 2048 + 512):
+            memory[addr] = random.randint(0, 2**32 - 1)
+    expected = dict(memory)
+
+    # The model: pixels are drawn in order, each with the settings of its
+    # context as last written before it.
+    contexts = [{}, {}]
+    ctxt, abe = 0, 0
+    for item in script:
+        if item[0] == "reg":
+            _, address, data = item
+            if address == Register.PRIM:
+                ctxt, abe = (data >> 9) & 1, (data >> 6) & 1
+            elif address in (Register.FRAME_1, Register.ZBUF_1, Register.TEST_1, Register.ALPHA_1):
+                contexts[0][address] = data
+            elif address in (Register.FRAME_2, Register.ZBUF_2, Register.TEST_2, Register.ALPHA_2):
+                contexts[1][address - 1] = data
+            continue
+        if item[0] == "idle":
+            continue
+        settings = contexts[ctxt]
+        fbp = settings[Register.FRAME_1] & 0x1FF
+        zbp = settings[Register.ZBUF_1] & 0x1FF
+        zmsk = (settings[Register.ZBUF_1] >> 32) & 1
+        ztst = (settings[Register.TEST_1] >> 17) & 3
+        for pixel in item[1]:
+            if pixel is None:
+                continue
+            x, y, z, colour = pixel
+            fb, zb = fbp * 2048 + y * 64 + x, zbp * 2048 + y * 64 + x
+            if ztst == ZTestMode.NEVER or (ztst == ZTestMode.GEQUAL and z < expected.get(zb, 0)) or \
+               (ztst == ZTestMode.GREATER and z <= expected.get(zb, 0)):
+                continue
+            if not zmsk:
+                expected[zb] = z
+            if abe:
+                dest = expected.get(fb, 0)
+                colour = (colour & 0xFF000000) | sum(
+                    (((dest >> c) & 0xFF) + ((((colour >> c) & 0xFF) - ((dest >> c) & 0xFF)) * 64 >> 7)
+                     if settings[Register.ALPHA_1] == HALF else (dest >> c) & 0xFF) << c for c in [0, 8, 16])
+            expected[fb] = colour
+
+    clocks = []
+    clut_reads = []
+    bounds = []
+    done = []
+
+    def feed():
+        for item in script:
+            if item[0] == "reg":
+                yield group.i_write.eq(1)
+                yield group.i_address.eq(item[1])
+                yield group.i_data.eq(item[2])
+                yield
+                yield group.i_write.eq(0)
+                continue
+            if item[0] == "idle":
+                for i in range(item[1]):
+                    yield
+                continue
+            # The pixels of a span are offered together, and the next span
+            # only once all of them have gone in.
+            waiting = set()
+            for k, (rec, pixel) in enumerate(zip(group.pipes, item[1])):
+                yield rec.i_valid.eq(pixel is not None)
+                if pixel is not None:
+                    x, y, z, colour = pixel
+                    waiting.add(k)
+                    yield rec.i_rgbrndr.eq(1)
+                    yield rec.i_arndr.eq(1)
+                    yield rec.i_zrndr.eq(1)
+                    yield rec.i_x_coord.eq(x << 4)
+                    yield rec.i_y_coord.eq(y << 4)
+                    yield rec.i_z_coord.eq(z)
+                    yield rec.i_red.eq(colour & 0xFF)
+                    yield rec.i_green.eq((colour >> 8) & 0xFF)
+                    yield rec.i_blue.eq((colour >> 16) & 0xFF)
+                    yield rec.i_alpha.eq(colour >> 24)
+            while waiting:
+                yield
+                clocks.append(1)
+                for k in list(waiting):
+                    if (yield group.pipes[k].o_ready):
+                        waiting.remove(k)
+                        yield group.pipes[k].i_valid.eq(0)
+
+        for i in range(4 * group.r_pipes[0].capacity):
+            yield
+        yield group.i_flush.eq(1)
+        yield
+        while not (yield group.o_idle):
+            yield
+        yield group.i_flush.eq(0)
+
+        if coarse_z:
+            for tile in range(8):
+                yield group.i_coarse_x.eq(8 * tile)
+                yield group.i_coarse_y.eq(0)
+                yield
+                yield
+                bounds.append(((yield group.o_coarse_zmin), (yield group.o_coarse_zmax)))
+        done.append(True)
+
+    def reader(req_valid, req_addr, req_ready, resp_valid, resp_data, words=memory, requests=None):
+        # Memory which answers reads in order, from what it held as they were
+        # accepted
+        def process():
+            yield pysim.Passive()
+            responses = []
+            clock = 0
+            while True:
+                yield req_ready.eq(1)
+                answer = responses and responses[0][0] <= clock
+                yield resp_valid.eq(bool(answer))
+                if answer:
+                    yield resp_data.eq(responses.pop(0)[1])
+                yield
+                clock += 1
+                if (yield req_valid):
+                    addr = yield req_addr
+                    delay = random.randint(1, latency) if random_latency else latency
+                    responses.append((max([clock + delay - 1] + [t for t, d in responses]), words.get(addr, 0)))
+                    if requests is not None:
+                        requests.append(addr)
+        return process
+
+    def writer(valid, addr, data, mask, ready):
+        # Memory which takes a line burst at random
+        def process():
+            yield pysim.Passive()
+            while True:
+                yield ready.eq(random.randint(0, 3) != 0)
+                yield
+                if (yield ready) and (yield valid):
+                    line, words, enables = (yield addr), (yield data), (yield mask)
+                    for word in range(16):
+                        value = memory.get(16 * line + word, 0)
+                        for byte in range(4):
+                            if enables & (1 << (4 * word + byte)):
+                                shift = 32 * word + 8 * byte
+                                value = (value & ~(0xFF << (8 * byte))) | (((words >> shift) & 0xFF) << (8 * byte))
+                        memory[16 * line + word] = value
+        return process
+
+    sim = pysim.Simulator(group)
+    sim.add_sync_process(feed)
+    sim.add_sync_process(writer(group.o_fbw_valid, group.o_fbw_addr, group.o_fbw_data, group.o_fbw_mask,
+                                group.i_fbw_ready))
+    sim.add_sync_process(writer(group.o_zw_valid, group.o_zw_addr, group.o_zw_data, group.o_zw_mask,
+                                group.i_zw_ready))
+    for rec in group.pipes:
+        sim.add_sync_process(reader(rec.o_fbreq_valid, rec.o_fbreq_addr, rec.i_fbreq_ready,
+                                    rec.i_fbresp_valid, rec.i_fbresp_data))
+        sim.add_sync_process(reader(rec.o_zreq_valid, rec.o_zreq_addr, rec.i_zreq_ready,
+                                    rec.i_zresp_valid, rec.i_zresp_data))
+    if texture:
+        sim.add_sync_process(reader(group.o_clutreq_valid, group.o_clutreq_addr, group.i_clutreq_ready,
+                                    group.i_clutresp_valid, group.i_clutresp_data, words={}, requests=clut_reads))
+    sim.add_clock(1e-6)
+    sim.run()
+
+    assert done
+    # Bursts write whole lines, so words outside the model may be written, but
+    # only with what they held
+    wrong = [hex(addr) for addr in set(memory) | set(expected) if memory.get(addr, 0) != expected.get(addr, 0)]
+    assert not wrong, sorted(wrong)[:8]
+
+    zs = [[memory[4 * 2048 + y * 64 + x] >> 16 for y in range(8) for x in range(8 * tile, 8 * tile + 8)]
+          for tile in range(8)]
+    return len(clocks), len(clut_reads), list(zip(bounds, zs))
+
+
+def frame(fbp):
+    # A FRAME write, for 32-bit pixels 64 to a row
+    return fbp | (1 << 16) | (PixelFormat.PSMCT32 << 24)
+
+
+def zbuf(zbp, zmsk=0):
+    # A ZBUF write, for 32-bit Z
+    return zbp | ((PixelFormat.PSMZ32 & 0xF) << 24) | (zmsk << 32)
+
+
+def test(ztst):
+    # A TEST write, Z testing only
+    return (1 << 16) | (ztst << 17)
+
+
+def prim(ctxt, abe):
+    # A PRIM write
+    return (abe << 6) | (ctxt << 9)
+
+
+def alpha(a, b, c, d, fix):
+    # An ALPHA write
+    return a | (b << 2) | (c << 4) | (d << 6) | (fix << 32)
+
+
+# The blends group_test models: the framebuffer kept, and halfway to the pixel
+KEEP = alpha(BlendRGB.FB, BlendRGB.ZERO, BlendAlpha.FIX, BlendRGB.ZERO, 0x80)
+HALF = alpha(BlendRGB.SRC, BlendRGB.FB, BlendAlpha.FIX, BlendRGB.FB, 0x40)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a PipelineGroup as Verilog, report how it scales, or test it.")
+    parser.add_argument("--lanes", type=int, nargs="+", default=[16],
+                        help="pixels per clock; several may be given with --report (default: 16)")
+    parser.add_argument("--read-depth", type=int, default=8,
+                        help="pixels each pipeline can have waiting on each buffer read (default: 8)")
+    parser.add_argument("--no-dither", action="store_true", help="leave out the dither stage")
+    parser.add_argument("--no-texture", action="store_true", help="leave out the texture stage")
+    parser.add_argument("--texture-ways", type=int, default=2,
+                        help="lines per set of each pipeline's texel cache (default: 2)")
+    parser.add_argument("--texture-lines", type=int, default=32,
+                        help="sets of each pipeline's texel cache (default: 32)")
+    parser.add_argument("--no-texture-filter", action="store_true",
+                        help="leave out bilinear filtering; textures are always point sampled")
+    parser.add_argument("--no-blend", action="store_true", help="leave out the alpha blending stage")
+    parser.add_argument("--blend-latency", type=int, choices=[1, 2, 3], default=1,
+                        help="clocks spent blending; more shortens the critical path (default: 1)")
+    parser.add_argument("--bypass", action="store_true",
+                        help="let pixels skip stages which would do nothing to them")
+    parser.add_argument("--hazard-bits", type=int, default=10,
+                        help="hash width of the scoreboards holding back pixels at positions in flight (default: 10)")
+    parser.add_argument("--coarse-z", action="store_true",
+                        help="keep Z bounds per 8x8 tile, for the rasteriser to reject pixels early")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate small groups against a software model, and check their throughput, "
+                             "instead of generating Verilog")
+    parser.add_argument("--report", metavar="FAMILY", choices=sorted(FAMILIES),
+                        help="synthesise each lane count for FAMILY ({}) with yosys, and print "
+                             "LUT/FF/DSP counts and the logic levels of the longest path".format(", ".join(sorted(FAMILIES))))
+    args = parser.parse_args()
+
+    def group(lanes):
+        return PipelineGroup(lanes, depth=args.read_depth, dither=not args.no_dither, blend=not args.no_blend,
+                             blend_latency=args.blend_latency, bypass=args.bypass,
+                             hazard_bits=args.hazard_bits, coarse_z=args.coarse_z,
+                             texture=not args.no_texture, texture_ways=args.texture_ways,
+                             texture_lines=args.texture_lines, texture_filter=not args.no_texture_filter)
+
+    if args.test:
+        setup = [
+            ("reg", Register.FRAME_1, frame(1)), ("reg", Register.ZBUF_1, zbuf(4)),
+            ("reg", Register.TEST_1, test(ZTestMode.ALWAYS)), ("reg", Register.ALPHA_1, KEEP),
+            ("reg", Register.FRAME_2, frame(2)), ("reg", Register.ZBUF_2, zbuf(4)),
+            ("reg", Register.TEST_2, test(ZTestMode.GEQUAL)), ("reg", Register.ALPHA_2, HALF)
+        ]
+
+        def row(lanes, y):
+            return [("span", [(x + k, y, random.randint(0, 2**32 - 1), random.randint(0, 2**32 - 1))
+                              for k in range(lanes)]) for x in range(0, 64, lanes)]
+
+        # Once the coarse Z table has been forgotten for the new Z buffer, eight
+        # rows are filled in context 1, then Z tested, in contexts 1 and 2 by
+        # turns, blending. Context 1 is rewritten as its fill is still in
+        # flight, and context 2 each row; neither waits for pixels to drain, so
+        # once the pipelines are full, a span goes in every clock. Every tile
+        # has been filled, so its coarse Z bounds are known, and hold its Z.
+        for lanes in [1, 2]:
+            script = setup + [("reg", Register.PRIM, prim(0, 0)), ("idle", 32)]
+            for y in range(8):
+                script += row(lanes, y)
+            script += [("reg", Register.TEST_1, test(ZTestMode.GEQUAL))]
+            for y in range(8):
+                script += [("reg", Register.PRIM, prim(y & 1, 1)), ("reg", Register.ALPHA_2, [HALF, KEEP][y >> 1 & 1])]
+                script += row(lanes, y)
+            spans = sum(item[0] == "span" for item in script)
+
+            clocks, clut_words, tiles = group_test(lanes, script, latency=4, coarse_z=True)
+            print("{} lanes: {} spans in {} clocks".format(lanes, spans, clocks))
+            assert clocks <= spans + 8
+            for (zmin, zmax), zs in tiles:
+                assert (zmin, zmax) != (0, 0xFFFF) and zmin <= min(zs) and max(zs) <= zmax
+
+        # Random spans over a small area, so pixels often land on positions in
+        # flight, in random contexts; between them, random rewrites of either
+        # context, and TEX0 and TEX2 writes loading one of two CLUTs, or the
+        # one already loaded. Memory answers after random latencies.
+        script = setup + [("reg", Register.PRIM, prim(0, 0))]
+        loads = 0
+        loaded = None
+        for n in range(60):
+            ctxt = random.randint(0, 1)
+            change = random.randint(0, 5)
+            if change == 0:
+                script.append(("reg", [Register.ALPHA_1, Register.ALPHA_2][ctxt], random.choice([KEEP, HALF])))
+            elif change == 1:
+                ztst = random.choice([ZTestMode.ALWAYS, ZTestMode.GEQUAL, ZTestMode.GREATER])
+                script.append(("reg", [Register.TEST_1, Register.TEST_2][ctxt], test(ztst)))
+            elif change == 2:
+                script.append(("reg", [Register.FRAME_1, Register.FRAME_2][ctxt], frame(random.randint(1, 3))))
+            elif change == 3:
+                script.append(("reg", [Register.ZBUF_1, Register.ZBUF_2][ctxt],
+                               zbuf(random.randint(4, 5), random.randint(0, 3) == 0)))
+            elif change == 4:
+                cbp = random.choice([16, 20])
+                address = random.choice([Register.TEX0_1, Register.TEX0_2, Register.TEX2_1, Register.TEX2_2])
+                script.append(("reg", address, (PixelFormat.PSMT8 << 20) | (cbp << 37) | (ClutLoad.LOAD << 61)))
+                loads += cbp != loaded
+                loaded = cbp
+            script.append(("reg", Register.PRIM, prim(random.randint(0, 1), random.randint(0, 1))))
+            for i in range(random.randint(1, 6)):
+                x, y = 2 * random.randint(0, 7), random.randint(0, 3)
+                script.append(("span", [(x + k, y, random.randint(0, 2**32 - 1), random.randint(0, 2**32 - 1))
+                                        if random.randint(0, 4) else None for k in range(2)]))
 
-    print(verilog.convert(pipe, ports=ports))
+        clocks, clut_words, tiles = group_test(2, script, latency=6, random_latency=True, texture=True)
+        print("2 lanes, random: {} spans in {} clocks".format(sum(item[0] == "span" for item in script), clocks))
+        assert clut_words == 256 * loads
+    elif args.report is not None:
+        # A configuration yosys cannot synthesise (running out of memory, say)
+        # is reported, and the others still are.
+        print("{:>5} {:>7} {:>8} {:>8} {:>5} {:>6}".format("lanes", "latency", "LUTs", "FFs", "DSPs", "levels"))
+        failed = []
+        for lanes in args.lanes:
+            pipe = group(lanes)
+            try:
+                luts, ffs, dsps, levels = synthesis_report(pipe, args.report)
+            except subprocess.CalledProcessError as e:
+                print("{:>5} {:>7} yosys failed with exit status {}".format(lanes, pipe.latency, e.returncode),
+                      flush=True)
+                failed.append(lanes)
+                continue
+            print("{:>5} {:>7} {:>8} {:>8} {:>5} {:>6}".format(lanes, pipe.latency, luts, ffs, dsps, levels),
+                  flush=True)
+        if failed:
+            parser.exit(1, "{}: yosys failed to synthesise {} lanes with {}\n".format(
+                parser.prog, ", ".join(map(str, failed)), " ".join(sys.argv[1:])))
+    else:
+        if len(args.lanes) != 1:
+            parser.error("only one lane count can be generated at once")
+        pipe = group(args.lanes[0])
+        print(verilog.convert(pipe, ports=group_ports(pipe)))
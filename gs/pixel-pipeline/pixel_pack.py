@@ -0,0 +1,286 @@
+import argparse
+from nmigen import Cat, Elaboratable, EnableInserter, Module, Mux, Repl, Signal
+from nmigen.back import pysim, rtlil
+
+from common import PixelFormat
+
+
+class PixelPack(Elaboratable):
+    def __init__(self):
+        # Converts a finished pixel to the formats of the framebuffer and the Z
+        # buffer, giving one word write for each with a byte enable per byte.
+        # 16-bit formats hold two pixels to a word, so only the pixel's own half
+        # of the word is enabled.
+
+        # FRAME - Framebuffer Settings
+        self.i_fbp     = Signal(9)  # Framebuffer base pointer, in units of 2048 words
+        self.i_fbw     = Signal(6)  # Buffer width, in units of 64 pixels
+        self.i_fbpsm   = Signal(6)  # Framebuffer pixel storage format
+        self.i_fbmsk   = Signal(32) # Framebuffer bits not to update, laid out as PSMCT32
+
+        # ZBUF - Z Buffer Settings
+        self.i_zbp     = Signal(9)  # Z buffer base pointer, in units of 2048 words
+        self.i_zbpsm   = Signal(4)  # Z buffer pixel storage format; low bits of PixelFormat.PSMZ*
+        self.i_zmsk    = Signal()   # Whether to leave the Z buffer alone; Off or On
+
+        self.i_valid   = Signal()   # Input pixel is valid
+        self.o_ready   = Signal()   # Input pixel is accepted this cycle
+
+        self.i_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
+        self.i_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
+        self.i_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.i_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+
+        self.i_x_coord = Signal(16) # Q12.4; Pixel X Coordinate
+        self.i_y_coord = Signal(16) # Q12.4; Pixel Y Coordinate
+        self.i_z_coord = Signal(32) # Float32; Pixel Z Coordinate
+
+        self.i_red     = Signal(8)  # Q8.0; Pixel Red Channel
+        self.i_green   = Signal(8)  # Q8.0; Pixel Green Channel
+        self.i_blue    = Signal(8)  # Q8.0; Pixel Blue Channel
+        self.i_alpha   = Signal(8)  # Q8.0; Pixel Alpha (Transparency) Channel
+
+        # Bits kept by FBMSK within a written byte come from here, so the
+        # framebuffer must have been read if FBMSK is not byte-aligned.
+        self.i_fbred   = Signal(8)  # Q8.0; Framebuffer Red Channel
+        self.i_fbgreen = Signal(8)  # Q8.0; Framebuffer Green Channel
+        self.i_fbblue  = Signal(8)  # Q8.0; Framebuffer Blue Channel
+        self.i_fbalpha = Signal(8)  # Q8.0; Framebuffer Alpha (Transparency) Channel
+
+        self.o_valid   = Signal()   # Output pixel is valid
+        self.i_ready   = Signal()   # Output pixel is accepted this cycle
+
+        self.o_fbaddr  = Signal(20) # Framebuffer word address
+        self.o_fbdata  = Signal(32) # Framebuffer word
+        self.o_fbmask  = Signal(4)  # Framebuffer byte enables; 0 if nothing is written
+
+        self.o_zaddr   = Signal(20) # Z buffer word address
+        self.o_zdata   = Signal(32) # Z buffer word
+        self.o_zmask   = Signal(4)  # Z buffer byte enables; 0 if nothing is written
+
+        # The pixel's context slot, position and depth, so its writes can be
+        # matched to it; see PipelineGroup, Scoreboard and CoarseZ
+        self.o_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.o_x_coord = Signal(16) # Output X Coordinate
+        self.o_y_coord = Signal(16) # Output Y Coordinate
+        self.o_z_coord = Signal(32) # Output Z Coordinate
+
+    @staticmethod
+    def _pack16(red, green, blue, alpha):
+        # R5 G5 B5 A1, keeping the top bits of each channel
+        return Cat(red[3:8], green[3:8], blue[3:8], alpha[7])
+
+    def elaborate(self, platform):
+        m = Module()
+
+        # The stage holds its output until it is accepted.
+        m.d.comb += self.o_ready.eq(~self.o_valid | self.i_ready)
+
+        ct16 = Signal()
+        ct24 = Signal()
+        z16  = Signal()
+        z24  = Signal()
+        m.d.comb += [
+            ct16.eq((self.i_fbpsm == PixelFormat.PSMCT16) | (self.i_fbpsm == PixelFormat.PSMCT16S)),
+            ct24.eq(self.i_fbpsm == PixelFormat.PSMCT24),
+            z16.eq((self.i_zbpsm == (PixelFormat.PSMZ16 & 0xF)) | (self.i_zbpsm == (PixelFormat.PSMZ16S & 0xF))),
+            z24.eq(self.i_zbpsm == (PixelFormat.PSMZ24 & 0xF))
+        ]
+
+        x = self.i_x_coord[4:]
+        y = self.i_y_coord[4:]
+        offset = Signal(20)
+        m.d.comb += offset.eq(y * (self.i_fbw << 6) + x)
+
+        # Colour, and which bits of the word to keep as they are
+        colour = Signal(32)
+        old    = Signal(32)
+        keep   = Signal(32)
+        with m.If(ct16):
+            half = self._pack16(self.i_red, self.i_green, self.i_blue, self.i_alpha)
+            old_half = self._pack16(self.i_fbred, self.i_fbgreen, self.i_fbblue, self.i_fbalpha)
+            keep_half = (self._pack16(self.i_fbmsk[0:8], self.i_fbmsk[8:16], self.i_fbmsk[16:24], self.i_fbmsk[24:32]) |
+                         Cat(Repl(~self.i_rgbrndr, 15), ~self.i_arndr))
+            m.d.comb += [
+                colour.eq(Cat(half, half)),
+                old.eq(Cat(old_half, old_half)),
+                keep.eq(Mux(x[0], Cat(Repl(1, 16), keep_half), Cat(keep_half, Repl(1, 16))))
+            ]
+        with m.Else():
+            # PSMCT24 has no alpha to write.
+            m.d.comb += [
+                colour.eq(Cat(self.i_red, self.i_green, self.i_blue, self.i_alpha)),
+                old.eq(Cat(self.i_fbred, self.i_fbgreen, self.i_fbblue, self.i_fbalpha)),
+                keep.eq(self.i_fbmsk | Cat(Repl(~self.i_rgbrndr, 24), Repl(~self.i_arndr | ct24, 8)))
+            ]
+
+        # Z saturates at the largest value the buffer can hold.
+        z = Signal(32)
+        with m.If(z16):
+            m.d.comb += z.eq(Mux(self.i_z_coord > 0xFFFF, 0xFFFF, self.i_z_coord))
+        with m.Elif(z24):
+            m.d.comb += z.eq(Mux(self.i_z_coord > 0xFFFFFF, 0xFFFFFF, self.i_z_coord))
+        with m.Else():
+            m.d.comb += z.eq(self.i_z_coord)
+
+        zwrite = Signal()
+        m.d.comb += zwrite.eq(self.i_zrndr & ~self.i_zmsk)
+
+        # Move the pipeline along
+        m.d.sync += [
+            self.o_valid.eq(self.i_valid),
+
+            self.o_fbaddr.eq((self.i_fbp << 11) + Mux(ct16, offset >> 1, offset)),
+            self.o_fbdata.eq((colour & ~keep) | (old & keep)),
+            self.o_fbmask.eq(Cat(*[keep[8 * b:8 * b + 8] != 0xFF for b in range(4)])),
+
+            self.o_zaddr.eq((self.i_zbp << 11) + Mux(z16, offset >> 1, offset)),
+            self.o_zdata.eq(Mux(z16, Cat(z[0:16], z[0:16]), z)),
+
+            self.o_ctxt.eq(self.i_ctxt),
+            self.o_x_coord.eq(self.i_x_coord),
+            self.o_y_coord.eq(self.i_y_coord),
+            self.o_z_coord.eq(self.i_z_coord)
+        ]
+
+        with m.If(~zwrite):
+            m.d.sync += self.o_zmask.eq(0b0000)
+        with m.Elif(z16):
+            m.d.sync += self.o_zmask.eq(Mux(x[0], 0b1100, 0b0011))
+        with m.Elif(z24):
+            m.d.sync += self.o_zmask.eq(0b0111)
+        with m.Else():
+            m.d.sync += self.o_zmask.eq(0b1111)
+
+        return EnableInserter(self.o_ready)(m)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a PixelPack as RTLIL, or test it.")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate random pixels in every format against a memory model, "
+                             "instead of generating RTLIL")
+    args = parser.parse_args()
+
+    pack = PixelPack()
+
+    ports = [
+        pack.i_fbp, pack.i_fbw, pack.i_fbpsm, pack.i_fbmsk,
+        pack.i_zbp, pack.i_zbpsm, pack.i_zmsk,
+
+        pack.i_valid, pack.o_ready,
+        pack.i_rgbrndr, pack.i_arndr, pack.i_zrndr, pack.i_ctxt,
+        pack.i_x_coord, pack.i_y_coord, pack.i_z_coord,
+        pack.i_red, pack.i_green, pack.i_blue, pack.i_alpha,
+        pack.i_fbred, pack.i_fbgreen, pack.i_fbblue, pack.i_fbalpha,
+
+        pack.o_valid, pack.i_ready,
+        pack.o_fbaddr, pack.o_fbdata, pack.o_fbmask,
+        pack.o_zaddr, pack.o_zdata, pack.o_zmask,
+        pack.o_ctxt, pack.o_x_coord, pack.o_y_coord,
+    ]
+
+    if args.test:
+        import random
+
+        def pack16(r, g, b, a):
+            return (r >> 3) | ((g >> 3) << 5) | ((b >> 3) << 10) | ((a >> 7) << 15)
+
+        def merge(word, mask, data):
+            # Apply a masked word write to a word of memory
+            for b in range(4):
+                if mask & (1 << b):
+                    word = (word & ~(0xFF << (8 * b))) | (data & (0xFF << (8 * b)))
+            return word
+
+        with pysim.Simulator(pack) as sim:
+            def pack_test(fbpsm, zbpsm, fbmsk, zmsk):
+                for i in range(32):
+                    x, y = random.randint(0, 127), random.randint(0, 63)
+                    rgbrndr, arndr, zrndr = random.randint(0, 1), random.randint(0, 1), random.randint(0, 1)
+                    if fbpsm != PixelFormat.PSMCT32:
+                        # Only PSMCT32 can write RGB without alpha.
+                        arndr = rgbrndr
+                    r, g, b, a = [random.randint(0, 255) for c in range(4)]
+                    fr, fg, fb, fa = [random.randint(0, 255) for c in range(4)]
+                    z = random.randint(0, 2**32 - 1)
+
+                    yield pack.i_fbp.eq(2)
+                    yield pack.i_fbw.eq(2)
+                    yield pack.i_fbpsm.eq(fbpsm)
+                    yield pack.i_fbmsk.eq(fbmsk)
+                    yield pack.i_zbp.eq(5)
+                    yield pack.i_zbpsm.eq(zbpsm & 0xF)
+                    yield pack.i_zmsk.eq(zmsk)
+
+                    yield pack.i_valid.eq(1)
+                    yield pack.i_ready.eq(1)
+                    yield pack.i_rgbrndr.eq(rgbrndr)
+                    yield pack.i_arndr.eq(arndr)
+                    yield pack.i_zrndr.eq(zrndr)
+                    yield pack.i_x_coord.eq(x << 4)
+                    yield pack.i_y_coord.eq(y << 4)
+                    yield pack.i_z_coord.eq(z)
+                    yield pack.i_red.eq(r)
+                    yield pack.i_green.eq(g)
+                    yield pack.i_blue.eq(b)
+                    yield pack.i_alpha.eq(a)
+                    yield pack.i_fbred.eq(fr)
+                    yield pack.i_fbgreen.eq(fg)
+                    yield pack.i_fbblue.eq(fb)
+                    yield pack.i_fbalpha.eq(fa)
+
+                    yield; yield
+
+                    offset = y * 128 + x
+                    # The framebuffer word around the pixel, with a random neighbour
+                    neighbour = random.randint(0, 2**16 - 1)
+
+                    if fbpsm in (PixelFormat.PSMCT16, PixelFormat.PSMCT16S):
+                        assert (yield pack.o_fbaddr) == 2 * 2048 + (offset >> 1)
+                        shift = 16 * (x & 1)
+                        word = (pack16(fr, fg, fb, fa) << shift) | (neighbour << (16 - shift))
+                        mask16 = pack16(fbmsk & 0xFF, (fbmsk >> 8) & 0xFF, (fbmsk >> 16) & 0xFF, fbmsk >> 24)
+                        new = pack16(r, g, b, a) if rgbrndr else pack16(fr, fg, fb, fa)
+                        new = (new & ~mask16) | (pack16(fr, fg, fb, fa) & mask16)
+                        expected = (new << shift) | (neighbour << (16 - shift))
+                    else:
+                        assert (yield pack.o_fbaddr) == 2 * 2048 + offset
+                        word = fr | (fg << 8) | (fb << 16) | (fa << 24)
+                        keep = (fbmsk | (0 if rgbrndr else 0xFFFFFF) |
+                                (0 if arndr and fbpsm == PixelFormat.PSMCT32 else 0xFF000000))
+                        expected = ((r | (g << 8) | (b << 16) | (a << 24)) & ~keep) | (word & keep)
+                    assert merge(word, (yield pack.o_fbmask), (yield pack.o_fbdata)) == expected
+
+                    # The Z buffer word around the pixel, with random untouched bits
+                    if zbpsm in (PixelFormat.PSMZ16, PixelFormat.PSMZ16S):
+                        assert (yield pack.o_zaddr) == 5 * 2048 + (offset >> 1)
+                        shift = 16 * (x & 1)
+                        word = neighbour << (16 - shift)
+                        expected = word | (min(z, 0xFFFF) << shift if zrndr and not zmsk else 0)
+                    elif zbpsm == PixelFormat.PSMZ24:
+                        assert (yield pack.o_zaddr) == 5 * 2048 + offset
+                        word = neighbour << 16
+                        expected = (word & 0xFF000000) | (min(z, 0xFFFFFF) if zrndr and not zmsk else word & 0xFFFFFF)
+                    else:
+                        assert (yield pack.o_zaddr) == 5 * 2048 + offset
+                        word = neighbour
+                        expected = z if zrndr and not zmsk else word
+                    assert merge(word, (yield pack.o_zmask), (yield pack.o_zdata)) == expected
+
+            def tests():
+                formats = [
+                    (PixelFormat.PSMCT32, PixelFormat.PSMZ32),
+                    (PixelFormat.PSMCT24, PixelFormat.PSMZ24),
+                    (PixelFormat.PSMCT16, PixelFormat.PSMZ16),
+                    (PixelFormat.PSMCT16S, PixelFormat.PSMZ16S),
+                ]
+                for fbpsm, zbpsm in formats:
+                    for fbmsk in [0, 0xFF00FF00, random.randint(0, 2**32 - 1)]:
+                        for zmsk in range(2):
+                            yield from pack_test(fbpsm, zbpsm, fbmsk, zmsk)
+
+            sim.add_sync_process(tests)
+            sim.add_clock(1e-6)
+            sim.run()
+    else:
+        print(rtlil.convert(pack, ports=ports))
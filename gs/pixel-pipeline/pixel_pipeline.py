@@ -1,39 +1,125 @@
-from nmigen import Elaboratable, Module, Signal
-from nmigen.back import rtlil, verilog
+import argparse
+from nmigen import Cat, Elaboratable, Module, Record, Signal
+from nmigen.back import pysim, rtlil, verilog
 
-from alpha_blend import AlphaBlend
-from alpha_test import AlphaTest
+from alpha_blend import AlphaBlend, BlendAlpha, BlendRGB
+from alpha_test import AlphaFailMode, AlphaTest, AlphaTestMode
 from clamp import Clamp
+from common import PixelFormat
 from dest_alpha_test import DestinationAlphaTest
 from dither import Dither
-from z_test import ZTest
+from fb_read import FramebufferRead
+from pixel_pack import PixelPack
+from scoreboard import Scoreboard
+from skid_buffer import SkidBuffer
+from stage_bypass import StageBypass
+from texture import TextureFunction, TextureUnit
+from z_read import ZBufferRead
+from z_test import ZTest, ZTestMode
+
+
+# Pixel fields passed from stage to stage, where both stages have them
+STAGE_FIELDS = [
+    "rgbrndr", "arndr", "zrndr", "ctxt", "tme", "abe",
+    "x_coord", "y_coord", "z_coord",
+    "red", "green", "blue", "alpha",
+    "fbred", "fbgreen", "fbblue", "fbalpha",
+    "zref",
+    "u", "v"
+]
+
+
+# Settings each drawing context has its own copy of
+CONTEXT = [
+    # ALPHA - Alpha Blending
+    ("blend_a", 2),      # Blending Parameter A; see BlendRGB
+    ("blend_b", 2),      # Blending Parameter B; see BlendRGB
+    ("blend_c", 2),      # Blending Parameter C; see BlendAlpha
+    ("blend_d", 2),      # Blending Parameter D; see BlendRGB
+    ("blend_fix", 8),    # Q8.0; Fixed alpha value
+
+    # TEST - Pixel Test Settings
+    ("test_ate", 1),     # Whether to perform alpha testing
+    ("test_atst", 3),    # Alpha test to perform
+    ("test_aref", 8),    # Reference alpha value
+    ("test_afail", 2),   # Action to perform on test failure
+    ("test_date", 1),    # Whether to perform destination alpha testing
+    ("test_datm", 1),    # Destination alpha test comparison value
+    ("test_zte", 1),     # Z test enable (buggy)
+    ("test_ztst", 2),    # Z test type
+
+    # FBA - Framebuffer Alpha Correction value
+    ("fba_fba", 1),      # Value ORed with most significant bit of alpha channel.
+
+    # FRAME - Framebuffer Settings
+    ("frame_fbp", 9),    # Framebuffer base pointer, in units of 2048 words
+    ("frame_fbw", 6),    # Framebuffer width, in units of 64 pixels
+    ("frame_psm", 6),    # Framebuffer pixel storage format
+    ("frame_fbmsk", 32), # Framebuffer bits not to update
+
+    # ZBUF - Z Buffer Settings
+    ("zbuf_zbp", 9),     # Z buffer base pointer, in units of 2048 words
+    ("zbuf_psm", 4),     # Z buffer pixel storage format
+    ("zbuf_zmsk", 1),    # Whether to leave the Z buffer alone
+
+    # TEX0 - Texture Settings
+    ("tex0_tbp0", 14),   # Texture base pointer, in units of 64 words
+    ("tex0_tbw", 6),     # Texture buffer width, in units of 64 texels
+    ("tex0_psm", 6),     # Texture pixel storage format
+    ("tex0_tw", 4),      # Log2 of texture width
+    ("tex0_th", 4),      # Log2 of texture height
+    ("tex0_tcc", 1),     # Whether to take alpha from the texture
+    ("tex0_tfx", 2),     # Texture function; see TextureFunction
+    ("tex0_cpsm", 4),    # CLUT pixel storage format
+    ("tex0_csa", 5),     # CLUT entry offset of 4-bit textures, in units of 16 entries
+
+    # TEX1 - Texture LOD Settings
+    ("tex1_mmag", 1),    # Whether to filter magnified textures bilinearly
+
+    # CLAMP - Texture Wrap Modes
+    ("clamp_wms", 2),    # Wrap mode of texel X coordinates; see WrapMode
+    ("clamp_wmt", 2),    # Wrap mode of texel Y coordinates; see WrapMode
+    ("clamp_minu", 10),  # REGION_CLAMP: leftmost column; REGION_REPEAT: column mask
+    ("clamp_maxu", 10),  # REGION_CLAMP: rightmost column; REGION_REPEAT: column bits set
+    ("clamp_minv", 10),  # REGION_CLAMP: top row; REGION_REPEAT: row mask
+    ("clamp_maxv", 10)   # REGION_CLAMP: bottom row; REGION_REPEAT: row bits set
+]
 
 
 class PixelPipeline(Elaboratable):
-    def __init__(self):
-        # ALPHA - Alpha Blending
-        self.i_blend_a    = Signal(2) # Blending Parameter A; see BlendRGB
-        self.i_blend_b    = Signal(2) # Blending Parameter B; see BlendRGB
-        self.i_blend_c    = Signal(2) # Blending Parameter C; see BlendAlpha
-        self.i_blend_d    = Signal(2) # Blending Parameter D; see BlendRGB
-        self.i_blend_fix  = Signal(8) # Q8.0; Fixed alpha value
+    def __init__(self, depth=8, dither=True, blend=True, blend_latency=1, bypass=False, hazard_bits=8,
+                 texture=True, texture_ways=2, texture_lines=32, texture_filter=True):
+        self.depth        = depth   # Pixels each buffer read can have waiting on memory
+        self.dither       = dither  # Whether to build the dither stage; DTHE and DIMX are ignored without it
+        self.blend        = blend   # Whether to build the alpha blending stage; ABE is ignored without it
+        self.blend_latency = blend_latency # Clocks spent blending; see AlphaBlend
+        self.bypass       = bypass  # Whether pixels skip stages which would do nothing to them
+        self.hazard_bits  = hazard_bits # Hash width of the scoreboard holding back pixels at positions in flight;
+                                        # with 0, the caller holds them back instead, using o_drop
+        self.texture      = texture # Whether to build the texture stage; TME is ignored without it
+        self.texture_ways = texture_ways   # Lines per set of the texel cache; see TextureUnit
+        self.texture_lines = texture_lines # Sets of the texel cache; see TextureUnit
+        self.texture_filter = texture_filter # Whether to build the bilinear filter; MMAG is ignored without it
+
+        # Clocks from a pixel entering to its writes leaving, without stalls or
+        # memory reads: one for each skid buffer and stage, and the blending
+        # and texturing latencies. In bypass mode, a skipped stage takes none.
+        self.latency      = (9 + (blend_latency if blend else 0) + (1 if dither else 0) +
+                             ((5 if texture_filter else 3) if texture else 0))
+
+        # Most pixels inside at once: two in each skid buffer, `depth` in each
+        # buffer read, and one in every other stage
+        self.capacity     = self.latency + 2 * depth
+
+        # Settings of each context slot a pixel may be tagged with; see CONTEXT.
+        # How contexts are placed in slots is up to the user: PipelineGroup
+        # gives each drawing context two, so one can be rewritten while pixels
+        # of the other are in flight.
+        self.i_context    = [Record(CONTEXT) for i in range(4)]
 
         # PABE - Per-Pixel Alpha Blending Enable
         self.i_pabe_pabe  = Signal()  # Whether to perform per-pixel alpha blending
 
-        # PRIM/PRMODE - Primitive Settings
-        self.i_prim_abe   = Signal()  # Whether to perform alpha blending
-
-        # TEST - Pixel Test Settings
-        self.i_test_ate   = Signal()  # Whether to perform alpha testing
-        self.i_test_atst  = Signal(3) # Alpha test to perform
-        self.i_test_aref  = Signal(8) # Reference alpha value
-        self.i_test_afail = Signal(2) # Action to perform on test failure
-        self.i_test_date  = Signal()  # Whether to perform destination alpha testing
-        self.i_test_datm  = Signal()  # Destination alpha test comparison value
-        self.i_test_zte   = Signal()  # Z test enable (buggy)
-        self.i_test_ztst  = Signal(2) # Z test type
-
         # DIMX - Dither Matrix
         self.i_dimx_dm00  = Signal(8) # (0, 0) dither matrix
         self.i_dimx_dm01  = Signal(8) # (1, 0) dither matrix
@@ -58,18 +144,48 @@ class PixelPipeline(Elaboratable):
         # COLCLAMP - Colour Clamping Enable
         self.i_colclamp   = Signal()  # Whether to saturate or overflow colour channels
 
-        # FBA - Framebuffer Alpha Correction value
-        self.i_fba_fba    = Signal()  # Value ORed with most significant bit of alpha channel.
-
-        # FRAME - Framebuffer Settings
-        self.i_frame_psm  = Signal(6) # Framebuffer pixel storage format
-
-        # ZBUF - Z Buffer Settings
-        self.i_zbuf_psm   = Signal(4) # Z buffer pixel storage format
+        # TEXA - Texture Alpha Expansion
+        self.i_texa_ta0   = Signal(8) # Alpha of 24-bit texels, and of 16-bit texels with A = 0
+        self.i_texa_aem   = Signal()  # Whether texels with R = G = B = 0 are transparent
+        self.i_texa_ta1   = Signal(8) # Alpha of 16-bit texels with A = 1
+
+        # TEXFLUSH - Texture Flush
+        self.i_texflush   = Signal()  # Forget every cached texel; texture memory has been written
+
+        # Framebuffer memory reads
+        self.o_fbreq_valid  = Signal()   # Read request is valid
+        self.o_fbreq_addr   = Signal(20) # Word address to read
+        self.i_fbreq_ready  = Signal()   # Read request is accepted this cycle
+        self.i_fbresp_valid = Signal()   # Read data is valid; responses return in request order
+        self.i_fbresp_data  = Signal(32) # Read data
+
+        # Z buffer memory reads
+        self.o_zreq_valid  = Signal()   # Read request is valid
+        self.o_zreq_addr   = Signal(20) # Word address to read
+        self.i_zreq_ready  = Signal()   # Read request is accepted this cycle
+        self.i_zresp_valid = Signal()   # Read data is valid; responses return in request order
+        self.i_zresp_data  = Signal(32) # Read data
+
+        # Texture memory reads
+        self.o_texreq_valid  = Signal()   # Read request is valid
+        self.o_texreq_addr   = Signal(20) # Word address to read
+        self.i_texreq_ready  = Signal()   # Read request is accepted this cycle
+        self.i_texresp_valid = Signal()   # Read data is valid; responses return in request order
+        self.i_texresp_data  = Signal(32) # Read data
+
+        # CLUT reads, answered a clock later; see TextureUnit
+        self.o_clut_addr   = Signal(8)  # CLUT word to read
+        self.i_clut_data   = Signal(32) # CLUT word
+
+        self.i_valid   = Signal()   # Input pixel is valid
+        self.o_ready   = Signal()   # Input pixel is accepted this cycle
 
         self.i_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
         self.i_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
         self.i_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.i_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.i_tme     = Signal()   # Whether to texture this pixel (TME); Off or On
+        self.i_abe     = Signal()   # Whether to alpha blend this pixel (ABE); Off or On
 
         self.i_x_coord = Signal(16) # Q12.4; Pixel X Coordinate
         self.i_y_coord = Signal(16) # Q12.4; Pixel Y Coordinate
@@ -80,206 +196,539 @@ class PixelPipeline(Elaboratable):
         self.i_blue    = Signal(8)  # Q8.0; Pixel Blue Channel
         self.i_alpha   = Signal(8)  # Q8.0; Pixel Alpha (Transparency) Channel
 
-        self.o_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
-        self.o_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
-        self.o_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.i_u       = Signal(16) # Q12.4; Texel X Coordinate
+        self.i_v       = Signal(16) # Q12.4; Texel Y Coordinate
 
+        self.o_valid   = Signal()   # Output pixel is valid
+        self.i_ready   = Signal()   # Output pixel is accepted this cycle
+
+        # The pixel's writes, in the buffers' formats; see PixelPack
+        self.o_fbaddr  = Signal(20) # Framebuffer word address
+        self.o_fbdata  = Signal(32) # Framebuffer word
+        self.o_fbmask  = Signal(4)  # Framebuffer byte enables; 0 if nothing is written
+
+        self.o_zaddr   = Signal(20) # Z buffer word address
+        self.o_zdata   = Signal(32) # Z buffer word
+        self.o_zmask   = Signal(4)  # Z buffer byte enables; 0 if nothing is written
+
+        # The context slot, position and depth of the pixel written
+        self.o_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
         self.o_x_coord = Signal(16) # Output X Coordinate
         self.o_y_coord = Signal(16) # Output Y Coordinate
         self.o_z_coord = Signal(32) # Output Z Coordinate
 
-        self.o_red     = Signal(9)  # Output Red Channel
-        self.o_green   = Signal(9)  # Output Green Channel
-        self.o_blue    = Signal(9)  # Output Blue Channel
-        self.o_alpha   = Signal(8)  # Output Alpha Channel
+        # Pixels dropped by the destination alpha test and by the Z test, which
+        # will write nothing and never come out
+        self.o_drop    = [Record([("o_valid", 1), ("o_ctxt", 2), ("o_x_coord", 16), ("o_y_coord", 16)]) for i in range(2)]
+
+    def _pixel(self, d, stage=None):
+        return [getattr(stage or self, d + "_" + name) for name in [
+            "rgbrndr", "arndr", "zrndr", "ctxt", "abe",
+            "x_coord", "y_coord", "z_coord",
+            "red", "green", "blue", "alpha"
+        ] + (["tme", "u", "v"] if self.texture else [])]
+
+    def _context(self, m, stage):
+        # The settings of the context slot of the pixel entering a stage
+        ctx = Record(CONTEXT)
+        with m.Switch(stage.i_ctxt):
+            for n, slot in enumerate(self.i_context):
+                with m.Case(n):
+                    m.d.comb += ctx.eq(slot)
+        return ctx
+
+    def _writes(self, stage):
+        return [getattr(stage, "o_" + name) for name in [
+            "fbaddr", "fbdata", "fbmask",
+            "zaddr", "zdata", "zmask",
+            "ctxt", "x_coord", "y_coord", "z_coord"
+        ]]
+
+    def _connect(self, m, src, dst, live=None):
+        # Pixels move between stages with a valid/ready handshake, taking every
+        # field both stages have; every stage registers its output, so the
+        # stream itself is wired directly. A pixel which is not live leaves the
+        # stream instead of moving on.
+        if live is None:
+            m.d.comb += [
+                dst.i_valid.eq(src.o_valid),
+                src.i_ready.eq(dst.o_ready)
+            ]
+        else:
+            m.d.comb += [
+                dst.i_valid.eq(src.o_valid & live),
+                src.i_ready.eq(dst.o_ready | ~live)
+            ]
+
+        for name in STAGE_FIELDS:
+            if hasattr(src, "o_" + name) and hasattr(dst, "i_" + name):
+                m.d.comb += getattr(dst, "i_" + name).eq(getattr(src, "o_" + name))
 
     def elaborate(self, platform):
         m = Module()
-    
+
+        # Skid buffers at either end keep the ready paths inside the pipeline.
+        m.submodules.input_skid = input_skid = SkidBuffer(len(Cat(self._pixel("i"))))
+        if self.texture:
+            m.submodules.texture = texture = TextureUnit(ways=self.texture_ways, lines=self.texture_lines,
+                                                             bilinear=self.texture_filter)
+        m.submodules.fb_read = fb_read = FramebufferRead(depth=self.depth)
         m.submodules.alpha_test = alpha_test = AlphaTest()
         m.submodules.dest_alpha = dest_alpha = DestinationAlphaTest()
+        m.submodules.z_read = z_read = ZBufferRead(depth=self.depth)
         m.submodules.z_test = z_test = ZTest()
-        m.submodules.alpha_blend = alpha_blend = AlphaBlend()
-        m.submodules.dither = dither = Dither()
+        if self.blend:
+            m.submodules.alpha_blend = alpha_blend = AlphaBlend(latency=self.blend_latency)
+        if self.dither:
+            m.submodules.dither = dither = Dither()
         m.submodules.clamp = clamp = Clamp()
+        m.submodules.pack = pack = PixelPack()
+        m.submodules.output_skid = output_skid = SkidBuffer(len(Cat(self._writes(self))))
+        if self.hazard_bits:
+            m.submodules.scoreboard = scoreboard = Scoreboard(bits=self.hazard_bits, releases=3)
+
+        # Framebuffer and Z buffer reads go straight to memory.
+        m.d.comb += [
+            self.o_fbreq_valid.eq(fb_read.o_req_valid),
+            self.o_fbreq_addr.eq(fb_read.o_req_addr),
+            fb_read.i_req_ready.eq(self.i_fbreq_ready),
+            fb_read.i_resp_valid.eq(self.i_fbresp_valid),
+            fb_read.i_resp_data.eq(self.i_fbresp_data),
+
+            self.o_zreq_valid.eq(z_read.o_req_valid),
+            self.o_zreq_addr.eq(z_read.o_req_addr),
+            z_read.i_req_ready.eq(self.i_zreq_ready),
+            z_read.i_resp_valid.eq(self.i_zresp_valid),
+            z_read.i_resp_data.eq(self.i_zresp_data)
+        ]
+
+        if self.texture:
+            # Texels come from memory through the texture unit's cache, and from
+            # the CLUT.
+            texture_ctx = self._context(m, texture)
+            m.d.comb += [
+                self.o_texreq_valid.eq(texture.o_req_valid),
+                self.o_texreq_addr.eq(texture.o_req_addr),
+                texture.i_req_ready.eq(self.i_texreq_ready),
+                texture.i_resp_valid.eq(self.i_texresp_valid),
+                texture.i_resp_data.eq(self.i_texresp_data),
+
+                self.o_clut_addr.eq(texture.o_clut_addr),
+                texture.i_clut_data.eq(self.i_clut_data),
+
+                texture.i_filter.eq(texture_ctx.tex1_mmag),
+                texture.i_tbp0.eq(texture_ctx.tex0_tbp0),
+                texture.i_tbw.eq(texture_ctx.tex0_tbw),
+                texture.i_psm.eq(texture_ctx.tex0_psm),
+                texture.i_tw.eq(texture_ctx.tex0_tw),
+                texture.i_th.eq(texture_ctx.tex0_th),
+                texture.i_tcc.eq(texture_ctx.tex0_tcc),
+                texture.i_tfx.eq(texture_ctx.tex0_tfx),
+                texture.i_cpsm.eq(texture_ctx.tex0_cpsm),
+                texture.i_csa.eq(texture_ctx.tex0_csa),
+                texture.i_wms.eq(texture_ctx.clamp_wms),
+                texture.i_wmt.eq(texture_ctx.clamp_wmt),
+                texture.i_minu.eq(texture_ctx.clamp_minu),
+                texture.i_maxu.eq(texture_ctx.clamp_maxu),
+                texture.i_minv.eq(texture_ctx.clamp_minv),
+                texture.i_maxv.eq(texture_ctx.clamp_maxv),
+                texture.i_ta0.eq(self.i_texa_ta0),
+                texture.i_aem.eq(self.i_texa_aem),
+                texture.i_ta1.eq(self.i_texa_ta1),
+                texture.i_flush.eq(self.i_texflush)
+            ]
+
+        # Each stage takes the settings of its pixel's context slot, so pixels
+        # of every slot may be in the pipeline at once.
+        fb_read_ctx = self._context(m, fb_read)
+        alpha_test_ctx = self._context(m, alpha_test)
+        dest_alpha_ctx = self._context(m, dest_alpha)
+        z_read_ctx = self._context(m, z_read)
+        z_test_ctx = self._context(m, z_test)
+        clamp_ctx = self._context(m, clamp)
+        pack_ctx = self._context(m, pack)
+
+        # Without blending, only the destination alpha test and partial masks
+        # need the framebuffer.
+        blend = fb_read.i_abe if self.blend else 0
+
+        m.d.comb += [
+            fb_read.i_enable.eq(blend | fb_read_ctx.test_date | (fb_read_ctx.frame_fbmsk != 0)),
+            fb_read.i_fbp.eq(fb_read_ctx.frame_fbp),
+            fb_read.i_fbw.eq(fb_read_ctx.frame_fbw),
+            fb_read.i_psm.eq(fb_read_ctx.frame_psm),
+
+            alpha_test.i_enable.eq(alpha_test_ctx.test_ate),
+            alpha_test.i_test.eq(alpha_test_ctx.test_atst),
+            alpha_test.i_aref.eq(alpha_test_ctx.test_aref),
+            alpha_test.i_failmod.eq(alpha_test_ctx.test_afail),
+            alpha_test.i_fbpxfmt.eq(alpha_test_ctx.frame_psm),
+
+            dest_alpha.i_enable.eq(dest_alpha_ctx.test_date),
+            dest_alpha.i_mode.eq(dest_alpha_ctx.test_datm),
+            dest_alpha.i_fbpxfmt.eq(dest_alpha_ctx.frame_psm),
+
+            z_read.i_enable.eq(z_read_ctx.test_zte),
+            z_read.i_test.eq(z_read_ctx.test_ztst),
+            z_read.i_zbp.eq(z_read_ctx.zbuf_zbp),
+            z_read.i_fbw.eq(z_read_ctx.frame_fbw),
+            z_read.i_psm.eq(z_read_ctx.zbuf_psm),
+
+            z_test.i_enable.eq(z_test_ctx.test_zte),
+            z_test.i_test.eq(z_test_ctx.test_ztst),
 
-        m.d.sync += [
-            # TODO: Is this synchronous or combinational? (Matters for timing)
-            # input -> alpha_test
-            alpha_test.i_enable.eq(self.i_test_ate),
-            alpha_test.i_test.eq(self.i_test_atst),
-            alpha_test.i_aref.eq(self.i_test_aref),
-            alpha_test.i_failmod.eq(self.i_test_afail),
-
-            alpha_test.i_rgbrndr.eq(self.i_rgbrndr),
-            alpha_test.i_arndr.eq(self.i_arndr),
-            alpha_test.i_zrndr.eq(self.i_zrndr),
-
-            alpha_test.i_x_coord.eq(self.i_x_coord),
-            alpha_test.i_y_coord.eq(self.i_y_coord),
-            alpha_test.i_z_coord.eq(self.i_z_coord),
-
-            alpha_test.i_red.eq(self.i_red),
-            alpha_test.i_green.eq(self.i_green),
-            alpha_test.i_blue.eq(self.i_blue),
-            alpha_test.i_alpha.eq(self.i_alpha),
-
-            alpha_test.i_fbpxfmt.eq(self.i_frame_psm),
-
-            # alpha_test -> dest_alpha
-            dest_alpha.i_enable.eq(self.i_test_date),
-            dest_alpha.i_mode.eq(self.i_test_datm),
-
-            dest_alpha.i_rgbrndr.eq(alpha_test.o_rgbrndr),
-            dest_alpha.i_arndr.eq(alpha_test.o_arndr),
-            dest_alpha.i_zrndr.eq(alpha_test.o_zrndr),
-
-            dest_alpha.i_x_coord.eq(alpha_test.o_x_coord),
-            dest_alpha.i_y_coord.eq(alpha_test.o_y_coord),
-            dest_alpha.i_z_coord.eq(alpha_test.o_z_coord),
-
-            dest_alpha.i_red.eq(alpha_test.o_red),
-            dest_alpha.i_green.eq(alpha_test.o_green),
-            dest_alpha.i_blue.eq(alpha_test.o_blue),
-            dest_alpha.i_alpha.eq(alpha_test.o_alpha),
-
-            dest_alpha.i_fbpxfmt.eq(self.i_frame_psm),
-            
-            # dest_alpha -> z_test
-            z_test.i_enable.eq(self.i_test_zte),
-            z_test.i_test.eq(self.i_test_ztst),
-            z_test.i_zref.eq(0x7FFFFFFF),
-
-            z_test.i_rgbrndr.eq(dest_alpha.o_rgbrndr),
-            z_test.i_arndr.eq(dest_alpha.o_arndr),
-            z_test.i_zrndr.eq(dest_alpha.o_zrndr),
-
-            z_test.i_x_coord.eq(dest_alpha.o_x_coord),
-            z_test.i_y_coord.eq(dest_alpha.o_y_coord),
-            z_test.i_z_coord.eq(dest_alpha.o_z_coord),
-
-            z_test.i_red.eq(dest_alpha.o_red),
-            z_test.i_green.eq(dest_alpha.o_green),
-            z_test.i_blue.eq(dest_alpha.o_blue),
-            z_test.i_alpha.eq(dest_alpha.o_alpha),
-            
-            # z_test -> alpha_blend
-            alpha_blend.i_blend_a.eq(self.i_blend_a),
-            alpha_blend.i_blend_b.eq(self.i_blend_b),
-            alpha_blend.i_blend_c.eq(self.i_blend_c),
-            alpha_blend.i_blend_d.eq(self.i_blend_d),
-            alpha_blend.i_fix.eq(self.i_blend_fix),
-            
-            alpha_blend.i_alphaen.eq(self.i_pabe_pabe),
-
-            alpha_blend.i_enable.eq(self.i_prim_abe),
-
-            alpha_blend.i_rgbrndr.eq(z_test.o_rgbrndr),
-            alpha_blend.i_arndr.eq(z_test.o_arndr),
-            alpha_blend.i_zrndr.eq(z_test.o_zrndr),
-
-            alpha_blend.i_x_coord.eq(z_test.o_x_coord),
-            alpha_blend.i_y_coord.eq(z_test.o_y_coord),
-            alpha_blend.i_z_coord.eq(z_test.o_z_coord),
-
-            alpha_blend.i_red.eq(z_test.o_red),
-            alpha_blend.i_green.eq(z_test.o_green),
-            alpha_blend.i_blue.eq(z_test.o_blue),
-            alpha_blend.i_alpha.eq(z_test.o_alpha),
-
-            alpha_blend.i_fbpxfmt.eq(self.i_frame_psm),
-
-            # alpha_blend -> dither
-            dither.i_enable.eq(self.i_dthe_dthe),
-
-            dither.i_dm00.eq(self.i_dimx_dm00),
-            dither.i_dm01.eq(self.i_dimx_dm01),
-            dither.i_dm02.eq(self.i_dimx_dm02),
-            dither.i_dm03.eq(self.i_dimx_dm03),
-            dither.i_dm10.eq(self.i_dimx_dm10),
-            dither.i_dm11.eq(self.i_dimx_dm11),
-            dither.i_dm12.eq(self.i_dimx_dm12),
-            dither.i_dm13.eq(self.i_dimx_dm13),
-            dither.i_dm20.eq(self.i_dimx_dm20),
-            dither.i_dm21.eq(self.i_dimx_dm21),
-            dither.i_dm22.eq(self.i_dimx_dm22),
-            dither.i_dm23.eq(self.i_dimx_dm23),
-            dither.i_dm30.eq(self.i_dimx_dm30),
-            dither.i_dm31.eq(self.i_dimx_dm31),
-            dither.i_dm32.eq(self.i_dimx_dm32),
-            dither.i_dm33.eq(self.i_dimx_dm33),
-
-            dither.i_rgbrndr.eq(alpha_blend.o_rgbrndr),
-            dither.i_arndr.eq(alpha_blend.o_arndr),
-            dither.i_zrndr.eq(alpha_blend.o_zrndr),
-
-            dither.i_x_coord.eq(alpha_blend.o_x_coord),
-            dither.i_y_coord.eq(alpha_blend.o_y_coord),
-            dither.i_z_coord.eq(alpha_blend.o_z_coord),
-
-            dither.i_red.eq(alpha_blend.o_red),
-            dither.i_green.eq(alpha_blend.o_green),
-            dither.i_blue.eq(alpha_blend.o_blue),
-            dither.i_alpha.eq(alpha_blend.o_alpha),
-
-            # dither -> clamp
             clamp.i_clamp.eq(self.i_colclamp),
-            clamp.i_alphcor.eq(self.i_fba_fba),
-
-            clamp.i_rgbrndr.eq(dither.o_rgbrndr),
-            clamp.i_arndr.eq(dither.o_arndr),
-            clamp.i_zrndr.eq(dither.o_zrndr),
-
-            clamp.i_x_coord.eq(dither.o_x_coord),
-            clamp.i_y_coord.eq(dither.o_y_coord),
-            clamp.i_z_coord.eq(dither.o_z_coord),
-
-            clamp.i_red.eq(dither.o_red),
-            clamp.i_green.eq(dither.o_green),
-            clamp.i_blue.eq(dither.o_blue),
-            clamp.i_alpha.eq(dither.o_alpha),
-
-            # clamp -> output
-            self.o_rgbrndr.eq(clamp.o_rgbrndr),
-            self.o_arndr.eq(clamp.o_arndr),
-            self.o_zrndr.eq(clamp.o_zrndr),
-
-            self.o_x_coord.eq(clamp.o_x_coord),
-            self.o_y_coord.eq(clamp.o_y_coord),
-            self.o_z_coord.eq(clamp.o_z_coord),
-
-            self.o_red.eq(clamp.o_red),
-            self.o_green.eq(clamp.o_green),
-            self.o_blue.eq(clamp.o_blue),
-            self.o_alpha.eq(clamp.o_alpha)
-         ]
+            clamp.i_alphcor.eq(clamp_ctx.fba_fba),
+
+            pack.i_fbp.eq(pack_ctx.frame_fbp),
+            pack.i_fbw.eq(pack_ctx.frame_fbw),
+            pack.i_fbpsm.eq(pack_ctx.frame_psm),
+            pack.i_fbmsk.eq(pack_ctx.frame_fbmsk),
+            pack.i_zbp.eq(pack_ctx.zbuf_zbp),
+            pack.i_zbpsm.eq(pack_ctx.zbuf_psm),
+            pack.i_zmsk.eq(pack_ctx.zbuf_zmsk)
+        ]
+
+        if self.blend:
+            alpha_blend_ctx = self._context(m, alpha_blend)
+            m.d.comb += [
+                alpha_blend.i_blend_a.eq(alpha_blend_ctx.blend_a),
+                alpha_blend.i_blend_b.eq(alpha_blend_ctx.blend_b),
+                alpha_blend.i_blend_c.eq(alpha_blend_ctx.blend_c),
+                alpha_blend.i_blend_d.eq(alpha_blend_ctx.blend_d),
+                alpha_blend.i_fix.eq(alpha_blend_ctx.blend_fix),
+                alpha_blend.i_alphaen.eq(self.i_pabe_pabe),
+                alpha_blend.i_fbpxfmt.eq(alpha_blend_ctx.frame_psm)
+            ]
+
+        if self.dither:
+            m.d.comb += [
+                dither.i_enable.eq(self.i_dthe_dthe),
+                dither.i_dm00.eq(self.i_dimx_dm00),
+                dither.i_dm01.eq(self.i_dimx_dm01),
+                dither.i_dm02.eq(self.i_dimx_dm02),
+                dither.i_dm03.eq(self.i_dimx_dm03),
+                dither.i_dm10.eq(self.i_dimx_dm10),
+                dither.i_dm11.eq(self.i_dimx_dm11),
+                dither.i_dm12.eq(self.i_dimx_dm12),
+                dither.i_dm13.eq(self.i_dimx_dm13),
+                dither.i_dm20.eq(self.i_dimx_dm20),
+                dither.i_dm21.eq(self.i_dimx_dm21),
+                dither.i_dm22.eq(self.i_dimx_dm22),
+                dither.i_dm23.eq(self.i_dimx_dm23),
+                dither.i_dm30.eq(self.i_dimx_dm30),
+                dither.i_dm31.eq(self.i_dimx_dm31),
+                dither.i_dm32.eq(self.i_dimx_dm32),
+                dither.i_dm33.eq(self.i_dimx_dm33)
+            ]
+
+        # Pixels are textured before the pixel tests, which may depend on the
+        # texture's alpha. The framebuffer is read as early as possible after
+        # that, so its latency overlaps the pixel tests.
+        stages = [texture] if self.texture else []
+        stages += [fb_read, alpha_test, dest_alpha, z_read, z_test]
+        stages += [alpha_blend] if self.blend else []
+        stages += [dither] if self.dither else []
+        stages += [clamp, pack]
+
+        # The pixel tests which may kill a pixel
+        tests = [stages.index(dest_alpha), stages.index(z_test)]
+
+        # In bypass mode, pixels skip the stages which would do nothing to them
+        # whenever those stages are empty; see StageBypass.
+        if self.bypass:
+            bypasses = [("texture", texture, ~texture.i_tme, texture.latency)] if self.texture else []
+            bypasses += [
+                ("fb_read", fb_read, ~fb_read.i_enable, self.depth),
+                ("alpha_test", alpha_test, ~alpha_test.i_enable, 1),
+                ("dest_alpha", dest_alpha, ~dest_alpha.i_enable | (dest_alpha.i_fbpxfmt == PixelFormat.PSMCT24), 1),
+                ("z_read", z_read, ~z_read.i_enable | ((z_read.i_test != ZTestMode.GEQUAL) &
+                                                      (z_read.i_test != ZTestMode.GREATER)), self.depth),
+                ("z_test", z_test, ~z_test.i_enable | (z_test.i_test == ZTestMode.ALWAYS), 1)
+            ]
+            if self.blend:
+                bypasses.append(("alpha_blend", alpha_blend, ~alpha_blend.i_abe, self.blend_latency))
+            if self.dither:
+                bypasses.append(("dither", dither, ~dither.i_enable, 1))
+
+            for name, stage, skip, capacity in bypasses:
+                m.submodules[name + "_bypass"] = bypass = StageBypass(stage, STAGE_FIELDS, capacity)
+                m.d.comb += bypass.i_bypass.eq(skip)
+                stages[stages.index(stage)] = bypass
+
+        m.d.comb += [
+            input_skid.i_valid.eq(self.i_valid),
+            self.o_ready.eq(input_skid.o_ready),
+            input_skid.i_data.eq(Cat(*self._pixel("i"))),
+            Cat(*self._pixel("i", stages[0])).eq(input_skid.o_data)
+        ]
+
+        # A pixel may only start reading the buffers once no pixel at the same
+        # position is still in flight, or it would read what that pixel is
+        # about to overwrite. Pixels leave the scoreboard when the tests drop
+        # them, and when their writes leave the pipeline.
+        if self.hazard_bits:
+            claim = scoreboard.claim[0]
+            m.d.comb += [
+                stages[0].i_valid.eq(input_skid.o_valid & ~claim.o_busy),
+                input_skid.i_ready.eq(stages[0].o_ready & ~claim.o_busy),
+
+                claim.i_valid.eq(input_skid.o_valid),
+                claim.i_index.eq(scoreboard.index(stages[0].i_x_coord, stages[0].i_y_coord)),
+                claim.i_claim.eq(stages[0].i_valid & stages[0].o_ready)
+            ]
+        else:
+            m.d.comb += [
+                stages[0].i_valid.eq(input_skid.o_valid),
+                input_skid.i_ready.eq(stages[0].o_ready)
+            ]
+
+        # Pixels which will write nothing leave the stream as soon as the tests
+        # have failed them, so they take neither a Z read nor a write slot. The
+        # stage behind a killed pixel moves up in the same cycle, and as each
+        # stage refills whenever it is empty, no bubble is left behind.
+        for i, (src, dst) in enumerate(zip(stages, stages[1:])):
+            live = None
+            if i in tests:
+                live = Signal()
+                drop = self.o_drop[tests.index(i)]
+                m.d.comb += [
+                    live.eq(src.o_rgbrndr | src.o_arndr | src.o_zrndr),
+                    drop.o_valid.eq(src.o_valid & ~live),
+                    drop.o_ctxt.eq(src.o_ctxt),
+                    drop.o_x_coord.eq(src.o_x_coord),
+                    drop.o_y_coord.eq(src.o_y_coord)
+                ]
+                if self.hazard_bits:
+                    release = scoreboard.release[tests.index(i)]
+                    m.d.comb += [
+                        release.i_valid.eq(drop.o_valid),
+                        release.i_index.eq(scoreboard.index(drop.o_x_coord, drop.o_y_coord))
+                    ]
+            self._connect(m, src, dst, live)
+
+        m.d.comb += [
+            output_skid.i_valid.eq(pack.o_valid),
+            pack.i_ready.eq(output_skid.o_ready),
+            output_skid.i_data.eq(Cat(self._writes(pack))),
+
+            self.o_valid.eq(output_skid.o_valid),
+            output_skid.i_ready.eq(self.i_ready),
+            Cat(self._writes(self)).eq(output_skid.o_data)
+        ]
+
+        if self.hazard_bits:
+            m.d.comb += [
+                scoreboard.release[2].i_valid.eq(self.o_valid & self.i_ready),
+                scoreboard.release[2].i_index.eq(scoreboard.index(self.o_x_coord, self.o_y_coord))
+            ]
 
         return m
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a PixelPipeline as Verilog, or test it.")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate pipelines against a software model under random stalls, "
+                             "instead of generating Verilog")
+    args = parser.parse_args()
+
     pipe = PixelPipeline()
 
     ports = [
-        pipe.i_blend_a, pipe.i_blend_b, pipe.i_blend_c, pipe.i_blend_d, pipe.i_blend_fix,
+        *[field for ctx in pipe.i_context for field in ctx.fields.values()],
+        pipe.i_pabe_pabe,
         pipe.i_dimx_dm00, pipe.i_dimx_dm01, pipe.i_dimx_dm02, pipe.i_dimx_dm03,
         pipe.i_dimx_dm10, pipe.i_dimx_dm11, pipe.i_dimx_dm12, pipe.i_dimx_dm13,
         pipe.i_dimx_dm20, pipe.i_dimx_dm21, pipe.i_dimx_dm22, pipe.i_dimx_dm23,
         pipe.i_dimx_dm30, pipe.i_dimx_dm31, pipe.i_dimx_dm32, pipe.i_dimx_dm33,
-        pipe.i_prim_abe,
-        pipe.i_test_ate, pipe.i_test_atst, pipe.i_test_aref, pipe.i_test_afail,
-        pipe.i_test_date, pipe.i_test_datm,
-        pipe.i_test_zte, pipe.i_test_ztst,
+        pipe.i_dthe_dthe,
         pipe.i_colclamp,
-        pipe.i_fba_fba,
-        pipe.i_frame_psm, pipe.i_zbuf_psm,
-
-        pipe.i_rgbrndr, pipe.i_arndr, pipe.i_zrndr,
+        pipe.i_texa_ta0, pipe.i_texa_aem, pipe.i_texa_ta1, pipe.i_texflush,
+
+        pipe.o_fbreq_valid, pipe.o_fbreq_addr, pipe.i_fbreq_ready,
+        pipe.i_fbresp_valid, pipe.i_fbresp_data,
+        pipe.o_zreq_valid, pipe.o_zreq_addr, pipe.i_zreq_ready,
+        pipe.i_zresp_valid, pipe.i_zresp_data,
+        pipe.o_texreq_valid, pipe.o_texreq_addr, pipe.i_texreq_ready,
+        pipe.i_texresp_valid, pipe.i_texresp_data,
+        pipe.o_clut_addr, pipe.i_clut_data,
+
+        pipe.i_valid, pipe.o_ready,
+        pipe.i_rgbrndr, pipe.i_arndr, pipe.i_zrndr, pipe.i_ctxt, pipe.i_tme, pipe.i_abe,
         pipe.i_x_coord, pipe.i_y_coord, pipe.i_z_coord,
         pipe.i_red, pipe.i_green, pipe.i_blue, pipe.i_alpha,
+        pipe.i_u, pipe.i_v,
 
-        pipe.o_rgbrndr, pipe.o_arndr, pipe.o_zrndr,
-        pipe.o_x_coord, pipe.o_y_coord, pipe.o_z_coord,
-        pipe.o_red, pipe.o_green, pipe.o_blue, pipe.o_alpha
+        pipe.o_valid, pipe.i_ready,
+        pipe.o_fbaddr, pipe.o_fbdata, pipe.o_fbmask,
+        pipe.o_zaddr, pipe.o_zdata, pipe.o_zmask,
+        pipe.o_ctxt, pipe.o_x_coord, pipe.o_y_coord, pipe.o_z_coord,
+        *[field for drop in pipe.o_drop for field in drop.fields.values()]
     ]
 
-    print(verilog.convert(pipe, ports=ports))
+    if args.test:
+        import random
+
+        # In bypass mode, the same pixels are drawn without blending or texturing,
+        # so the texture unit, framebuffer read, blending and dithering are all
+        # skipped. Otherwise each pixel takes its colour from a 4x4 texture, which
+        # lies where the pixel does; it is filtered, but sampled at texel centres.
+        for bypass in [False, True]:
+            pipe = PixelPipeline(bypass=bypass)
+
+            with pysim.Simulator(pipe) as sim:
+                count = 200
+                # Pixels land on a small area, so many share a position with a pixel
+                # still in flight.
+                pixels = [(random.randint(0, 3), random.randint(0, 3), random.randint(0, 2**32 - 1),
+                           random.randint(0, 255), random.randint(0, 255),
+                           random.randint(0, 255), random.randint(0, 255),
+                           random.randint(0, 1))
+                          for i in range(count)]
+                fb_memory = {}
+                z_memory = {zbp * 2048 + y * 128 + x: random.randint(0, 2**32 - 1)
+                            for zbp in [8, 16] for y in range(4) for x in range(4)}
+                z_initial = dict(z_memory)
+                tex_memory = {}
+                outputs = []
+                fed = []
+                done = []
+
+                def settings():
+                    # Blending as Cs + (Cs - Cs) * As leaves the colour alone, but still
+                    # reads the framebuffer. Pixels are alpha tested, and those which pass
+                    # are Z tested against the Z buffer. The two contexts draw to
+                    # different buffers, with opposite alpha tests.
+                    for ctx, (atst, fbp, zbp) in zip(pipe.i_context, [(AlphaTestMode.GEQUAL, 4, 8),
+                                                                      (AlphaTestMode.LESS, 12, 16)]):
+                        yield ctx.test_ate.eq(1)
+                        yield ctx.test_atst.eq(atst)
+                        yield ctx.test_aref.eq(64)
+                        yield ctx.test_afail.eq(AlphaFailMode.KEEP)
+                        yield ctx.blend_a.eq(BlendRGB.SRC)
+                        yield ctx.blend_b.eq(BlendRGB.SRC)
+                        yield ctx.blend_c.eq(BlendAlpha.SRC)
+                        yield ctx.blend_d.eq(BlendRGB.SRC)
+                        yield ctx.test_zte.eq(1)
+                        yield ctx.test_ztst.eq(ZTestMode.GEQUAL)
+                        yield ctx.frame_fbp.eq(fbp)
+                        yield ctx.frame_fbw.eq(2)
+                        yield ctx.frame_psm.eq(PixelFormat.PSMCT32)
+                        yield ctx.zbuf_zbp.eq(zbp)
+                        yield ctx.zbuf_psm.eq(PixelFormat.PSMZ32 & 0xF)
+                        yield ctx.tex0_tbp0.eq(64)
+                        yield ctx.tex0_tbw.eq(1)
+                        yield ctx.tex0_psm.eq(PixelFormat.PSMCT32)
+                        yield ctx.tex0_tw.eq(2)
+                        yield ctx.tex0_th.eq(2)
+                        yield ctx.tex0_tcc.eq(1)
+                        yield ctx.tex0_tfx.eq(TextureFunction.DECAL)
+                        yield ctx.tex1_mmag.eq(1)
+                    yield pipe.i_colclamp.eq(1)
+                    yield; yield
+
+                def feed():
+                    yield from settings()
+                    sent = 0
+                    while sent < count:
+                        x, y, z, r, g, b, a, ctxt = pixels[sent]
+                        valid = random.randint(0, 3) != 0
+                        yield pipe.i_valid.eq(valid)
+                        yield pipe.i_rgbrndr.eq(1)
+                        yield pipe.i_arndr.eq(1)
+                        yield pipe.i_zrndr.eq(1)
+                        yield pipe.i_ctxt.eq(ctxt)
+                        yield pipe.i_tme.eq(not bypass)
+                        yield pipe.i_abe.eq(not bypass)
+                        yield pipe.i_x_coord.eq(x << 4)
+                        yield pipe.i_y_coord.eq(y << 4)
+                        yield pipe.i_z_coord.eq(z)
+                        yield pipe.i_red.eq(r)
+                        yield pipe.i_green.eq(g)
+                        yield pipe.i_blue.eq(b)
+                        yield pipe.i_alpha.eq(a)
+                        yield pipe.i_u.eq(x << 4 | 8)
+                        yield pipe.i_v.eq(y << 4 | 8)
+                        yield
+                        if valid and (yield pipe.o_ready):
+                            sent += 1
+                    yield pipe.i_valid.eq(0)
+                    fed.append(True)
+
+                def memory(memory, req_valid, req_addr, req_ready, resp_valid, resp_data):
+                    # Memory which accepts requests at random and answers them in order
+                    # after a random latency
+                    def process():
+                        responses = []
+                        clock = 0
+                        while not done:
+                            ready = random.randint(0, 2) != 0
+                            yield req_ready.eq(ready)
+                            answer = responses and responses[0][0] <= clock
+                            yield resp_valid.eq(bool(answer))
+                            if answer:
+                                yield resp_data.eq(responses.pop(0)[1])
+                            yield
+                            clock += 1
+                            if ready and (yield req_valid):
+                                addr = yield req_addr
+                                data = memory.setdefault(addr, random.randint(0, 2**32 - 1))
+                                responses.append((max([clock] + [t for t, d in responses]) + random.randint(1, 8),
+                                                  data))
+                    return process
+
+                def drain():
+                    # Killed pixels never come out, so wait for the pipeline to go quiet
+                    # once every pixel is in.
+                    idle = 0
+                    while idle < 100:
+                        ready = random.randint(0, 3) != 0
+                        yield pipe.i_ready.eq(ready)
+                        yield
+                        idle += 1
+                        if not fed:
+                            idle = 0
+                        if ready and (yield pipe.o_valid):
+                            idle = 0
+                            outputs.append(((yield pipe.o_fbaddr), (yield pipe.o_fbdata), (yield pipe.o_fbmask),
+                                            (yield pipe.o_zaddr), (yield pipe.o_zdata), (yield pipe.o_zmask)))
+                            if (yield pipe.o_zmask):
+                                z_memory[(yield pipe.o_zaddr)] = yield pipe.o_zdata
+                    done.append(True)
+
+                sim.add_sync_process(feed)
+                sim.add_sync_process(memory(fb_memory, pipe.o_fbreq_valid, pipe.o_fbreq_addr, pipe.i_fbreq_ready,
+                                            pipe.i_fbresp_valid, pipe.i_fbresp_data))
+                sim.add_sync_process(memory(z_memory, pipe.o_zreq_valid, pipe.o_zreq_addr, pipe.i_zreq_ready,
+                                            pipe.i_zresp_valid, pipe.i_zresp_data))
+                sim.add_sync_process(memory(tex_memory, pipe.o_texreq_valid, pipe.o_texreq_addr, pipe.i_texreq_ready,
+                                            pipe.i_texresp_valid, pipe.i_texresp_data))
+                sim.add_sync_process(drain)
+                sim.add_clock(1e-6)
+                sim.run()
+
+                # Under random stalls from memory and the output, no pixel is lost or
+                # reordered, each is tested and written with its own context's settings
+                # against its own Z buffer entry, as written by the pixels before it,
+                # and only pixels which passed both tests come out.
+                buffers = [(4, 8), (12, 16)]
+                if not bypass:
+                    texels = [tex_memory.get(64 * 64 + p[1] * 64 + p[0], 0) for p in pixels]
+                    pixels = [p[:3] + tuple((t >> s) & 0xFF for s in [0, 8, 16, 24]) + p[7:]
+                              for p, t in zip(pixels, texels)]
+                zbuf = dict(z_initial)
+                passed = []
+                for p in pixels:
+                    zaddr = buffers[p[7]][1] * 2048 + p[1] * 128 + p[0]
+                    if (p[6] >= 64) != p[7] and p[2] >= zbuf[zaddr]:
+                        passed.append(p)
+                        zbuf[zaddr] = p[2]
+                assert len(outputs) == len(passed)
+                for (x, y, z, r, g, b, a, ctxt), output in zip(passed, outputs):
+                    fbp, zbp = buffers[ctxt]
+                    assert output == (fbp * 2048 + y * 128 + x, r | (g << 8) | (b << 16) | (a << 24), 0b1111,
+                                      zbp * 2048 + y * 128 + x, z, 0b1111)
+                assert (len(fb_memory) > 0) != bypass
+                assert (len(tex_memory) > 0) != bypass
+    else:
+        print(verilog.convert(pipe, ports=ports))
@@ -0,0 +1,75 @@
+from nmigen import Cat, Elaboratable, Module, Signal
+from nmigen.lib.fifo import SyncFIFO
+
+
+class ReadQueue(Elaboratable):
+    def __init__(self, width, depth=8):
+        # Reads are issued as entries arrive and their responses are queued, so
+        # up to `depth` reads may be in flight at once; with memory latency
+        # below that, one entry still leaves per clock. Entries leave in order,
+        # each with the response to its read, if it made one.
+        self.width   = width    # Payload width
+        self.depth   = depth    # Maximum reads in flight
+
+        self.i_valid = Signal()      # Input entry is valid
+        self.o_ready = Signal()      # Input entry is accepted this cycle
+        self.i_read  = Signal()      # Input entry needs a read
+        self.i_addr  = Signal(20)    # Word address to read
+        self.i_data  = Signal(width) # Payload carried alongside the read
+
+        # Memory read requests
+        self.o_req_valid  = Signal()   # Read request is valid
+        self.o_req_addr   = Signal(20) # Word address to read
+        self.i_req_ready  = Signal()   # Read request is accepted this cycle
+
+        # Memory read responses, in request order and with any latency
+        self.i_resp_valid = Signal()   # Read data is valid
+        self.i_resp_data  = Signal(32) # Read data
+
+        self.o_valid = Signal()      # Output entry is valid
+        self.i_ready = Signal()      # Output entry is accepted this cycle
+        self.o_read  = Signal()      # Output entry made a read
+        self.o_resp  = Signal(32)    # Read data, if o_read
+        self.o_data  = Signal(width) # Payload
+
+        self.r_read  = Signal(range(depth + 1)) # Reads in flight or awaiting their entry
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.entries = entries = SyncFIFO(width=self.width + 1, depth=self.depth)
+        m.submodules.resps = resps = SyncFIFO(width=32, depth=self.depth)
+
+        # A read is only made if its response is sure to have space waiting for it.
+        can_read = Signal()
+        m.d.comb += [
+            can_read.eq(entries.w_rdy & (self.r_read < self.depth)),
+
+            self.o_req_valid.eq(self.i_valid & self.i_read & can_read),
+            self.o_req_addr.eq(self.i_addr),
+
+            self.o_ready.eq(entries.w_rdy & (~self.i_read | (can_read & self.i_req_ready))),
+
+            entries.w_en.eq(self.i_valid & self.o_ready),
+            entries.w_data.eq(Cat(self.i_data, self.i_read)),
+
+            resps.w_en.eq(self.i_resp_valid),
+            resps.w_data.eq(self.i_resp_data)
+        ]
+
+        # Entries leave once their read, if any, has returned.
+        m.d.comb += [
+            self.o_read.eq(entries.r_data[-1]),
+            self.o_data.eq(entries.r_data),
+            self.o_resp.eq(resps.r_data),
+
+            self.o_valid.eq(entries.r_rdy & (~self.o_read | resps.r_rdy)),
+
+            entries.r_en.eq(self.o_valid & self.i_ready),
+            resps.r_en.eq(self.o_valid & self.i_ready & self.o_read)
+        ]
+
+        issued = self.o_req_valid & self.i_req_ready
+        m.d.sync += self.r_read.eq(self.r_read + issued - resps.r_en)
+
+        return m
@@ -0,0 +1,127 @@
+import argparse
+from nmigen import Cat, Elaboratable, Module, Record, Signal
+from nmigen.back import pysim, rtlil
+
+
+class Scoreboard(Elaboratable):
+    def __init__(self, bits=6, claims=1, releases=1):
+        # Tracks which pixel positions have a pixel in flight between reading
+        # the framebuffer and Z buffer and writing them back, so that a pixel
+        # at the same position is held back until that write has left, instead
+        # of reading stale data.
+        #
+        # Positions are hashed into 2**bits entries of one bit each. A pixel
+        # whose entry is busy waits, even if the busy pixel is only a different
+        # position with the same hash, so an entry never holds more than one
+        # pixel. Only the waiting pixel is held; pixels at other positions
+        # keep moving through other pipelines.
+        #
+        # Up to `claims` pixels may enter at once, one per port, such as the
+        # pixels of a span entering a group of pipelines. A pixel also waits
+        # while a pixel on a lower port, waiting in the same clock, shares its
+        # entry; pixels sharing a clock are at different positions, so which
+        # goes first does not matter.
+        #
+        # Pixels may leave at `releases` points at once, such as where the
+        # pixel tests drop them and where their writes leave.
+        self.bits     = bits     # Hash width
+        self.claims   = claims   # Claim ports
+        self.releases = releases # Release points
+
+        self.claim    = [Record([("i_valid", 1), ("i_index", bits), ("o_busy", 1), ("i_claim", 1)])
+                         for i in range(claims)]
+        self.release  = [Record([("i_valid", 1), ("i_index", bits)]) for i in range(releases)]
+
+        self.o_idle   = Signal()        # No pixel is in flight
+
+        self.r_busy   = Signal(2**bits) # Entries with a pixel in flight
+
+    def index(self, x_coord, y_coord):
+        # Hash of a pixel position, from Q12.4 coordinates: the low bits of X,
+        # then the two low bits of Y. The entries tile the buffer with a
+        # window 2**(bits - 2) pixels wide and 4 rows tall, so two pixels share
+        # an entry only when they are a multiple of its width apart along a
+        # row, or of 4 rows apart. The rasterisers step along rows, so most of
+        # the window is drawn before any entry is needed again.
+        k = self.bits - min(2, self.bits // 2)
+        return Cat(x_coord[4:4 + k], y_coord[4:4 + self.bits - k])
+
+    def elaborate(self, platform):
+        m = Module()
+
+        for k, rec in enumerate(self.claim):
+            busy = self.r_busy.bit_select(rec.i_index, 1)
+            for lower in self.claim[:k]:
+                busy = busy | (lower.i_valid & (lower.i_index == rec.i_index))
+            m.d.comb += rec.o_busy.eq(busy)
+
+        claim = Signal(2**self.bits)
+        release = Signal(2**self.bits)
+        for rec in self.claim:
+            claim = claim | (rec.i_claim << rec.i_index)
+        for rec in self.release:
+            release = release | (rec.i_valid << rec.i_index)
+
+        m.d.sync += self.r_busy.eq((self.r_busy & ~release) | claim)
+        m.d.comb += self.o_idle.eq(~self.r_busy.any())
+
+        return m
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a Scoreboard as RTLIL, or test it.")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate random claims and releases, instead of generating RTLIL")
+    args = parser.parse_args()
+
+    sb = Scoreboard(bits=4, claims=2, releases=2)
+
+    ports = [sb.o_idle]
+    for rec in sb.claim:
+        ports += [rec.i_valid, rec.i_index, rec.o_busy, rec.i_claim]
+    for rec in sb.release:
+        ports += [rec.i_valid, rec.i_index]
+
+    if args.test:
+        import random
+
+        with pysim.Simulator(sb) as sim:
+            count = 1000
+            inflight = []
+            claimed = []
+
+            def process():
+                for i in range(count):
+                    # Release up to two pixels in flight, in any order, while two
+                    # random pixels claim their entries if they are free; the
+                    # second also waits on the first.
+                    released = random.sample(inflight, min(len(inflight), random.randint(0, 2)))
+                    for rec, gone in zip(sb.release, released + [None, None]):
+                        yield rec.i_valid.eq(gone is not None)
+                        yield rec.i_index.eq(gone or 0)
+                    indices = [random.randint(0, 15), random.randint(0, 15)]
+                    valid = [random.randint(0, 3) != 0, random.randint(0, 3) != 0]
+                    busy = [indices[0] in inflight,
+                            indices[1] in inflight or (valid[0] and indices[0] == indices[1])]
+                    for rec, index, v, b in zip(sb.claim, indices, valid, busy):
+                        yield rec.i_valid.eq(v)
+                        yield rec.i_index.eq(index)
+                        yield rec.i_claim.eq(v and not b)
+                    yield pysim.Settle()
+                    for rec, b in zip(sb.claim, busy):
+                        assert (yield rec.o_busy) == b
+                    assert (yield sb.o_idle) == (not inflight)
+                    yield
+                    for gone in released:
+                        inflight.remove(gone)
+                    for index, v, b in zip(indices, valid, busy):
+                        if v and not b:
+                            inflight.append(index)
+                            claimed.append(index)
+
+            sim.add_sync_process(process)
+            sim.add_clock(1e-6)
+            sim.run()
+
+            assert len(claimed) > count // 4
+    else:
+        print(rtlil.convert(sb, ports=ports))
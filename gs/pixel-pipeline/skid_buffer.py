@@ -0,0 +1,98 @@
+import argparse
+from nmigen import Elaboratable, Module, Signal
+from nmigen.back import pysim, rtlil
+
+
+class SkidBuffer(Elaboratable):
+    def __init__(self, width):
+        # A register stage whose o_ready does not depend on i_ready, so a chain
+        # of stages can be cut into shorter ready paths without losing rate. If
+        # the output stalls while an input is being accepted, that input waits
+        # in the skid register until the output is free again.
+        self.width   = width    # Payload width
+
+        self.i_valid = Signal()      # Input entry is valid
+        self.o_ready = Signal()      # Input entry is accepted this cycle
+        self.i_data  = Signal(width) # Input payload
+
+        self.o_valid = Signal()      # Output entry is valid
+        self.i_ready = Signal()      # Output entry is accepted this cycle
+        self.o_data  = Signal(width) # Output payload
+
+        self.r_skid_valid = Signal()      # Skid register holds an entry
+        self.r_skid_data  = Signal(width) # Skid register payload
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.d.comb += self.o_ready.eq(~self.r_skid_valid)
+
+        with m.If(~self.o_valid | self.i_ready):
+            # The output register is free; the skid register drains first.
+            with m.If(self.r_skid_valid):
+                m.d.sync += [
+                    self.o_valid.eq(1),
+                    self.o_data.eq(self.r_skid_data),
+                    self.r_skid_valid.eq(0)
+                ]
+            with m.Else():
+                m.d.sync += [
+                    self.o_valid.eq(self.i_valid),
+                    self.o_data.eq(self.i_data)
+                ]
+        with m.Elif(self.i_valid & self.o_ready):
+            m.d.sync += [
+                self.r_skid_valid.eq(1),
+                self.r_skid_data.eq(self.i_data)
+            ]
+
+        return m
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a SkidBuffer as RTLIL, or test it.")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate random traffic under random stalls, instead of generating RTLIL")
+    args = parser.parse_args()
+
+    skid = SkidBuffer(16)
+
+    ports = [
+        skid.i_valid, skid.o_ready, skid.i_data,
+        skid.o_valid, skid.i_ready, skid.o_data,
+    ]
+
+    if args.test:
+        import random
+
+        with pysim.Simulator(skid) as sim:
+            count = 1000
+            outputs = []
+
+            def feed():
+                sent = 0
+                while sent < count:
+                    valid = random.randint(0, 3) != 0
+                    yield skid.i_valid.eq(valid)
+                    yield skid.i_data.eq(sent)
+                    yield
+                    if valid and (yield skid.o_ready):
+                        sent += 1
+                yield skid.i_valid.eq(0)
+
+            def drain():
+                while len(outputs) < count:
+                    ready = random.randint(0, 3) != 0
+                    yield skid.i_ready.eq(ready)
+                    yield
+                    if ready and (yield skid.o_valid):
+                        outputs.append((yield skid.o_data))
+
+            sim.add_sync_process(feed)
+            sim.add_sync_process(drain)
+            sim.add_clock(1e-6)
+            sim.run()
+
+            # Nothing is lost, duplicated or reordered under random stalls.
+            assert outputs == list(range(count))
+    else:
+        print(rtlil.convert(skid, ports=ports))
@@ -0,0 +1,135 @@
+import argparse
+from nmigen import Elaboratable, Module, Mux, Signal
+from nmigen.back import pysim, rtlil
+
+
+class StageBypass(Elaboratable):
+    def __init__(self, stage, fields, capacity=1):
+        # Sits in front of and behind a pipeline stage. Pixels for which the
+        # stage would do nothing skip it, going straight from input to output in
+        # the same clock, but only while the stage is empty, so that a pixel
+        # never overtakes one still inside it. Other pixels go through the stage
+        # as usual.
+        #
+        # The wrapper has the stage's handshake, and an input and output for
+        # each of `fields` the stage has, so it can take the stage's place in
+        # the stream. The stage's settings are still driven directly.
+        self.stage    = stage
+        self.capacity = capacity # Most pixels the stage can hold at once
+
+        self.i_bypass = Signal() # The input pixel may skip the stage
+
+        self.i_valid  = Signal() # Input pixel is valid
+        self.o_ready  = Signal() # Input pixel is accepted this cycle
+        self.o_valid  = Signal() # Output pixel is valid
+        self.i_ready  = Signal() # Output pixel is accepted this cycle
+
+        self.fields   = []
+        for name in fields:
+            if hasattr(stage, "i_" + name) or hasattr(stage, "o_" + name):
+                self.fields.append(name)
+            if hasattr(stage, "i_" + name):
+                setattr(self, "i_" + name, Signal.like(getattr(stage, "i_" + name)))
+            if hasattr(stage, "o_" + name):
+                setattr(self, "o_" + name, Signal.like(getattr(stage, "o_" + name)))
+
+        self.r_count  = Signal(range(capacity + 1)) # Pixels inside the stage
+
+    def elaborate(self, platform):
+        m = Module()
+
+        stage = self.stage
+
+        bypass = Signal()
+        m.d.comb += bypass.eq(self.i_bypass & (self.r_count == 0))
+
+        m.d.comb += [
+            stage.i_valid.eq(self.i_valid & ~bypass),
+            self.o_ready.eq(Mux(bypass, self.i_ready, stage.o_ready)),
+
+            self.o_valid.eq(Mux(bypass, self.i_valid, stage.o_valid)),
+            stage.i_ready.eq(self.i_ready)
+        ]
+
+        for name in self.fields:
+            i_field = getattr(self, "i_" + name, None)
+            o_field = getattr(self, "o_" + name, None)
+            if i_field is not None:
+                m.d.comb += getattr(stage, "i_" + name).eq(i_field)
+            if o_field is not None:
+                # Fields the stage adds read as 0 for pixels which skip it.
+                m.d.comb += o_field.eq(Mux(bypass, 0 if i_field is None else i_field, getattr(stage, "o_" + name)))
+
+        entered = stage.i_valid & stage.o_ready
+        left = stage.o_valid & stage.i_ready
+        m.d.sync += self.r_count.eq(self.r_count + entered - left)
+
+        return m
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a StageBypass around a Dither as RTLIL, or test it.")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate random pixels under random stalls, instead of generating RTLIL")
+    args = parser.parse_args()
+
+    from dither import Dither
+
+    dither = Dither()
+    bypass = StageBypass(dither, ["x_coord", "y_coord", "red", "green", "blue"])
+
+    ports = [
+        bypass.i_bypass,
+        bypass.i_valid, bypass.o_ready, bypass.i_x_coord, bypass.i_y_coord, bypass.i_red,
+        bypass.o_valid, bypass.i_ready, bypass.o_x_coord, bypass.o_y_coord, bypass.o_red,
+    ]
+
+    m = Module()
+    m.submodules.dither = dither
+    m.submodules.bypass = bypass
+
+    if args.test:
+        import random
+
+        with pysim.Simulator(m) as sim:
+            count = 1000
+            enables = [random.randint(0, 1) for i in range(count)]
+            outputs = []
+            skipped = []
+
+            def feed():
+                yield dither.i_dm00.eq(1)
+                sent = 0
+                while sent < count:
+                    # Dithering with DM00 = 1 adds 1; pixels with dithering off skip
+                    # the stage when they can.
+                    valid = random.randint(0, 3) != 0
+                    yield bypass.i_valid.eq(valid)
+                    yield bypass.i_bypass.eq(not enables[sent])
+                    yield dither.i_enable.eq(enables[sent])
+                    yield bypass.i_x_coord.eq(sent << 4)
+                    yield bypass.i_red.eq(sent & 0xFF)
+                    yield
+                    if valid and (yield bypass.o_ready):
+                        sent += 1
+                yield bypass.i_valid.eq(0)
+
+            def drain():
+                while len(outputs) < count:
+                    ready = random.randint(0, 3) != 0
+                    yield bypass.i_ready.eq(ready)
+                    yield
+                    if ready and (yield bypass.o_valid):
+                        outputs.append(((yield bypass.o_x_coord) >> 4, (yield bypass.o_red)))
+                        if (yield bypass.i_valid) and (yield bypass.i_bypass) and not (yield bypass.r_count):
+                            skipped.append(True)
+
+            sim.add_sync_process(feed)
+            sim.add_sync_process(drain)
+            sim.add_clock(1e-6)
+            sim.run()
+
+            # Nothing is lost or reordered, whether it skipped the stage or not.
+            assert outputs == [(n, (n & 0xFF) + enables[n]) for n in range(count)]
+            assert skipped
+    else:
+        print(rtlil.convert(m, ports=ports))
@@ -0,0 +1,1033 @@
+import argparse
+from enum import IntEnum
+
+from nmigen import Cat, Const, Elaboratable, Memory, Module, Mux, Signal
+from nmigen.back import pysim, rtlil
+
+from common import PixelFormat
+
+
+class TextureFunction(IntEnum):
+    MODULATE   = 0 # Texture colour scaled by the pixel colour
+    DECAL      = 1 # Texture colour replaces the pixel colour
+    HIGHLIGHT  = 2 # As MODULATE, then the pixel alpha is added; alphas add too
+    HIGHLIGHT2 = 3 # As HIGHLIGHT, but alpha is the texture's
+
+
+class WrapMode(IntEnum):
+    REPEAT        = 0 # Texel coordinates wrap at the texture's size
+    CLAMP         = 1 # Texel coordinates stop at the texture's edges
+    REGION_CLAMP  = 2 # Texel coordinates stop at MIN and MAX
+    REGION_REPEAT = 3 # Texel coordinates are masked by MIN, then have MAX set
+
+
+class BilinearFilter(Elaboratable):
+    def __init__(self, tag_width=0):
+        # Blends a 2x2 quad of texels by where the sample falls between them:
+        # along both rows in the first stage, then between the rows in the
+        # second, rounding to nearest. Alpha is blended like the colours. Every
+        # stage advances together, so one quad is accepted per clock.
+        self.latency  = 2
+
+        self.i_valid  = Signal()          # Input quad is valid
+        self.o_ready  = Signal()          # Input quad is accepted this cycle
+        self.i_texels = [Signal(32, name="i_texel{}".format(i)) for i in range(4)] # Top left, top right, bottom left, bottom right
+        self.i_fu     = Signal(4)         # Q0.4; weight of the right texels
+        self.i_fv     = Signal(4)         # Q0.4; weight of the bottom texels
+        self.i_tag    = Signal(tag_width) # Carried alongside the quad
+
+        self.o_valid  = Signal()          # Output texel is valid
+        self.i_ready  = Signal()          # Output texel is accepted this cycle
+        self.o_texel  = Signal(32)        # Blended texel
+        self.o_tag    = Signal(tag_width) # Tag of the quad that produced o_texel
+
+    def elaborate(self, platform):
+        m = Module()
+
+        # The whole filter stalls only when its output is not accepted.
+        advance = Signal()
+        m.d.comb += [
+            advance.eq(~self.o_valid | self.i_ready),
+            self.o_ready.eq(advance)
+        ]
+
+        fu = Signal(5)
+        m.d.comb += fu.eq(16 - self.i_fu)
+
+        # Stage 1: along the rows
+        r_valid = Signal()
+        r_tag = Signal.like(self.i_tag)
+        r_fv = Signal(4)
+        r_top = [Signal(12, name="r_top{}".format(c)) for c in range(4)]
+        r_bottom = [Signal(12, name="r_bottom{}".format(c)) for c in range(4)]
+
+        t00, t01, t10, t11 = self.i_texels
+        with m.If(advance):
+            m.d.sync += [
+                r_valid.eq(self.i_valid),
+                r_tag.eq(self.i_tag),
+                r_fv.eq(self.i_fv)
+            ]
+            for c in range(4):
+                channel = slice(8 * c, 8 * c + 8)
+                m.d.sync += [
+                    r_top[c].eq(t00[channel] * fu + t01[channel] * self.i_fu),
+                    r_bottom[c].eq(t10[channel] * fu + t11[channel] * self.i_fu)
+                ]
+
+        # Stage 2: between the rows
+        fv = Signal(5)
+        m.d.comb += fv.eq(16 - r_fv)
+
+        with m.If(advance):
+            m.d.sync += [
+                self.o_valid.eq(r_valid),
+                self.o_tag.eq(r_tag)
+            ]
+            for c in range(4):
+                m.d.sync += self.o_texel[8 * c:8 * c + 8].eq((r_top[c] * fv + r_bottom[c] * r_fv + 128) >> 8)
+
+        return m
+
+
+class TextureUnit(Elaboratable):
+    def __init__(self, ways=2, lines=32, line_words=8, bilinear=True):
+        # Looks up each pixel's texel and combines it with the pixel colour by
+        # the texture function, before the pixel tests.
+        #
+        # Texels come from local memory through a set-associative cache of
+        # `lines` sets of `ways` lines, each of `line_words` consecutive words.
+        # The sets are split into four quadrants by whether the line's column
+        # and the texel row are odd, and a set within a quadrant is picked by
+        # hashing the rest of them, so a 2D area of texels spreads over every
+        # set instead of rows of it landing on the same few; any area of up to
+        # ways * lines lines then stays in the cache while it is drawn over,
+        # and every pixel on it hits. Each line is kept in two banks, of its
+        # even and its odd words.
+        #
+        # With bilinear filtering, a pixel samples the 2x2 quad of texels
+        # around its texture coordinate. The quad's two rows are in different
+        # quadrants, and its two columns are either in different quadrants or
+        # in neighbouring words of one line, in different banks; so all four
+        # texels are read in the same clock, and blended by a BilinearFilter.
+        #
+        # A hit costs nothing, so a pixel is taken every clock, filtered or not;
+        # a miss holds the pixel until its lines have been read, one at a time
+        # from the first word, each into an empty line of its set, or else the
+        # next line round-robin.
+        #
+        # Indexed texels are looked up in the CLUT in the clock after the cache,
+        # and CLUT entries and 16-bit texels are expanded by TEXA. There is one
+        # CLUT read a clock, so indexed textures are not filtered.
+        #
+        # Texel coordinates wrap or stop at the texture's edges, or at a region
+        # of it, by the wrap modes (CLAMP). REGION_REPEAT textures are not
+        # filtered either, as the texels around a coordinate need not be
+        # neighbours there, and so need not fall in different quadrants.
+        #
+        # The cache is not kept in step with memory writes; like the GS, it
+        # must be flushed (TEXFLUSH) once texture memory has been written.
+        assert ways & (ways - 1) == 0 and lines & (lines - 1) == 0 and line_words & (line_words - 1) == 0
+        assert lines >= 8 and line_words >= 2
+
+        self.ways     = ways       # Lines per set; a power of two
+        self.lines    = lines      # Sets; a power of two, at least 8
+        self.line_words = line_words # Words per line; a power of two, at least 2
+        self.bilinear = bilinear   # Whether to build the bilinear filter; MMAG is ignored without it
+        self.latency  = 5 if bilinear else 3
+
+        self.i_filter = Signal()   # Whether to filter textures bilinearly (MMAG); Off or On
+
+        # TEX0 - Texture Settings
+        self.i_tbp0   = Signal(14) # Texture base pointer, in units of 64 words
+        self.i_tbw    = Signal(6)  # Texture buffer width, in units of 64 texels
+        self.i_psm    = Signal(6)  # Texture pixel storage format
+        self.i_tw     = Signal(4)  # Log2 of texture width
+        self.i_th     = Signal(4)  # Log2 of texture height
+        self.i_tcc    = Signal()   # Whether to take alpha from the texture
+        self.i_tfx    = Signal(2)  # Texture function; see TextureFunction
+        self.i_cpsm   = Signal(4)  # CLUT pixel storage format; PSMCT32 or PSMCT16
+        self.i_csa    = Signal(5)  # CLUT entry offset of 4-bit textures, in units of 16 entries
+
+        # CLAMP - Texture Wrap Modes
+        self.i_wms    = Signal(2)  # Wrap mode of texel X coordinates; see WrapMode
+        self.i_wmt    = Signal(2)  # Wrap mode of texel Y coordinates; see WrapMode
+        self.i_minu   = Signal(10) # REGION_CLAMP: leftmost column; REGION_REPEAT: column mask
+        self.i_maxu   = Signal(10) # REGION_CLAMP: rightmost column; REGION_REPEAT: column bits set
+        self.i_minv   = Signal(10) # REGION_CLAMP: top row; REGION_REPEAT: row mask
+        self.i_maxv   = Signal(10) # REGION_CLAMP: bottom row; REGION_REPEAT: row bits set
+
+        # TEXA - Texture Alpha Expansion
+        self.i_ta0    = Signal(8)  # Alpha of 24-bit texels, and of 16-bit texels with A = 0
+        self.i_aem    = Signal()   # Whether texels with R = G = B = 0 are transparent
+        self.i_ta1    = Signal(8)  # Alpha of 16-bit texels with A = 1
+
+        # Forget every cached line, as after texture memory is written
+        self.i_flush  = Signal()
+        self.o_busy   = Signal()   # Lines are being forgotten; no pixel is taken
+
+        self.i_valid   = Signal()   # Input pixel is valid
+        self.o_ready   = Signal()   # Input pixel is accepted this cycle
+
+        self.i_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
+        self.i_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
+        self.i_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.i_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.i_abe     = Signal()   # Whether to alpha blend this pixel (ABE); Off or On
+        self.i_tme     = Signal()   # Whether to texture this pixel (TME); Off or On
+
+        self.i_x_coord = Signal(16) # Q12.4; Pixel X Coordinate
+        self.i_y_coord = Signal(16) # Q12.4; Pixel Y Coordinate
+        self.i_z_coord = Signal(32) # Float32; Pixel Z Coordinate
+
+        self.i_red     = Signal(8)  # Q8.0; Pixel Red Channel
+        self.i_green   = Signal(8)  # Q8.0; Pixel Green Channel
+        self.i_blue    = Signal(8)  # Q8.0; Pixel Blue Channel
+        self.i_alpha   = Signal(8)  # Q8.0; Pixel Alpha (Transparency) Channel
+
+        self.i_u       = Signal(16) # Q12.4; Texel X Coordinate
+        self.i_v       = Signal(16) # Q12.4; Texel Y Coordinate
+
+        # Memory read requests, for cache line fills; the texture is laid out
+        # linearly, a row at a time.
+        self.o_req_valid = Signal()   # Read request is valid
+        self.o_req_addr  = Signal(20) # Word address to read
+        self.i_req_ready = Signal()   # Read request is accepted this cycle
+
+        # Memory read responses, in request order and with any latency
+        self.i_resp_valid = Signal()   # Read data is valid
+        self.i_resp_data  = Signal(32) # Read data
+
+        # CLUT reads; the entry is expected a clock after its address. 16-bit
+        # CLUTs hold entries 0 to 255 in the low half and 256 to 511 in the
+        # high half of each word.
+        self.o_clut_addr = Signal(8)  # CLUT word to read
+        self.i_clut_data = Signal(32) # CLUT word
+
+        self.o_valid   = Signal()   # Output pixel is valid
+        self.i_ready   = Signal()   # Output pixel is accepted this cycle
+
+        self.o_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
+        self.o_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
+        self.o_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.o_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.o_abe     = Signal()   # Whether to alpha blend this pixel (ABE); Off or On
+
+        self.o_x_coord = Signal(16) # Output X Coordinate
+        self.o_y_coord = Signal(16) # Output Y Coordinate
+        self.o_z_coord = Signal(32) # Output Z Coordinate
+
+        self.o_red     = Signal(8)  # Output Red Channel
+        self.o_green   = Signal(8)  # Output Green Channel
+        self.o_blue    = Signal(8)  # Output Blue Channel
+        self.o_alpha   = Signal(8)  # Output Alpha Channel
+
+        self.sets      = lines // 4 # Sets per quadrant
+        self.set_bits  = (self.sets - 1).bit_length()
+        self.word_bits = (line_words - 1).bit_length()
+        self.tag_bits  = 20 - self.word_bits
+
+        # Each quadrant and way's tags, holding the whole line address and a
+        # valid bit, and its lines' even and odd words
+        self.r_tags    = [[Memory(width=self.tag_bits + 1, depth=self.sets) for way in range(ways)]
+                          for quad in range(4)]
+        self.r_data    = [[[Memory(width=32, depth=self.sets * line_words // 2) for bank in range(2)]
+                           for way in range(ways)] for quad in range(4)]
+
+        self.r_sweep   = Signal(range(self.sets + 1), reset=self.sets) # Next set to forget
+        self.r_victim  = Signal(range(ways))                           # Way the next line fill goes to, without an empty one
+
+    def _pixel(self, d):
+        return [getattr(self, d + "_" + name) for name in [
+            "rgbrndr", "arndr", "zrndr", "ctxt", "abe",
+            "x_coord", "y_coord", "z_coord",
+            "red", "green", "blue", "alpha"
+        ]]
+
+    def _expand16(self, c):
+        # R5 G5 B5 A1, expanded to 8 bits per channel with alpha from TEXA
+        alpha = Mux(self.i_aem & (c[0:15] == 0), 0, Mux(c[15], self.i_ta1, self.i_ta0))
+        return Cat(Const(0, 3), c[0:5], Const(0, 3), c[5:10], Const(0, 3), c[10:15], alpha)
+
+    def _hash(self, column, row):
+        # Set of a line within its quadrant, by its column and texel row, less
+        # the bits picking the quadrant. The column picks the low bits of the
+        # set and the row, rotated, mostly the high bits, so a block of lines
+        # a few columns wide and a few rows tall takes distinct sets; lines of
+        # one row, or of one column, always do.
+        bits = self.set_bits
+        k = bits - bits // 2
+        row = row[:bits]
+        return (column ^ Cat(row[k:], row[:k]))[:bits]
+
+    def _wrap(self, m, start, below, mode, size, low, high, name):
+        # The wrapped texel coordinates of the integer part of `start`, and of
+        # the one after it; `below` is set if the coordinate is really -1.
+        mask = (Const(1, 12) << size) - 1
+        first = Signal(12, name=name + "0")
+        second = Signal(12, name=name + "1")
+        coord = start[4:]
+        after = coord + 1
+        with m.Switch(mode):
+            with m.Case(WrapMode.REPEAT):
+                m.d.comb += [
+                    first.eq(coord & mask),
+                    second.eq(after & mask)
+                ]
+            with m.Case(WrapMode.CLAMP, WrapMode.REGION_CLAMP):
+                region = mode == WrapMode.REGION_CLAMP
+                least = Mux(region, low, 0)
+                most = Mux(region, high, mask)
+                m.d.comb += [
+                    first.eq(Mux(below | (coord < least), least, Mux(coord > most, most, coord))),
+                    second.eq(Mux(below | (after < least), least, Mux(after > most, most, after)))
+                ]
+            with m.Case(WrapMode.REGION_REPEAT):
+                m.d.comb += [
+                    first.eq((coord & low) | high),
+                    second.eq((coord & low) | high)
+                ]
+        return first, second
+
+    def elaborate(self, platform):
+        m = Module()
+
+        tag_ports = []
+        data_ports = []
+        tag_writes = []
+        data_writes = []
+        for quad in range(4):
+            tag_ports.append([])
+            data_ports.append([])
+            tag_writes.append([])
+            data_writes.append([])
+            for way in range(self.ways):
+                tag_ports[quad].append(self.r_tags[quad][way].read_port())
+                tag_writes[quad].append(self.r_tags[quad][way].write_port())
+                m.submodules["tag_read{}_{}".format(quad, way)] = tag_ports[quad][way]
+                m.submodules["tag_write{}_{}".format(quad, way)] = tag_writes[quad][way]
+
+                data_ports[quad].append([memory.read_port() for memory in self.r_data[quad][way]])
+                data_writes[quad].append([memory.write_port() for memory in self.r_data[quad][way]])
+                for bank in range(2):
+                    m.submodules["data_read{}_{}_{}".format(quad, way, bank)] = data_ports[quad][way][bank]
+                    m.submodules["data_write{}_{}_{}".format(quad, way, bank)] = data_writes[quad][way][bank]
+
+        # The output moves when it is free, and everything before it when the
+        # stage after it moves.
+        advance = Signal()
+        m.d.comb += advance.eq(~self.o_valid | self.i_ready)
+
+        if self.bilinear:
+            m.submodules.bilinear = bilinear = BilinearFilter(tag_width=len(Cat(self._pixel("i"))) + 4)
+            texels = 4
+        else:
+            texels = 1
+
+        # Texel addresses of the input pixel
+        ct16 = Signal()
+        t8 = Signal()
+        t4 = Signal()
+        indexed = Signal()
+        m.d.comb += [
+            ct16.eq((self.i_psm == PixelFormat.PSMCT16) | (self.i_psm == PixelFormat.PSMCT16S)),
+            t8.eq(self.i_psm == PixelFormat.PSMT8),
+            t4.eq(self.i_psm == PixelFormat.PSMT4),
+            indexed.eq(t8 | t4 | (self.i_psm == PixelFormat.PSMT8H) |
+                       (self.i_psm == PixelFormat.PSMT4HL) | (self.i_psm == PixelFormat.PSMT4HH))
+        ]
+
+        # A filtered pixel samples the texels around the point half a texel up
+        # and left of its coordinate, weighted by its fraction.
+        filtered = Signal()
+        u_start = Signal(16)
+        v_start = Signal(16)
+        fu = Signal(4)
+        fv = Signal(4)
+        m.d.comb += [
+            filtered.eq(self.i_filter & ~indexed & (self.i_wms != WrapMode.REGION_REPEAT) &
+                        (self.i_wmt != WrapMode.REGION_REPEAT) if self.bilinear else 0),
+            u_start.eq(Mux(filtered, self.i_u - 8, self.i_u)),
+            v_start.eq(Mux(filtered, self.i_v - 8, self.i_v)),
+            fu.eq(Mux(filtered, u_start[0:4], 0)),
+            fv.eq(Mux(filtered, v_start[0:4], 0))
+        ]
+
+        us = [Signal(12, name="u{}".format(i)) for i in range(2)]
+        vs = [Signal(12, name="v{}".format(i)) for i in range(2)]
+        rows = [Signal(24, name="row{}".format(i)) for i in range(2)]
+        u_first, u_second = self._wrap(m, u_start, filtered & (self.i_u < 8), self.i_wms, self.i_tw,
+                                       self.i_minu, self.i_maxu, "u_wrap")
+        v_first, v_second = self._wrap(m, v_start, filtered & (self.i_v < 8), self.i_wmt, self.i_th,
+                                       self.i_minv, self.i_maxv, "v_wrap")
+        m.d.comb += [
+            us[0].eq(u_first),
+            us[1].eq(Mux(filtered, u_second, u_first)),
+            vs[0].eq(v_first),
+            vs[1].eq(Mux(filtered, v_second, v_first))
+        ]
+        for v, row in zip(vs, rows):
+            m.d.comb += row.eq(v * (self.i_tbw << 6))
+
+        # Texels are the top left, top right, bottom left and bottom right of
+        # the quad; a pixel which is not filtered takes only the first.
+        texel = [Signal(24, name="texel{}".format(t)) for t in range(texels)]
+        word = [Signal(20, name="word{}".format(t)) for t in range(texels)]
+        column = [Signal(12, name="column{}".format(t)) for t in range(texels)]
+        quad = [Signal(2, name="quad{}".format(t)) for t in range(texels)]
+        for t in range(texels):
+            u = us[t & 1]
+            v = vs[t >> 1]
+            m.d.comb += texel[t].eq(rows[t >> 1] + u)
+            with m.If(ct16):
+                m.d.comb += [
+                    word[t].eq((self.i_tbp0 << 6) + (texel[t] >> 1)),
+                    column[t].eq(u >> (self.word_bits + 1))
+                ]
+            with m.Elif(t8):
+                m.d.comb += [
+                    word[t].eq((self.i_tbp0 << 6) + (texel[t] >> 2)),
+                    column[t].eq(u >> (self.word_bits + 2))
+                ]
+            with m.Elif(t4):
+                m.d.comb += [
+                    word[t].eq((self.i_tbp0 << 6) + (texel[t] >> 3)),
+                    column[t].eq(u >> (self.word_bits + 3))
+                ]
+            with m.Else():
+                m.d.comb += [
+                    word[t].eq((self.i_tbp0 << 6) + texel[t]),
+                    column[t].eq(u >> self.word_bits)
+                ]
+            m.d.comb += quad[t].eq(Cat(column[t][0], v[0]))
+
+        # Each quadrant reads the line of the texels falling in it, and each of
+        # its banks the word of those texels falling in it; texels sharing a
+        # quadrant share its line, and texels sharing a bank share its word.
+        need = Signal(4)
+        line = [Signal(self.tag_bits, name="line{}".format(q)) for q in range(4)]
+        set_index = [Signal(self.set_bits, name="set{}".format(q)) for q in range(4)]
+        bank_addr = [[Signal(self.set_bits + self.word_bits - 1, name="bank_addr{}_{}".format(q, b))
+                      for b in range(2)] for q in range(4)]
+        for t in range(texels):
+            for q in range(4):
+                with m.If(quad[t] == q):
+                    texel_set = self._hash(column[t][1:], vs[t >> 1][1:])
+                    m.d.comb += [
+                        need[q].eq(1),
+                        line[q].eq(word[t][self.word_bits:]),
+                        set_index[q].eq(texel_set)
+                    ]
+                    for b in range(2):
+                        with m.If(word[t][0] == b):
+                            m.d.comb += bank_addr[q][b].eq(Cat(word[t][1:self.word_bits], texel_set))
+
+        # Stage 1: the pixel's sets are read from every way of every quadrant.
+        r1_valid = Signal()
+        r1_tex = Signal()
+        r1_pixel = Signal(len(Cat(self._pixel("i"))))
+        r1_need = Signal(4)
+        r1_line = [Signal(self.tag_bits, name="r1_line{}".format(q)) for q in range(4)]
+        r1_set = [Signal(self.set_bits, name="r1_set{}".format(q)) for q in range(4)]
+        r1_bank_addr = [[Signal.like(bank_addr[q][b], name="r1_bank_addr{}_{}".format(q, b))
+                         for b in range(2)] for q in range(4)]
+        r1_quad = [Signal(2, name="r1_quad{}".format(t)) for t in range(texels)]
+        r1_bank = [Signal(name="r1_bank{}".format(t)) for t in range(texels)]
+        r1_sub = [Signal(3, name="r1_sub{}".format(t)) for t in range(texels)]
+        r1_fu = Signal(4)
+        r1_fv = Signal(4)
+        r1_psm = Signal(6)
+        r1_cpsm = Signal(4)
+        r1_csa = Signal(5)
+        r1_tcc = Signal()
+        r1_tfx = Signal(2)
+
+        hits = [Signal(self.ways, name="hits{}".format(q)) for q in range(4)]
+        misses = Signal(4)
+        for q in range(4):
+            for way, port in enumerate(tag_ports[q]):
+                m.d.comb += hits[q][way].eq(port.data[-1] & (port.data[:-1] == r1_line[q]))
+            m.d.comb += misses[q].eq(r1_need[q] & ~hits[q].any())
+
+        # The stage after stage 2 moves when it is free.
+        move2 = Signal()
+        m.d.comb += move2.eq(bilinear.o_ready if self.bilinear else advance)
+
+        # A pixel waits in stage 1 on a miss, or while lines are being forgotten.
+        stall = Signal()
+        move = Signal()
+        m.d.comb += [
+            self.o_busy.eq(self.r_sweep != self.sets),
+            stall.eq(r1_valid & r1_tex & (misses.any() | self.o_busy)),
+            move.eq(move2 & ~stall),
+            self.o_ready.eq(move & ~self.o_busy)
+        ]
+
+        for q in range(4):
+            for way in range(self.ways):
+                m.d.comb += tag_ports[q][way].addr.eq(Mux(move, set_index[q], r1_set[q]))
+                for b in range(2):
+                    m.d.comb += data_ports[q][way][b].addr.eq(Mux(move, bank_addr[q][b], r1_bank_addr[q][b]))
+
+        with m.If(move):
+            m.d.sync += [
+                r1_valid.eq(self.i_valid & ~self.o_busy),
+                r1_tex.eq(self.i_tme),
+                r1_pixel.eq(Cat(self._pixel("i"))),
+                r1_need.eq(need),
+                r1_fu.eq(fu),
+                r1_fv.eq(fv),
+                r1_psm.eq(self.i_psm),
+                r1_cpsm.eq(self.i_cpsm),
+                r1_csa.eq(self.i_csa),
+                r1_tcc.eq(self.i_tcc),
+                r1_tfx.eq(self.i_tfx)
+            ]
+            for q in range(4):
+                m.d.sync += [
+                    r1_line[q].eq(line[q]),
+                    r1_set[q].eq(set_index[q]),
+                    r1_bank_addr[q][0].eq(bank_addr[q][0]),
+                    r1_bank_addr[q][1].eq(bank_addr[q][1])
+                ]
+            for t in range(texels):
+                m.d.sync += [
+                    r1_quad[t].eq(quad[t]),
+                    r1_bank[t].eq(word[t][0]),
+                    r1_sub[t].eq(texel[t][0:3])
+                ]
+
+        # Line fills, for the first quadrant missing; the missing line goes
+        # into an empty way of its set, or else the next way.
+        fill_quad = Signal(2)
+        for q in reversed(range(4)):
+            with m.If(misses[q]):
+                m.d.comb += fill_quad.eq(q)
+
+        empty = Signal(self.ways)
+        for q in range(4):
+            with m.If(fill_quad == q):
+                m.d.comb += empty.eq(Cat(*[~port.data[-1] for port in tag_ports[q]]))
+
+        fill_way = Signal(range(self.ways))
+        m.d.comb += fill_way.eq(self.r_victim)
+        for way in reversed(range(self.ways)):
+            with m.If(empty[way]):
+                m.d.comb += fill_way.eq(way)
+
+        r_quad = Signal(2)
+        r_line = Signal(self.tag_bits)
+        r_set = Signal(self.set_bits)
+        r_way = Signal(range(self.ways))
+        r_req = Signal(range(self.line_words + 1))
+        r_resp = Signal(range(self.line_words))
+        r_stale = Signal() # Lines were forgotten during the fill
+
+        m.d.comb += self.o_req_addr.eq(Cat(r_req[:self.word_bits], r_line))
+
+        with m.If(self.i_flush):
+            m.d.sync += [
+                self.r_sweep.eq(0),
+                r_stale.eq(1)
+            ]
+        with m.Elif(self.o_busy):
+            m.d.sync += self.r_sweep.eq(self.r_sweep + 1)
+
+        for q in range(4):
+            for way in range(self.ways):
+                for b in range(2):
+                    m.d.comb += [
+                        data_writes[q][way][b].addr.eq(Cat(r_resp[1:], r_set)),
+                        data_writes[q][way][b].data.eq(self.i_resp_data)
+                    ]
+
+        with m.FSM():
+            with m.State("IDLE"):
+                with m.If(r1_valid & r1_tex & misses.any() & ~self.o_busy):
+                    for q in range(4):
+                        with m.If(fill_quad == q):
+                            m.d.sync += [
+                                r_line.eq(r1_line[q]),
+                                r_set.eq(r1_set[q])
+                            ]
+                    m.d.sync += [
+                        r_quad.eq(fill_quad),
+                        r_way.eq(fill_way),
+                        r_req.eq(0),
+                        r_resp.eq(0),
+                        r_stale.eq(0)
+                    ]
+                    with m.If(~empty.any()):
+                        m.d.sync += self.r_victim.eq(self.r_victim + 1)
+                    m.next = "FILL"
+
+            with m.State("FILL"):
+                m.d.comb += self.o_req_valid.eq(r_req != self.line_words)
+                with m.If(self.o_req_valid & self.i_req_ready):
+                    m.d.sync += r_req.eq(r_req + 1)
+
+                with m.If(self.i_resp_valid):
+                    for q in range(4):
+                        for way in range(self.ways):
+                            for b in range(2):
+                                m.d.comb += data_writes[q][way][b].en.eq((r_quad == q) & (r_way == way) & (r_resp[0] == b))
+                    m.d.sync += r_resp.eq(r_resp + 1)
+
+                    # The line becomes valid with its last word.
+                    with m.If(r_resp == self.line_words - 1):
+                        with m.If(~self.o_busy & ~self.i_flush & ~r_stale):
+                            for q in range(4):
+                                for way in range(self.ways):
+                                    m.d.comb += [
+                                        tag_writes[q][way].en.eq((r_quad == q) & (r_way == way)),
+                                        tag_writes[q][way].addr.eq(r_set),
+                                        tag_writes[q][way].data.eq(Cat(r_line, 1))
+                                    ]
+                        m.next = "IDLE"
+
+        # Forgetting, one set per clock across every quadrant and way
+        with m.If(self.o_busy):
+            for q in range(4):
+                for way in range(self.ways):
+                    m.d.comb += [
+                        tag_writes[q][way].en.eq(1),
+                        tag_writes[q][way].addr.eq(self.r_sweep),
+                        tag_writes[q][way].data.eq(0)
+                    ]
+
+        # Stage 2: each texel is picked from the hitting way of its quadrant
+        # and its bank, and expanded, or looked up in the CLUT.
+        banks = []
+        for q in range(4):
+            for b in range(2):
+                data = 0
+                for way in range(self.ways):
+                    data = Mux(hits[q][way], data_ports[q][way][b].data, data)
+                banks.append(data)
+        banks = Cat(*banks)
+
+        r1_ct24 = r1_psm == PixelFormat.PSMCT24
+        r1_ct16 = (r1_psm == PixelFormat.PSMCT16) | (r1_psm == PixelFormat.PSMCT16S)
+        r1_t8 = (r1_psm == PixelFormat.PSMT8) | (r1_psm == PixelFormat.PSMT8H)
+        r1_t4 = (r1_psm == PixelFormat.PSMT4) | (r1_psm == PixelFormat.PSMT4HL) | (r1_psm == PixelFormat.PSMT4HH)
+
+        cached = [Signal(32, name="cached{}".format(t)) for t in range(texels)]
+        direct = [Signal(32, name="direct{}".format(t)) for t in range(texels)]
+        for t in range(texels):
+            m.d.comb += cached[t].eq(banks.word_select(Cat(r1_bank[t], r1_quad[t]), 32))
+
+            half = cached[t].word_select(r1_sub[t][0], 16)
+            with m.If(r1_ct16):
+                m.d.comb += direct[t].eq(self._expand16(half))
+            with m.Elif(r1_ct24):
+                m.d.comb += direct[t].eq(Cat(cached[t][0:24], Mux(self.i_aem & (cached[t][0:24] == 0), 0, self.i_ta0)))
+            with m.Else():
+                m.d.comb += direct[t].eq(cached[t])
+
+        byte = cached[0].word_select(r1_sub[0][0:2], 8)
+        nibble = cached[0].word_select(r1_sub[0][0:3], 4)
+
+        index = Signal(8)
+        with m.Switch(r1_psm):
+            with m.Case(PixelFormat.PSMT8):
+                m.d.comb += index.eq(byte)
+            with m.Case(PixelFormat.PSMT4):
+                m.d.comb += index.eq(nibble)
+            with m.Case(PixelFormat.PSMT8H):
+                m.d.comb += index.eq(cached[0][24:32])
+            with m.Case(PixelFormat.PSMT4HL):
+                m.d.comb += index.eq(cached[0][24:28])
+            with m.Case(PixelFormat.PSMT4HH):
+                m.d.comb += index.eq(cached[0][28:32])
+
+        # 4-bit indices take 16 entries from CSA on; 16-bit CLUTs hold entries
+        # 256 to 511 in the high halves.
+        clut_addr = Signal(8)
+        clut_upper = Signal()
+        m.d.comb += [
+            clut_addr.eq(Mux(r1_t4, Cat(index[0:4], r1_csa[0:4]), index)),
+            clut_upper.eq(r1_t4 & r1_csa[4])
+        ]
+
+        r2_valid = Signal()
+        r2_tex = Signal()
+        r2_pixel = Signal.like(r1_pixel)
+        r2_indexed = Signal()
+        r2_direct = [Signal(32, name="r2_direct{}".format(t)) for t in range(texels)]
+        r2_fu = Signal(4)
+        r2_fv = Signal(4)
+        r2_clut_addr = Signal(8)
+        r2_upper = Signal()
+        r2_cpsm = Signal(4)
+        r2_tcc = Signal()
+        r2_tfx = Signal(2)
+
+        # The CLUT is read for whichever pixel is in stage 2 next clock.
+        m.d.comb += self.o_clut_addr.eq(Mux(move2, clut_addr, r2_clut_addr))
+
+        with m.If(move2):
+            m.d.sync += [
+                r2_valid.eq(r1_valid & ~stall),
+                r2_tex.eq(r1_tex),
+                r2_pixel.eq(r1_pixel),
+                r2_indexed.eq(r1_t8 | r1_t4),
+                Cat(*r2_direct).eq(Cat(*direct)),
+                r2_fu.eq(r1_fu),
+                r2_fv.eq(r1_fv),
+                r2_clut_addr.eq(clut_addr),
+                r2_upper.eq(clut_upper),
+                r2_cpsm.eq(r1_cpsm),
+                r2_tcc.eq(r1_tcc),
+                r2_tfx.eq(r1_tfx)
+            ]
+
+        clut = Signal(32)
+        with m.If((r2_cpsm == PixelFormat.PSMCT16) | (r2_cpsm == PixelFormat.PSMCT16S)):
+            m.d.comb += clut.eq(self._expand16(Mux(r2_upper, self.i_clut_data[16:32], self.i_clut_data[0:16])))
+        with m.Else():
+            m.d.comb += clut.eq(self.i_clut_data)
+
+        # Then the quad is filtered, if the filter is built; an indexed texel
+        # fills the whole quad, with no weight on the rest.
+        pixel = [Signal.like(field, name="pixel{}".format(i)) for i, field in enumerate(self._pixel("o"))]
+        out_valid = Signal()
+        out_tex = Signal()
+        out_tcc = Signal()
+        out_tfx = Signal(2)
+        texture = Signal(32)
+        if self.bilinear:
+            m.d.comb += [
+                bilinear.i_valid.eq(r2_valid),
+                bilinear.i_fu.eq(r2_fu),
+                bilinear.i_fv.eq(r2_fv),
+                bilinear.i_tag.eq(Cat(r2_pixel, r2_tex, r2_tcc, r2_tfx)),
+                bilinear.i_ready.eq(advance),
+
+                out_valid.eq(bilinear.o_valid),
+                Cat(*pixel, out_tex, out_tcc, out_tfx).eq(bilinear.o_tag),
+                texture.eq(bilinear.o_texel)
+            ]
+            for t in range(texels):
+                m.d.comb += bilinear.i_texels[t].eq(Mux(r2_indexed, clut, r2_direct[t]))
+        else:
+            m.d.comb += [
+                out_valid.eq(r2_valid),
+                Cat(*pixel, out_tex, out_tcc, out_tfx).eq(Cat(r2_pixel, r2_tex, r2_tcc, r2_tfx)),
+                texture.eq(Mux(r2_indexed, clut, r2_direct[0]))
+            ]
+
+        # Last stage: the texture function
+        colour = pixel[-4:-1]
+        alpha = pixel[-1]
+
+        def clamp(value):
+            return Mux(value > 255, 255, value)
+
+        with m.If(advance):
+            m.d.sync += [
+                self.o_valid.eq(out_valid),
+                Cat(*self._pixel("o")).eq(Cat(*pixel))
+            ]
+
+            with m.If(out_tex):
+                tex_colour = [texture[0:8], texture[8:16], texture[16:24]]
+                tex_alpha = texture[24:32]
+
+                for out, cf, ct in zip([self.o_red, self.o_green, self.o_blue], colour, tex_colour):
+                    modulated = (cf * ct) >> 7
+                    with m.Switch(out_tfx):
+                        with m.Case(TextureFunction.MODULATE):
+                            m.d.sync += out.eq(clamp(modulated))
+                        with m.Case(TextureFunction.DECAL):
+                            m.d.sync += out.eq(ct)
+                        with m.Case(TextureFunction.HIGHLIGHT, TextureFunction.HIGHLIGHT2):
+                            m.d.sync += out.eq(clamp(modulated + alpha))
+
+                with m.If(out_tcc):
+                    with m.Switch(out_tfx):
+                        with m.Case(TextureFunction.MODULATE):
+                            m.d.sync += self.o_alpha.eq(clamp((alpha * tex_alpha) >> 7))
+                        with m.Case(TextureFunction.DECAL, TextureFunction.HIGHLIGHT2):
+                            m.d.sync += self.o_alpha.eq(tex_alpha)
+                        with m.Case(TextureFunction.HIGHLIGHT):
+                            m.d.sync += self.o_alpha.eq(clamp(alpha + tex_alpha))
+
+        return m
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a TextureUnit as RTLIL, or test it.")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate every format and wrap mode against a software model, "
+                             "instead of generating RTLIL")
+    args = parser.parse_args()
+
+    tex = TextureUnit(ways=2, lines=32, line_words=8)
+
+    ports = [
+        tex.i_filter,
+        tex.i_tbp0, tex.i_tbw, tex.i_psm, tex.i_tw, tex.i_th, tex.i_tcc, tex.i_tfx, tex.i_cpsm, tex.i_csa,
+        tex.i_wms, tex.i_wmt, tex.i_minu, tex.i_maxu, tex.i_minv, tex.i_maxv,
+        tex.i_ta0, tex.i_aem, tex.i_ta1,
+        tex.i_flush, tex.o_busy,
+        tex.i_valid, tex.o_ready,
+        tex.i_rgbrndr, tex.i_arndr, tex.i_zrndr, tex.i_ctxt, tex.i_abe, tex.i_tme,
+        tex.i_x_coord, tex.i_y_coord, tex.i_z_coord,
+        tex.i_red, tex.i_green, tex.i_blue, tex.i_alpha,
+        tex.i_u, tex.i_v,
+        tex.o_req_valid, tex.o_req_addr, tex.i_req_ready, tex.i_resp_valid, tex.i_resp_data,
+        tex.o_clut_addr, tex.i_clut_data,
+        tex.o_valid, tex.i_ready,
+        tex.o_rgbrndr, tex.o_arndr, tex.o_zrndr, tex.o_ctxt, tex.o_abe,
+        tex.o_x_coord, tex.o_y_coord, tex.o_z_coord,
+        tex.o_red, tex.o_green, tex.o_blue, tex.o_alpha
+    ]
+
+    if args.test:
+        import random
+
+        def expand16(c, aem, ta0, ta1):
+            a = 0 if aem and c & 0x7FFF == 0 else (ta1 if c & 0x8000 else ta0)
+            return ((c & 0x1F) << 3) | (((c >> 5) & 0x1F) << 11) | (((c >> 10) & 0x1F) << 19) | (a << 24)
+
+        def texel(memory, clut, psm, cpsm, csa, aem, ta0, ta1, u, v):
+            # Software model of the texel lookup; the texture is 32 by 16 texels at
+            # word 4 * 64, 64 texels to a row.
+            t = (v & 15) * 64 + (u & 31)
+            if psm == PixelFormat.PSMCT16:
+                return expand16((memory(256 + t // 2) >> (16 * (t & 1))) & 0xFFFF, aem, ta0, ta1)
+            if psm in (PixelFormat.PSMCT32, PixelFormat.PSMCT24):
+                word = memory(256 + t)
+                if psm == PixelFormat.PSMCT32:
+                    return word
+                return (word & 0xFFFFFF) | ((0 if aem and word & 0xFFFFFF == 0 else ta0) << 24)
+            if psm == PixelFormat.PSMT8:
+                index = (memory(256 + t // 4) >> (8 * (t & 3))) & 0xFF
+            elif psm == PixelFormat.PSMT4:
+                index = (memory(256 + t // 8) >> (4 * (t & 7))) & 0xF
+            else:
+                shift = {PixelFormat.PSMT8H: 24, PixelFormat.PSMT4HL: 24, PixelFormat.PSMT4HH: 28}[psm]
+                index = (memory(256 + t) >> shift) & (0xFF if psm == PixelFormat.PSMT8H else 0xF)
+            upper = False
+            if psm in (PixelFormat.PSMT4, PixelFormat.PSMT4HL, PixelFormat.PSMT4HH):
+                index |= (csa & 15) << 4
+                upper = csa >= 16
+            entry = clut[index]
+            if cpsm == PixelFormat.PSMCT16:
+                return expand16((entry >> 16) if upper else (entry & 0xFFFF), aem, ta0, ta1)
+            return entry
+
+        def wrap(coord, mode, size, low, high):
+            # Software model of the wrap modes
+            if mode == WrapMode.REPEAT:
+                return coord & (size - 1)
+            if mode == WrapMode.CLAMP:
+                return min(max(coord, 0), size - 1)
+            if mode == WrapMode.REGION_CLAMP:
+                return min(max(coord, low), high)
+            return (coord & low) | high
+
+        def bilinear(texels, fu, fv):
+            # Software model of the filter, channel by channel
+            out = 0
+            for c in range(0, 32, 8):
+                t00, t01, t10, t11 = [(t >> c) & 0xFF for t in texels]
+                top = t00 * (16 - fu) + t01 * fu
+                bottom = t10 * (16 - fu) + t11 * fu
+                out |= ((top * (16 - fv) + bottom * fv + 128) >> 8) << c
+            return out
+
+        def function(tfx, tcc, colour, alpha, t):
+            tc = [t & 0xFF, (t >> 8) & 0xFF, (t >> 16) & 0xFF]
+            ta = t >> 24
+            if tfx == TextureFunction.DECAL:
+                out = tc
+            elif tfx == TextureFunction.MODULATE:
+                out = [min(255, (c * d) >> 7) for c, d in zip(colour, tc)]
+            else:
+                out = [min(255, ((c * d) >> 7) + alpha) for c, d in zip(colour, tc)]
+            if not tcc:
+                a = alpha
+            elif tfx == TextureFunction.MODULATE:
+                a = min(255, (alpha * ta) >> 7)
+            elif tfx == TextureFunction.HIGHLIGHT:
+                a = min(255, alpha + ta)
+            else:
+                a = ta
+            return out, a
+
+        formats = [PixelFormat.PSMCT32, PixelFormat.PSMCT24, PixelFormat.PSMCT16, PixelFormat.PSMT8,
+                   PixelFormat.PSMT4, PixelFormat.PSMT8H, PixelFormat.PSMT4HL, PixelFormat.PSMT4HH]
+
+        def with_clut(tex, clut):
+            # The CLUT is a memory read a clock after its address.
+            m = Module()
+            m.submodules.tex = tex
+            m.submodules.clut = clut_read = Memory(width=32, depth=256, init=clut).read_port(transparent=False)
+            m.d.comb += [
+                clut_read.addr.eq(tex.o_clut_addr),
+                tex.i_clut_data.eq(clut_read.data)
+            ]
+            return m
+
+        # Each format repeating, then 32-bit texels with the other wrap modes: the
+        # texel coordinates of each, by how far they are offset from the pixel's,
+        # and the region's MIN and MAX.
+        wraps = {
+            WrapMode.REPEAT:        (32, 16, 0, 0, 0, 0),
+            WrapMode.CLAMP:         (9, 0, 0, 0, 0, 0),
+            WrapMode.REGION_CLAMP:  (0, 0, 5, 20, 3, 10),
+            WrapMode.REGION_REPEAT: (0, 0, 0x0F, 0x10, 0x07, 0x08)
+        }
+        for psm, filters, mode in ([(psm, True, WrapMode.REPEAT) for psm in formats] +
+                                   [(PixelFormat.PSMCT16, False, WrapMode.REPEAT)] +
+                                   [(PixelFormat.PSMCT32, True, mode) for mode in list(WrapMode)[1:]]):
+            tex = TextureUnit(ways=2, lines=32, line_words=8, bilinear=filters)
+            clut = [random.randint(0, 2**32 - 1) for i in range(256)]
+            m = with_clut(tex, clut)
+            offset_u, offset_v, minu, maxu, minv, maxv = wraps[mode]
+
+            with pysim.Simulator(m) as sim:
+                print("// ", psm.name, mode.name, "bilinear" if filters else "")
+                memory = {}
+                cpsm = random.choice([PixelFormat.PSMCT32, PixelFormat.PSMCT16])
+                csa = random.randint(0, 31)
+                tcc = random.randint(0, 1)
+                aem = random.randint(0, 1)
+                ta0, ta1 = random.randint(0, 255), random.randint(0, 255)
+
+                # Two passes over a 32 by 16 area, in rows, with random texture
+                # functions, then one with stalls after the texture is rewritten and
+                # the cache flushed; texture coordinates are offset so that they
+                # wrap, or run off the texture or region. A few pixels are not
+                # textured, and most that are, are filtered.
+                area = [(x, y) for y in range(16) for x in range(32)]
+                pixels = [(x, y, random.randint(0, 3), random.randint(0, 15) != 0,
+                           random.randint(0, 3) != 0, random.randint(0, 15), random.randint(0, 15),
+                           random.randint(0, 255), random.randint(0, 255),
+                           random.randint(0, 255), random.randint(0, 255))
+                          for n in range(3) for x, y in area]
+                outputs = []
+                clocks = []
+                done = []
+                before = {}
+
+                def settings():
+                    yield tex.i_tbp0.eq(4)
+                    yield tex.i_tbw.eq(1)
+                    yield tex.i_psm.eq(psm)
+                    yield tex.i_tw.eq(5)
+                    yield tex.i_th.eq(4)
+                    yield tex.i_tcc.eq(tcc)
+                    yield tex.i_cpsm.eq(cpsm)
+                    yield tex.i_csa.eq(csa)
+                    yield tex.i_wms.eq(mode)
+                    yield tex.i_wmt.eq(mode)
+                    yield tex.i_minu.eq(minu)
+                    yield tex.i_maxu.eq(maxu)
+                    yield tex.i_minv.eq(minv)
+                    yield tex.i_maxv.eq(maxv)
+                    yield tex.i_ta0.eq(ta0)
+                    yield tex.i_aem.eq(aem)
+                    yield tex.i_ta1.eq(ta1)
+
+                def feed():
+                    yield from settings()
+                    yield
+                    sent = 0
+                    clock = 0
+                    while sent < len(pixels):
+                        x, y, tfx, enable, filter, fu, fv, r, g, b, a = pixels[sent]
+                        # The first two passes go as fast as they can.
+                        valid = sent < 2 * len(area) or random.randint(0, 3) != 0
+                        yield tex.i_valid.eq(valid)
+                        yield tex.i_tme.eq(enable)
+                        yield tex.i_filter.eq(filter)
+                        yield tex.i_tfx.eq(tfx)
+                        yield tex.i_rgbrndr.eq(1)
+                        yield tex.i_x_coord.eq(x << 4)
+                        yield tex.i_y_coord.eq(y << 4)
+                        yield tex.i_u.eq((x + offset_u) << 4 | fu)
+                        yield tex.i_v.eq((y + offset_v) << 4 | fv)
+                        yield tex.i_red.eq(r)
+                        yield tex.i_green.eq(g)
+                        yield tex.i_blue.eq(b)
+                        yield tex.i_alpha.eq(a)
+                        yield
+                        clock += 1
+                        if valid and (yield tex.o_ready):
+                            sent += 1
+                            if sent in (len(area), 2 * len(area)):
+                                clocks.append(clock)
+                            if sent == 2 * len(area):
+                                yield tex.i_valid.eq(0)
+                                before.update(memory)
+                                for addr in memory:
+                                    memory[addr] = random.randint(0, 2**32 - 1)
+                                yield tex.i_flush.eq(1)
+                                yield
+                                yield tex.i_flush.eq(0)
+                    yield tex.i_valid.eq(0)
+
+                def memory_process():
+                    # Memory which accepts requests at random and answers them in
+                    # order after a random latency
+                    responses = []
+                    clock = 0
+                    while not done:
+                        ready = random.randint(0, 2) != 0
+                        yield tex.i_req_ready.eq(ready)
+                        answer = responses and responses[0][0] <= clock
+                        yield tex.i_resp_valid.eq(bool(answer))
+                        if answer:
+                            yield tex.i_resp_data.eq(responses.pop(0)[1])
+                        yield
+                        clock += 1
+                        if ready and (yield tex.o_req_valid):
+                            addr = yield tex.o_req_addr
+                            data = memory.setdefault(addr, random.randint(0, 2**32 - 1))
+                            responses.append((max([clock] + [t for t, d in responses]) + random.randint(1, 8), data))
+
+                def drain():
+                    while len(outputs) < len(pixels):
+                        # The output only stalls in the last pass.
+                        ready = len(outputs) < 2 * len(area) or random.randint(0, 3) != 0
+                        yield tex.i_ready.eq(ready)
+                        yield
+                        if ready and (yield tex.o_valid):
+                            outputs.append((((yield tex.o_x_coord) >> 4, (yield tex.o_y_coord) >> 4),
+                                            [(yield tex.o_red), (yield tex.o_green), (yield tex.o_blue)],
+                                            (yield tex.o_alpha)))
+                    done.append(True)
+
+                sim.add_sync_process(feed)
+                sim.add_sync_process(memory_process)
+                sim.add_sync_process(drain)
+                sim.add_clock(1e-6)
+                sim.run()
+
+                # Every pixel comes out in order, textured by its own function;
+                # filtered pixels blend the texels around the point half a texel up
+                # and left of theirs.
+                indexed = psm not in (PixelFormat.PSMCT32, PixelFormat.PSMCT24, PixelFormat.PSMCT16)
+                for n, ((x, y, tfx, enable, filter, fu, fv, r, g, b, a), output) in enumerate(zip(pixels, outputs)):
+                    if enable:
+                        contents = before if n < 2 * len(area) else memory
+                        lookup = lambda u, v: texel(lambda addr: contents[addr], clut, psm, cpsm, csa, aem, ta0, ta1,
+                                                    wrap(u, mode, 32, minu, maxu), wrap(v, mode, 16, minv, maxv))
+                        u, v = x + offset_u, y + offset_v
+                        if filter and filters and not indexed and mode != WrapMode.REGION_REPEAT:
+                            u, v = ((u << 4 | fu) - 8) >> 4, ((v << 4 | fv) - 8) >> 4
+                            t = bilinear([lookup(u, v), lookup(u + 1, v), lookup(u, v + 1), lookup(u + 1, v + 1)],
+                                         (fu - 8) & 15, (fv - 8) & 15)
+                        else:
+                            t = lookup(u, v)
+                        expected = function(tfx, tcc, [r, g, b], a, t)
+                    else:
+                        expected = ([r, g, b], a)
+                    assert output == ((x, y),) + expected, (x, y, output, expected)
+
+                # The whole area fits in the cache, so the second pass never misses,
+                # filtered or not.
+                assert clocks[1] - clocks[0] == len(area)
+    else:
+        print(rtlil.convert(tex, ports=ports))
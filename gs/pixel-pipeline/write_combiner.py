@@ -0,0 +1,320 @@
+import argparse
+from nmigen import Cat, Elaboratable, Module, Mux, Record, Signal
+from nmigen.back import pysim, rtlil
+
+
+# One lane's word write; the mask has a bit for each byte of the word.
+WRITE = [
+    ("i_valid", 1),
+    ("o_ready", 1),
+
+    ("i_addr", 20),
+    ("i_data", 32),
+    ("i_mask", 4)
+]
+
+
+# One lane's read of the buffer being written, checked against the writes held.
+READ = [
+    ("i_addr", 20),
+    ("o_data", 32), # Bytes of the word held here, newer than memory's
+    ("o_mask", 4)   # Which bytes of o_data are held; bit n for byte n
+]
+
+
+class WriteCombiner(Elaboratable):
+    def __init__(self, lanes=16, lines=4, words=16):
+        # Pixel writes are gathered into lines of `words` aligned words, and each
+        # line goes to memory as a single burst with a byte mask, instead of as
+        # one transaction per pixel. Up to `lanes` writes are merged per clock,
+        # and as neighbouring pixels mostly land in the same line, a full span
+        # of pixels usually costs a single burst.
+        #
+        # A line is written out when all of its bytes have been written, when
+        # its space is needed for a new line, or when flushing.
+        #
+        # Reads of the same buffer are checked against the writes held, in
+        # open lines and in the burst waiting for memory, and are given the
+        # bytes of their word held here, to lay over what memory returns. So a
+        # read never waits for a line to leave; memory need only answer each
+        # read with the data of the bursts it accepted before it.
+        #
+        # Writes to the same bytes must come in in the order they were drawn;
+        # PipelineGroup's hazard check keeps at most one pixel at each position
+        # in flight, so this holds whichever lane each write takes. Should
+        # writes on different lanes still overlap in the same clock, the bytes
+        # of the highest lane win.
+        self.lanes   = lanes    # Writes accepted per clock
+        self.lines   = lines    # Lines held open at once
+        self.words   = words    # Words per line; a power of two
+
+        self.bits    = (words - 1).bit_length()
+
+        self.writes  = [Record(WRITE) for i in range(lanes)]
+        self.reads   = [Record(READ) for i in range(lanes)]
+
+        self.i_flush = Signal() # Write out every open line
+        self.o_idle  = Signal() # No line is open or waiting to be written
+
+        # Memory burst writes
+        self.o_valid = Signal()                 # Burst is valid
+        self.o_addr  = Signal(20 - self.bits)   # Line address; the word address of its first word, divided by `words`
+        self.o_data  = Signal(32 * words)       # Line data, first word in the lowest bits
+        self.o_mask  = Signal(4 * words)        # Byte write mask; bit n enables byte n of the line
+        self.i_ready = Signal()                 # Burst is accepted this cycle
+
+        self.r_open   = Signal(lines)                                         # Which lines are in use
+        self.r_tag    = [Signal(20 - self.bits) for i in range(lines)]        # Line addresses
+        self.r_data   = [Signal(32 * words) for i in range(lines)]            # Line data
+        self.r_mask   = [Signal(4 * words) for i in range(lines)]             # Bytes of each line written so far
+        self.r_victim = Signal(range(lines))                                  # Next line to write out for space
+
+    def elaborate(self, platform):
+        m = Module()
+
+        lanes = range(self.lanes)
+        lines = range(self.lines)
+
+        tag  = [w.i_addr[self.bits:] for w in self.writes]
+        word = [w.i_addr[:self.bits] for w in self.writes]
+
+        # Which open line each lane's write falls in
+        hit = [[Signal() for n in lines] for k in lanes]
+        miss = Signal(self.lanes)
+        for k in lanes:
+            for n in lines:
+                m.d.comb += hit[k][n].eq(self.r_open[n] & (self.r_tag[n] == tag[k]))
+            m.d.comb += miss[k].eq(self.writes[k].i_valid & ~Cat(*hit[k]).any())
+
+        # The first lane to miss opens a new line in the first free line; other
+        # lanes writing to the same line join it in the same clock.
+        alloc_tag = Signal(20 - self.bits)
+        for k in reversed(lanes):
+            alloc_tag = Mux(miss[k] & ~miss[:k].any(), tag[k], alloc_tag) if k else Mux(miss[k], tag[k], alloc_tag)
+
+        free = Signal(self.lines)
+        alloc = Signal(self.lines)
+        m.d.comb += free.eq(~self.r_open)
+        for n in lines:
+            m.d.comb += alloc[n].eq(miss.any() & free[n] & ~free[:n].any() if n else miss.any() & free[n])
+
+        write = [[Signal() for n in lines] for k in lanes]
+        for k in lanes:
+            for n in lines:
+                m.d.comb += write[k][n].eq(self.writes[k].i_valid &
+                                           (hit[k][n] | (alloc[n] & (tag[k] == alloc_tag))))
+            m.d.comb += self.writes[k].o_ready.eq(Cat(*write[k]).any() | ~self.writes[k].i_valid)
+
+        # Reads take the bytes of their word held in the burst waiting to go to
+        # memory, and then in the open line, which are newer.
+        for r in self.reads:
+            read_tag = r.i_addr[self.bits:]
+            read_word = r.i_addr[:self.bits]
+            data = Mux(self.o_valid & (self.o_addr == read_tag), self.o_data.word_select(read_word, 32), 0)
+            mask = Mux(self.o_valid & (self.o_addr == read_tag), self.o_mask.word_select(read_word, 4), 0)
+            for n in lines:
+                line = self.r_open[n] & (self.r_tag[n] == read_tag)
+                held = Mux(line, self.r_mask[n].word_select(read_word, 4), 0)
+                line_data = self.r_data[n].word_select(read_word, 32)
+                data = Cat(Mux(held[b], line_data[8 * b:8 * b + 8], data[8 * b:8 * b + 8]) for b in range(4))
+                mask = mask | held
+            m.d.comb += [
+                r.o_data.eq(data),
+                r.o_mask.eq(mask)
+            ]
+
+        # Merge this clock's writes into each line; later lanes take priority.
+        nxt_data = [Signal(32 * self.words) for n in lines]
+        nxt_mask = [Signal(4 * self.words) for n in lines]
+        for n in lines:
+            for w in range(self.words):
+                for b in range(4):
+                    byte = 4 * w + b
+                    sel = [write[k][n] & (word[k] == w) & self.writes[k].i_mask[b] for k in lanes]
+                    data = 0
+                    for k in lanes:
+                        data = Mux(sel[k], self.writes[k].i_data[8 * b:8 * b + 8], data)
+                    m.d.comb += [
+                        nxt_mask[n][byte].eq(Cat(*sel).any() | (self.r_mask[n][byte] & ~alloc[n])),
+                        nxt_data[n][8 * byte:8 * byte + 8].eq(Mux(Cat(*sel).any(), data, self.r_data[n][8 * byte:8 * byte + 8]))
+                    ]
+            m.d.sync += [
+                self.r_data[n].eq(nxt_data[n]),
+                self.r_mask[n].eq(nxt_mask[n])
+            ]
+            with m.If(alloc[n]):
+                m.d.sync += self.r_tag[n].eq(alloc_tag)
+
+        # Choose a line to write out: a full line first, then the victim if a
+        # new line has nowhere to go, then any open line when flushing.
+        full = Signal(self.lines)
+        for n in lines:
+            m.d.comb += full[n].eq(self.r_open[n] & self.r_mask[n].all())
+
+        evict = Signal()
+        m.d.comb += evict.eq(miss.any() & ~free.any())
+
+        emit = Signal(self.lines)
+        for n in lines:
+            first_full = full[n] & ~full[:n].any() if n else full[0]
+            first_open = self.r_open[n] & ~self.r_open[:n].any() if n else self.r_open[0]
+            m.d.comb += emit[n].eq(Mux(full.any(), first_full,
+                                   Mux(evict, self.r_victim == n,
+                                   self.i_flush & first_open)))
+
+        m.d.comb += self.o_idle.eq(~self.r_open.any() & ~self.o_valid)
+
+        with m.If(~self.o_valid | self.i_ready):
+            m.d.sync += self.o_valid.eq(emit.any())
+            for n in lines:
+                with m.If(emit[n]):
+                    m.d.sync += [
+                        self.o_addr.eq(self.r_tag[n]),
+                        self.o_data.eq(nxt_data[n]),
+                        self.o_mask.eq(nxt_mask[n])
+                    ]
+            with m.If(~full.any() & evict):
+                m.d.sync += self.r_victim.eq(Mux(self.r_victim == self.lines - 1, 0, self.r_victim + 1))
+            m.d.sync += self.r_open.eq((self.r_open | alloc) & ~emit)
+        with m.Else():
+            m.d.sync += self.r_open.eq(self.r_open | alloc)
+
+        return m
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a WriteCombiner as RTLIL, or test it.")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate random spans against a memory model, instead of generating RTLIL")
+    args = parser.parse_args()
+
+    wc = WriteCombiner(lanes=4, lines=2, words=8)
+
+    ports = [wc.i_flush, wc.o_idle, wc.o_valid, wc.o_addr, wc.o_data, wc.o_mask, wc.i_ready]
+    for w in wc.writes:
+        ports += [w.i_valid, w.o_ready, w.i_addr, w.i_data, w.i_mask]
+    for r in wc.reads:
+        ports += [r.i_addr, r.o_data, r.o_mask]
+
+    if args.test:
+        import random
+
+        with pysim.Simulator(wc) as sim:
+            memory = {}
+            expected = {}
+            bursts = []
+            forwarded = []
+
+            def read_test(addr):
+                # A read of a word just written finds it in memory, with the bytes
+                # still held here laid over the top.
+                lane = random.randint(0, 3)
+                yield wc.reads[lane].i_addr.eq(addr)
+                yield
+                data, mask = (yield wc.reads[lane].o_data), (yield wc.reads[lane].o_mask)
+                if mask:
+                    forwarded.append(addr)
+                for b in range(4):
+                    if mask & (1 << b):
+                        assert (data >> (8 * b)) & 0xFF == expected.get(4 * addr + b)
+                    else:
+                        assert memory.get(4 * addr + b) == expected.get(4 * addr + b)
+
+            def write_test(spans):
+                # Spans of four pixels, with some pixels missing, on random rows
+                for span in spans:
+                    pending = [k for k in range(4) if span[k] is not None]
+                    for k in range(4):
+                        if span[k] is not None:
+                            addr, data, mask = span[k]
+                            yield wc.writes[k].i_valid.eq(1)
+                            yield wc.writes[k].i_addr.eq(addr)
+                            yield wc.writes[k].i_data.eq(data)
+                            yield wc.writes[k].i_mask.eq(mask)
+                            for b in range(4):
+                                if mask & (1 << b):
+                                    expected[4 * addr + b] = (data >> (8 * b)) & 0xFF
+                        else:
+                            yield wc.writes[k].i_valid.eq(0)
+                    while pending:
+                        yield
+                        for k in list(pending):
+                            if (yield wc.writes[k].o_ready):
+                                pending.remove(k)
+                                yield wc.writes[k].i_valid.eq(0)
+                    written = [pixel[0] for pixel in span if pixel is not None]
+                    if written and random.randint(0, 3) == 0:
+                        yield from read_test(random.choice(written))
+                for k in range(4):
+                    yield wc.writes[k].i_valid.eq(0)
+
+                yield wc.i_flush.eq(1)
+                yield
+                while not (yield wc.o_idle):
+                    yield
+                yield wc.i_flush.eq(0)
+
+            def spans():
+                result = []
+                for i in range(64):
+                    y = random.randint(0, 3)
+                    x = random.randint(0, 15) & ~3
+                    span = []
+                    for k in range(4):
+                        if random.randint(0, 5) == 0:
+                            span.append(None)
+                        else:
+                            span.append((y * 16 + x + k, random.randint(0, 2**32 - 1), random.randint(1, 15)))
+                    result.append(span)
+                return result
+
+            def line_test():
+                # A line whose every byte has been written goes out by itself, with
+                # no flush or eviction to force it.
+                addr = 8 * random.randint(8, 15)
+                for half in range(2):
+                    for k in range(4):
+                        data = random.randint(0, 2**32 - 1)
+                        yield wc.writes[k].i_valid.eq(1)
+                        yield wc.writes[k].i_addr.eq(addr + 4 * half + k)
+                        yield wc.writes[k].i_data.eq(data)
+                        yield wc.writes[k].i_mask.eq(0b1111)
+                        for b in range(4):
+                            expected[4 * (addr + 4 * half + k) + b] = (data >> (8 * b)) & 0xFF
+                    yield
+                for k in range(4):
+                    yield wc.writes[k].i_valid.eq(0)
+                for i in range(20):
+                    yield
+                assert bursts[-1] == addr // 8
+                assert (yield wc.o_idle)
+
+            def feed():
+                yield from write_test(spans())
+                yield from line_test()
+
+            def drain():
+                yield pysim.Passive()
+                while True:
+                    ready = random.randint(0, 2) != 0
+                    yield wc.i_ready.eq(ready)
+                    yield
+                    if ready and (yield wc.o_valid):
+                        addr, data, mask = (yield wc.o_addr), (yield wc.o_data), (yield wc.o_mask)
+                        bursts.append(addr)
+                        for byte in range(32):
+                            if mask & (1 << byte):
+                                memory[32 * addr + byte] = (data >> (8 * byte)) & 0xFF
+
+            sim.add_sync_process(feed)
+            sim.add_sync_process(drain)
+            sim.add_clock(1e-6)
+            sim.run()
+
+            # Every byte written ends up in memory, and writes to the same few rows
+            # are combined into far fewer bursts than pixels, with reads of held
+            # words answered from here.
+            assert memory == expected
+            assert len(bursts) < 64
+            assert forwarded
+    else:
+        print(rtlil.convert(wc, ports=ports))
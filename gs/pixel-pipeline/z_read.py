@@ -0,0 +1,240 @@
+import argparse
+from nmigen import Cat, Elaboratable, Module, Mux, Signal
+from nmigen.back import pysim, rtlil
+
+from common import PixelFormat
+from read_queue import ReadQueue
+from z_test import ZTestMode
+
+
+class ZBufferRead(Elaboratable):
+    def __init__(self, depth=8):
+        self.i_enable  = Signal()   # Z test enable; Off or On
+        self.i_test    = Signal(2)  # Which test to use; see ZTestMode
+
+        # ZBUF/FRAME - Z Buffer Settings
+        self.i_zbp     = Signal(9)  # Z buffer base pointer, in units of 2048 words
+        self.i_fbw     = Signal(6)  # Buffer width, in units of 64 pixels
+        self.i_psm     = Signal(4)  # Z buffer pixel storage format; low bits of PixelFormat.PSMZ*
+
+        self.i_valid   = Signal()   # Input pixel is valid
+        self.o_ready   = Signal()   # Input pixel is accepted this cycle
+
+        self.i_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
+        self.i_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
+        self.i_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.i_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.i_abe     = Signal()   # Whether to alpha blend this pixel (ABE); Off or On
+
+        self.i_x_coord = Signal(16) # Q12.4; Pixel X Coordinate
+        self.i_y_coord = Signal(16) # Q12.4; Pixel Y Coordinate
+        self.i_z_coord = Signal(32) # Float32; Pixel Z Coordinate
+
+        self.i_red     = Signal(8)  # Q8.0; Pixel Red Channel
+        self.i_green   = Signal(8)  # Q8.0; Pixel Green Channel
+        self.i_blue    = Signal(8)  # Q8.0; Pixel Blue Channel
+        self.i_alpha   = Signal(8)  # Q8.0; Pixel Alpha (Transparency) Channel
+
+        self.i_fbred   = Signal(8)  # Q8.0; Framebuffer Red Channel
+        self.i_fbgreen = Signal(8)  # Q8.0; Framebuffer Green Channel
+        self.i_fbblue  = Signal(8)  # Q8.0; Framebuffer Blue Channel
+        self.i_fbalpha = Signal(8)  # Q8.0; Framebuffer Alpha (Transparency) Channel
+
+        # Memory read requests; the buffer is laid out linearly, a row at a time.
+        self.o_req_valid = Signal()   # Read request is valid
+        self.o_req_addr  = Signal(20) # Word address to read
+        self.i_req_ready = Signal()   # Read request is accepted this cycle
+
+        # Memory read responses, in request order and with any latency
+        self.i_resp_valid = Signal()   # Read data is valid
+        self.i_resp_data  = Signal(32) # Read data
+
+        self.o_valid   = Signal()   # Output pixel is valid
+        self.i_ready   = Signal()   # Output pixel is accepted this cycle
+
+        self.o_zref    = Signal(32) # Stored Z value for this pixel; 0 if it was not read
+
+        self.o_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
+        self.o_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
+        self.o_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.o_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.o_abe     = Signal()   # Whether to alpha blend this pixel (ABE); Off or On
+
+        self.o_x_coord = Signal(16) # Output X Coordinate
+        self.o_y_coord = Signal(16) # Output Y Coordinate
+        self.o_z_coord = Signal(32) # Output Z Coordinate
+
+        self.o_red     = Signal(8)  # Output Red Channel
+        self.o_green   = Signal(8)  # Output Green Channel
+        self.o_blue    = Signal(8)  # Output Blue Channel
+        self.o_alpha   = Signal(8)  # Output Alpha Channel
+
+        self.o_fbred   = Signal(8)  # Output Framebuffer Red Channel
+        self.o_fbgreen = Signal(8)  # Output Framebuffer Green Channel
+        self.o_fbblue  = Signal(8)  # Output Framebuffer Blue Channel
+        self.o_fbalpha = Signal(8)  # Output Framebuffer Alpha Channel
+
+        # Pixels wait here for their Z, along with which half of the word holds
+        # it for 16-bit formats and the buffer format, as the settings may have
+        # moved on to another context's by the time the data returns.
+        self.r_queue   = ReadQueue(width=len(Cat(self._pixel("i"))) + 1 + len(self.i_psm), depth=depth)
+
+    def _pixel(self, d):
+        return [getattr(self, d + "_" + name) for name in [
+            "rgbrndr", "arndr", "zrndr", "ctxt", "abe",
+            "x_coord", "y_coord", "z_coord",
+            "red", "green", "blue", "alpha",
+            "fbred", "fbgreen", "fbblue", "fbalpha"
+        ]]
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.queue = queue = self.r_queue
+
+        upper = Signal()
+        psm = Signal.like(self.i_psm)
+
+        half_width = Signal()
+        m.d.comb += half_width.eq((self.i_psm == (PixelFormat.PSMZ16 & 0xF)) |
+                                  (self.i_psm == (PixelFormat.PSMZ16S & 0xF)))
+
+        # Only pixels that will be compared against the Z buffer need a read.
+        read = Signal()
+        m.d.comb += read.eq((self.i_rgbrndr | self.i_arndr | self.i_zrndr) & self.i_enable &
+                            ((self.i_test == ZTestMode.GEQUAL) | (self.i_test == ZTestMode.GREATER)))
+
+        x = self.i_x_coord[4:]
+        y = self.i_y_coord[4:]
+        offset = Signal(20)
+        m.d.comb += offset.eq(y * (self.i_fbw << 6) + x)
+
+        m.d.comb += [
+            queue.i_valid.eq(self.i_valid),
+            self.o_ready.eq(queue.o_ready),
+            queue.i_read.eq(read),
+            queue.i_addr.eq((self.i_zbp << 11) + Mux(half_width, offset >> 1, offset)),
+            queue.i_data.eq(Cat(*self._pixel("i"), half_width & x[0], self.i_psm)),
+
+            self.o_req_valid.eq(queue.o_req_valid),
+            self.o_req_addr.eq(queue.o_req_addr),
+            queue.i_req_ready.eq(self.i_req_ready),
+            queue.i_resp_valid.eq(self.i_resp_valid),
+            queue.i_resp_data.eq(self.i_resp_data),
+
+            self.o_valid.eq(queue.o_valid),
+            queue.i_ready.eq(self.i_ready),
+            Cat(*self._pixel("o"), upper, psm).eq(queue.o_data)
+        ]
+
+        with m.If(~queue.o_read):
+            m.d.comb += self.o_zref.eq(0)
+        with m.Elif(psm == (PixelFormat.PSMZ32 & 0xF)):
+            m.d.comb += self.o_zref.eq(queue.o_resp)
+        with m.Elif(psm == (PixelFormat.PSMZ24 & 0xF)):
+            m.d.comb += self.o_zref.eq(queue.o_resp[0:24])
+        with m.Else():
+            m.d.comb += self.o_zref.eq(Mux(upper, queue.o_resp[16:32], queue.o_resp[0:16]))
+
+        return m
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a ZBufferRead as RTLIL, or test it.")
+    parser.add_argument("--test", action="store_true",
+                        help="simulate reads against a fixed-latency memory, instead of generating RTLIL")
+    args = parser.parse_args()
+
+    zrd = ZBufferRead()
+
+    ports = [
+        zrd.i_enable, zrd.i_test,
+        zrd.i_zbp, zrd.i_fbw, zrd.i_psm,
+
+        zrd.i_valid, zrd.o_ready,
+        zrd.i_rgbrndr, zrd.i_arndr, zrd.i_zrndr, zrd.i_ctxt, zrd.i_abe,
+        zrd.i_x_coord, zrd.i_y_coord, zrd.i_z_coord,
+        zrd.i_red, zrd.i_green, zrd.i_blue, zrd.i_alpha,
+        zrd.i_fbred, zrd.i_fbgreen, zrd.i_fbblue, zrd.i_fbalpha,
+
+        zrd.o_req_valid, zrd.o_req_addr, zrd.i_req_ready,
+        zrd.i_resp_valid, zrd.i_resp_data,
+
+        zrd.o_valid, zrd.i_ready, zrd.o_zref,
+        zrd.o_rgbrndr, zrd.o_arndr, zrd.o_zrndr, zrd.o_ctxt, zrd.o_abe,
+        zrd.o_x_coord, zrd.o_y_coord, zrd.o_z_coord,
+        zrd.o_red, zrd.o_green, zrd.o_blue, zrd.o_alpha,
+        zrd.o_fbred, zrd.o_fbgreen, zrd.o_fbblue, zrd.o_fbalpha,
+    ]
+
+    if args.test:
+        import random
+
+        # Z buffer contents, one word per address
+        memory = {}
+        latency = 5
+
+        with pysim.Simulator(zrd) as sim:
+            def pixel_test(psm, coords):
+                # Memory with a fixed read latency, answering one request per clock
+                responses = []
+                results = []
+                sent = 0
+                clock = 0
+
+                yield zrd.i_enable.eq(1)
+                yield zrd.i_test.eq(ZTestMode.GEQUAL)
+                yield zrd.i_zbp.eq(1)
+                yield zrd.i_fbw.eq(2)
+                yield zrd.i_psm.eq(psm & 0xF)
+                yield zrd.i_req_ready.eq(1)
+                yield zrd.i_ready.eq(1)
+
+                while len(results) < len(coords):
+                    if sent < len(coords):
+                        x, y = coords[sent]
+                        yield zrd.i_valid.eq(1)
+                        yield zrd.i_rgbrndr.eq(1)
+                        yield zrd.i_x_coord.eq(x << 4)
+                        yield zrd.i_y_coord.eq(y << 4)
+                    else:
+                        yield zrd.i_valid.eq(0)
+
+                    ready = responses and responses[0][0] <= clock
+                    yield zrd.i_resp_valid.eq(bool(ready))
+                    if ready:
+                        yield zrd.i_resp_data.eq(responses.pop(0)[1])
+
+                    yield
+                    clock += 1
+
+                    if (yield zrd.o_req_valid) and (yield zrd.i_req_ready):
+                        addr = yield zrd.o_req_addr
+                        responses.append((clock + latency, memory.setdefault(addr, random.randint(0, 2**32 - 1))))
+                    if sent < len(coords) and (yield zrd.o_ready):
+                        sent += 1
+                    if (yield zrd.o_valid):
+                        results.append(((yield zrd.o_x_coord) >> 4, (yield zrd.o_y_coord) >> 4, (yield zrd.o_zref)))
+
+                # After the memory latency has been filled, one pixel should leave per clock.
+                assert clock <= len(coords) + latency + 4
+
+                for (x, y), (o_x, o_y, zref) in zip(coords, results):
+                    assert (o_x, o_y) == (x, y)
+                    offset = y * 128 + x
+                    if psm == PixelFormat.PSMZ32:
+                        assert zref == memory[2048 + offset]
+                    elif psm == PixelFormat.PSMZ24:
+                        assert zref == memory[2048 + offset] & 0xFFFFFF
+                    else:
+                        assert zref == (memory[2048 + (offset >> 1)] >> (16 * (x & 1))) & 0xFFFF
+
+            def pixels():
+                for psm in [PixelFormat.PSMZ32, PixelFormat.PSMZ24, PixelFormat.PSMZ16, PixelFormat.PSMZ16S]:
+                    coords = [(random.randint(0, 127), random.randint(0, 63)) for i in range(32)]
+                    yield from pixel_test(psm, coords)
+
+            sim.add_sync_process(pixels)
+            sim.add_clock(1e-6)
+            sim.run()
+    else:
+        print(rtlil.convert(zrd, ports=ports))
@@ -1,5 +1,5 @@
 from enum import IntEnum
-from nmigen import Elaboratable, Signal, Module
+from nmigen import Elaboratable, EnableInserter, Signal, Module
 from nmigen.back import rtlil, pysim
 
 
@@ -17,9 +17,14 @@ class ZTest(Elaboratable):
         self.i_test    = Signal(2)  # Which test to use; see ZTestMode
         self.i_zref    = Signal(32) # Reference Z Value
 
+        self.i_valid   = Signal()   # Input pixel is valid
+        self.o_ready   = Signal()   # Input pixel is accepted this cycle
+
         self.i_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
         self.i_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
         self.i_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.i_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.i_abe     = Signal()   # Whether to alpha blend this pixel (ABE); Off or On
 
         self.i_x_coord = Signal(16) # Q12.4; Pixel X Coordinate
         self.i_y_coord = Signal(16) # Q12.4; Pixel Y Coordinate
@@ -30,9 +35,19 @@ class ZTest(Elaboratable):
         self.i_blue    = Signal(8)  # Q8.0; Pixel Blue Channel
         self.i_alpha   = Signal(8)  # Q8.0; Pixel Alpha (Transparency) Channel
 
+        self.i_fbred   = Signal(8)  # Q8.0; Framebuffer Red Channel
+        self.i_fbgreen = Signal(8)  # Q8.0; Framebuffer Green Channel
+        self.i_fbblue  = Signal(8)  # Q8.0; Framebuffer Blue Channel
+        self.i_fbalpha = Signal(8)  # Q8.0; Framebuffer Alpha (Transparency) Channel
+
+        self.o_valid   = Signal()   # Output pixel is valid
+        self.i_ready   = Signal()   # Output pixel is accepted this cycle
+
         self.o_rgbrndr = Signal()   # Whether to render this pixel's RGB; Off or On
         self.o_arndr   = Signal()   # Whether to render this pixel's Alpha; Off or On
         self.o_zrndr   = Signal()   # Whether to update this pixel's Z; Off or On
+        self.o_ctxt    = Signal(2)  # Context slot of this pixel; see PixelPipeline.i_context
+        self.o_abe     = Signal()   # Whether to alpha blend this pixel (ABE); Off or On
 
         self.o_x_coord = Signal(16) # Output X Coordinate
         self.o_y_coord = Signal(16) # Output Y Coordinate
@@ -43,11 +58,24 @@ class ZTest(Elaboratable):
         self.o_blue    = Signal(8)  # Output Blue Channel
         self.o_alpha   = Signal(8)  # Output Alpha Channel
 
+        self.o_fbred   = Signal(8)  # Output Framebuffer Red Channel
+        self.o_fbgreen = Signal(8)  # Output Framebuffer Green Channel
+        self.o_fbblue  = Signal(8)  # Output Framebuffer Blue Channel
+        self.o_fbalpha = Signal(8)  # Output Framebuffer Alpha Channel
+
     def elaborate(self, platform):
         m = Module()
 
+        # The stage holds its output until it is accepted.
+        m.d.comb += self.o_ready.eq(~self.o_valid | self.i_ready)
+
         # Move the pipeline along
         m.d.sync += [
+            self.o_valid.eq(self.i_valid),
+
+            self.o_ctxt.eq(self.i_ctxt),
+            self.o_abe.eq(self.i_abe),
+
             self.o_x_coord.eq(self.i_x_coord),
             self.o_y_coord.eq(self.i_y_coord),
             self.o_z_coord.eq(self.i_z_coord),
@@ -56,6 +84,11 @@ class ZTest(Elaboratable):
             self.o_green.eq(self.i_green),
             self.o_blue.eq(self.i_blue),
             self.o_alpha.eq(self.i_alpha),
+
+            self.o_fbred.eq(self.i_fbred),
+            self.o_fbgreen.eq(self.i_fbgreen),
+            self.o_fbblue.eq(self.i_fbblue),
+            self.o_fbalpha.eq(self.i_fbalpha)
         ]
 
         # Z Test, relative to ZREF.
@@ -79,7 +112,7 @@ class ZTest(Elaboratable):
             self.o_zrndr.eq(self.i_zrndr & test)
         ]
 
-        return m
+        return EnableInserter(self.o_ready)(m)
 
 if __name__ == "__main__":
     ztst = ZTest()
@@ -87,11 +120,13 @@ if __name__ == "__main__":
     ports = [
         ztst.i_enable, ztst.i_test, ztst.i_zref,
 
-        ztst.i_rgbrndr, ztst.i_arndr, ztst.i_zrndr,
+        ztst.i_valid, ztst.o_ready,
+        ztst.i_rgbrndr, ztst.i_arndr, ztst.i_zrndr, ztst.i_ctxt, ztst.i_abe,
         ztst.i_x_coord, ztst.i_y_coord, ztst.i_z_coord,
         ztst.i_red, ztst.i_green, ztst.i_blue, ztst.i_alpha,
 
-        ztst.o_rgbrndr, ztst.o_arndr, ztst.o_zrndr,
+        ztst.o_valid, ztst.i_ready,
+        ztst.o_rgbrndr, ztst.o_arndr, ztst.o_zrndr, ztst.o_ctxt, ztst.o_abe,
         ztst.o_x_coord, ztst.o_y_coord, ztst.o_z_coord,
         ztst.o_red, ztst.o_green, ztst.o_blue, ztst.o_alpha,
     ]
@@ -1,1465 +1,137 @@
-from nmigen import Elaboratable, Module, Signal
+from nmigen import Cat, Elaboratable, Memory, Module, Mux, Record, Signal
+from nmigen.back import pysim
+from nmigen.lib.fifo import SyncFIFO
+
+
+# One pixel of a span or block; lane k maps onto PipelineGroup.pipes[k], with
+# valid driving its rgbrndr/arndr/zrndr bits and u/v its texel coordinates.
+PIXEL = [
+    ("valid", 1), # Pixel is covered by the primitive
+
+    ("x", 12),
+    ("y", 12),
+    ("z", 32),
+
+    ("r", 8),
+    ("g", 8),
+    ("b", 8),
+    ("a", 8),
+    ("f", 8),     # Fog coefficient
+
+    ("s", 24),    # Q16.8; signed, S * Q premultiplied by the texture width
+    ("t", 24),    # Q16.8; signed, T * Q premultiplied by the texture height
+    ("q", 16),    # Q4.12
+    ("u", 16),    # Q12.4; texel X coordinate
+    ("v", 16)     # Q12.4; texel Y coordinate
+]
+
+
+class ReciprocalTable(Elaboratable):
+    def __init__(self, width=16, in_frac=4, out_width=20, out_frac=15, table_bits=10, nearest=True):
+        # The input is normalised so that its leading one is at the top, and the
+        # table_bits bits below it index a ROM of mantissa reciprocals. The result
+        # is then shifted back down by the position of the leading one.
+        #
+        # Inputs below 2 ** (table_bits + 1) are looked up exactly; larger inputs
+        # have their low bits truncated, which is within one LSB of the output.
+        # This is a deliberate trade of accuracy for ROM size: with the default
+        # table_bits of 10, FixedPointReciprocal is one LSB out on 537 of its
+        # 65536 inputs (2053 gives 256, where 255 is correctly rounded), and
+        # ColourDivider on 4 (2049 and 4097 to 4099). A table_bits of width - 1
+        # looks every input up exactly.
+        self.width      = width
+        self.shift      = in_frac + out_frac # o = 2 ** shift / i
+        self.table_bits = min(table_bits, width - 1)
+        self.guard_bits = 2
+        self.nearest    = nearest            # Round to nearest, or truncate
+
+        self.i       = Signal(width)     # Input value, with in_frac fraction bits
+        self.i_en    = Signal(reset=1)   # Sample input value
+
+        self.o       = Signal(out_width) # 1 / (input value), with out_frac fraction bits; valid one cycle after i_en
+
+    def table(self):
+        # Entry k holds 1 / (1 + k / 2**table_bits), scaled by 2**(shift + guard_bits).
+        numerator = 1 << (self.shift + self.guard_bits + self.table_bits)
+        table = []
+        for k in range(1 << self.table_bits):
+            mantissa = (1 << self.table_bits) + k
+            if self.nearest:
+                table.append((numerator + mantissa // 2) // mantissa)
+            else:
+                table.append(numerator // mantissa)
+        return table
+
+    def elaborate(self, platform):
+        m = Module()
+
+        rom = Memory(width=self.shift + self.guard_bits + 1, depth=1 << self.table_bits, init=self.table())
+        m.submodules.rom = port = rom.read_port(transparent=False)
+
+        # Find the leading one of the input; later assignments take priority.
+        lead = Signal(range(self.width))
+        for bit in range(self.width):
+            with m.If(self.i[bit]):
+                m.d.comb += lead.eq(bit)
+
+        norm = Signal(self.width)
+        m.d.comb += [
+            norm.eq(self.i << (self.width - 1 - lead)),
+
+            port.addr.eq(norm[self.width - 1 - self.table_bits:self.width - 1]),
+            port.en.eq(self.i_en)
+        ]
+
+        r_lead = Signal.like(lead)
+        r_zero = Signal()
+        with m.If(self.i_en):
+            m.d.sync += [
+                r_lead.eq(lead),
+                r_zero.eq(self.i == 0)
+            ]
+
+        # Shift the mantissa reciprocal back down, keeping one extra bit to round with.
+        result = Signal(len(port.data))
+        m.d.comb += result.eq(port.data >> (r_lead + self.guard_bits - 1))
+
+        with m.If(r_zero):
+            m.d.comb += self.o.eq(0)
+        with m.Else():
+            if self.nearest:
+                m.d.comb += self.o.eq((result + 1) >> 1)
+            else:
+                m.d.comb += self.o.eq(result >> 1)
+
+        return m
+
 
 class FixedPointReciprocal(Elaboratable):
-    def __init__(self):
+    def __init__(self, table_bits=10):
         self.i       = Signal(16) # Q12.4; input value
         self.i_hold  = Signal()   # Hold output value
 
         self.o       = Signal(20) # Q5.15; 1 / (input value)
 
+        self.table   = ReciprocalTable(table_bits=table_bits)
+
     def elaborate(self, platform):
         m = Module()
 
+        m.submodules.table = self.table
+
+        m.d.comb += [
+            self.table.i.eq(self.i),
+            self.o.eq(self.table.o)
+        ]
+
         with m.FSM():
             with m.State("START"):
-                # The following mess calculates the reciprocal of i
-                # as a Q5.15 fixed-point number.
-                with m.If((self.i >= 0) & (self.i < 1)): m.d.sync += self.o.eq(0)
-                with m.If((self.i >= 1) & (self.i < 2)): m.d.sync += self.o.eq(524288)
-                with m.If((self.i >= 2) & (self.i < 3)): m.d.sync += self.o.eq(262144)
-                with m.If((self.i >= 3) & (self.i < 4)): m.d.sync += self.o.eq(174763)
-                with m.If((self.i >= 4) & (self.i < 5)): m.d.sync += self.o.eq(131072)
-                with m.If((self.i >= 5) & (self.i < 6)): m.d.sync += self.o.eq(104858)
-                with m.If((self.i >= 6) & (self.i < 7)): m.d.sync += self.o.eq(87381)
-                with m.If((self.i >= 7) & (self.i < 8)): m.d.sync += self.o.eq(74898)
-                with m.If((self.i >= 8) & (self.i < 9)): m.d.sync += self.o.eq(65536)
-                with m.If((self.i >= 9) & (self.i < 10)): m.d.sync += self.o.eq(58254)
-                with m.If((self.i >= 10) & (self.i < 11)): m.d.sync += self.o.eq(52429)
-                with m.If((self.i >= 11) & (self.i < 12)): m.d.sync += self.o.eq(47663)
-                with m.If((self.i >= 12) & (self.i < 13)): m.d.sync += self.o.eq(43691)
-                with m.If((self.i >= 13) & (self.i < 14)): m.d.sync += self.o.eq(40330)
-                with m.If((self.i >= 14) & (self.i < 15)): m.d.sync += self.o.eq(37449)
-                with m.If((self.i >= 15) & (self.i < 16)): m.d.sync += self.o.eq(34953)
-                with m.If((self.i >= 16) & (self.i < 17)): m.d.sync += self.o.eq(32768)
-                with m.If((self.i >= 17) & (self.i < 18)): m.d.sync += self.o.eq(30840)
-                with m.If((self.i >= 18) & (self.i < 19)): m.d.sync += self.o.eq(29127)
-                with m.If((self.i >= 19) & (self.i < 20)): m.d.sync += self.o.eq(27594)
-                with m.If((self.i >= 20) & (self.i < 21)): m.d.sync += self.o.eq(26214)
-                with m.If((self.i >= 21) & (self.i < 22)): m.d.sync += self.o.eq(24966)
-                with m.If((self.i >= 22) & (self.i < 23)): m.d.sync += self.o.eq(23831)
-                with m.If((self.i >= 23) & (self.i < 24)): m.d.sync += self.o.eq(22795)
-                with m.If((self.i >= 24) & (self.i < 25)): m.d.sync += self.o.eq(21845)
-                with m.If((self.i >= 25) & (self.i < 26)): m.d.sync += self.o.eq(20972)
-                with m.If((self.i >= 26) & (self.i < 27)): m.d.sync += self.o.eq(20165)
-                with m.If((self.i >= 27) & (self.i < 28)): m.d.sync += self.o.eq(19418)
-                with m.If((self.i >= 28) & (self.i < 29)): m.d.sync += self.o.eq(18725)
-                with m.If((self.i >= 29) & (self.i < 30)): m.d.sync += self.o.eq(18079)
-                with m.If((self.i >= 30) & (self.i < 31)): m.d.sync += self.o.eq(17476)
-                with m.If((self.i >= 31) & (self.i < 32)): m.d.sync += self.o.eq(16913)
-                with m.If((self.i >= 32) & (self.i < 33)): m.d.sync += self.o.eq(16384)
-                with m.If((self.i >= 33) & (self.i < 34)): m.d.sync += self.o.eq(15888)
-                with m.If((self.i >= 34) & (self.i < 35)): m.d.sync += self.o.eq(15420)
-                with m.If((self.i >= 35) & (self.i < 36)): m.d.sync += self.o.eq(14980)
-                with m.If((self.i >= 36) & (self.i < 37)): m.d.sync += self.o.eq(14564)
-                with m.If((self.i >= 37) & (self.i < 38)): m.d.sync += self.o.eq(14170)
-                with m.If((self.i >= 38) & (self.i < 39)): m.d.sync += self.o.eq(13797)
-                with m.If((self.i >= 39) & (self.i < 40)): m.d.sync += self.o.eq(13443)
-                with m.If((self.i >= 40) & (self.i < 41)): m.d.sync += self.o.eq(13107)
-                with m.If((self.i >= 41) & (self.i < 42)): m.d.sync += self.o.eq(12788)
-                with m.If((self.i >= 42) & (self.i < 43)): m.d.sync += self.o.eq(12483)
-                with m.If((self.i >= 43) & (self.i < 44)): m.d.sync += self.o.eq(12193)
-                with m.If((self.i >= 44) & (self.i < 45)): m.d.sync += self.o.eq(11916)
-                with m.If((self.i >= 45) & (self.i < 46)): m.d.sync += self.o.eq(11651)
-                with m.If((self.i >= 46) & (self.i < 47)): m.d.sync += self.o.eq(11398)
-                with m.If((self.i >= 47) & (self.i < 48)): m.d.sync += self.o.eq(11155)
-                with m.If((self.i >= 48) & (self.i < 49)): m.d.sync += self.o.eq(10923)
-                with m.If((self.i >= 49) & (self.i < 50)): m.d.sync += self.o.eq(10700)
-                with m.If((self.i >= 50) & (self.i < 51)): m.d.sync += self.o.eq(10486)
-                with m.If((self.i >= 51) & (self.i < 52)): m.d.sync += self.o.eq(10280)
-                with m.If((self.i >= 52) & (self.i < 53)): m.d.sync += self.o.eq(10082)
-                with m.If((self.i >= 53) & (self.i < 54)): m.d.sync += self.o.eq(9892)
-                with m.If((self.i >= 54) & (self.i < 55)): m.d.sync += self.o.eq(9709)
-                with m.If((self.i >= 55) & (self.i < 56)): m.d.sync += self.o.eq(9533)
-                with m.If((self.i >= 56) & (self.i < 57)): m.d.sync += self.o.eq(9362)
-                with m.If((self.i >= 57) & (self.i < 58)): m.d.sync += self.o.eq(9198)
-                with m.If((self.i >= 58) & (self.i < 59)): m.d.sync += self.o.eq(9039)
-                with m.If((self.i >= 59) & (self.i < 60)): m.d.sync += self.o.eq(8886)
-                with m.If((self.i >= 60) & (self.i < 61)): m.d.sync += self.o.eq(8738)
-                with m.If((self.i >= 61) & (self.i < 62)): m.d.sync += self.o.eq(8595)
-                with m.If((self.i >= 62) & (self.i < 63)): m.d.sync += self.o.eq(8456)
-                with m.If((self.i >= 63) & (self.i < 64)): m.d.sync += self.o.eq(8322)
-                with m.If((self.i >= 64) & (self.i < 65)): m.d.sync += self.o.eq(8192)
-                with m.If((self.i >= 65) & (self.i < 66)): m.d.sync += self.o.eq(8066)
-                with m.If((self.i >= 66) & (self.i < 67)): m.d.sync += self.o.eq(7944)
-                with m.If((self.i >= 67) & (self.i < 68)): m.d.sync += self.o.eq(7825)
-                with m.If((self.i >= 68) & (self.i < 69)): m.d.sync += self.o.eq(7710)
-                with m.If((self.i >= 69) & (self.i < 70)): m.d.sync += self.o.eq(7598)
-                with m.If((self.i >= 70) & (self.i < 71)): m.d.sync += self.o.eq(7490)
-                with m.If((self.i >= 71) & (self.i < 72)): m.d.sync += self.o.eq(7384)
-                with m.If((self.i >= 72) & (self.i < 73)): m.d.sync += self.o.eq(7282)
-                with m.If((self.i >= 73) & (self.i < 74)): m.d.sync += self.o.eq(7182)
-                with m.If((self.i >= 74) & (self.i < 75)): m.d.sync += self.o.eq(7085)
-                with m.If((self.i >= 75) & (self.i < 76)): m.d.sync += self.o.eq(6991)
-                with m.If((self.i >= 76) & (self.i < 77)): m.d.sync += self.o.eq(6899)
-                with m.If((self.i >= 77) & (self.i < 78)): m.d.sync += self.o.eq(6809)
-                with m.If((self.i >= 78) & (self.i < 79)): m.d.sync += self.o.eq(6722)
-                with m.If((self.i >= 79) & (self.i < 80)): m.d.sync += self.o.eq(6637)
-                with m.If((self.i >= 80) & (self.i < 81)): m.d.sync += self.o.eq(6554)
-                with m.If((self.i >= 81) & (self.i < 82)): m.d.sync += self.o.eq(6473)
-                with m.If((self.i >= 82) & (self.i < 83)): m.d.sync += self.o.eq(6394)
-                with m.If((self.i >= 83) & (self.i < 84)): m.d.sync += self.o.eq(6317)
-                with m.If((self.i >= 84) & (self.i < 85)): m.d.sync += self.o.eq(6242)
-                with m.If((self.i >= 85) & (self.i < 86)): m.d.sync += self.o.eq(6168)
-                with m.If((self.i >= 86) & (self.i < 87)): m.d.sync += self.o.eq(6096)
-                with m.If((self.i >= 87) & (self.i < 88)): m.d.sync += self.o.eq(6026)
-                with m.If((self.i >= 88) & (self.i < 89)): m.d.sync += self.o.eq(5958)
-                with m.If((self.i >= 89) & (self.i < 90)): m.d.sync += self.o.eq(5891)
-                with m.If((self.i >= 90) & (self.i < 91)): m.d.sync += self.o.eq(5825)
-                with m.If((self.i >= 91) & (self.i < 92)): m.d.sync += self.o.eq(5761)
-                with m.If((self.i >= 92) & (self.i < 93)): m.d.sync += self.o.eq(5699)
-                with m.If((self.i >= 93) & (self.i < 94)): m.d.sync += self.o.eq(5638)
-                with m.If((self.i >= 94) & (self.i < 95)): m.d.sync += self.o.eq(5578)
-                with m.If((self.i >= 95) & (self.i < 96)): m.d.sync += self.o.eq(5519)
-                with m.If((self.i >= 96) & (self.i < 97)): m.d.sync += self.o.eq(5461)
-                with m.If((self.i >= 97) & (self.i < 98)): m.d.sync += self.o.eq(5405)
-                with m.If((self.i >= 98) & (self.i < 99)): m.d.sync += self.o.eq(5350)
-                with m.If((self.i >= 99) & (self.i < 100)): m.d.sync += self.o.eq(5296)
-                with m.If((self.i >= 100) & (self.i < 101)): m.d.sync += self.o.eq(5243)
-                with m.If((self.i >= 101) & (self.i < 102)): m.d.sync += self.o.eq(5191)
-                with m.If((self.i >= 102) & (self.i < 103)): m.d.sync += self.o.eq(5140)
-                with m.If((self.i >= 103) & (self.i < 104)): m.d.sync += self.o.eq(5090)
-                with m.If((self.i >= 104) & (self.i < 105)): m.d.sync += self.o.eq(5041)
-                with m.If((self.i >= 105) & (self.i < 106)): m.d.sync += self.o.eq(4993)
-                with m.If((self.i >= 106) & (self.i < 107)): m.d.sync += self.o.eq(4946)
-                with m.If((self.i >= 107) & (self.i < 108)): m.d.sync += self.o.eq(4900)
-                with m.If((self.i >= 108) & (self.i < 109)): m.d.sync += self.o.eq(4855)
-                with m.If((self.i >= 109) & (self.i < 110)): m.d.sync += self.o.eq(4810)
-                with m.If((self.i >= 110) & (self.i < 111)): m.d.sync += self.o.eq(4766)
-                with m.If((self.i >= 111) & (self.i < 112)): m.d.sync += self.o.eq(4723)
-                with m.If((self.i >= 112) & (self.i < 113)): m.d.sync += self.o.eq(4681)
-                with m.If((self.i >= 113) & (self.i < 114)): m.d.sync += self.o.eq(4640)
-                with m.If((self.i >= 114) & (self.i < 115)): m.d.sync += self.o.eq(4599)
-                with m.If((self.i >= 115) & (self.i < 116)): m.d.sync += self.o.eq(4559)
-                with m.If((self.i >= 116) & (self.i < 117)): m.d.sync += self.o.eq(4520)
-                with m.If((self.i >= 117) & (self.i < 118)): m.d.sync += self.o.eq(4481)
-                with m.If((self.i >= 118) & (self.i < 119)): m.d.sync += self.o.eq(4443)
-                with m.If((self.i >= 119) & (self.i < 120)): m.d.sync += self.o.eq(4406)
-                with m.If((self.i >= 120) & (self.i < 121)): m.d.sync += self.o.eq(4369)
-                with m.If((self.i >= 121) & (self.i < 122)): m.d.sync += self.o.eq(4333)
-                with m.If((self.i >= 122) & (self.i < 123)): m.d.sync += self.o.eq(4297)
-                with m.If((self.i >= 123) & (self.i < 124)): m.d.sync += self.o.eq(4263)
-                with m.If((self.i >= 124) & (self.i < 125)): m.d.sync += self.o.eq(4228)
-                with m.If((self.i >= 125) & (self.i < 126)): m.d.sync += self.o.eq(4194)
-                with m.If((self.i >= 126) & (self.i < 127)): m.d.sync += self.o.eq(4161)
-                with m.If((self.i >= 127) & (self.i < 128)): m.d.sync += self.o.eq(4128)
-                with m.If((self.i >= 128) & (self.i < 129)): m.d.sync += self.o.eq(4096)
-                with m.If((self.i >= 129) & (self.i < 130)): m.d.sync += self.o.eq(4064)
-                with m.If((self.i >= 130) & (self.i < 131)): m.d.sync += self.o.eq(4033)
-                with m.If((self.i >= 131) & (self.i < 132)): m.d.sync += self.o.eq(4002)
-                with m.If((self.i >= 132) & (self.i < 133)): m.d.sync += self.o.eq(3972)
-                with m.If((self.i >= 133) & (self.i < 134)): m.d.sync += self.o.eq(3942)
-                with m.If((self.i >= 134) & (self.i < 135)): m.d.sync += self.o.eq(3913)
-                with m.If((self.i >= 135) & (self.i < 136)): m.d.sync += self.o.eq(3884)
-                with m.If((self.i >= 136) & (self.i < 137)): m.d.sync += self.o.eq(3855)
-                with m.If((self.i >= 137) & (self.i < 138)): m.d.sync += self.o.eq(3827)
-                with m.If((self.i >= 138) & (self.i < 139)): m.d.sync += self.o.eq(3799)
-                with m.If((self.i >= 139) & (self.i < 140)): m.d.sync += self.o.eq(3772)
-                with m.If((self.i >= 140) & (self.i < 141)): m.d.sync += self.o.eq(3745)
-                with m.If((self.i >= 141) & (self.i < 142)): m.d.sync += self.o.eq(3718)
-                with m.If((self.i >= 142) & (self.i < 143)): m.d.sync += self.o.eq(3692)
-                with m.If((self.i >= 143) & (self.i < 144)): m.d.sync += self.o.eq(3666)
-                with m.If((self.i >= 144) & (self.i < 145)): m.d.sync += self.o.eq(3641)
-                with m.If((self.i >= 145) & (self.i < 146)): m.d.sync += self.o.eq(3616)
-                with m.If((self.i >= 146) & (self.i < 147)): m.d.sync += self.o.eq(3591)
-                with m.If((self.i >= 147) & (self.i < 148)): m.d.sync += self.o.eq(3567)
-                with m.If((self.i >= 148) & (self.i < 149)): m.d.sync += self.o.eq(3542)
-                with m.If((self.i >= 149) & (self.i < 150)): m.d.sync += self.o.eq(3519)
-                with m.If((self.i >= 150) & (self.i < 151)): m.d.sync += self.o.eq(3495)
-                with m.If((self.i >= 151) & (self.i < 152)): m.d.sync += self.o.eq(3472)
-                with m.If((self.i >= 152) & (self.i < 153)): m.d.sync += self.o.eq(3449)
-                with m.If((self.i >= 153) & (self.i < 154)): m.d.sync += self.o.eq(3427)
-                with m.If((self.i >= 154) & (self.i < 155)): m.d.sync += self.o.eq(3404)
-                with m.If((self.i >= 155) & (self.i < 156)): m.d.sync += self.o.eq(3383)
-                with m.If((self.i >= 156) & (self.i < 157)): m.d.sync += self.o.eq(3361)
-                with m.If((self.i >= 157) & (self.i < 158)): m.d.sync += self.o.eq(3339)
-                with m.If((self.i >= 158) & (self.i < 159)): m.d.sync += self.o.eq(3318)
-                with m.If((self.i >= 159) & (self.i < 160)): m.d.sync += self.o.eq(3297)
-                with m.If((self.i >= 160) & (self.i < 161)): m.d.sync += self.o.eq(3277)
-                with m.If((self.i >= 161) & (self.i < 162)): m.d.sync += self.o.eq(3256)
-                with m.If((self.i >= 162) & (self.i < 163)): m.d.sync += self.o.eq(3236)
-                with m.If((self.i >= 163) & (self.i < 164)): m.d.sync += self.o.eq(3216)
-                with m.If((self.i >= 164) & (self.i < 165)): m.d.sync += self.o.eq(3197)
-                with m.If((self.i >= 165) & (self.i < 166)): m.d.sync += self.o.eq(3178)
-                with m.If((self.i >= 166) & (self.i < 167)): m.d.sync += self.o.eq(3158)
-                with m.If((self.i >= 167) & (self.i < 168)): m.d.sync += self.o.eq(3139)
-                with m.If((self.i >= 168) & (self.i < 169)): m.d.sync += self.o.eq(3121)
-                with m.If((self.i >= 169) & (self.i < 170)): m.d.sync += self.o.eq(3102)
-                with m.If((self.i >= 170) & (self.i < 171)): m.d.sync += self.o.eq(3084)
-                with m.If((self.i >= 171) & (self.i < 172)): m.d.sync += self.o.eq(3066)
-                with m.If((self.i >= 172) & (self.i < 173)): m.d.sync += self.o.eq(3048)
-                with m.If((self.i >= 173) & (self.i < 174)): m.d.sync += self.o.eq(3031)
-                with m.If((self.i >= 174) & (self.i < 175)): m.d.sync += self.o.eq(3013)
-                with m.If((self.i >= 175) & (self.i < 176)): m.d.sync += self.o.eq(2996)
-                with m.If((self.i >= 176) & (self.i < 177)): m.d.sync += self.o.eq(2979)
-                with m.If((self.i >= 177) & (self.i < 178)): m.d.sync += self.o.eq(2962)
-                with m.If((self.i >= 178) & (self.i < 179)): m.d.sync += self.o.eq(2945)
-                with m.If((self.i >= 179) & (self.i < 180)): m.d.sync += self.o.eq(2929)
-                with m.If((self.i >= 180) & (self.i < 181)): m.d.sync += self.o.eq(2913)
-                with m.If((self.i >= 181) & (self.i < 182)): m.d.sync += self.o.eq(2897)
-                with m.If((self.i >= 182) & (self.i < 183)): m.d.sync += self.o.eq(2881)
-                with m.If((self.i >= 183) & (self.i < 184)): m.d.sync += self.o.eq(2865)
-                with m.If((self.i >= 184) & (self.i < 185)): m.d.sync += self.o.eq(2849)
-                with m.If((self.i >= 185) & (self.i < 186)): m.d.sync += self.o.eq(2834)
-                with m.If((self.i >= 186) & (self.i < 187)): m.d.sync += self.o.eq(2819)
-                with m.If((self.i >= 187) & (self.i < 188)): m.d.sync += self.o.eq(2804)
-                with m.If((self.i >= 188) & (self.i < 189)): m.d.sync += self.o.eq(2789)
-                with m.If((self.i >= 189) & (self.i < 190)): m.d.sync += self.o.eq(2774)
-                with m.If((self.i >= 190) & (self.i < 191)): m.d.sync += self.o.eq(2759)
-                with m.If((self.i >= 191) & (self.i < 192)): m.d.sync += self.o.eq(2745)
-                with m.If((self.i >= 192) & (self.i < 193)): m.d.sync += self.o.eq(2731)
-                with m.If((self.i >= 193) & (self.i < 194)): m.d.sync += self.o.eq(2717)
-                with m.If((self.i >= 194) & (self.i < 195)): m.d.sync += self.o.eq(2703)
-                with m.If((self.i >= 195) & (self.i < 196)): m.d.sync += self.o.eq(2689)
-                with m.If((self.i >= 196) & (self.i < 197)): m.d.sync += self.o.eq(2675)
-                with m.If((self.i >= 197) & (self.i < 198)): m.d.sync += self.o.eq(2661)
-                with m.If((self.i >= 198) & (self.i < 199)): m.d.sync += self.o.eq(2648)
-                with m.If((self.i >= 199) & (self.i < 200)): m.d.sync += self.o.eq(2635)
-                with m.If((self.i >= 200) & (self.i < 201)): m.d.sync += self.o.eq(2621)
-                with m.If((self.i >= 201) & (self.i < 202)): m.d.sync += self.o.eq(2608)
-                with m.If((self.i >= 202) & (self.i < 203)): m.d.sync += self.o.eq(2595)
-                with m.If((self.i >= 203) & (self.i < 204)): m.d.sync += self.o.eq(2583)
-                with m.If((self.i >= 204) & (self.i < 205)): m.d.sync += self.o.eq(2570)
-                with m.If((self.i >= 205) & (self.i < 206)): m.d.sync += self.o.eq(2558)
-                with m.If((self.i >= 206) & (self.i < 207)): m.d.sync += self.o.eq(2545)
-                with m.If((self.i >= 207) & (self.i < 208)): m.d.sync += self.o.eq(2533)
-                with m.If((self.i >= 208) & (self.i < 209)): m.d.sync += self.o.eq(2521)
-                with m.If((self.i >= 209) & (self.i < 210)): m.d.sync += self.o.eq(2509)
-                with m.If((self.i >= 210) & (self.i < 211)): m.d.sync += self.o.eq(2497)
-                with m.If((self.i >= 211) & (self.i < 212)): m.d.sync += self.o.eq(2485)
-                with m.If((self.i >= 212) & (self.i < 213)): m.d.sync += self.o.eq(2473)
-                with m.If((self.i >= 213) & (self.i < 214)): m.d.sync += self.o.eq(2461)
-                with m.If((self.i >= 214) & (self.i < 215)): m.d.sync += self.o.eq(2450)
-                with m.If((self.i >= 215) & (self.i < 216)): m.d.sync += self.o.eq(2439)
-                with m.If((self.i >= 216) & (self.i < 217)): m.d.sync += self.o.eq(2427)
-                with m.If((self.i >= 217) & (self.i < 218)): m.d.sync += self.o.eq(2416)
-                with m.If((self.i >= 218) & (self.i < 219)): m.d.sync += self.o.eq(2405)
-                with m.If((self.i >= 219) & (self.i < 220)): m.d.sync += self.o.eq(2394)
-                with m.If((self.i >= 220) & (self.i < 221)): m.d.sync += self.o.eq(2383)
-                with m.If((self.i >= 221) & (self.i < 222)): m.d.sync += self.o.eq(2372)
-                with m.If((self.i >= 222) & (self.i < 223)): m.d.sync += self.o.eq(2362)
-                with m.If((self.i >= 223) & (self.i < 224)): m.d.sync += self.o.eq(2351)
-                with m.If((self.i >= 224) & (self.i < 225)): m.d.sync += self.o.eq(2341)
-                with m.If((self.i >= 225) & (self.i < 226)): m.d.sync += self.o.eq(2330)
-                with m.If((self.i >= 226) & (self.i < 227)): m.d.sync += self.o.eq(2320)
-                with m.If((self.i >= 227) & (self.i < 228)): m.d.sync += self.o.eq(2310)
-                with m.If((self.i >= 228) & (self.i < 229)): m.d.sync += self.o.eq(2300)
-                with m.If((self.i >= 229) & (self.i < 230)): m.d.sync += self.o.eq(2289)
-                with m.If((self.i >= 230) & (self.i < 231)): m.d.sync += self.o.eq(2280)
-                with m.If((self.i >= 231) & (self.i < 232)): m.d.sync += self.o.eq(2270)
-                with m.If((self.i >= 232) & (self.i < 233)): m.d.sync += self.o.eq(2260)
-                with m.If((self.i >= 233) & (self.i < 234)): m.d.sync += self.o.eq(2250)
-                with m.If((self.i >= 234) & (self.i < 235)): m.d.sync += self.o.eq(2241)
-                with m.If((self.i >= 235) & (self.i < 236)): m.d.sync += self.o.eq(2231)
-                with m.If((self.i >= 236) & (self.i < 237)): m.d.sync += self.o.eq(2222)
-                with m.If((self.i >= 237) & (self.i < 238)): m.d.sync += self.o.eq(2212)
-                with m.If((self.i >= 238) & (self.i < 239)): m.d.sync += self.o.eq(2203)
-                with m.If((self.i >= 239) & (self.i < 240)): m.d.sync += self.o.eq(2194)
-                with m.If((self.i >= 240) & (self.i < 241)): m.d.sync += self.o.eq(2185)
-                with m.If((self.i >= 241) & (self.i < 242)): m.d.sync += self.o.eq(2175)
-                with m.If((self.i >= 242) & (self.i < 243)): m.d.sync += self.o.eq(2166)
-                with m.If((self.i >= 243) & (self.i < 244)): m.d.sync += self.o.eq(2158)
-                with m.If((self.i >= 244) & (self.i < 245)): m.d.sync += self.o.eq(2149)
-                with m.If((self.i >= 245) & (self.i < 246)): m.d.sync += self.o.eq(2140)
-                with m.If((self.i >= 246) & (self.i < 247)): m.d.sync += self.o.eq(2131)
-                with m.If((self.i >= 247) & (self.i < 248)): m.d.sync += self.o.eq(2123)
-                with m.If((self.i >= 248) & (self.i < 249)): m.d.sync += self.o.eq(2114)
-                with m.If((self.i >= 249) & (self.i < 250)): m.d.sync += self.o.eq(2106)
-                with m.If((self.i >= 250) & (self.i < 251)): m.d.sync += self.o.eq(2097)
-                with m.If((self.i >= 251) & (self.i < 252)): m.d.sync += self.o.eq(2089)
-                with m.If((self.i >= 252) & (self.i < 253)): m.d.sync += self.o.eq(2081)
-                with m.If((self.i >= 253) & (self.i < 254)): m.d.sync += self.o.eq(2072)
-                with m.If((self.i >= 254) & (self.i < 255)): m.d.sync += self.o.eq(2064)
-                with m.If((self.i >= 255) & (self.i < 256)): m.d.sync += self.o.eq(2056)
-                with m.If((self.i >= 256) & (self.i < 257)): m.d.sync += self.o.eq(2048)
-                with m.If((self.i >= 257) & (self.i < 258)): m.d.sync += self.o.eq(2040)
-                with m.If((self.i >= 258) & (self.i < 259)): m.d.sync += self.o.eq(2032)
-                with m.If((self.i >= 259) & (self.i < 260)): m.d.sync += self.o.eq(2024)
-                with m.If((self.i >= 260) & (self.i < 261)): m.d.sync += self.o.eq(2016)
-                with m.If((self.i >= 261) & (self.i < 262)): m.d.sync += self.o.eq(2009)
-                with m.If((self.i >= 262) & (self.i < 263)): m.d.sync += self.o.eq(2001)
-                with m.If((self.i >= 263) & (self.i < 264)): m.d.sync += self.o.eq(1993)
-                with m.If((self.i >= 264) & (self.i < 265)): m.d.sync += self.o.eq(1986)
-                with m.If((self.i >= 265) & (self.i < 266)): m.d.sync += self.o.eq(1978)
-                with m.If((self.i >= 266) & (self.i < 267)): m.d.sync += self.o.eq(1971)
-                with m.If((self.i >= 267) & (self.i < 268)): m.d.sync += self.o.eq(1964)
-                with m.If((self.i >= 268) & (self.i < 269)): m.d.sync += self.o.eq(1956)
-                with m.If((self.i >= 269) & (self.i < 270)): m.d.sync += self.o.eq(1949)
-                with m.If((self.i >= 270) & (self.i < 271)): m.d.sync += self.o.eq(1942)
-                with m.If((self.i >= 271) & (self.i < 272)): m.d.sync += self.o.eq(1935)
-                with m.If((self.i >= 272) & (self.i < 273)): m.d.sync += self.o.eq(1928)
-                with m.If((self.i >= 273) & (self.i < 274)): m.d.sync += self.o.eq(1920)
-                with m.If((self.i >= 274) & (self.i < 275)): m.d.sync += self.o.eq(1913)
-                with m.If((self.i >= 275) & (self.i < 276)): m.d.sync += self.o.eq(1907)
-                with m.If((self.i >= 276) & (self.i < 277)): m.d.sync += self.o.eq(1900)
-                with m.If((self.i >= 277) & (self.i < 278)): m.d.sync += self.o.eq(1893)
-                with m.If((self.i >= 278) & (self.i < 279)): m.d.sync += self.o.eq(1886)
-                with m.If((self.i >= 279) & (self.i < 280)): m.d.sync += self.o.eq(1879)
-                with m.If((self.i >= 280) & (self.i < 281)): m.d.sync += self.o.eq(1872)
-                with m.If((self.i >= 281) & (self.i < 282)): m.d.sync += self.o.eq(1866)
-                with m.If((self.i >= 282) & (self.i < 283)): m.d.sync += self.o.eq(1859)
-                with m.If((self.i >= 283) & (self.i < 284)): m.d.sync += self.o.eq(1853)
-                with m.If((self.i >= 284) & (self.i < 285)): m.d.sync += self.o.eq(1846)
-                with m.If((self.i >= 285) & (self.i < 286)): m.d.sync += self.o.eq(1840)
-                with m.If((self.i >= 286) & (self.i < 287)): m.d.sync += self.o.eq(1833)
-                with m.If((self.i >= 287) & (self.i < 288)): m.d.sync += self.o.eq(1827)
-                with m.If((self.i >= 288) & (self.i < 289)): m.d.sync += self.o.eq(1820)
-                with m.If((self.i >= 289) & (self.i < 290)): m.d.sync += self.o.eq(1814)
-                with m.If((self.i >= 290) & (self.i < 291)): m.d.sync += self.o.eq(1808)
-                with m.If((self.i >= 291) & (self.i < 292)): m.d.sync += self.o.eq(1802)
-                with m.If((self.i >= 292) & (self.i < 293)): m.d.sync += self.o.eq(1796)
-                with m.If((self.i >= 293) & (self.i < 294)): m.d.sync += self.o.eq(1789)
-                with m.If((self.i >= 294) & (self.i < 295)): m.d.sync += self.o.eq(1783)
-                with m.If((self.i >= 295) & (self.i < 296)): m.d.sync += self.o.eq(1777)
-                with m.If((self.i >= 296) & (self.i < 297)): m.d.sync += self.o.eq(1771)
-                with m.If((self.i >= 297) & (self.i < 298)): m.d.sync += self.o.eq(1765)
-                with m.If((self.i >= 298) & (self.i < 299)): m.d.sync += self.o.eq(1759)
-                with m.If((self.i >= 299) & (self.i < 300)): m.d.sync += self.o.eq(1753)
-                with m.If((self.i >= 300) & (self.i < 301)): m.d.sync += self.o.eq(1748)
-                with m.If((self.i >= 301) & (self.i < 302)): m.d.sync += self.o.eq(1742)
-                with m.If((self.i >= 302) & (self.i < 303)): m.d.sync += self.o.eq(1736)
-                with m.If((self.i >= 303) & (self.i < 304)): m.d.sync += self.o.eq(1730)
-                with m.If((self.i >= 304) & (self.i < 305)): m.d.sync += self.o.eq(1725)
-                with m.If((self.i >= 305) & (self.i < 306)): m.d.sync += self.o.eq(1719)
-                with m.If((self.i >= 306) & (self.i < 307)): m.d.sync += self.o.eq(1713)
-                with m.If((self.i >= 307) & (self.i < 308)): m.d.sync += self.o.eq(1708)
-                with m.If((self.i >= 308) & (self.i < 309)): m.d.sync += self.o.eq(1702)
-                with m.If((self.i >= 309) & (self.i < 310)): m.d.sync += self.o.eq(1697)
-                with m.If((self.i >= 310) & (self.i < 311)): m.d.sync += self.o.eq(1691)
-                with m.If((self.i >= 311) & (self.i < 312)): m.d.sync += self.o.eq(1686)
-                with m.If((self.i >= 312) & (self.i < 313)): m.d.sync += self.o.eq(1680)
-                with m.If((self.i >= 313) & (self.i < 314)): m.d.sync += self.o.eq(1675)
-                with m.If((self.i >= 314) & (self.i < 315)): m.d.sync += self.o.eq(1670)
-                with m.If((self.i >= 315) & (self.i < 316)): m.d.sync += self.o.eq(1664)
-                with m.If((self.i >= 316) & (self.i < 317)): m.d.sync += self.o.eq(1659)
-                with m.If((self.i >= 317) & (self.i < 318)): m.d.sync += self.o.eq(1654)
-                with m.If((self.i >= 318) & (self.i < 319)): m.d.sync += self.o.eq(1649)
-                with m.If((self.i >= 319) & (self.i < 320)): m.d.sync += self.o.eq(1644)
-                with m.If((self.i >= 320) & (self.i < 321)): m.d.sync += self.o.eq(1638)
-                with m.If((self.i >= 321) & (self.i < 322)): m.d.sync += self.o.eq(1633)
-                with m.If((self.i >= 322) & (self.i < 323)): m.d.sync += self.o.eq(1628)
-                with m.If((self.i >= 323) & (self.i < 324)): m.d.sync += self.o.eq(1623)
-                with m.If((self.i >= 324) & (self.i < 325)): m.d.sync += self.o.eq(1618)
-                with m.If((self.i >= 325) & (self.i < 326)): m.d.sync += self.o.eq(1613)
-                with m.If((self.i >= 326) & (self.i < 327)): m.d.sync += self.o.eq(1608)
-                with m.If((self.i >= 327) & (self.i < 328)): m.d.sync += self.o.eq(1603)
-                with m.If((self.i >= 328) & (self.i < 329)): m.d.sync += self.o.eq(1598)
-                with m.If((self.i >= 329) & (self.i < 330)): m.d.sync += self.o.eq(1594)
-                with m.If((self.i >= 330) & (self.i < 331)): m.d.sync += self.o.eq(1589)
-                with m.If((self.i >= 331) & (self.i < 332)): m.d.sync += self.o.eq(1584)
-                with m.If((self.i >= 332) & (self.i < 333)): m.d.sync += self.o.eq(1579)
-                with m.If((self.i >= 333) & (self.i < 334)): m.d.sync += self.o.eq(1574)
-                with m.If((self.i >= 334) & (self.i < 335)): m.d.sync += self.o.eq(1570)
-                with m.If((self.i >= 335) & (self.i < 336)): m.d.sync += self.o.eq(1565)
-                with m.If((self.i >= 336) & (self.i < 337)): m.d.sync += self.o.eq(1560)
-                with m.If((self.i >= 337) & (self.i < 338)): m.d.sync += self.o.eq(1556)
-                with m.If((self.i >= 338) & (self.i < 339)): m.d.sync += self.o.eq(1551)
-                with m.If((self.i >= 339) & (self.i < 340)): m.d.sync += self.o.eq(1547)
-                with m.If((self.i >= 340) & (self.i < 341)): m.d.sync += self.o.eq(1542)
-                with m.If((self.i >= 341) & (self.i < 342)): m.d.sync += self.o.eq(1538)
-                with m.If((self.i >= 342) & (self.i < 343)): m.d.sync += self.o.eq(1533)
-                with m.If((self.i >= 343) & (self.i < 344)): m.d.sync += self.o.eq(1529)
-                with m.If((self.i >= 344) & (self.i < 345)): m.d.sync += self.o.eq(1524)
-                with m.If((self.i >= 345) & (self.i < 346)): m.d.sync += self.o.eq(1520)
-                with m.If((self.i >= 346) & (self.i < 347)): m.d.sync += self.o.eq(1515)
-                with m.If((self.i >= 347) & (self.i < 348)): m.d.sync += self.o.eq(1511)
-                with m.If((self.i >= 348) & (self.i < 349)): m.d.sync += self.o.eq(1507)
-                with m.If((self.i >= 349) & (self.i < 350)): m.d.sync += self.o.eq(1502)
-                with m.If((self.i >= 350) & (self.i < 351)): m.d.sync += self.o.eq(1498)
-                with m.If((self.i >= 351) & (self.i < 352)): m.d.sync += self.o.eq(1494)
-                with m.If((self.i >= 352) & (self.i < 353)): m.d.sync += self.o.eq(1489)
-                with m.If((self.i >= 353) & (self.i < 354)): m.d.sync += self.o.eq(1485)
-                with m.If((self.i >= 354) & (self.i < 355)): m.d.sync += self.o.eq(1481)
-                with m.If((self.i >= 355) & (self.i < 356)): m.d.sync += self.o.eq(1477)
-                with m.If((self.i >= 356) & (self.i < 357)): m.d.sync += self.o.eq(1473)
-                with m.If((self.i >= 357) & (self.i < 358)): m.d.sync += self.o.eq(1469)
-                with m.If((self.i >= 358) & (self.i < 359)): m.d.sync += self.o.eq(1464)
-                with m.If((self.i >= 359) & (self.i < 360)): m.d.sync += self.o.eq(1460)
-                with m.If((self.i >= 360) & (self.i < 361)): m.d.sync += self.o.eq(1456)
-                with m.If((self.i >= 361) & (self.i < 362)): m.d.sync += self.o.eq(1452)
-                with m.If((self.i >= 362) & (self.i < 363)): m.d.sync += self.o.eq(1448)
-                with m.If((self.i >= 363) & (self.i < 364)): m.d.sync += self.o.eq(1444)
-                with m.If((self.i >= 364) & (self.i < 365)): m.d.sync += self.o.eq(1440)
-                with m.If((self.i >= 365) & (self.i < 366)): m.d.sync += self.o.eq(1436)
-                with m.If((self.i >= 366) & (self.i < 367)): m.d.sync += self.o.eq(1432)
-                with m.If((self.i >= 367) & (self.i < 368)): m.d.sync += self.o.eq(1429)
-                with m.If((self.i >= 368) & (self.i < 369)): m.d.sync += self.o.eq(1425)
-                with m.If((self.i >= 369) & (self.i < 370)): m.d.sync += self.o.eq(1421)
-                with m.If((self.i >= 370) & (self.i < 371)): m.d.sync += self.o.eq(1417)
-                with m.If((self.i >= 371) & (self.i < 372)): m.d.sync += self.o.eq(1413)
-                with m.If((self.i >= 372) & (self.i < 373)): m.d.sync += self.o.eq(1409)
-                with m.If((self.i >= 373) & (self.i < 374)): m.d.sync += self.o.eq(1406)
-                with m.If((self.i >= 374) & (self.i < 375)): m.d.sync += self.o.eq(1402)
-                with m.If((self.i >= 375) & (self.i < 376)): m.d.sync += self.o.eq(1398)
-                with m.If((self.i >= 376) & (self.i < 377)): m.d.sync += self.o.eq(1394)
-                with m.If((self.i >= 377) & (self.i < 378)): m.d.sync += self.o.eq(1391)
-                with m.If((self.i >= 378) & (self.i < 379)): m.d.sync += self.o.eq(1387)
-                with m.If((self.i >= 379) & (self.i < 380)): m.d.sync += self.o.eq(1383)
-                with m.If((self.i >= 380) & (self.i < 381)): m.d.sync += self.o.eq(1380)
-                with m.If((self.i >= 381) & (self.i < 382)): m.d.sync += self.o.eq(1376)
-                with m.If((self.i >= 382) & (self.i < 383)): m.d.sync += self.o.eq(1372)
-                with m.If((self.i >= 383) & (self.i < 384)): m.d.sync += self.o.eq(1369)
-                with m.If((self.i >= 384) & (self.i < 385)): m.d.sync += self.o.eq(1365)
-                with m.If((self.i >= 385) & (self.i < 386)): m.d.sync += self.o.eq(1362)
-                with m.If((self.i >= 386) & (self.i < 387)): m.d.sync += self.o.eq(1358)
-                with m.If((self.i >= 387) & (self.i < 388)): m.d.sync += self.o.eq(1355)
-                with m.If((self.i >= 388) & (self.i < 389)): m.d.sync += self.o.eq(1351)
-                with m.If((self.i >= 389) & (self.i < 390)): m.d.sync += self.o.eq(1348)
-                with m.If((self.i >= 390) & (self.i < 391)): m.d.sync += self.o.eq(1344)
-                with m.If((self.i >= 391) & (self.i < 392)): m.d.sync += self.o.eq(1341)
-                with m.If((self.i >= 392) & (self.i < 393)): m.d.sync += self.o.eq(1337)
-                with m.If((self.i >= 393) & (self.i < 394)): m.d.sync += self.o.eq(1334)
-                with m.If((self.i >= 394) & (self.i < 395)): m.d.sync += self.o.eq(1331)
-                with m.If((self.i >= 395) & (self.i < 396)): m.d.sync += self.o.eq(1327)
-                with m.If((self.i >= 396) & (self.i < 397)): m.d.sync += self.o.eq(1324)
-                with m.If((self.i >= 397) & (self.i < 398)): m.d.sync += self.o.eq(1321)
-                with m.If((self.i >= 398) & (self.i < 399)): m.d.sync += self.o.eq(1317)
-                with m.If((self.i >= 399) & (self.i < 400)): m.d.sync += self.o.eq(1314)
-                with m.If((self.i >= 400) & (self.i < 401)): m.d.sync += self.o.eq(1311)
-                with m.If((self.i >= 401) & (self.i < 402)): m.d.sync += self.o.eq(1307)
-                with m.If((self.i >= 402) & (self.i < 403)): m.d.sync += self.o.eq(1304)
-                with m.If((self.i >= 403) & (self.i < 404)): m.d.sync += self.o.eq(1301)
-                with m.If((self.i >= 404) & (self.i < 405)): m.d.sync += self.o.eq(1298)
-                with m.If((self.i >= 405) & (self.i < 406)): m.d.sync += self.o.eq(1295)
-                with m.If((self.i >= 406) & (self.i < 407)): m.d.sync += self.o.eq(1291)
-                with m.If((self.i >= 407) & (self.i < 408)): m.d.sync += self.o.eq(1288)
-                with m.If((self.i >= 408) & (self.i < 409)): m.d.sync += self.o.eq(1285)
-                with m.If((self.i >= 409) & (self.i < 410)): m.d.sync += self.o.eq(1282)
-                with m.If((self.i >= 410) & (self.i < 411)): m.d.sync += self.o.eq(1279)
-                with m.If((self.i >= 411) & (self.i < 412)): m.d.sync += self.o.eq(1276)
-                with m.If((self.i >= 412) & (self.i < 413)): m.d.sync += self.o.eq(1273)
-                with m.If((self.i >= 413) & (self.i < 414)): m.d.sync += self.o.eq(1269)
-                with m.If((self.i >= 414) & (self.i < 415)): m.d.sync += self.o.eq(1266)
-                with m.If((self.i >= 415) & (self.i < 416)): m.d.sync += self.o.eq(1263)
-                with m.If((self.i >= 416) & (self.i < 417)): m.d.sync += self.o.eq(1260)
-                with m.If((self.i >= 417) & (self.i < 418)): m.d.sync += self.o.eq(1257)
-                with m.If((self.i >= 418) & (self.i < 419)): m.d.sync += self.o.eq(1254)
-                with m.If((self.i >= 419) & (self.i < 420)): m.d.sync += self.o.eq(1251)
-                with m.If((self.i >= 420) & (self.i < 421)): m.d.sync += self.o.eq(1248)
-                with m.If((self.i >= 421) & (self.i < 422)): m.d.sync += self.o.eq(1245)
-                with m.If((self.i >= 422) & (self.i < 423)): m.d.sync += self.o.eq(1242)
-                with m.If((self.i >= 423) & (self.i < 424)): m.d.sync += self.o.eq(1239)
-                with m.If((self.i >= 424) & (self.i < 425)): m.d.sync += self.o.eq(1237)
-                with m.If((self.i >= 425) & (self.i < 426)): m.d.sync += self.o.eq(1234)
-                with m.If((self.i >= 426) & (self.i < 427)): m.d.sync += self.o.eq(1231)
-                with m.If((self.i >= 427) & (self.i < 428)): m.d.sync += self.o.eq(1228)
-                with m.If((self.i >= 428) & (self.i < 429)): m.d.sync += self.o.eq(1225)
-                with m.If((self.i >= 429) & (self.i < 430)): m.d.sync += self.o.eq(1222)
-                with m.If((self.i >= 430) & (self.i < 431)): m.d.sync += self.o.eq(1219)
-                with m.If((self.i >= 431) & (self.i < 432)): m.d.sync += self.o.eq(1216)
-                with m.If((self.i >= 432) & (self.i < 433)): m.d.sync += self.o.eq(1214)
-                with m.If((self.i >= 433) & (self.i < 434)): m.d.sync += self.o.eq(1211)
-                with m.If((self.i >= 434) & (self.i < 435)): m.d.sync += self.o.eq(1208)
-                with m.If((self.i >= 435) & (self.i < 436)): m.d.sync += self.o.eq(1205)
-                with m.If((self.i >= 436) & (self.i < 437)): m.d.sync += self.o.eq(1202)
-                with m.If((self.i >= 437) & (self.i < 438)): m.d.sync += self.o.eq(1200)
-                with m.If((self.i >= 438) & (self.i < 439)): m.d.sync += self.o.eq(1197)
-                with m.If((self.i >= 439) & (self.i < 440)): m.d.sync += self.o.eq(1194)
-                with m.If((self.i >= 440) & (self.i < 441)): m.d.sync += self.o.eq(1192)
-                with m.If((self.i >= 441) & (self.i < 442)): m.d.sync += self.o.eq(1189)
-                with m.If((self.i >= 442) & (self.i < 443)): m.d.sync += self.o.eq(1186)
-                with m.If((self.i >= 443) & (self.i < 444)): m.d.sync += self.o.eq(1183)
-                with m.If((self.i >= 444) & (self.i < 445)): m.d.sync += self.o.eq(1181)
-                with m.If((self.i >= 445) & (self.i < 446)): m.d.sync += self.o.eq(1178)
-                with m.If((self.i >= 446) & (self.i < 447)): m.d.sync += self.o.eq(1176)
-                with m.If((self.i >= 447) & (self.i < 448)): m.d.sync += self.o.eq(1173)
-                with m.If((self.i >= 448) & (self.i < 449)): m.d.sync += self.o.eq(1170)
-                with m.If((self.i >= 449) & (self.i < 450)): m.d.sync += self.o.eq(1168)
-                with m.If((self.i >= 450) & (self.i < 451)): m.d.sync += self.o.eq(1165)
-                with m.If((self.i >= 451) & (self.i < 452)): m.d.sync += self.o.eq(1163)
-                with m.If((self.i >= 452) & (self.i < 453)): m.d.sync += self.o.eq(1160)
-                with m.If((self.i >= 453) & (self.i < 454)): m.d.sync += self.o.eq(1157)
-                with m.If((self.i >= 454) & (self.i < 455)): m.d.sync += self.o.eq(1155)
-                with m.If((self.i >= 455) & (self.i < 456)): m.d.sync += self.o.eq(1152)
-                with m.If((self.i >= 456) & (self.i < 457)): m.d.sync += self.o.eq(1150)
-                with m.If((self.i >= 457) & (self.i < 458)): m.d.sync += self.o.eq(1147)
-                with m.If((self.i >= 458) & (self.i < 459)): m.d.sync += self.o.eq(1145)
-                with m.If((self.i >= 459) & (self.i < 460)): m.d.sync += self.o.eq(1142)
-                with m.If((self.i >= 460) & (self.i < 461)): m.d.sync += self.o.eq(1140)
-                with m.If((self.i >= 461) & (self.i < 462)): m.d.sync += self.o.eq(1137)
-                with m.If((self.i >= 462) & (self.i < 463)): m.d.sync += self.o.eq(1135)
-                with m.If((self.i >= 463) & (self.i < 464)): m.d.sync += self.o.eq(1132)
-                with m.If((self.i >= 464) & (self.i < 465)): m.d.sync += self.o.eq(1130)
-                with m.If((self.i >= 465) & (self.i < 466)): m.d.sync += self.o.eq(1128)
-                with m.If((self.i >= 466) & (self.i < 467)): m.d.sync += self.o.eq(1125)
-                with m.If((self.i >= 467) & (self.i < 468)): m.d.sync += self.o.eq(1123)
-                with m.If((self.i >= 468) & (self.i < 469)): m.d.sync += self.o.eq(1120)
-                with m.If((self.i >= 469) & (self.i < 470)): m.d.sync += self.o.eq(1118)
-                with m.If((self.i >= 470) & (self.i < 471)): m.d.sync += self.o.eq(1116)
-                with m.If((self.i >= 471) & (self.i < 472)): m.d.sync += self.o.eq(1113)
-                with m.If((self.i >= 472) & (self.i < 473)): m.d.sync += self.o.eq(1111)
-                with m.If((self.i >= 473) & (self.i < 474)): m.d.sync += self.o.eq(1108)
-                with m.If((self.i >= 474) & (self.i < 475)): m.d.sync += self.o.eq(1106)
-                with m.If((self.i >= 475) & (self.i < 476)): m.d.sync += self.o.eq(1104)
-                with m.If((self.i >= 476) & (self.i < 477)): m.d.sync += self.o.eq(1101)
-                with m.If((self.i >= 477) & (self.i < 478)): m.d.sync += self.o.eq(1099)
-                with m.If((self.i >= 478) & (self.i < 479)): m.d.sync += self.o.eq(1097)
-                with m.If((self.i >= 479) & (self.i < 480)): m.d.sync += self.o.eq(1095)
-                with m.If((self.i >= 480) & (self.i < 481)): m.d.sync += self.o.eq(1092)
-                with m.If((self.i >= 481) & (self.i < 482)): m.d.sync += self.o.eq(1090)
-                with m.If((self.i >= 482) & (self.i < 483)): m.d.sync += self.o.eq(1088)
-                with m.If((self.i >= 483) & (self.i < 484)): m.d.sync += self.o.eq(1085)
-                with m.If((self.i >= 484) & (self.i < 485)): m.d.sync += self.o.eq(1083)
-                with m.If((self.i >= 485) & (self.i < 486)): m.d.sync += self.o.eq(1081)
-                with m.If((self.i >= 486) & (self.i < 487)): m.d.sync += self.o.eq(1079)
-                with m.If((self.i >= 487) & (self.i < 488)): m.d.sync += self.o.eq(1077)
-                with m.If((self.i >= 488) & (self.i < 489)): m.d.sync += self.o.eq(1074)
-                with m.If((self.i >= 489) & (self.i < 490)): m.d.sync += self.o.eq(1072)
-                with m.If((self.i >= 490) & (self.i < 491)): m.d.sync += self.o.eq(1070)
-                with m.If((self.i >= 491) & (self.i < 492)): m.d.sync += self.o.eq(1068)
-                with m.If((self.i >= 492) & (self.i < 493)): m.d.sync += self.o.eq(1066)
-                with m.If((self.i >= 493) & (self.i < 494)): m.d.sync += self.o.eq(1063)
-                with m.If((self.i >= 494) & (self.i < 495)): m.d.sync += self.o.eq(1061)
-                with m.If((self.i >= 495) & (self.i < 496)): m.d.sync += self.o.eq(1059)
-                with m.If((self.i >= 496) & (self.i < 497)): m.d.sync += self.o.eq(1057)
-                with m.If((self.i >= 497) & (self.i < 498)): m.d.sync += self.o.eq(1055)
-                with m.If((self.i >= 498) & (self.i < 499)): m.d.sync += self.o.eq(1053)
-                with m.If((self.i >= 499) & (self.i < 500)): m.d.sync += self.o.eq(1051)
-                with m.If((self.i >= 500) & (self.i < 501)): m.d.sync += self.o.eq(1049)
-                with m.If((self.i >= 501) & (self.i < 502)): m.d.sync += self.o.eq(1046)
-                with m.If((self.i >= 502) & (self.i < 503)): m.d.sync += self.o.eq(1044)
-                with m.If((self.i >= 503) & (self.i < 504)): m.d.sync += self.o.eq(1042)
-                with m.If((self.i >= 504) & (self.i < 505)): m.d.sync += self.o.eq(1040)
-                with m.If((self.i >= 505) & (self.i < 506)): m.d.sync += self.o.eq(1038)
-                with m.If((self.i >= 506) & (self.i < 507)): m.d.sync += self.o.eq(1036)
-                with m.If((self.i >= 507) & (self.i < 508)): m.d.sync += self.o.eq(1034)
-                with m.If((self.i >= 508) & (self.i < 509)): m.d.sync += self.o.eq(1032)
-                with m.If((self.i >= 509) & (self.i < 510)): m.d.sync += self.o.eq(1030)
-                with m.If((self.i >= 510) & (self.i < 511)): m.d.sync += self.o.eq(1028)
-                with m.If((self.i >= 511) & (self.i < 512)): m.d.sync += self.o.eq(1026)
-                with m.If((self.i >= 512) & (self.i < 513)): m.d.sync += self.o.eq(1024)
-                with m.If((self.i >= 513) & (self.i < 514)): m.d.sync += self.o.eq(1022)
-                with m.If((self.i >= 514) & (self.i < 515)): m.d.sync += self.o.eq(1020)
-                with m.If((self.i >= 515) & (self.i < 516)): m.d.sync += self.o.eq(1018)
-                with m.If((self.i >= 516) & (self.i < 517)): m.d.sync += self.o.eq(1016)
-                with m.If((self.i >= 517) & (self.i < 518)): m.d.sync += self.o.eq(1014)
-                with m.If((self.i >= 518) & (self.i < 519)): m.d.sync += self.o.eq(1012)
-                with m.If((self.i >= 519) & (self.i < 520)): m.d.sync += self.o.eq(1010)
-                with m.If((self.i >= 520) & (self.i < 521)): m.d.sync += self.o.eq(1008)
-                with m.If((self.i >= 521) & (self.i < 522)): m.d.sync += self.o.eq(1006)
-                with m.If((self.i >= 522) & (self.i < 523)): m.d.sync += self.o.eq(1004)
-                with m.If((self.i >= 523) & (self.i < 524)): m.d.sync += self.o.eq(1002)
-                with m.If((self.i >= 524) & (self.i < 525)): m.d.sync += self.o.eq(1001)
-                with m.If((self.i >= 525) & (self.i < 526)): m.d.sync += self.o.eq(999)
-                with m.If((self.i >= 526) & (self.i < 527)): m.d.sync += self.o.eq(997)
-                with m.If((self.i >= 527) & (self.i < 528)): m.d.sync += self.o.eq(995)
-                with m.If((self.i >= 528) & (self.i < 529)): m.d.sync += self.o.eq(993)
-                with m.If((self.i >= 529) & (self.i < 530)): m.d.sync += self.o.eq(991)
-                with m.If((self.i >= 530) & (self.i < 531)): m.d.sync += self.o.eq(989)
-                with m.If((self.i >= 531) & (self.i < 532)): m.d.sync += self.o.eq(987)
-                with m.If((self.i >= 532) & (self.i < 533)): m.d.sync += self.o.eq(986)
-                with m.If((self.i >= 533) & (self.i < 534)): m.d.sync += self.o.eq(984)
-                with m.If((self.i >= 534) & (self.i < 535)): m.d.sync += self.o.eq(982)
-                with m.If((self.i >= 535) & (self.i < 536)): m.d.sync += self.o.eq(980)
-                with m.If((self.i >= 536) & (self.i < 537)): m.d.sync += self.o.eq(978)
-                with m.If((self.i >= 537) & (self.i < 538)): m.d.sync += self.o.eq(976)
-                with m.If((self.i >= 538) & (self.i < 539)): m.d.sync += self.o.eq(975)
-                with m.If((self.i >= 539) & (self.i < 540)): m.d.sync += self.o.eq(973)
-                with m.If((self.i >= 540) & (self.i < 541)): m.d.sync += self.o.eq(971)
-                with m.If((self.i >= 541) & (self.i < 542)): m.d.sync += self.o.eq(969)
-                with m.If((self.i >= 542) & (self.i < 543)): m.d.sync += self.o.eq(967)
-                with m.If((self.i >= 543) & (self.i < 544)): m.d.sync += self.o.eq(966)
-                with m.If((self.i >= 544) & (self.i < 545)): m.d.sync += self.o.eq(964)
-                with m.If((self.i >= 545) & (self.i < 546)): m.d.sync += self.o.eq(962)
-                with m.If((self.i >= 546) & (self.i < 547)): m.d.sync += self.o.eq(960)
-                with m.If((self.i >= 547) & (self.i < 548)): m.d.sync += self.o.eq(958)
-                with m.If((self.i >= 548) & (self.i < 549)): m.d.sync += self.o.eq(957)
-                with m.If((self.i >= 549) & (self.i < 550)): m.d.sync += self.o.eq(955)
-                with m.If((self.i >= 550) & (self.i < 551)): m.d.sync += self.o.eq(953)
-                with m.If((self.i >= 551) & (self.i < 552)): m.d.sync += self.o.eq(952)
-                with m.If((self.i >= 552) & (self.i < 553)): m.d.sync += self.o.eq(950)
-                with m.If((self.i >= 553) & (self.i < 554)): m.d.sync += self.o.eq(948)
-                with m.If((self.i >= 554) & (self.i < 555)): m.d.sync += self.o.eq(946)
-                with m.If((self.i >= 555) & (self.i < 556)): m.d.sync += self.o.eq(945)
-                with m.If((self.i >= 556) & (self.i < 557)): m.d.sync += self.o.eq(943)
-                with m.If((self.i >= 557) & (self.i < 558)): m.d.sync += self.o.eq(941)
-                with m.If((self.i >= 558) & (self.i < 559)): m.d.sync += self.o.eq(940)
-                with m.If((self.i >= 559) & (self.i < 560)): m.d.sync += self.o.eq(938)
-                with m.If((self.i >= 560) & (self.i < 561)): m.d.sync += self.o.eq(936)
-                with m.If((self.i >= 561) & (self.i < 562)): m.d.sync += self.o.eq(935)
-                with m.If((self.i >= 562) & (self.i < 563)): m.d.sync += self.o.eq(933)
-                with m.If((self.i >= 563) & (self.i < 564)): m.d.sync += self.o.eq(931)
-                with m.If((self.i >= 564) & (self.i < 565)): m.d.sync += self.o.eq(930)
-                with m.If((self.i >= 565) & (self.i < 566)): m.d.sync += self.o.eq(928)
-                with m.If((self.i >= 566) & (self.i < 567)): m.d.sync += self.o.eq(926)
-                with m.If((self.i >= 567) & (self.i < 568)): m.d.sync += self.o.eq(925)
-                with m.If((self.i >= 568) & (self.i < 569)): m.d.sync += self.o.eq(923)
-                with m.If((self.i >= 569) & (self.i < 570)): m.d.sync += self.o.eq(921)
-                with m.If((self.i >= 570) & (self.i < 571)): m.d.sync += self.o.eq(920)
-                with m.If((self.i >= 571) & (self.i < 572)): m.d.sync += self.o.eq(918)
-                with m.If((self.i >= 572) & (self.i < 573)): m.d.sync += self.o.eq(917)
-                with m.If((self.i >= 573) & (self.i < 574)): m.d.sync += self.o.eq(915)
-                with m.If((self.i >= 574) & (self.i < 575)): m.d.sync += self.o.eq(913)
-                with m.If((self.i >= 575) & (self.i < 576)): m.d.sync += self.o.eq(912)
-                with m.If((self.i >= 576) & (self.i < 577)): m.d.sync += self.o.eq(910)
-                with m.If((self.i >= 577) & (self.i < 578)): m.d.sync += self.o.eq(909)
-                with m.If((self.i >= 578) & (self.i < 579)): m.d.sync += self.o.eq(907)
-                with m.If((self.i >= 579) & (self.i < 580)): m.d.sync += self.o.eq(906)
-                with m.If((self.i >= 580) & (self.i < 581)): m.d.sync += self.o.eq(904)
-                with m.If((self.i >= 581) & (self.i < 582)): m.d.sync += self.o.eq(902)
-                with m.If((self.i >= 582) & (self.i < 583)): m.d.sync += self.o.eq(901)
-                with m.If((self.i >= 583) & (self.i < 584)): m.d.sync += self.o.eq(899)
-                with m.If((self.i >= 584) & (self.i < 585)): m.d.sync += self.o.eq(898)
-                with m.If((self.i >= 585) & (self.i < 586)): m.d.sync += self.o.eq(896)
-                with m.If((self.i >= 586) & (self.i < 587)): m.d.sync += self.o.eq(895)
-                with m.If((self.i >= 587) & (self.i < 588)): m.d.sync += self.o.eq(893)
-                with m.If((self.i >= 588) & (self.i < 589)): m.d.sync += self.o.eq(892)
-                with m.If((self.i >= 589) & (self.i < 590)): m.d.sync += self.o.eq(890)
-                with m.If((self.i >= 590) & (self.i < 591)): m.d.sync += self.o.eq(889)
-                with m.If((self.i >= 591) & (self.i < 592)): m.d.sync += self.o.eq(887)
-                with m.If((self.i >= 592) & (self.i < 593)): m.d.sync += self.o.eq(886)
-                with m.If((self.i >= 593) & (self.i < 594)): m.d.sync += self.o.eq(884)
-                with m.If((self.i >= 594) & (self.i < 595)): m.d.sync += self.o.eq(883)
-                with m.If((self.i >= 595) & (self.i < 596)): m.d.sync += self.o.eq(881)
-                with m.If((self.i >= 596) & (self.i < 597)): m.d.sync += self.o.eq(880)
-                with m.If((self.i >= 597) & (self.i < 598)): m.d.sync += self.o.eq(878)
-                with m.If((self.i >= 598) & (self.i < 599)): m.d.sync += self.o.eq(877)
-                with m.If((self.i >= 599) & (self.i < 600)): m.d.sync += self.o.eq(875)
-                with m.If((self.i >= 600) & (self.i < 601)): m.d.sync += self.o.eq(874)
-                with m.If((self.i >= 601) & (self.i < 602)): m.d.sync += self.o.eq(872)
-                with m.If((self.i >= 602) & (self.i < 603)): m.d.sync += self.o.eq(871)
-                with m.If((self.i >= 603) & (self.i < 604)): m.d.sync += self.o.eq(869)
-                with m.If((self.i >= 604) & (self.i < 605)): m.d.sync += self.o.eq(868)
-                with m.If((self.i >= 605) & (self.i < 606)): m.d.sync += self.o.eq(867)
-                with m.If((self.i >= 606) & (self.i < 607)): m.d.sync += self.o.eq(865)
-                with m.If((self.i >= 607) & (self.i < 608)): m.d.sync += self.o.eq(864)
-                with m.If((self.i >= 608) & (self.i < 609)): m.d.sync += self.o.eq(862)
-                with m.If((self.i >= 609) & (self.i < 610)): m.d.sync += self.o.eq(861)
-                with m.If((self.i >= 610) & (self.i < 611)): m.d.sync += self.o.eq(859)
-                with m.If((self.i >= 611) & (self.i < 612)): m.d.sync += self.o.eq(858)
-                with m.If((self.i >= 612) & (self.i < 613)): m.d.sync += self.o.eq(857)
-                with m.If((self.i >= 613) & (self.i < 614)): m.d.sync += self.o.eq(855)
-                with m.If((self.i >= 614) & (self.i < 615)): m.d.sync += self.o.eq(854)
-                with m.If((self.i >= 615) & (self.i < 616)): m.d.sync += self.o.eq(853)
-                with m.If((self.i >= 616) & (self.i < 617)): m.d.sync += self.o.eq(851)
-                with m.If((self.i >= 617) & (self.i < 618)): m.d.sync += self.o.eq(850)
-                with m.If((self.i >= 618) & (self.i < 619)): m.d.sync += self.o.eq(848)
-                with m.If((self.i >= 619) & (self.i < 620)): m.d.sync += self.o.eq(847)
-                with m.If((self.i >= 620) & (self.i < 621)): m.d.sync += self.o.eq(846)
-                with m.If((self.i >= 621) & (self.i < 622)): m.d.sync += self.o.eq(844)
-                with m.If((self.i >= 622) & (self.i < 623)): m.d.sync += self.o.eq(843)
-                with m.If((self.i >= 623) & (self.i < 624)): m.d.sync += self.o.eq(842)
-                with m.If((self.i >= 624) & (self.i < 625)): m.d.sync += self.o.eq(840)
-                with m.If((self.i >= 625) & (self.i < 626)): m.d.sync += self.o.eq(839)
-                with m.If((self.i >= 626) & (self.i < 627)): m.d.sync += self.o.eq(838)
-                with m.If((self.i >= 627) & (self.i < 628)): m.d.sync += self.o.eq(836)
-                with m.If((self.i >= 628) & (self.i < 629)): m.d.sync += self.o.eq(835)
-                with m.If((self.i >= 629) & (self.i < 630)): m.d.sync += self.o.eq(834)
-                with m.If((self.i >= 630) & (self.i < 631)): m.d.sync += self.o.eq(832)
-                with m.If((self.i >= 631) & (self.i < 632)): m.d.sync += self.o.eq(831)
-                with m.If((self.i >= 632) & (self.i < 633)): m.d.sync += self.o.eq(830)
-                with m.If((self.i >= 633) & (self.i < 634)): m.d.sync += self.o.eq(828)
-                with m.If((self.i >= 634) & (self.i < 635)): m.d.sync += self.o.eq(827)
-                with m.If((self.i >= 635) & (self.i < 636)): m.d.sync += self.o.eq(826)
-                with m.If((self.i >= 636) & (self.i < 637)): m.d.sync += self.o.eq(824)
-                with m.If((self.i >= 637) & (self.i < 638)): m.d.sync += self.o.eq(823)
-                with m.If((self.i >= 638) & (self.i < 639)): m.d.sync += self.o.eq(822)
-                with m.If((self.i >= 639) & (self.i < 640)): m.d.sync += self.o.eq(820)
-                with m.If((self.i >= 640) & (self.i < 641)): m.d.sync += self.o.eq(819)
-                with m.If((self.i >= 641) & (self.i < 642)): m.d.sync += self.o.eq(818)
-                with m.If((self.i >= 642) & (self.i < 643)): m.d.sync += self.o.eq(817)
-                with m.If((self.i >= 643) & (self.i < 644)): m.d.sync += self.o.eq(815)
-                with m.If((self.i >= 644) & (self.i < 645)): m.d.sync += self.o.eq(814)
-                with m.If((self.i >= 645) & (self.i < 646)): m.d.sync += self.o.eq(813)
-                with m.If((self.i >= 646) & (self.i < 647)): m.d.sync += self.o.eq(812)
-                with m.If((self.i >= 647) & (self.i < 648)): m.d.sync += self.o.eq(810)
-                with m.If((self.i >= 648) & (self.i < 649)): m.d.sync += self.o.eq(809)
-                with m.If((self.i >= 649) & (self.i < 650)): m.d.sync += self.o.eq(808)
-                with m.If((self.i >= 650) & (self.i < 651)): m.d.sync += self.o.eq(807)
-                with m.If((self.i >= 651) & (self.i < 652)): m.d.sync += self.o.eq(805)
-                with m.If((self.i >= 652) & (self.i < 653)): m.d.sync += self.o.eq(804)
-                with m.If((self.i >= 653) & (self.i < 654)): m.d.sync += self.o.eq(803)
-                with m.If((self.i >= 654) & (self.i < 655)): m.d.sync += self.o.eq(802)
-                with m.If((self.i >= 655) & (self.i < 656)): m.d.sync += self.o.eq(800)
-                with m.If((self.i >= 656) & (self.i < 657)): m.d.sync += self.o.eq(799)
-                with m.If((self.i >= 657) & (self.i < 658)): m.d.sync += self.o.eq(798)
-                with m.If((self.i >= 658) & (self.i < 659)): m.d.sync += self.o.eq(797)
-                with m.If((self.i >= 659) & (self.i < 660)): m.d.sync += self.o.eq(796)
-                with m.If((self.i >= 660) & (self.i < 661)): m.d.sync += self.o.eq(794)
-                with m.If((self.i >= 661) & (self.i < 662)): m.d.sync += self.o.eq(793)
-                with m.If((self.i >= 662) & (self.i < 663)): m.d.sync += self.o.eq(792)
-                with m.If((self.i >= 663) & (self.i < 664)): m.d.sync += self.o.eq(791)
-                with m.If((self.i >= 664) & (self.i < 665)): m.d.sync += self.o.eq(790)
-                with m.If((self.i >= 665) & (self.i < 666)): m.d.sync += self.o.eq(788)
-                with m.If((self.i >= 666) & (self.i < 667)): m.d.sync += self.o.eq(787)
-                with m.If((self.i >= 667) & (self.i < 668)): m.d.sync += self.o.eq(786)
-                with m.If((self.i >= 668) & (self.i < 669)): m.d.sync += self.o.eq(785)
-                with m.If((self.i >= 669) & (self.i < 670)): m.d.sync += self.o.eq(784)
-                with m.If((self.i >= 670) & (self.i < 671)): m.d.sync += self.o.eq(783)
-                with m.If((self.i >= 671) & (self.i < 672)): m.d.sync += self.o.eq(781)
-                with m.If((self.i >= 672) & (self.i < 673)): m.d.sync += self.o.eq(780)
-                with m.If((self.i >= 673) & (self.i < 674)): m.d.sync += self.o.eq(779)
-                with m.If((self.i >= 674) & (self.i < 675)): m.d.sync += self.o.eq(778)
-                with m.If((self.i >= 675) & (self.i < 676)): m.d.sync += self.o.eq(777)
-                with m.If((self.i >= 676) & (self.i < 677)): m.d.sync += self.o.eq(776)
-                with m.If((self.i >= 677) & (self.i < 678)): m.d.sync += self.o.eq(774)
-                with m.If((self.i >= 678) & (self.i < 679)): m.d.sync += self.o.eq(773)
-                with m.If((self.i >= 679) & (self.i < 680)): m.d.sync += self.o.eq(772)
-                with m.If((self.i >= 680) & (self.i < 681)): m.d.sync += self.o.eq(771)
-                with m.If((self.i >= 681) & (self.i < 682)): m.d.sync += self.o.eq(770)
-                with m.If((self.i >= 682) & (self.i < 683)): m.d.sync += self.o.eq(769)
-                with m.If((self.i >= 683) & (self.i < 684)): m.d.sync += self.o.eq(768)
-                with m.If((self.i >= 684) & (self.i < 685)): m.d.sync += self.o.eq(767)
-                with m.If((self.i >= 685) & (self.i < 686)): m.d.sync += self.o.eq(765)
-                with m.If((self.i >= 686) & (self.i < 687)): m.d.sync += self.o.eq(764)
-                with m.If((self.i >= 687) & (self.i < 688)): m.d.sync += self.o.eq(763)
-                with m.If((self.i >= 688) & (self.i < 689)): m.d.sync += self.o.eq(762)
-                with m.If((self.i >= 689) & (self.i < 690)): m.d.sync += self.o.eq(761)
-                with m.If((self.i >= 690) & (self.i < 691)): m.d.sync += self.o.eq(760)
-                with m.If((self.i >= 691) & (self.i < 692)): m.d.sync += self.o.eq(759)
-                with m.If((self.i >= 692) & (self.i < 693)): m.d.sync += self.o.eq(758)
-                with m.If((self.i >= 693) & (self.i < 694)): m.d.sync += self.o.eq(757)
-                with m.If((self.i >= 694) & (self.i < 695)): m.d.sync += self.o.eq(755)
-                with m.If((self.i >= 695) & (self.i < 696)): m.d.sync += self.o.eq(754)
-                with m.If((self.i >= 696) & (self.i < 697)): m.d.sync += self.o.eq(753)
-                with m.If((self.i >= 697) & (self.i < 698)): m.d.sync += self.o.eq(752)
-                with m.If((self.i >= 698) & (self.i < 699)): m.d.sync += self.o.eq(751)
-                with m.If((self.i >= 699) & (self.i < 700)): m.d.sync += self.o.eq(750)
-                with m.If((self.i >= 700) & (self.i < 701)): m.d.sync += self.o.eq(749)
-                with m.If((self.i >= 701) & (self.i < 702)): m.d.sync += self.o.eq(748)
-                with m.If((self.i >= 702) & (self.i < 703)): m.d.sync += self.o.eq(747)
-                with m.If((self.i >= 703) & (self.i < 704)): m.d.sync += self.o.eq(746)
-                with m.If((self.i >= 704) & (self.i < 705)): m.d.sync += self.o.eq(745)
-                with m.If((self.i >= 705) & (self.i < 706)): m.d.sync += self.o.eq(744)
-                with m.If((self.i >= 706) & (self.i < 707)): m.d.sync += self.o.eq(743)
-                with m.If((self.i >= 707) & (self.i < 708)): m.d.sync += self.o.eq(742)
-                with m.If((self.i >= 708) & (self.i < 709)): m.d.sync += self.o.eq(741)
-                with m.If((self.i >= 709) & (self.i < 710)): m.d.sync += self.o.eq(739)
-                with m.If((self.i >= 710) & (self.i < 711)): m.d.sync += self.o.eq(738)
-                with m.If((self.i >= 711) & (self.i < 712)): m.d.sync += self.o.eq(737)
-                with m.If((self.i >= 712) & (self.i < 713)): m.d.sync += self.o.eq(736)
-                with m.If((self.i >= 713) & (self.i < 714)): m.d.sync += self.o.eq(735)
-                with m.If((self.i >= 714) & (self.i < 715)): m.d.sync += self.o.eq(734)
-                with m.If((self.i >= 715) & (self.i < 716)): m.d.sync += self.o.eq(733)
-                with m.If((self.i >= 716) & (self.i < 717)): m.d.sync += self.o.eq(732)
-                with m.If((self.i >= 717) & (self.i < 718)): m.d.sync += self.o.eq(731)
-                with m.If((self.i >= 718) & (self.i < 719)): m.d.sync += self.o.eq(730)
-                with m.If((self.i >= 719) & (self.i < 720)): m.d.sync += self.o.eq(729)
-                with m.If((self.i >= 720) & (self.i < 721)): m.d.sync += self.o.eq(728)
-                with m.If((self.i >= 721) & (self.i < 722)): m.d.sync += self.o.eq(727)
-                with m.If((self.i >= 722) & (self.i < 723)): m.d.sync += self.o.eq(726)
-                with m.If((self.i >= 723) & (self.i < 724)): m.d.sync += self.o.eq(725)
-                with m.If((self.i >= 724) & (self.i < 725)): m.d.sync += self.o.eq(724)
-                with m.If((self.i >= 725) & (self.i < 726)): m.d.sync += self.o.eq(723)
-                with m.If((self.i >= 726) & (self.i < 727)): m.d.sync += self.o.eq(722)
-                with m.If((self.i >= 727) & (self.i < 728)): m.d.sync += self.o.eq(721)
-                with m.If((self.i >= 728) & (self.i < 729)): m.d.sync += self.o.eq(720)
-                with m.If((self.i >= 729) & (self.i < 730)): m.d.sync += self.o.eq(719)
-                with m.If((self.i >= 730) & (self.i < 731)): m.d.sync += self.o.eq(718)
-                with m.If((self.i >= 731) & (self.i < 732)): m.d.sync += self.o.eq(717)
-                with m.If((self.i >= 732) & (self.i < 733)): m.d.sync += self.o.eq(716)
-                with m.If((self.i >= 733) & (self.i < 734)): m.d.sync += self.o.eq(715)
-                with m.If((self.i >= 734) & (self.i < 735)): m.d.sync += self.o.eq(714)
-                with m.If((self.i >= 735) & (self.i < 736)): m.d.sync += self.o.eq(713)
-                with m.If((self.i >= 736) & (self.i < 737)): m.d.sync += self.o.eq(712)
-                with m.If((self.i >= 737) & (self.i < 738)): m.d.sync += self.o.eq(711)
-                with m.If((self.i >= 738) & (self.i < 739)): m.d.sync += self.o.eq(710)
-                with m.If((self.i >= 739) & (self.i < 740)): m.d.sync += self.o.eq(709)
-                with m.If((self.i >= 740) & (self.i < 742)): m.d.sync += self.o.eq(708)
-                with m.If((self.i >= 742) & (self.i < 743)): m.d.sync += self.o.eq(707)
-                with m.If((self.i >= 743) & (self.i < 744)): m.d.sync += self.o.eq(706)
-                with m.If((self.i >= 744) & (self.i < 745)): m.d.sync += self.o.eq(705)
-                with m.If((self.i >= 745) & (self.i < 746)): m.d.sync += self.o.eq(704)
-                with m.If((self.i >= 746) & (self.i < 747)): m.d.sync += self.o.eq(703)
-                with m.If((self.i >= 747) & (self.i < 748)): m.d.sync += self.o.eq(702)
-                with m.If((self.i >= 748) & (self.i < 749)): m.d.sync += self.o.eq(701)
-                with m.If((self.i >= 749) & (self.i < 750)): m.d.sync += self.o.eq(700)
-                with m.If((self.i >= 750) & (self.i < 751)): m.d.sync += self.o.eq(699)
-                with m.If((self.i >= 751) & (self.i < 752)): m.d.sync += self.o.eq(698)
-                with m.If((self.i >= 752) & (self.i < 753)): m.d.sync += self.o.eq(697)
-                with m.If((self.i >= 753) & (self.i < 754)): m.d.sync += self.o.eq(696)
-                with m.If((self.i >= 754) & (self.i < 755)): m.d.sync += self.o.eq(695)
-                with m.If((self.i >= 755) & (self.i < 757)): m.d.sync += self.o.eq(694)
-                with m.If((self.i >= 757) & (self.i < 758)): m.d.sync += self.o.eq(693)
-                with m.If((self.i >= 758) & (self.i < 759)): m.d.sync += self.o.eq(692)
-                with m.If((self.i >= 759) & (self.i < 760)): m.d.sync += self.o.eq(691)
-                with m.If((self.i >= 760) & (self.i < 761)): m.d.sync += self.o.eq(690)
-                with m.If((self.i >= 761) & (self.i < 762)): m.d.sync += self.o.eq(689)
-                with m.If((self.i >= 762) & (self.i < 763)): m.d.sync += self.o.eq(688)
-                with m.If((self.i >= 763) & (self.i < 764)): m.d.sync += self.o.eq(687)
-                with m.If((self.i >= 764) & (self.i < 765)): m.d.sync += self.o.eq(686)
-                with m.If((self.i >= 765) & (self.i < 766)): m.d.sync += self.o.eq(685)
-                with m.If((self.i >= 766) & (self.i < 768)): m.d.sync += self.o.eq(684)
-                with m.If((self.i >= 768) & (self.i < 769)): m.d.sync += self.o.eq(683)
-                with m.If((self.i >= 769) & (self.i < 770)): m.d.sync += self.o.eq(682)
-                with m.If((self.i >= 770) & (self.i < 771)): m.d.sync += self.o.eq(681)
-                with m.If((self.i >= 771) & (self.i < 772)): m.d.sync += self.o.eq(680)
-                with m.If((self.i >= 772) & (self.i < 773)): m.d.sync += self.o.eq(679)
-                with m.If((self.i >= 773) & (self.i < 774)): m.d.sync += self.o.eq(678)
-                with m.If((self.i >= 774) & (self.i < 776)): m.d.sync += self.o.eq(677)
-                with m.If((self.i >= 776) & (self.i < 777)): m.d.sync += self.o.eq(676)
-                with m.If((self.i >= 777) & (self.i < 778)): m.d.sync += self.o.eq(675)
-                with m.If((self.i >= 778) & (self.i < 779)): m.d.sync += self.o.eq(674)
-                with m.If((self.i >= 779) & (self.i < 780)): m.d.sync += self.o.eq(673)
-                with m.If((self.i >= 780) & (self.i < 781)): m.d.sync += self.o.eq(672)
-                with m.If((self.i >= 781) & (self.i < 782)): m.d.sync += self.o.eq(671)
-                with m.If((self.i >= 782) & (self.i < 784)): m.d.sync += self.o.eq(670)
-                with m.If((self.i >= 784) & (self.i < 785)): m.d.sync += self.o.eq(669)
-                with m.If((self.i >= 785) & (self.i < 786)): m.d.sync += self.o.eq(668)
-                with m.If((self.i >= 786) & (self.i < 787)): m.d.sync += self.o.eq(667)
-                with m.If((self.i >= 787) & (self.i < 788)): m.d.sync += self.o.eq(666)
-                with m.If((self.i >= 788) & (self.i < 789)): m.d.sync += self.o.eq(665)
-                with m.If((self.i >= 789) & (self.i < 791)): m.d.sync += self.o.eq(664)
-                with m.If((self.i >= 791) & (self.i < 792)): m.d.sync += self.o.eq(663)
-                with m.If((self.i >= 792) & (self.i < 793)): m.d.sync += self.o.eq(662)
-                with m.If((self.i >= 793) & (self.i < 794)): m.d.sync += self.o.eq(661)
-                with m.If((self.i >= 794) & (self.i < 795)): m.d.sync += self.o.eq(660)
-                with m.If((self.i >= 795) & (self.i < 797)): m.d.sync += self.o.eq(659)
-                with m.If((self.i >= 797) & (self.i < 798)): m.d.sync += self.o.eq(658)
-                with m.If((self.i >= 798) & (self.i < 799)): m.d.sync += self.o.eq(657)
-                with m.If((self.i >= 799) & (self.i < 800)): m.d.sync += self.o.eq(656)
-                with m.If((self.i >= 800) & (self.i < 802)): m.d.sync += self.o.eq(655)
-                with m.If((self.i >= 802) & (self.i < 803)): m.d.sync += self.o.eq(654)
-                with m.If((self.i >= 803) & (self.i < 804)): m.d.sync += self.o.eq(653)
-                with m.If((self.i >= 804) & (self.i < 805)): m.d.sync += self.o.eq(652)
-                with m.If((self.i >= 805) & (self.i < 806)): m.d.sync += self.o.eq(651)
-                with m.If((self.i >= 806) & (self.i < 808)): m.d.sync += self.o.eq(650)
-                with m.If((self.i >= 808) & (self.i < 809)): m.d.sync += self.o.eq(649)
-                with m.If((self.i >= 809) & (self.i < 810)): m.d.sync += self.o.eq(648)
-                with m.If((self.i >= 810) & (self.i < 811)): m.d.sync += self.o.eq(647)
-                with m.If((self.i >= 811) & (self.i < 813)): m.d.sync += self.o.eq(646)
-                with m.If((self.i >= 813) & (self.i < 814)): m.d.sync += self.o.eq(645)
-                with m.If((self.i >= 814) & (self.i < 815)): m.d.sync += self.o.eq(644)
-                with m.If((self.i >= 815) & (self.i < 817)): m.d.sync += self.o.eq(643)
-                with m.If((self.i >= 817) & (self.i < 818)): m.d.sync += self.o.eq(642)
-                with m.If((self.i >= 818) & (self.i < 819)): m.d.sync += self.o.eq(641)
-                with m.If((self.i >= 819) & (self.i < 820)): m.d.sync += self.o.eq(640)
-                with m.If((self.i >= 820) & (self.i < 822)): m.d.sync += self.o.eq(639)
-                with m.If((self.i >= 822) & (self.i < 823)): m.d.sync += self.o.eq(638)
-                with m.If((self.i >= 823) & (self.i < 824)): m.d.sync += self.o.eq(637)
-                with m.If((self.i >= 824) & (self.i < 826)): m.d.sync += self.o.eq(636)
-                with m.If((self.i >= 826) & (self.i < 827)): m.d.sync += self.o.eq(635)
-                with m.If((self.i >= 827) & (self.i < 828)): m.d.sync += self.o.eq(634)
-                with m.If((self.i >= 828) & (self.i < 829)): m.d.sync += self.o.eq(633)
-                with m.If((self.i >= 829) & (self.i < 831)): m.d.sync += self.o.eq(632)
-                with m.If((self.i >= 831) & (self.i < 832)): m.d.sync += self.o.eq(631)
-                with m.If((self.i >= 832) & (self.i < 833)): m.d.sync += self.o.eq(630)
-                with m.If((self.i >= 833) & (self.i < 835)): m.d.sync += self.o.eq(629)
-                with m.If((self.i >= 835) & (self.i < 836)): m.d.sync += self.o.eq(628)
-                with m.If((self.i >= 836) & (self.i < 837)): m.d.sync += self.o.eq(627)
-                with m.If((self.i >= 837) & (self.i < 839)): m.d.sync += self.o.eq(626)
-                with m.If((self.i >= 839) & (self.i < 840)): m.d.sync += self.o.eq(625)
-                with m.If((self.i >= 840) & (self.i < 841)): m.d.sync += self.o.eq(624)
-                with m.If((self.i >= 841) & (self.i < 843)): m.d.sync += self.o.eq(623)
-                with m.If((self.i >= 843) & (self.i < 844)): m.d.sync += self.o.eq(622)
-                with m.If((self.i >= 844) & (self.i < 845)): m.d.sync += self.o.eq(621)
-                with m.If((self.i >= 845) & (self.i < 847)): m.d.sync += self.o.eq(620)
-                with m.If((self.i >= 847) & (self.i < 848)): m.d.sync += self.o.eq(619)
-                with m.If((self.i >= 848) & (self.i < 850)): m.d.sync += self.o.eq(618)
-                with m.If((self.i >= 850) & (self.i < 851)): m.d.sync += self.o.eq(617)
-                with m.If((self.i >= 851) & (self.i < 852)): m.d.sync += self.o.eq(616)
-                with m.If((self.i >= 852) & (self.i < 854)): m.d.sync += self.o.eq(615)
-                with m.If((self.i >= 854) & (self.i < 855)): m.d.sync += self.o.eq(614)
-                with m.If((self.i >= 855) & (self.i < 856)): m.d.sync += self.o.eq(613)
-                with m.If((self.i >= 856) & (self.i < 858)): m.d.sync += self.o.eq(612)
-                with m.If((self.i >= 858) & (self.i < 859)): m.d.sync += self.o.eq(611)
-                with m.If((self.i >= 859) & (self.i < 861)): m.d.sync += self.o.eq(610)
-                with m.If((self.i >= 861) & (self.i < 862)): m.d.sync += self.o.eq(609)
-                with m.If((self.i >= 862) & (self.i < 864)): m.d.sync += self.o.eq(608)
-                with m.If((self.i >= 864) & (self.i < 865)): m.d.sync += self.o.eq(607)
-                with m.If((self.i >= 865) & (self.i < 866)): m.d.sync += self.o.eq(606)
-                with m.If((self.i >= 866) & (self.i < 868)): m.d.sync += self.o.eq(605)
-                with m.If((self.i >= 868) & (self.i < 869)): m.d.sync += self.o.eq(604)
-                with m.If((self.i >= 869) & (self.i < 871)): m.d.sync += self.o.eq(603)
-                with m.If((self.i >= 871) & (self.i < 872)): m.d.sync += self.o.eq(602)
-                with m.If((self.i >= 872) & (self.i < 874)): m.d.sync += self.o.eq(601)
-                with m.If((self.i >= 874) & (self.i < 875)): m.d.sync += self.o.eq(600)
-                with m.If((self.i >= 875) & (self.i < 877)): m.d.sync += self.o.eq(599)
-                with m.If((self.i >= 877) & (self.i < 878)): m.d.sync += self.o.eq(598)
-                with m.If((self.i >= 878) & (self.i < 879)): m.d.sync += self.o.eq(597)
-                with m.If((self.i >= 879) & (self.i < 881)): m.d.sync += self.o.eq(596)
-                with m.If((self.i >= 881) & (self.i < 882)): m.d.sync += self.o.eq(595)
-                with m.If((self.i >= 882) & (self.i < 884)): m.d.sync += self.o.eq(594)
-                with m.If((self.i >= 884) & (self.i < 885)): m.d.sync += self.o.eq(593)
-                with m.If((self.i >= 885) & (self.i < 887)): m.d.sync += self.o.eq(592)
-                with m.If((self.i >= 887) & (self.i < 888)): m.d.sync += self.o.eq(591)
-                with m.If((self.i >= 888) & (self.i < 890)): m.d.sync += self.o.eq(590)
-                with m.If((self.i >= 890) & (self.i < 891)): m.d.sync += self.o.eq(589)
-                with m.If((self.i >= 891) & (self.i < 893)): m.d.sync += self.o.eq(588)
-                with m.If((self.i >= 893) & (self.i < 894)): m.d.sync += self.o.eq(587)
-                with m.If((self.i >= 894) & (self.i < 896)): m.d.sync += self.o.eq(586)
-                with m.If((self.i >= 896) & (self.i < 897)): m.d.sync += self.o.eq(585)
-                with m.If((self.i >= 897) & (self.i < 899)): m.d.sync += self.o.eq(584)
-                with m.If((self.i >= 899) & (self.i < 901)): m.d.sync += self.o.eq(583)
-                with m.If((self.i >= 901) & (self.i < 902)): m.d.sync += self.o.eq(582)
-                with m.If((self.i >= 902) & (self.i < 904)): m.d.sync += self.o.eq(581)
-                with m.If((self.i >= 904) & (self.i < 905)): m.d.sync += self.o.eq(580)
-                with m.If((self.i >= 905) & (self.i < 907)): m.d.sync += self.o.eq(579)
-                with m.If((self.i >= 907) & (self.i < 908)): m.d.sync += self.o.eq(578)
-                with m.If((self.i >= 908) & (self.i < 910)): m.d.sync += self.o.eq(577)
-                with m.If((self.i >= 910) & (self.i < 912)): m.d.sync += self.o.eq(576)
-                with m.If((self.i >= 912) & (self.i < 913)): m.d.sync += self.o.eq(575)
-                with m.If((self.i >= 913) & (self.i < 915)): m.d.sync += self.o.eq(574)
-                with m.If((self.i >= 915) & (self.i < 916)): m.d.sync += self.o.eq(573)
-                with m.If((self.i >= 916) & (self.i < 918)): m.d.sync += self.o.eq(572)
-                with m.If((self.i >= 918) & (self.i < 919)): m.d.sync += self.o.eq(571)
-                with m.If((self.i >= 919) & (self.i < 921)): m.d.sync += self.o.eq(570)
-                with m.If((self.i >= 921) & (self.i < 923)): m.d.sync += self.o.eq(569)
-                with m.If((self.i >= 923) & (self.i < 924)): m.d.sync += self.o.eq(568)
-                with m.If((self.i >= 924) & (self.i < 926)): m.d.sync += self.o.eq(567)
-                with m.If((self.i >= 926) & (self.i < 928)): m.d.sync += self.o.eq(566)
-                with m.If((self.i >= 928) & (self.i < 929)): m.d.sync += self.o.eq(565)
-                with m.If((self.i >= 929) & (self.i < 931)): m.d.sync += self.o.eq(564)
-                with m.If((self.i >= 931) & (self.i < 933)): m.d.sync += self.o.eq(563)
-                with m.If((self.i >= 933) & (self.i < 934)): m.d.sync += self.o.eq(562)
-                with m.If((self.i >= 934) & (self.i < 936)): m.d.sync += self.o.eq(561)
-                with m.If((self.i >= 936) & (self.i < 938)): m.d.sync += self.o.eq(560)
-                with m.If((self.i >= 938) & (self.i < 939)): m.d.sync += self.o.eq(559)
-                with m.If((self.i >= 939) & (self.i < 941)): m.d.sync += self.o.eq(558)
-                with m.If((self.i >= 941) & (self.i < 943)): m.d.sync += self.o.eq(557)
-                with m.If((self.i >= 943) & (self.i < 944)): m.d.sync += self.o.eq(556)
-                with m.If((self.i >= 944) & (self.i < 946)): m.d.sync += self.o.eq(555)
-                with m.If((self.i >= 946) & (self.i < 948)): m.d.sync += self.o.eq(554)
-                with m.If((self.i >= 948) & (self.i < 949)): m.d.sync += self.o.eq(553)
-                with m.If((self.i >= 949) & (self.i < 951)): m.d.sync += self.o.eq(552)
-                with m.If((self.i >= 951) & (self.i < 953)): m.d.sync += self.o.eq(551)
-                with m.If((self.i >= 953) & (self.i < 955)): m.d.sync += self.o.eq(550)
-                with m.If((self.i >= 955) & (self.i < 956)): m.d.sync += self.o.eq(549)
-                with m.If((self.i >= 956) & (self.i < 958)): m.d.sync += self.o.eq(548)
-                with m.If((self.i >= 958) & (self.i < 960)): m.d.sync += self.o.eq(547)
-                with m.If((self.i >= 960) & (self.i < 962)): m.d.sync += self.o.eq(546)
-                with m.If((self.i >= 962) & (self.i < 963)): m.d.sync += self.o.eq(545)
-                with m.If((self.i >= 963) & (self.i < 965)): m.d.sync += self.o.eq(544)
-                with m.If((self.i >= 965) & (self.i < 967)): m.d.sync += self.o.eq(543)
-                with m.If((self.i >= 967) & (self.i < 969)): m.d.sync += self.o.eq(542)
-                with m.If((self.i >= 969) & (self.i < 971)): m.d.sync += self.o.eq(541)
-                with m.If((self.i >= 971) & (self.i < 972)): m.d.sync += self.o.eq(540)
-                with m.If((self.i >= 972) & (self.i < 974)): m.d.sync += self.o.eq(539)
-                with m.If((self.i >= 974) & (self.i < 976)): m.d.sync += self.o.eq(538)
-                with m.If((self.i >= 976) & (self.i < 978)): m.d.sync += self.o.eq(537)
-                with m.If((self.i >= 978) & (self.i < 980)): m.d.sync += self.o.eq(536)
-                with m.If((self.i >= 980) & (self.i < 981)): m.d.sync += self.o.eq(535)
-                with m.If((self.i >= 981) & (self.i < 983)): m.d.sync += self.o.eq(534)
-                with m.If((self.i >= 983) & (self.i < 985)): m.d.sync += self.o.eq(533)
-                with m.If((self.i >= 985) & (self.i < 987)): m.d.sync += self.o.eq(532)
-                with m.If((self.i >= 987) & (self.i < 989)): m.d.sync += self.o.eq(531)
-                with m.If((self.i >= 989) & (self.i < 991)): m.d.sync += self.o.eq(530)
-                with m.If((self.i >= 991) & (self.i < 993)): m.d.sync += self.o.eq(529)
-                with m.If((self.i >= 993) & (self.i < 994)): m.d.sync += self.o.eq(528)
-                with m.If((self.i >= 994) & (self.i < 996)): m.d.sync += self.o.eq(527)
-                with m.If((self.i >= 996) & (self.i < 998)): m.d.sync += self.o.eq(526)
-                with m.If((self.i >= 998) & (self.i < 1000)): m.d.sync += self.o.eq(525)
-                with m.If((self.i >= 1000) & (self.i < 1002)): m.d.sync += self.o.eq(524)
-                with m.If((self.i >= 1002) & (self.i < 1004)): m.d.sync += self.o.eq(523)
-                with m.If((self.i >= 1004) & (self.i < 1006)): m.d.sync += self.o.eq(522)
-                with m.If((self.i >= 1006) & (self.i < 1008)): m.d.sync += self.o.eq(521)
-                with m.If((self.i >= 1008) & (self.i < 1010)): m.d.sync += self.o.eq(520)
-                with m.If((self.i >= 1010) & (self.i < 1012)): m.d.sync += self.o.eq(519)
-                with m.If((self.i >= 1012) & (self.i < 1014)): m.d.sync += self.o.eq(518)
-                with m.If((self.i >= 1014) & (self.i < 1016)): m.d.sync += self.o.eq(517)
-                with m.If((self.i >= 1016) & (self.i < 1018)): m.d.sync += self.o.eq(516)
-                with m.If((self.i >= 1018) & (self.i < 1020)): m.d.sync += self.o.eq(515)
-                with m.If((self.i >= 1020) & (self.i < 1022)): m.d.sync += self.o.eq(514)
-                with m.If((self.i >= 1022) & (self.i < 1024)): m.d.sync += self.o.eq(513)
-                with m.If((self.i >= 1024) & (self.i < 1026)): m.d.sync += self.o.eq(512)
-                with m.If((self.i >= 1026) & (self.i < 1028)): m.d.sync += self.o.eq(511)
-                with m.If((self.i >= 1028) & (self.i < 1030)): m.d.sync += self.o.eq(510)
-                with m.If((self.i >= 1030) & (self.i < 1032)): m.d.sync += self.o.eq(509)
-                with m.If((self.i >= 1032) & (self.i < 1034)): m.d.sync += self.o.eq(508)
-                with m.If((self.i >= 1034) & (self.i < 1036)): m.d.sync += self.o.eq(507)
-                with m.If((self.i >= 1036) & (self.i < 1038)): m.d.sync += self.o.eq(506)
-                with m.If((self.i >= 1038) & (self.i < 1040)): m.d.sync += self.o.eq(505)
-                with m.If((self.i >= 1040) & (self.i < 1042)): m.d.sync += self.o.eq(504)
-                with m.If((self.i >= 1042) & (self.i < 1044)): m.d.sync += self.o.eq(503)
-                with m.If((self.i >= 1044) & (self.i < 1046)): m.d.sync += self.o.eq(502)
-                with m.If((self.i >= 1046) & (self.i < 1048)): m.d.sync += self.o.eq(501)
-                with m.If((self.i >= 1048) & (self.i < 1050)): m.d.sync += self.o.eq(500)
-                with m.If((self.i >= 1050) & (self.i < 1052)): m.d.sync += self.o.eq(499)
-                with m.If((self.i >= 1052) & (self.i < 1054)): m.d.sync += self.o.eq(498)
-                with m.If((self.i >= 1054) & (self.i < 1056)): m.d.sync += self.o.eq(497)
-                with m.If((self.i >= 1056) & (self.i < 1059)): m.d.sync += self.o.eq(496)
-                with m.If((self.i >= 1059) & (self.i < 1061)): m.d.sync += self.o.eq(495)
-                with m.If((self.i >= 1061) & (self.i < 1063)): m.d.sync += self.o.eq(494)
-                with m.If((self.i >= 1063) & (self.i < 1065)): m.d.sync += self.o.eq(493)
-                with m.If((self.i >= 1065) & (self.i < 1067)): m.d.sync += self.o.eq(492)
-                with m.If((self.i >= 1067) & (self.i < 1069)): m.d.sync += self.o.eq(491)
-                with m.If((self.i >= 1069) & (self.i < 1072)): m.d.sync += self.o.eq(490)
-                with m.If((self.i >= 1072) & (self.i < 1074)): m.d.sync += self.o.eq(489)
-                with m.If((self.i >= 1074) & (self.i < 1076)): m.d.sync += self.o.eq(488)
-                with m.If((self.i >= 1076) & (self.i < 1078)): m.d.sync += self.o.eq(487)
-                with m.If((self.i >= 1078) & (self.i < 1080)): m.d.sync += self.o.eq(486)
-                with m.If((self.i >= 1080) & (self.i < 1083)): m.d.sync += self.o.eq(485)
-                with m.If((self.i >= 1083) & (self.i < 1085)): m.d.sync += self.o.eq(484)
-                with m.If((self.i >= 1085) & (self.i < 1087)): m.d.sync += self.o.eq(483)
-                with m.If((self.i >= 1087) & (self.i < 1089)): m.d.sync += self.o.eq(482)
-                with m.If((self.i >= 1089) & (self.i < 1092)): m.d.sync += self.o.eq(481)
-                with m.If((self.i >= 1092) & (self.i < 1094)): m.d.sync += self.o.eq(480)
-                with m.If((self.i >= 1094) & (self.i < 1096)): m.d.sync += self.o.eq(479)
-                with m.If((self.i >= 1096) & (self.i < 1098)): m.d.sync += self.o.eq(478)
-                with m.If((self.i >= 1098) & (self.i < 1101)): m.d.sync += self.o.eq(477)
-                with m.If((self.i >= 1101) & (self.i < 1103)): m.d.sync += self.o.eq(476)
-                with m.If((self.i >= 1103) & (self.i < 1105)): m.d.sync += self.o.eq(475)
-                with m.If((self.i >= 1105) & (self.i < 1108)): m.d.sync += self.o.eq(474)
-                with m.If((self.i >= 1108) & (self.i < 1110)): m.d.sync += self.o.eq(473)
-                with m.If((self.i >= 1110) & (self.i < 1112)): m.d.sync += self.o.eq(472)
-                with m.If((self.i >= 1112) & (self.i < 1115)): m.d.sync += self.o.eq(471)
-                with m.If((self.i >= 1115) & (self.i < 1117)): m.d.sync += self.o.eq(470)
-                with m.If((self.i >= 1117) & (self.i < 1120)): m.d.sync += self.o.eq(469)
-                with m.If((self.i >= 1120) & (self.i < 1122)): m.d.sync += self.o.eq(468)
-                with m.If((self.i >= 1122) & (self.i < 1124)): m.d.sync += self.o.eq(467)
-                with m.If((self.i >= 1124) & (self.i < 1127)): m.d.sync += self.o.eq(466)
-                with m.If((self.i >= 1127) & (self.i < 1129)): m.d.sync += self.o.eq(465)
-                with m.If((self.i >= 1129) & (self.i < 1132)): m.d.sync += self.o.eq(464)
-                with m.If((self.i >= 1132) & (self.i < 1134)): m.d.sync += self.o.eq(463)
-                with m.If((self.i >= 1134) & (self.i < 1137)): m.d.sync += self.o.eq(462)
-                with m.If((self.i >= 1137) & (self.i < 1139)): m.d.sync += self.o.eq(461)
-                with m.If((self.i >= 1139) & (self.i < 1141)): m.d.sync += self.o.eq(460)
-                with m.If((self.i >= 1141) & (self.i < 1144)): m.d.sync += self.o.eq(459)
-                with m.If((self.i >= 1144) & (self.i < 1146)): m.d.sync += self.o.eq(458)
-                with m.If((self.i >= 1146) & (self.i < 1149)): m.d.sync += self.o.eq(457)
-                with m.If((self.i >= 1149) & (self.i < 1152)): m.d.sync += self.o.eq(456)
-                with m.If((self.i >= 1152) & (self.i < 1154)): m.d.sync += self.o.eq(455)
-                with m.If((self.i >= 1154) & (self.i < 1157)): m.d.sync += self.o.eq(454)
-                with m.If((self.i >= 1157) & (self.i < 1159)): m.d.sync += self.o.eq(453)
-                with m.If((self.i >= 1159) & (self.i < 1162)): m.d.sync += self.o.eq(452)
-                with m.If((self.i >= 1162) & (self.i < 1164)): m.d.sync += self.o.eq(451)
-                with m.If((self.i >= 1164) & (self.i < 1167)): m.d.sync += self.o.eq(450)
-                with m.If((self.i >= 1167) & (self.i < 1169)): m.d.sync += self.o.eq(449)
-                with m.If((self.i >= 1169) & (self.i < 1172)): m.d.sync += self.o.eq(448)
-                with m.If((self.i >= 1172) & (self.i < 1175)): m.d.sync += self.o.eq(447)
-                with m.If((self.i >= 1175) & (self.i < 1177)): m.d.sync += self.o.eq(446)
-                with m.If((self.i >= 1177) & (self.i < 1180)): m.d.sync += self.o.eq(445)
-                with m.If((self.i >= 1180) & (self.i < 1183)): m.d.sync += self.o.eq(444)
-                with m.If((self.i >= 1183) & (self.i < 1185)): m.d.sync += self.o.eq(443)
-                with m.If((self.i >= 1185) & (self.i < 1188)): m.d.sync += self.o.eq(442)
-                with m.If((self.i >= 1188) & (self.i < 1191)): m.d.sync += self.o.eq(441)
-                with m.If((self.i >= 1191) & (self.i < 1193)): m.d.sync += self.o.eq(440)
-                with m.If((self.i >= 1193) & (self.i < 1196)): m.d.sync += self.o.eq(439)
-                with m.If((self.i >= 1196) & (self.i < 1199)): m.d.sync += self.o.eq(438)
-                with m.If((self.i >= 1199) & (self.i < 1202)): m.d.sync += self.o.eq(437)
-                with m.If((self.i >= 1202) & (self.i < 1204)): m.d.sync += self.o.eq(436)
-                with m.If((self.i >= 1204) & (self.i < 1207)): m.d.sync += self.o.eq(435)
-                with m.If((self.i >= 1207) & (self.i < 1210)): m.d.sync += self.o.eq(434)
-                with m.If((self.i >= 1210) & (self.i < 1213)): m.d.sync += self.o.eq(433)
-                with m.If((self.i >= 1213) & (self.i < 1216)): m.d.sync += self.o.eq(432)
-                with m.If((self.i >= 1216) & (self.i < 1218)): m.d.sync += self.o.eq(431)
-                with m.If((self.i >= 1218) & (self.i < 1221)): m.d.sync += self.o.eq(430)
-                with m.If((self.i >= 1221) & (self.i < 1224)): m.d.sync += self.o.eq(429)
-                with m.If((self.i >= 1224) & (self.i < 1227)): m.d.sync += self.o.eq(428)
-                with m.If((self.i >= 1227) & (self.i < 1230)): m.d.sync += self.o.eq(427)
-                with m.If((self.i >= 1230) & (self.i < 1233)): m.d.sync += self.o.eq(426)
-                with m.If((self.i >= 1233) & (self.i < 1236)): m.d.sync += self.o.eq(425)
-                with m.If((self.i >= 1236) & (self.i < 1238)): m.d.sync += self.o.eq(424)
-                with m.If((self.i >= 1238) & (self.i < 1241)): m.d.sync += self.o.eq(423)
-                with m.If((self.i >= 1241) & (self.i < 1244)): m.d.sync += self.o.eq(422)
-                with m.If((self.i >= 1244) & (self.i < 1247)): m.d.sync += self.o.eq(421)
-                with m.If((self.i >= 1247) & (self.i < 1250)): m.d.sync += self.o.eq(420)
-                with m.If((self.i >= 1250) & (self.i < 1253)): m.d.sync += self.o.eq(419)
-                with m.If((self.i >= 1253) & (self.i < 1256)): m.d.sync += self.o.eq(418)
-                with m.If((self.i >= 1256) & (self.i < 1259)): m.d.sync += self.o.eq(417)
-                with m.If((self.i >= 1259) & (self.i < 1262)): m.d.sync += self.o.eq(416)
-                with m.If((self.i >= 1262) & (self.i < 1265)): m.d.sync += self.o.eq(415)
-                with m.If((self.i >= 1265) & (self.i < 1268)): m.d.sync += self.o.eq(414)
-                with m.If((self.i >= 1268) & (self.i < 1272)): m.d.sync += self.o.eq(413)
-                with m.If((self.i >= 1272) & (self.i < 1275)): m.d.sync += self.o.eq(412)
-                with m.If((self.i >= 1275) & (self.i < 1278)): m.d.sync += self.o.eq(411)
-                with m.If((self.i >= 1278) & (self.i < 1281)): m.d.sync += self.o.eq(410)
-                with m.If((self.i >= 1281) & (self.i < 1284)): m.d.sync += self.o.eq(409)
-                with m.If((self.i >= 1284) & (self.i < 1287)): m.d.sync += self.o.eq(408)
-                with m.If((self.i >= 1287) & (self.i < 1290)): m.d.sync += self.o.eq(407)
-                with m.If((self.i >= 1290) & (self.i < 1293)): m.d.sync += self.o.eq(406)
-                with m.If((self.i >= 1293) & (self.i < 1297)): m.d.sync += self.o.eq(405)
-                with m.If((self.i >= 1297) & (self.i < 1300)): m.d.sync += self.o.eq(404)
-                with m.If((self.i >= 1300) & (self.i < 1303)): m.d.sync += self.o.eq(403)
-                with m.If((self.i >= 1303) & (self.i < 1306)): m.d.sync += self.o.eq(402)
-                with m.If((self.i >= 1306) & (self.i < 1310)): m.d.sync += self.o.eq(401)
-                with m.If((self.i >= 1310) & (self.i < 1313)): m.d.sync += self.o.eq(400)
-                with m.If((self.i >= 1313) & (self.i < 1316)): m.d.sync += self.o.eq(399)
-                with m.If((self.i >= 1316) & (self.i < 1319)): m.d.sync += self.o.eq(398)
-                with m.If((self.i >= 1319) & (self.i < 1323)): m.d.sync += self.o.eq(397)
-                with m.If((self.i >= 1323) & (self.i < 1326)): m.d.sync += self.o.eq(396)
-                with m.If((self.i >= 1326) & (self.i < 1329)): m.d.sync += self.o.eq(395)
-                with m.If((self.i >= 1329) & (self.i < 1333)): m.d.sync += self.o.eq(394)
-                with m.If((self.i >= 1333) & (self.i < 1336)): m.d.sync += self.o.eq(393)
-                with m.If((self.i >= 1336) & (self.i < 1340)): m.d.sync += self.o.eq(392)
-                with m.If((self.i >= 1340) & (self.i < 1343)): m.d.sync += self.o.eq(391)
-                with m.If((self.i >= 1343) & (self.i < 1347)): m.d.sync += self.o.eq(390)
-                with m.If((self.i >= 1347) & (self.i < 1350)): m.d.sync += self.o.eq(389)
-                with m.If((self.i >= 1350) & (self.i < 1354)): m.d.sync += self.o.eq(388)
-                with m.If((self.i >= 1354) & (self.i < 1357)): m.d.sync += self.o.eq(387)
-                with m.If((self.i >= 1357) & (self.i < 1361)): m.d.sync += self.o.eq(386)
-                with m.If((self.i >= 1361) & (self.i < 1364)): m.d.sync += self.o.eq(385)
-                with m.If((self.i >= 1364) & (self.i < 1368)): m.d.sync += self.o.eq(384)
-                with m.If((self.i >= 1368) & (self.i < 1371)): m.d.sync += self.o.eq(383)
-                with m.If((self.i >= 1371) & (self.i < 1375)): m.d.sync += self.o.eq(382)
-                with m.If((self.i >= 1375) & (self.i < 1378)): m.d.sync += self.o.eq(381)
-                with m.If((self.i >= 1378) & (self.i < 1382)): m.d.sync += self.o.eq(380)
-                with m.If((self.i >= 1382) & (self.i < 1386)): m.d.sync += self.o.eq(379)
-                with m.If((self.i >= 1386) & (self.i < 1389)): m.d.sync += self.o.eq(378)
-                with m.If((self.i >= 1389) & (self.i < 1393)): m.d.sync += self.o.eq(377)
-                with m.If((self.i >= 1393) & (self.i < 1397)): m.d.sync += self.o.eq(376)
-                with m.If((self.i >= 1397) & (self.i < 1400)): m.d.sync += self.o.eq(375)
-                with m.If((self.i >= 1400) & (self.i < 1404)): m.d.sync += self.o.eq(374)
-                with m.If((self.i >= 1404) & (self.i < 1408)): m.d.sync += self.o.eq(373)
-                with m.If((self.i >= 1408) & (self.i < 1412)): m.d.sync += self.o.eq(372)
-                with m.If((self.i >= 1412) & (self.i < 1416)): m.d.sync += self.o.eq(371)
-                with m.If((self.i >= 1416) & (self.i < 1419)): m.d.sync += self.o.eq(370)
-                with m.If((self.i >= 1419) & (self.i < 1423)): m.d.sync += self.o.eq(369)
-                with m.If((self.i >= 1423) & (self.i < 1427)): m.d.sync += self.o.eq(368)
-                with m.If((self.i >= 1427) & (self.i < 1431)): m.d.sync += self.o.eq(367)
-                with m.If((self.i >= 1431) & (self.i < 1435)): m.d.sync += self.o.eq(366)
-                with m.If((self.i >= 1435) & (self.i < 1439)): m.d.sync += self.o.eq(365)
-                with m.If((self.i >= 1439) & (self.i < 1443)): m.d.sync += self.o.eq(364)
-                with m.If((self.i >= 1443) & (self.i < 1447)): m.d.sync += self.o.eq(363)
-                with m.If((self.i >= 1447) & (self.i < 1451)): m.d.sync += self.o.eq(362)
-                with m.If((self.i >= 1451) & (self.i < 1455)): m.d.sync += self.o.eq(361)
-                with m.If((self.i >= 1455) & (self.i < 1459)): m.d.sync += self.o.eq(360)
-                with m.If((self.i >= 1459) & (self.i < 1463)): m.d.sync += self.o.eq(359)
-                with m.If((self.i >= 1463) & (self.i < 1467)): m.d.sync += self.o.eq(358)
-                with m.If((self.i >= 1467) & (self.i < 1471)): m.d.sync += self.o.eq(357)
-                with m.If((self.i >= 1471) & (self.i < 1475)): m.d.sync += self.o.eq(356)
-                with m.If((self.i >= 1475) & (self.i < 1479)): m.d.sync += self.o.eq(355)
-                with m.If((self.i >= 1479) & (self.i < 1484)): m.d.sync += self.o.eq(354)
-                with m.If((self.i >= 1484) & (self.i < 1488)): m.d.sync += self.o.eq(353)
-                with m.If((self.i >= 1488) & (self.i < 1492)): m.d.sync += self.o.eq(352)
-                with m.If((self.i >= 1492) & (self.i < 1496)): m.d.sync += self.o.eq(351)
-                with m.If((self.i >= 1496) & (self.i < 1501)): m.d.sync += self.o.eq(350)
-                with m.If((self.i >= 1501) & (self.i < 1505)): m.d.sync += self.o.eq(349)
-                with m.If((self.i >= 1505) & (self.i < 1509)): m.d.sync += self.o.eq(348)
-                with m.If((self.i >= 1509) & (self.i < 1514)): m.d.sync += self.o.eq(347)
-                with m.If((self.i >= 1514) & (self.i < 1518)): m.d.sync += self.o.eq(346)
-                with m.If((self.i >= 1518) & (self.i < 1522)): m.d.sync += self.o.eq(345)
-                with m.If((self.i >= 1522) & (self.i < 1527)): m.d.sync += self.o.eq(344)
-                with m.If((self.i >= 1527) & (self.i < 1531)): m.d.sync += self.o.eq(343)
-                with m.If((self.i >= 1531) & (self.i < 1536)): m.d.sync += self.o.eq(342)
-                with m.If((self.i >= 1536) & (self.i < 1540)): m.d.sync += self.o.eq(341)
-                with m.If((self.i >= 1540) & (self.i < 1545)): m.d.sync += self.o.eq(340)
-                with m.If((self.i >= 1545) & (self.i < 1549)): m.d.sync += self.o.eq(339)
-                with m.If((self.i >= 1549) & (self.i < 1554)): m.d.sync += self.o.eq(338)
-                with m.If((self.i >= 1554) & (self.i < 1559)): m.d.sync += self.o.eq(337)
-                with m.If((self.i >= 1559) & (self.i < 1563)): m.d.sync += self.o.eq(336)
-                with m.If((self.i >= 1563) & (self.i < 1568)): m.d.sync += self.o.eq(335)
-                with m.If((self.i >= 1568) & (self.i < 1573)): m.d.sync += self.o.eq(334)
-                with m.If((self.i >= 1573) & (self.i < 1577)): m.d.sync += self.o.eq(333)
-                with m.If((self.i >= 1577) & (self.i < 1582)): m.d.sync += self.o.eq(332)
-                with m.If((self.i >= 1582) & (self.i < 1587)): m.d.sync += self.o.eq(331)
-                with m.If((self.i >= 1587) & (self.i < 1592)): m.d.sync += self.o.eq(330)
-                with m.If((self.i >= 1592) & (self.i < 1597)): m.d.sync += self.o.eq(329)
-                with m.If((self.i >= 1597) & (self.i < 1601)): m.d.sync += self.o.eq(328)
-                with m.If((self.i >= 1601) & (self.i < 1606)): m.d.sync += self.o.eq(327)
-                with m.If((self.i >= 1606) & (self.i < 1611)): m.d.sync += self.o.eq(326)
-                with m.If((self.i >= 1611) & (self.i < 1616)): m.d.sync += self.o.eq(325)
-                with m.If((self.i >= 1616) & (self.i < 1621)): m.d.sync += self.o.eq(324)
-                with m.If((self.i >= 1621) & (self.i < 1626)): m.d.sync += self.o.eq(323)
-                with m.If((self.i >= 1626) & (self.i < 1631)): m.d.sync += self.o.eq(322)
-                with m.If((self.i >= 1631) & (self.i < 1636)): m.d.sync += self.o.eq(321)
-                with m.If((self.i >= 1636) & (self.i < 1641)): m.d.sync += self.o.eq(320)
-                with m.If((self.i >= 1641) & (self.i < 1647)): m.d.sync += self.o.eq(319)
-                with m.If((self.i >= 1647) & (self.i < 1652)): m.d.sync += self.o.eq(318)
-                with m.If((self.i >= 1652) & (self.i < 1657)): m.d.sync += self.o.eq(317)
-                with m.If((self.i >= 1657) & (self.i < 1662)): m.d.sync += self.o.eq(316)
-                with m.If((self.i >= 1662) & (self.i < 1668)): m.d.sync += self.o.eq(315)
-                with m.If((self.i >= 1668) & (self.i < 1673)): m.d.sync += self.o.eq(314)
-                with m.If((self.i >= 1673) & (self.i < 1678)): m.d.sync += self.o.eq(313)
-                with m.If((self.i >= 1678) & (self.i < 1684)): m.d.sync += self.o.eq(312)
-                with m.If((self.i >= 1684) & (self.i < 1689)): m.d.sync += self.o.eq(311)
-                with m.If((self.i >= 1689) & (self.i < 1694)): m.d.sync += self.o.eq(310)
-                with m.If((self.i >= 1694) & (self.i < 1700)): m.d.sync += self.o.eq(309)
-                with m.If((self.i >= 1700) & (self.i < 1706)): m.d.sync += self.o.eq(308)
-                with m.If((self.i >= 1706) & (self.i < 1711)): m.d.sync += self.o.eq(307)
-                with m.If((self.i >= 1711) & (self.i < 1717)): m.d.sync += self.o.eq(306)
-                with m.If((self.i >= 1717) & (self.i < 1722)): m.d.sync += self.o.eq(305)
-                with m.If((self.i >= 1722) & (self.i < 1728)): m.d.sync += self.o.eq(304)
-                with m.If((self.i >= 1728) & (self.i < 1734)): m.d.sync += self.o.eq(303)
-                with m.If((self.i >= 1734) & (self.i < 1739)): m.d.sync += self.o.eq(302)
-                with m.If((self.i >= 1739) & (self.i < 1745)): m.d.sync += self.o.eq(301)
-                with m.If((self.i >= 1745) & (self.i < 1751)): m.d.sync += self.o.eq(300)
-                with m.If((self.i >= 1751) & (self.i < 1757)): m.d.sync += self.o.eq(299)
-                with m.If((self.i >= 1757) & (self.i < 1763)): m.d.sync += self.o.eq(298)
-                with m.If((self.i >= 1763) & (self.i < 1769)): m.d.sync += self.o.eq(297)
-                with m.If((self.i >= 1769) & (self.i < 1775)): m.d.sync += self.o.eq(296)
-                with m.If((self.i >= 1775) & (self.i < 1781)): m.d.sync += self.o.eq(295)
-                with m.If((self.i >= 1781) & (self.i < 1787)): m.d.sync += self.o.eq(294)
-                with m.If((self.i >= 1787) & (self.i < 1793)): m.d.sync += self.o.eq(293)
-                with m.If((self.i >= 1793) & (self.i < 1799)): m.d.sync += self.o.eq(292)
-                with m.If((self.i >= 1799) & (self.i < 1805)): m.d.sync += self.o.eq(291)
-                with m.If((self.i >= 1805) & (self.i < 1812)): m.d.sync += self.o.eq(290)
-                with m.If((self.i >= 1812) & (self.i < 1818)): m.d.sync += self.o.eq(289)
-                with m.If((self.i >= 1818) & (self.i < 1824)): m.d.sync += self.o.eq(288)
-                with m.If((self.i >= 1824) & (self.i < 1830)): m.d.sync += self.o.eq(287)
-                with m.If((self.i >= 1830) & (self.i < 1837)): m.d.sync += self.o.eq(286)
-                with m.If((self.i >= 1837) & (self.i < 1843)): m.d.sync += self.o.eq(285)
-                with m.If((self.i >= 1843) & (self.i < 1850)): m.d.sync += self.o.eq(284)
-                with m.If((self.i >= 1850) & (self.i < 1856)): m.d.sync += self.o.eq(283)
-                with m.If((self.i >= 1856) & (self.i < 1863)): m.d.sync += self.o.eq(282)
-                with m.If((self.i >= 1863) & (self.i < 1870)): m.d.sync += self.o.eq(281)
-                with m.If((self.i >= 1870) & (self.i < 1876)): m.d.sync += self.o.eq(280)
-                with m.If((self.i >= 1876) & (self.i < 1883)): m.d.sync += self.o.eq(279)
-                with m.If((self.i >= 1883) & (self.i < 1890)): m.d.sync += self.o.eq(278)
-                with m.If((self.i >= 1890) & (self.i < 1897)): m.d.sync += self.o.eq(277)
-                with m.If((self.i >= 1897) & (self.i < 1904)): m.d.sync += self.o.eq(276)
-                with m.If((self.i >= 1904) & (self.i < 1910)): m.d.sync += self.o.eq(275)
-                with m.If((self.i >= 1910) & (self.i < 1917)): m.d.sync += self.o.eq(274)
-                with m.If((self.i >= 1917) & (self.i < 1924)): m.d.sync += self.o.eq(273)
-                with m.If((self.i >= 1924) & (self.i < 1932)): m.d.sync += self.o.eq(272)
-                with m.If((self.i >= 1932) & (self.i < 1939)): m.d.sync += self.o.eq(271)
-                with m.If((self.i >= 1939) & (self.i < 1946)): m.d.sync += self.o.eq(270)
-                with m.If((self.i >= 1946) & (self.i < 1953)): m.d.sync += self.o.eq(269)
-                with m.If((self.i >= 1953) & (self.i < 1960)): m.d.sync += self.o.eq(268)
-                with m.If((self.i >= 1960) & (self.i < 1968)): m.d.sync += self.o.eq(267)
-                with m.If((self.i >= 1968) & (self.i < 1975)): m.d.sync += self.o.eq(266)
-                with m.If((self.i >= 1975) & (self.i < 1983)): m.d.sync += self.o.eq(265)
-                with m.If((self.i >= 1983) & (self.i < 1990)): m.d.sync += self.o.eq(264)
-                with m.If((self.i >= 1990) & (self.i < 1998)): m.d.sync += self.o.eq(263)
-                with m.If((self.i >= 1998) & (self.i < 2005)): m.d.sync += self.o.eq(262)
-                with m.If((self.i >= 2005) & (self.i < 2013)): m.d.sync += self.o.eq(261)
-                with m.If((self.i >= 2013) & (self.i < 2021)): m.d.sync += self.o.eq(260)
-                with m.If((self.i >= 2021) & (self.i < 2029)): m.d.sync += self.o.eq(259)
-                with m.If((self.i >= 2029) & (self.i < 2037)): m.d.sync += self.o.eq(258)
-                with m.If((self.i >= 2037) & (self.i < 2045)): m.d.sync += self.o.eq(257)
-                with m.If((self.i >= 2045) & (self.i < 2053)): m.d.sync += self.o.eq(256)
-                with m.If((self.i >= 2053) & (self.i < 2061)): m.d.sync += self.o.eq(255)
-                with m.If((self.i >= 2061) & (self.i < 2069)): m.d.sync += self.o.eq(254)
-                with m.If((self.i >= 2069) & (self.i < 2077)): m.d.sync += self.o.eq(253)
-                with m.If((self.i >= 2077) & (self.i < 2085)): m.d.sync += self.o.eq(252)
-                with m.If((self.i >= 2085) & (self.i < 2093)): m.d.sync += self.o.eq(251)
-                with m.If((self.i >= 2093) & (self.i < 2102)): m.d.sync += self.o.eq(250)
-                with m.If((self.i >= 2102) & (self.i < 2110)): m.d.sync += self.o.eq(249)
-                with m.If((self.i >= 2110) & (self.i < 2119)): m.d.sync += self.o.eq(248)
-                with m.If((self.i >= 2119) & (self.i < 2127)): m.d.sync += self.o.eq(247)
-                with m.If((self.i >= 2127) & (self.i < 2136)): m.d.sync += self.o.eq(246)
-                with m.If((self.i >= 2136) & (self.i < 2145)): m.d.sync += self.o.eq(245)
-                with m.If((self.i >= 2145) & (self.i < 2154)): m.d.sync += self.o.eq(244)
-                with m.If((self.i >= 2154) & (self.i < 2163)): m.d.sync += self.o.eq(243)
-                with m.If((self.i >= 2163) & (self.i < 2171)): m.d.sync += self.o.eq(242)
-                with m.If((self.i >= 2171) & (self.i < 2180)): m.d.sync += self.o.eq(241)
-                with m.If((self.i >= 2180) & (self.i < 2190)): m.d.sync += self.o.eq(240)
-                with m.If((self.i >= 2190) & (self.i < 2199)): m.d.sync += self.o.eq(239)
-                with m.If((self.i >= 2199) & (self.i < 2208)): m.d.sync += self.o.eq(238)
-                with m.If((self.i >= 2208) & (self.i < 2217)): m.d.sync += self.o.eq(237)
-                with m.If((self.i >= 2217) & (self.i < 2227)): m.d.sync += self.o.eq(236)
-                with m.If((self.i >= 2227) & (self.i < 2236)): m.d.sync += self.o.eq(235)
-                with m.If((self.i >= 2236) & (self.i < 2246)): m.d.sync += self.o.eq(234)
-                with m.If((self.i >= 2246) & (self.i < 2256)): m.d.sync += self.o.eq(233)
-                with m.If((self.i >= 2256) & (self.i < 2265)): m.d.sync += self.o.eq(232)
-                with m.If((self.i >= 2265) & (self.i < 2275)): m.d.sync += self.o.eq(231)
-                with m.If((self.i >= 2275) & (self.i < 2285)): m.d.sync += self.o.eq(230)
-                with m.If((self.i >= 2285) & (self.i < 2295)): m.d.sync += self.o.eq(229)
-                with m.If((self.i >= 2295) & (self.i < 2305)): m.d.sync += self.o.eq(228)
-                with m.If((self.i >= 2305) & (self.i < 2315)): m.d.sync += self.o.eq(227)
-                with m.If((self.i >= 2315) & (self.i < 2326)): m.d.sync += self.o.eq(226)
-                with m.If((self.i >= 2326) & (self.i < 2336)): m.d.sync += self.o.eq(225)
-                with m.If((self.i >= 2336) & (self.i < 2346)): m.d.sync += self.o.eq(224)
-                with m.If((self.i >= 2346) & (self.i < 2357)): m.d.sync += self.o.eq(223)
-                with m.If((self.i >= 2357) & (self.i < 2367)): m.d.sync += self.o.eq(222)
-                with m.If((self.i >= 2367) & (self.i < 2378)): m.d.sync += self.o.eq(221)
-                with m.If((self.i >= 2378) & (self.i < 2389)): m.d.sync += self.o.eq(220)
-                with m.If((self.i >= 2389) & (self.i < 2400)): m.d.sync += self.o.eq(219)
-                with m.If((self.i >= 2400) & (self.i < 2411)): m.d.sync += self.o.eq(218)
-                with m.If((self.i >= 2411) & (self.i < 2422)): m.d.sync += self.o.eq(217)
-                with m.If((self.i >= 2422) & (self.i < 2433)): m.d.sync += self.o.eq(216)
-                with m.If((self.i >= 2433) & (self.i < 2445)): m.d.sync += self.o.eq(215)
-                with m.If((self.i >= 2445) & (self.i < 2456)): m.d.sync += self.o.eq(214)
-                with m.If((self.i >= 2456) & (self.i < 2468)): m.d.sync += self.o.eq(213)
-                with m.If((self.i >= 2468) & (self.i < 2479)): m.d.sync += self.o.eq(212)
-                with m.If((self.i >= 2479) & (self.i < 2491)): m.d.sync += self.o.eq(211)
-                with m.If((self.i >= 2491) & (self.i < 2503)): m.d.sync += self.o.eq(210)
-                with m.If((self.i >= 2503) & (self.i < 2515)): m.d.sync += self.o.eq(209)
-                with m.If((self.i >= 2515) & (self.i < 2527)): m.d.sync += self.o.eq(208)
-                with m.If((self.i >= 2527) & (self.i < 2539)): m.d.sync += self.o.eq(207)
-                with m.If((self.i >= 2539) & (self.i < 2552)): m.d.sync += self.o.eq(206)
-                with m.If((self.i >= 2552) & (self.i < 2564)): m.d.sync += self.o.eq(205)
-                with m.If((self.i >= 2564) & (self.i < 2577)): m.d.sync += self.o.eq(204)
-                with m.If((self.i >= 2577) & (self.i < 2590)): m.d.sync += self.o.eq(203)
-                with m.If((self.i >= 2590) & (self.i < 2602)): m.d.sync += self.o.eq(202)
-                with m.If((self.i >= 2602) & (self.i < 2615)): m.d.sync += self.o.eq(201)
-                with m.If((self.i >= 2615) & (self.i < 2629)): m.d.sync += self.o.eq(200)
-                with m.If((self.i >= 2629) & (self.i < 2642)): m.d.sync += self.o.eq(199)
-                with m.If((self.i >= 2642) & (self.i < 2655)): m.d.sync += self.o.eq(198)
-                with m.If((self.i >= 2655) & (self.i < 2669)): m.d.sync += self.o.eq(197)
-                with m.If((self.i >= 2669) & (self.i < 2682)): m.d.sync += self.o.eq(196)
-                with m.If((self.i >= 2682) & (self.i < 2696)): m.d.sync += self.o.eq(195)
-                with m.If((self.i >= 2696) & (self.i < 2710)): m.d.sync += self.o.eq(194)
-                with m.If((self.i >= 2710) & (self.i < 2724)): m.d.sync += self.o.eq(193)
-                with m.If((self.i >= 2724) & (self.i < 2738)): m.d.sync += self.o.eq(192)
-                with m.If((self.i >= 2738) & (self.i < 2753)): m.d.sync += self.o.eq(191)
-                with m.If((self.i >= 2753) & (self.i < 2767)): m.d.sync += self.o.eq(190)
-                with m.If((self.i >= 2767) & (self.i < 2782)): m.d.sync += self.o.eq(189)
-                with m.If((self.i >= 2782) & (self.i < 2797)): m.d.sync += self.o.eq(188)
-                with m.If((self.i >= 2797) & (self.i < 2812)): m.d.sync += self.o.eq(187)
-                with m.If((self.i >= 2812) & (self.i < 2827)): m.d.sync += self.o.eq(186)
-                with m.If((self.i >= 2827) & (self.i < 2842)): m.d.sync += self.o.eq(185)
-                with m.If((self.i >= 2842) & (self.i < 2858)): m.d.sync += self.o.eq(184)
-                with m.If((self.i >= 2858) & (self.i < 2873)): m.d.sync += self.o.eq(183)
-                with m.If((self.i >= 2873) & (self.i < 2889)): m.d.sync += self.o.eq(182)
-                with m.If((self.i >= 2889) & (self.i < 2905)): m.d.sync += self.o.eq(181)
-                with m.If((self.i >= 2905) & (self.i < 2921)): m.d.sync += self.o.eq(180)
-                with m.If((self.i >= 2921) & (self.i < 2938)): m.d.sync += self.o.eq(179)
-                with m.If((self.i >= 2938) & (self.i < 2954)): m.d.sync += self.o.eq(178)
-                with m.If((self.i >= 2954) & (self.i < 2971)): m.d.sync += self.o.eq(177)
-                with m.If((self.i >= 2971) & (self.i < 2988)): m.d.sync += self.o.eq(176)
-                with m.If((self.i >= 2988) & (self.i < 3005)): m.d.sync += self.o.eq(175)
-                with m.If((self.i >= 3005) & (self.i < 3022)): m.d.sync += self.o.eq(174)
-                with m.If((self.i >= 3022) & (self.i < 3040)): m.d.sync += self.o.eq(173)
-                with m.If((self.i >= 3040) & (self.i < 3058)): m.d.sync += self.o.eq(172)
-                with m.If((self.i >= 3058) & (self.i < 3076)): m.d.sync += self.o.eq(171)
-                with m.If((self.i >= 3076) & (self.i < 3094)): m.d.sync += self.o.eq(170)
-                with m.If((self.i >= 3094) & (self.i < 3112)): m.d.sync += self.o.eq(169)
-                with m.If((self.i >= 3112) & (self.i < 3131)): m.d.sync += self.o.eq(168)
-                with m.If((self.i >= 3131) & (self.i < 3149)): m.d.sync += self.o.eq(167)
-                with m.If((self.i >= 3149) & (self.i < 3168)): m.d.sync += self.o.eq(166)
-                with m.If((self.i >= 3168) & (self.i < 3188)): m.d.sync += self.o.eq(165)
-                with m.If((self.i >= 3188) & (self.i < 3207)): m.d.sync += self.o.eq(164)
-                with m.If((self.i >= 3207) & (self.i < 3227)): m.d.sync += self.o.eq(163)
-                with m.If((self.i >= 3227) & (self.i < 3247)): m.d.sync += self.o.eq(162)
-                with m.If((self.i >= 3247) & (self.i < 3267)): m.d.sync += self.o.eq(161)
-                with m.If((self.i >= 3267) & (self.i < 3288)): m.d.sync += self.o.eq(160)
-                with m.If((self.i >= 3288) & (self.i < 3308)): m.d.sync += self.o.eq(159)
-                with m.If((self.i >= 3308) & (self.i < 3329)): m.d.sync += self.o.eq(158)
-                with m.If((self.i >= 3329) & (self.i < 3351)): m.d.sync += self.o.eq(157)
-                with m.If((self.i >= 3351) & (self.i < 3372)): m.d.sync += self.o.eq(156)
-                with m.If((self.i >= 3372) & (self.i < 3394)): m.d.sync += self.o.eq(155)
-                with m.If((self.i >= 3394) & (self.i < 3416)): m.d.sync += self.o.eq(154)
-                with m.If((self.i >= 3416) & (self.i < 3438)): m.d.sync += self.o.eq(153)
-                with m.If((self.i >= 3438) & (self.i < 3461)): m.d.sync += self.o.eq(152)
-                with m.If((self.i >= 3461) & (self.i < 3484)): m.d.sync += self.o.eq(151)
-                with m.If((self.i >= 3484) & (self.i < 3507)): m.d.sync += self.o.eq(150)
-                with m.If((self.i >= 3507) & (self.i < 3531)): m.d.sync += self.o.eq(149)
-                with m.If((self.i >= 3531) & (self.i < 3555)): m.d.sync += self.o.eq(148)
-                with m.If((self.i >= 3555) & (self.i < 3579)): m.d.sync += self.o.eq(147)
-                with m.If((self.i >= 3579) & (self.i < 3604)): m.d.sync += self.o.eq(146)
-                with m.If((self.i >= 3604) & (self.i < 3629)): m.d.sync += self.o.eq(145)
-                with m.If((self.i >= 3629) & (self.i < 3654)): m.d.sync += self.o.eq(144)
-                with m.If((self.i >= 3654) & (self.i < 3680)): m.d.sync += self.o.eq(143)
-                with m.If((self.i >= 3680) & (self.i < 3706)): m.d.sync += self.o.eq(142)
-                with m.If((self.i >= 3706) & (self.i < 3732)): m.d.sync += self.o.eq(141)
-                with m.If((self.i >= 3732) & (self.i < 3759)): m.d.sync += self.o.eq(140)
-                with m.If((self.i >= 3759) & (self.i < 3786)): m.d.sync += self.o.eq(139)
-                with m.If((self.i >= 3786) & (self.i < 3814)): m.d.sync += self.o.eq(138)
-                with m.If((self.i >= 3814) & (self.i < 3841)): m.d.sync += self.o.eq(137)
-                with m.If((self.i >= 3841) & (self.i < 3870)): m.d.sync += self.o.eq(136)
-                with m.If((self.i >= 3870) & (self.i < 3899)): m.d.sync += self.o.eq(135)
-                with m.If((self.i >= 3899) & (self.i < 3928)): m.d.sync += self.o.eq(134)
-                with m.If((self.i >= 3928) & (self.i < 3957)): m.d.sync += self.o.eq(133)
-                with m.If((self.i >= 3957) & (self.i < 3987)): m.d.sync += self.o.eq(132)
-                with m.If((self.i >= 3987) & (self.i < 4018)): m.d.sync += self.o.eq(131)
-                with m.If((self.i >= 4018) & (self.i < 4049)): m.d.sync += self.o.eq(130)
-                with m.If((self.i >= 4049) & (self.i < 4081)): m.d.sync += self.o.eq(129)
-                with m.If((self.i >= 4081) & (self.i < 4113)): m.d.sync += self.o.eq(128)
-                with m.If((self.i >= 4113) & (self.i < 4145)): m.d.sync += self.o.eq(127)
-                with m.If((self.i >= 4145) & (self.i < 4178)): m.d.sync += self.o.eq(126)
-                with m.If((self.i >= 4178) & (self.i < 4212)): m.d.sync += self.o.eq(125)
-                with m.If((self.i >= 4212) & (self.i < 4246)): m.d.sync += self.o.eq(124)
-                with m.If((self.i >= 4246) & (self.i < 4280)): m.d.sync += self.o.eq(123)
-                with m.If((self.i >= 4280) & (self.i < 4316)): m.d.sync += self.o.eq(122)
-                with m.If((self.i >= 4316) & (self.i < 4351)): m.d.sync += self.o.eq(121)
-                with m.If((self.i >= 4351) & (self.i < 4388)): m.d.sync += self.o.eq(120)
-                with m.If((self.i >= 4388) & (self.i < 4425)): m.d.sync += self.o.eq(119)
-                with m.If((self.i >= 4425) & (self.i < 4463)): m.d.sync += self.o.eq(118)
-                with m.If((self.i >= 4463) & (self.i < 4501)): m.d.sync += self.o.eq(117)
-                with m.If((self.i >= 4501) & (self.i < 4540)): m.d.sync += self.o.eq(116)
-                with m.If((self.i >= 4540) & (self.i < 4579)): m.d.sync += self.o.eq(115)
-                with m.If((self.i >= 4579) & (self.i < 4620)): m.d.sync += self.o.eq(114)
-                with m.If((self.i >= 4620) & (self.i < 4661)): m.d.sync += self.o.eq(113)
-                with m.If((self.i >= 4661) & (self.i < 4703)): m.d.sync += self.o.eq(112)
-                with m.If((self.i >= 4703) & (self.i < 4745)): m.d.sync += self.o.eq(111)
-                with m.If((self.i >= 4745) & (self.i < 4789)): m.d.sync += self.o.eq(110)
-                with m.If((self.i >= 4789) & (self.i < 4833)): m.d.sync += self.o.eq(109)
-                with m.If((self.i >= 4833) & (self.i < 4878)): m.d.sync += self.o.eq(108)
-                with m.If((self.i >= 4878) & (self.i < 4923)): m.d.sync += self.o.eq(107)
-                with m.If((self.i >= 4923) & (self.i < 4970)): m.d.sync += self.o.eq(106)
-                with m.If((self.i >= 4970) & (self.i < 5018)): m.d.sync += self.o.eq(105)
-                with m.If((self.i >= 5018) & (self.i < 5066)): m.d.sync += self.o.eq(104)
-                with m.If((self.i >= 5066) & (self.i < 5116)): m.d.sync += self.o.eq(103)
-                with m.If((self.i >= 5116) & (self.i < 5166)): m.d.sync += self.o.eq(102)
-                with m.If((self.i >= 5166) & (self.i < 5217)): m.d.sync += self.o.eq(101)
-                with m.If((self.i >= 5217) & (self.i < 5270)): m.d.sync += self.o.eq(100)
-                with m.If((self.i >= 5270) & (self.i < 5323)): m.d.sync += self.o.eq(99)
-                with m.If((self.i >= 5323) & (self.i < 5378)): m.d.sync += self.o.eq(98)
-                with m.If((self.i >= 5378) & (self.i < 5434)): m.d.sync += self.o.eq(97)
-                with m.If((self.i >= 5434) & (self.i < 5490)): m.d.sync += self.o.eq(96)
-                with m.If((self.i >= 5490) & (self.i < 5549)): m.d.sync += self.o.eq(95)
-                with m.If((self.i >= 5549) & (self.i < 5608)): m.d.sync += self.o.eq(94)
-                with m.If((self.i >= 5608) & (self.i < 5668)): m.d.sync += self.o.eq(93)
-                with m.If((self.i >= 5668) & (self.i < 5730)): m.d.sync += self.o.eq(92)
-                with m.If((self.i >= 5730) & (self.i < 5794)): m.d.sync += self.o.eq(91)
-                with m.If((self.i >= 5794) & (self.i < 5858)): m.d.sync += self.o.eq(90)
-                with m.If((self.i >= 5858) & (self.i < 5925)): m.d.sync += self.o.eq(89)
-                with m.If((self.i >= 5925) & (self.i < 5992)): m.d.sync += self.o.eq(88)
-                with m.If((self.i >= 5992) & (self.i < 6062)): m.d.sync += self.o.eq(87)
-                with m.If((self.i >= 6062) & (self.i < 6133)): m.d.sync += self.o.eq(86)
-                with m.If((self.i >= 6133) & (self.i < 6205)): m.d.sync += self.o.eq(85)
-                with m.If((self.i >= 6205) & (self.i < 6279)): m.d.sync += self.o.eq(84)
-                with m.If((self.i >= 6279) & (self.i < 6356)): m.d.sync += self.o.eq(83)
-                with m.If((self.i >= 6356) & (self.i < 6433)): m.d.sync += self.o.eq(82)
-                with m.If((self.i >= 6433) & (self.i < 6513)): m.d.sync += self.o.eq(81)
-                with m.If((self.i >= 6513) & (self.i < 6595)): m.d.sync += self.o.eq(80)
-                with m.If((self.i >= 6595) & (self.i < 6679)): m.d.sync += self.o.eq(79)
-                with m.If((self.i >= 6679) & (self.i < 6766)): m.d.sync += self.o.eq(78)
-                with m.If((self.i >= 6766) & (self.i < 6854)): m.d.sync += self.o.eq(77)
-                with m.If((self.i >= 6854) & (self.i < 6945)): m.d.sync += self.o.eq(76)
-                with m.If((self.i >= 6945) & (self.i < 7038)): m.d.sync += self.o.eq(75)
-                with m.If((self.i >= 7038) & (self.i < 7134)): m.d.sync += self.o.eq(74)
-                with m.If((self.i >= 7134) & (self.i < 7232)): m.d.sync += self.o.eq(73)
-                with m.If((self.i >= 7232) & (self.i < 7333)): m.d.sync += self.o.eq(72)
-                with m.If((self.i >= 7333) & (self.i < 7437)): m.d.sync += self.o.eq(71)
-                with m.If((self.i >= 7437) & (self.i < 7544)): m.d.sync += self.o.eq(70)
-                with m.If((self.i >= 7544) & (self.i < 7654)): m.d.sync += self.o.eq(69)
-                with m.If((self.i >= 7654) & (self.i < 7768)): m.d.sync += self.o.eq(68)
-                with m.If((self.i >= 7768) & (self.i < 7885)): m.d.sync += self.o.eq(67)
-                with m.If((self.i >= 7885) & (self.i < 8005)): m.d.sync += self.o.eq(66)
-                with m.If((self.i >= 8005) & (self.i < 8129)): m.d.sync += self.o.eq(65)
-                with m.If((self.i >= 8129) & (self.i < 8257)): m.d.sync += self.o.eq(64)
-                with m.If((self.i >= 8257) & (self.i < 8389)): m.d.sync += self.o.eq(63)
-                with m.If((self.i >= 8389) & (self.i < 8526)): m.d.sync += self.o.eq(62)
-                with m.If((self.i >= 8526) & (self.i < 8666)): m.d.sync += self.o.eq(61)
-                with m.If((self.i >= 8666) & (self.i < 8812)): m.d.sync += self.o.eq(60)
-                with m.If((self.i >= 8812) & (self.i < 8963)): m.d.sync += self.o.eq(59)
-                with m.If((self.i >= 8963) & (self.i < 9119)): m.d.sync += self.o.eq(58)
-                with m.If((self.i >= 9119) & (self.i < 9280)): m.d.sync += self.o.eq(57)
-                with m.If((self.i >= 9280) & (self.i < 9447)): m.d.sync += self.o.eq(56)
-                with m.If((self.i >= 9447) & (self.i < 9620)): m.d.sync += self.o.eq(55)
-                with m.If((self.i >= 9620) & (self.i < 9800)): m.d.sync += self.o.eq(54)
-                with m.If((self.i >= 9800) & (self.i < 9987)): m.d.sync += self.o.eq(53)
-                with m.If((self.i >= 9987) & (self.i < 10181)): m.d.sync += self.o.eq(52)
-                with m.If((self.i >= 10181) & (self.i < 10382)): m.d.sync += self.o.eq(51)
-                with m.If((self.i >= 10382) & (self.i < 10592)): m.d.sync += self.o.eq(50)
-                with m.If((self.i >= 10592) & (self.i < 10811)): m.d.sync += self.o.eq(49)
-                with m.If((self.i >= 10811) & (self.i < 11038)): m.d.sync += self.o.eq(48)
-                with m.If((self.i >= 11038) & (self.i < 11276)): m.d.sync += self.o.eq(47)
-                with m.If((self.i >= 11276) & (self.i < 11523)): m.d.sync += self.o.eq(46)
-                with m.If((self.i >= 11523) & (self.i < 11782)): m.d.sync += self.o.eq(45)
-                with m.If((self.i >= 11782) & (self.i < 12053)): m.d.sync += self.o.eq(44)
-                with m.If((self.i >= 12053) & (self.i < 12337)): m.d.sync += self.o.eq(43)
-                with m.If((self.i >= 12337) & (self.i < 12634)): m.d.sync += self.o.eq(42)
-                with m.If((self.i >= 12634) & (self.i < 12946)): m.d.sync += self.o.eq(41)
-                with m.If((self.i >= 12946) & (self.i < 13274)): m.d.sync += self.o.eq(40)
-                with m.If((self.i >= 13274) & (self.i < 13618)): m.d.sync += self.o.eq(39)
-                with m.If((self.i >= 13618) & (self.i < 13982)): m.d.sync += self.o.eq(38)
-                with m.If((self.i >= 13982) & (self.i < 14365)): m.d.sync += self.o.eq(37)
-                with m.If((self.i >= 14365) & (self.i < 14769)): m.d.sync += self.o.eq(36)
-                with m.If((self.i >= 14769) & (self.i < 15197)): m.d.sync += self.o.eq(35)
-                with m.If((self.i >= 15197) & (self.i < 15651)): m.d.sync += self.o.eq(34)
-                with m.If((self.i >= 15651) & (self.i < 16132)): m.d.sync += self.o.eq(33)
-                with m.If((self.i >= 16132) & (self.i < 16645)): m.d.sync += self.o.eq(32)
-                with m.If((self.i >= 16645) & (self.i < 17190)): m.d.sync += self.o.eq(31)
-                with m.If((self.i >= 17190) & (self.i < 17773)): m.d.sync += self.o.eq(30)
-                with m.If((self.i >= 17773) & (self.i < 18397)): m.d.sync += self.o.eq(29)
-                with m.If((self.i >= 18397) & (self.i < 19066)): m.d.sync += self.o.eq(28)
-                with m.If((self.i >= 19066) & (self.i < 19785)): m.d.sync += self.o.eq(27)
-                with m.If((self.i >= 19785) & (self.i < 20561)): m.d.sync += self.o.eq(26)
-                with m.If((self.i >= 20561) & (self.i < 21400)): m.d.sync += self.o.eq(25)
-                with m.If((self.i >= 21400) & (self.i < 22311)): m.d.sync += self.o.eq(24)
-                with m.If((self.i >= 22311) & (self.i < 23302)): m.d.sync += self.o.eq(23)
-                with m.If((self.i >= 23302) & (self.i < 24386)): m.d.sync += self.o.eq(22)
-                with m.If((self.i >= 24386) & (self.i < 25576)): m.d.sync += self.o.eq(21)
-                with m.If((self.i >= 25576) & (self.i < 26887)): m.d.sync += self.o.eq(20)
-                with m.If((self.i >= 26887) & (self.i < 28340)): m.d.sync += self.o.eq(19)
-                with m.If((self.i >= 28340) & (self.i < 29960)): m.d.sync += self.o.eq(18)
-                with m.If((self.i >= 29960) & (self.i < 31776)): m.d.sync += self.o.eq(17)
-                with m.If((self.i >= 31776) & (self.i < 33826)): m.d.sync += self.o.eq(16)
-                with m.If((self.i >= 33826) & (self.i < 36158)): m.d.sync += self.o.eq(15)
-                with m.If((self.i >= 36158) & (self.i < 38837)): m.d.sync += self.o.eq(14)
-                with m.If((self.i >= 38837) & (self.i < 41944)): m.d.sync += self.o.eq(13)
-                with m.If((self.i >= 41944) & (self.i < 45591)): m.d.sync += self.o.eq(12)
-                with m.If((self.i >= 45591) & (self.i < 49933)): m.d.sync += self.o.eq(11)
-                with m.If((self.i >= 49933) & (self.i < 55189)): m.d.sync += self.o.eq(10)
-                with m.If((self.i >= 55189) & (self.i < 61681)): m.d.sync += self.o.eq(9)
-                with m.If((self.i >= 61681) & (self.i < 65536)): m.d.sync += self.o.eq(8)
-
                 with m.If(self.i_hold):
                     m.next = "HOLD"
 
             with m.State("HOLD"):
+                m.d.comb += self.table.i_en.eq(0)
+
                 with m.If(~self.i_hold):
                     m.next = "START"
 
@@ -1499,6 +171,134 @@ class FixedPointDivider(Elaboratable):
 
         return m
 
+
+class PipelinedDivider(Elaboratable):
+    def __init__(self, width=16, stages=2, table_bits=6, tag_width=0):
+        # Newton-Raphson divider: a small seed ROM gives an estimate of the
+        # reciprocal of the normalised denominator, and each refinement stage
+        # roughly doubles its number of correct bits via x = x * (2 - d * x).
+        # Every stage advances together, so one divide is accepted per clock.
+        # Wider numerators need more refinement stages to divide exactly.
+        self.width      = width      # Numerator and quotient width
+        self.stages     = stages     # Number of refinement stages
+        self.table_bits = table_bits # Seed ROM index width
+        self.frac       = width + 4  # Fraction bits of the internal reciprocal
+        self.latency    = 2 * stages + 2
+
+        self.i_valid = Signal()              # Input operands are valid
+        self.o_ready = Signal()              # Input operands are accepted this cycle
+        self.i_n     = Signal((width, True)) # Q12.4; numerator
+        self.i_d     = Signal(16)            # Q12.4; denominator
+        self.i_tag   = Signal(tag_width)     # Carried alongside the operands
+
+        self.o_valid = Signal()              # Quotient is valid
+        self.i_ready = Signal()              # Quotient is accepted this cycle
+        self.o_q     = Signal((width, True)) # Q12.4; numerator / denominator, saturated, or 0 if the denominator is 0
+        self.o_tag   = Signal(tag_width)     # Tag of the operands that produced o_q
+
+        self.seed    = ReciprocalTable(width=table_bits + 1, in_frac=table_bits,
+                                       out_width=self.frac + 1, out_frac=self.frac,
+                                       table_bits=table_bits)
+
+        self.sideband = [
+            ("valid", 1),
+            ("tag", tag_width),
+            ("n", width), # Q12.4; absolute numerator
+            ("neg", 1),   # Numerator is negative
+            ("zero", 1),  # Denominator is zero
+            ("lead", 4),  # Position of the denominator's leading one
+            ("norm", 16)  # Q1.15; normalised denominator
+        ]
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.seed = self.seed
+
+        # The whole pipeline stalls only when the quotient is not accepted.
+        advance = Signal()
+        m.d.comb += [
+            advance.eq(~self.o_valid | self.i_ready),
+            self.o_ready.eq(advance)
+        ]
+
+        # Normalise the denominator; later assignments take priority.
+        lead = Signal(4)
+        for bit in range(16):
+            with m.If(self.i_d[bit]):
+                m.d.comb += lead.eq(bit)
+
+        norm = Signal(16)
+        m.d.comb += [
+            norm.eq(self.i_d << (15 - lead)),
+
+            self.seed.i.eq(norm[15 - self.table_bits:]),
+            self.seed.i_en.eq(advance)
+        ]
+
+        side = Record(self.sideband)
+        with m.If(advance):
+            m.d.sync += [
+                side.valid.eq(self.i_valid),
+                side.tag.eq(self.i_tag),
+                side.n.eq(Mux(self.i_n < 0, -self.i_n, self.i_n)),
+                side.neg.eq(self.i_n < 0),
+                side.zero.eq(self.i_d == 0),
+                side.lead.eq(lead),
+                side.norm.eq(norm)
+            ]
+
+        x = self.seed.o
+
+        for stage in range(self.stages):
+            # e = 2 - d * x
+            e_side = Record(self.sideband)
+            e_x    = Signal(self.frac + 1)
+            e      = Signal(self.frac + 2)
+            with m.If(advance):
+                m.d.sync += [
+                    e_side.eq(side),
+                    e_x.eq(x),
+                    e.eq((2 << self.frac) - ((side.norm * x) >> 15))
+                ]
+
+            # x = x * e
+            x_side = Record(self.sideband)
+            x_next = Signal(self.frac + 1)
+            with m.If(advance):
+                m.d.sync += [
+                    x_side.eq(e_side),
+                    x_next.eq((e_x * e) >> self.frac)
+                ]
+
+            side, x = x_side, x_next
+
+        # q = n * x, shifted back by the denominator's exponent and rounded to nearest.
+        # Denominators below one can give quotients too large for o_q, so these
+        # saturate rather than wrap.
+        quotient = Signal(self.width + 5)
+        m.d.comb += quotient.eq((((side.n * x) >> (side.lead + self.frac - 5)) + 1) >> 1)
+
+        q_max = (1 << (self.width - 1)) - 1
+        saturated = Signal(self.width - 1)
+        m.d.comb += saturated.eq(Mux(quotient > q_max, q_max, quotient))
+
+        with m.If(advance):
+            m.d.sync += [
+                self.o_valid.eq(side.valid),
+                self.o_tag.eq(side.tag)
+            ]
+
+            with m.If(side.zero):
+                m.d.sync += self.o_q.eq(0)
+            with m.Elif(side.neg):
+                m.d.sync += self.o_q.eq(-saturated)
+            with m.Else():
+                m.d.sync += self.o_q.eq(saturated)
+
+        return m
+
+
 class DDA(Elaboratable):
     def __init__(self):
         # Pixel start coordinates
@@ -1516,3 +316,1415 @@ class DDA(Elaboratable):
         self.i_dr    = Signal(16) # Q12.4; unit red increment
         self.i_dg    = Signal(16) # Q12.4; unit green increment
         self.i_db    = Signal(16) # Q12.4; unit blue increment
+
+
+class SpriteGenerator(Elaboratable):
+    def __init__(self, lanes=16):
+        # Axis-aligned rectangles need no edge walking: the sprite is swept a
+        # row at a time, `lanes` pixels per clock, with constant colour. Spans
+        # are aligned to the lane count, so lane k always draws pixels with
+        # x % lanes == k.
+        #
+        # U steps linearly from the left corner to the right one, and V from
+        # the top corner to the bottom one; their per-pixel increments are
+        # divided out while the previous sprite is swept, with the sprite's
+        # setup travelling through the U divider as its tag. Untextured sprites
+        # need no increments, so go around the dividers and are loaded in the
+        # clock they are accepted, once every textured sprite ahead of them has
+        # been loaded.
+        self.lanes   = lanes    # Pixels emitted per clock; a power of two
+
+        # Input sprite corners; either corner may come first.
+        self.i_x0    = Signal(16) # Q12.4; corner 0 X coordinate
+        self.i_y0    = Signal(16) # Q12.4; corner 0 Y coordinate
+        self.i_x1    = Signal(16) # Q12.4; corner 1 X coordinate
+        self.i_y1    = Signal(16) # Q12.4; corner 1 Y coordinate
+
+        # Input texel coordinates at each corner
+        self.i_u0    = Signal(16) # Q12.4; corner 0 U coordinate
+        self.i_v0    = Signal(16) # Q12.4; corner 0 V coordinate
+        self.i_u1    = Signal(16) # Q12.4; corner 1 U coordinate
+        self.i_v1    = Signal(16) # Q12.4; corner 1 V coordinate
+
+        # XYOFFSET; subtracted from the corners to give window coordinates
+        self.i_ofx   = Signal(16) # Q12.4; X offset
+        self.i_ofy   = Signal(16) # Q12.4; Y offset
+
+        # SCISSOR; inclusive window coordinates of the drawable area
+        self.i_scax0 = Signal(11)             # Q11.0; leftmost column
+        self.i_scax1 = Signal(11, reset=2047) # Q11.0; rightmost column
+        self.i_scay0 = Signal(11)             # Q11.0; top row
+        self.i_scay1 = Signal(11, reset=2047) # Q11.0; bottom row
+
+        # Input colour
+        self.i_r     = Signal(8)  # Q8.0; red channel
+        self.i_g     = Signal(8)  # Q8.0; green channel
+        self.i_b     = Signal(8)  # Q8.0; blue channel
+        self.i_a     = Signal(8)  # Q8.0; alpha channel
+        self.i_f     = Signal(8)  # Q8.0; fog coefficient
+
+        # Input depth
+        self.i_z     = Signal(32) # Q32.0; Z coordinate
+
+        self.i_tme   = Signal()   # Whether the sprite is textured (TME); Off or On
+
+        self.i_valid = Signal() # Input sprite is valid
+        self.o_ready = Signal() # Input sprite is accepted this cycle
+
+        # Output span; lane k is pixel k of the span.
+        self.o_pixels = [Record(PIXEL) for i in range(lanes)]
+        self.o_mask  = Signal(lanes) # Coverage mask; bit k is o_pixels[k].valid
+
+        self.o_valid = Signal() # Output span is valid
+        self.o_last  = Signal() # Last span of the sprite
+        self.i_ready = Signal() # Output span is accepted this cycle
+
+        # Sprite bounds in pixels, clipped to the scissor rectangle; the maximum
+        # is exclusive.
+        self.r_min_x = Signal(12)
+        self.r_min_y = Signal(12)
+        self.r_max_x = Signal(13)
+        self.r_max_y = Signal(13)
+
+        # Current span, in pixels
+        self.r_x     = Signal(12)
+        self.r_y     = Signal(12)
+
+        self.r_red   = Signal(8)
+        self.r_green = Signal(8)
+        self.r_blue  = Signal(8)
+        self.r_alpha = Signal(8)
+        self.r_fog   = Signal(8)
+        self.r_z     = Signal(32)
+
+        # U at the start of each row and of the current span, and V of the
+        # current row; Q.8
+        self.r_u_row = Signal((24, True))
+        self.r_u     = Signal((24, True))
+        self.r_v     = Signal((24, True))
+
+        # Per-pixel increments; Q13.8
+        self.r_dudx  = Signal((22, True))
+        self.r_dvdy  = Signal((22, True))
+
+        # Setup of a sprite, as it travels through the U divider.
+        self.setup = [
+            ("min_x", 12),
+            ("min_y", 12),
+            ("max_x", 13),
+            ("max_y", 13),
+
+            ("r", 8),
+            ("g", 8),
+            ("b", 8),
+            ("a", 8),
+            ("f", 8),
+            ("z", 32),
+
+            ("u", 16),          # Q12.4; U at the left corner
+            ("v", 16),          # Q12.4; V at the top corner
+            ("du", (18, True)), # Q14.4; X of the first span, less that of the left corner
+            ("dv", (18, True))  # Q14.4; Y of the first row, less that of the top corner
+        ]
+
+        # Increment dividers; the numerators have four extra fraction bits, so
+        # that the quotients are Q13.8.
+        self.r_udiv  = PipelinedDivider(width=22, stages=3, tag_width=len(Record(self.setup)))
+        self.r_vdiv  = PipelinedDivider(width=22, stages=3)
+
+        # Textured sprites taken by the dividers but not yet loaded
+        self.r_queued = Signal(range(self.r_udiv.latency + 2))
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.udiv = self.r_udiv
+        m.submodules.vdiv = self.r_vdiv
+
+        # Corners in window coordinates; signed, as they may lie off screen.
+        x0 = Signal((17, True))
+        y0 = Signal((17, True))
+        x1 = Signal((17, True))
+        y1 = Signal((17, True))
+        m.d.comb += [
+            x0.eq(self.i_x0 - self.i_ofx),
+            y0.eq(self.i_y0 - self.i_ofy),
+            x1.eq(self.i_x1 - self.i_ofx),
+            y1.eq(self.i_y1 - self.i_ofy)
+        ]
+
+        # Pixels are covered if they lie within [min, max) of the sprite.
+        min_x = Signal((14, True))
+        min_y = Signal((14, True))
+        max_x = Signal((14, True))
+        max_y = Signal((14, True))
+        m.d.comb += [
+            min_x.eq((Mux(x0 < x1, x0, x1) + 15) >> 4),
+            min_y.eq((Mux(y0 < y1, y0, y1) + 15) >> 4),
+            max_x.eq((Mux(x0 < x1, x1, x0) + 15) >> 4),
+            max_y.eq((Mux(y0 < y1, y1, y0) + 15) >> 4)
+        ]
+
+        # Clip to the scissor rectangle, so that no span lies wholly outside it.
+        clip_min_x = Signal((14, True))
+        clip_min_y = Signal((14, True))
+        clip_max_x = Signal((14, True))
+        clip_max_y = Signal((14, True))
+        m.d.comb += [
+            clip_min_x.eq(Mux(min_x < self.i_scax0, self.i_scax0, min_x)),
+            clip_min_y.eq(Mux(min_y < self.i_scay0, self.i_scay0, min_y)),
+            clip_max_x.eq(Mux(max_x > self.i_scax1 + 1, self.i_scax1 + 1, max_x)),
+            clip_max_y.eq(Mux(max_y > self.i_scay1 + 1, self.i_scay1 + 1, max_y))
+        ]
+
+        # Zero-area sprites and those entirely outside the scissor rectangle
+        # cover nothing, so are dropped before they are loaded.
+        empty = Signal()
+        m.d.comb += empty.eq((clip_min_x >= clip_max_x) | (clip_min_y >= clip_max_y))
+
+        # U and V change across the sprite by du and dv, over dx and dy.
+        du = Signal((17, True))
+        dv = Signal((17, True))
+        m.d.comb += [
+            du.eq(Mux(x0 < x1, self.i_u1 - self.i_u0, self.i_u0 - self.i_u1)),
+            dv.eq(Mux(y0 < y1, self.i_v1 - self.i_v0, self.i_v0 - self.i_v1)),
+
+            self.r_udiv.i_n.eq(du << 4),
+            self.r_udiv.i_d.eq(Mux(x0 < x1, x1 - x0, x0 - x1)),
+            self.r_vdiv.i_n.eq(dv << 4),
+            self.r_vdiv.i_d.eq(Mux(y0 < y1, y1 - y0, y0 - y1))
+        ]
+
+        setup = Record(self.setup)
+        m.d.comb += [
+            setup.min_x.eq(clip_min_x),
+            setup.min_y.eq(clip_min_y),
+            setup.max_x.eq(clip_max_x),
+            setup.max_y.eq(clip_max_y),
+
+            setup.r.eq(self.i_r),
+            setup.g.eq(self.i_g),
+            setup.b.eq(self.i_b),
+            setup.a.eq(self.i_a),
+            setup.f.eq(self.i_f),
+            setup.z.eq(self.i_z),
+
+            setup.u.eq(Mux(x0 < x1, self.i_u0, self.i_u1)),
+            setup.v.eq(Mux(y0 < y1, self.i_v0, self.i_v1)),
+            setup.du.eq(((clip_min_x & ~(self.lanes - 1)) << 4) - Mux(x0 < x1, x0, x1)),
+            setup.dv.eq((clip_min_y << 4) - Mux(y0 < y1, y0, y1))
+        ]
+
+        # Output spans are held until accepted.
+        with m.If(self.i_ready):
+            m.d.sync += self.o_valid.eq(0)
+
+        m.d.comb += self.o_mask.eq(Cat(pixel.valid for pixel in self.o_pixels))
+
+        # The next sprite waits in the dividers' output registers while the
+        # current one is swept, and is loaded in the same clock as its last
+        # span, so back-to-back sprites sweep without idle clocks. An
+        # untextured sprite is loaded straight from the inputs instead, when
+        # none is waiting in the dividers.
+        free = Signal()
+        direct = Signal()
+        load = Signal()
+        m.d.comb += [
+            direct.eq(free & self.i_valid & ~self.i_tme & ~empty & (self.r_queued == 0)),
+            load.eq(direct | (free & self.r_udiv.o_valid)),
+
+            self.o_ready.eq(Mux(self.i_tme, self.r_udiv.o_ready, free & (self.r_queued == 0))),
+            self.r_udiv.i_tag.eq(setup)
+        ]
+
+        for div in [self.r_udiv, self.r_vdiv]:
+            m.d.comb += [
+                div.i_valid.eq(self.i_valid & self.i_tme & ~empty),
+                div.i_ready.eq(load)
+            ]
+
+        m.d.sync += self.r_queued.eq(self.r_queued + (self.r_udiv.i_valid & self.r_udiv.o_ready)
+                                     - (load & ~direct))
+
+        with m.FSM():
+            with m.State("IDLE"):
+                m.d.comb += free.eq(1)
+
+                with m.If(load):
+                    m.next = "SWEEP"
+
+            with m.State("SWEEP"):
+                end_of_row = Signal()
+                last = Signal()
+                m.d.comb += [
+                    end_of_row.eq(self.r_x + self.lanes >= self.r_max_x),
+                    last.eq(end_of_row & (self.r_y + 1 >= self.r_max_y))
+                ]
+
+                with m.If(~self.o_valid | self.i_ready):
+                    for lane, pixel in enumerate(self.o_pixels):
+                        x = self.r_x + lane
+                        m.d.sync += [
+                            pixel.valid.eq((x >= self.r_min_x) & (x < self.r_max_x)),
+
+                            pixel.x.eq(x),
+                            pixel.y.eq(self.r_y),
+
+                            pixel.z.eq(self.r_z),
+
+                            pixel.r.eq(self.r_red),
+                            pixel.g.eq(self.r_green),
+                            pixel.b.eq(self.r_blue),
+                            pixel.a.eq(self.r_alpha),
+                            pixel.f.eq(self.r_fog),
+
+                            pixel.u.eq((self.r_u + lane * self.r_dudx) >> 4),
+                            pixel.v.eq(self.r_v >> 4)
+                        ]
+
+                    m.d.sync += [
+                        self.o_valid.eq(1),
+                        self.o_last.eq(last)
+                    ]
+
+                    # Step to the next span
+                    with m.If(end_of_row):
+                        m.d.sync += [
+                            self.r_x.eq(self.r_min_x & ~(self.lanes - 1)),
+                            self.r_y.eq(self.r_y + 1),
+
+                            self.r_u.eq(self.r_u_row),
+                            self.r_v.eq(self.r_v + self.r_dvdy)
+                        ]
+                    with m.Else():
+                        m.d.sync += [
+                            self.r_x.eq(self.r_x + self.lanes),
+                            self.r_u.eq(self.r_u + self.lanes * self.r_dudx)
+                        ]
+
+                    with m.If(last):
+                        m.d.comb += free.eq(1)
+
+                        with m.If(~load):
+                            m.next = "IDLE"
+
+        # This comes last so that it takes priority over stepping the current
+        # sprite.
+        with m.If(load):
+            upcoming = Record(self.setup)
+            dudx = Signal.like(self.r_dudx)
+            dvdy = Signal.like(self.r_dvdy)
+            m.d.comb += [
+                upcoming.eq(Mux(direct, setup, self.r_udiv.o_tag)),
+                dudx.eq(Mux(direct, 0, self.r_udiv.o_q)),
+                dvdy.eq(Mux(direct, 0, self.r_vdiv.o_q))
+            ]
+
+            # Both start half an output LSB up, so that they round to nearest
+            # as they are shifted down for each pixel.
+            u_row = Signal.like(self.r_u_row)
+            m.d.comb += u_row.eq((upcoming.u << 4) + ((upcoming.du * dudx) >> 4) + 8)
+
+            m.d.sync += [
+                self.r_min_x.eq(upcoming.min_x),
+                self.r_min_y.eq(upcoming.min_y),
+                self.r_max_x.eq(upcoming.max_x),
+                self.r_max_y.eq(upcoming.max_y),
+
+                self.r_x.eq(upcoming.min_x & ~(self.lanes - 1)),
+                self.r_y.eq(upcoming.min_y),
+
+                self.r_red.eq(upcoming.r),
+                self.r_green.eq(upcoming.g),
+                self.r_blue.eq(upcoming.b),
+                self.r_alpha.eq(upcoming.a),
+                self.r_fog.eq(upcoming.f),
+                self.r_z.eq(upcoming.z),
+
+                self.r_u_row.eq(u_row),
+                self.r_u.eq(u_row),
+                self.r_v.eq((upcoming.v << 4) + ((upcoming.dv * dvdy) >> 4) + 8),
+
+                self.r_dudx.eq(dudx),
+                self.r_dvdy.eq(dvdy)
+            ]
+
+        return m
+
+
+class TriangleRasteriser(Elaboratable):
+    def __init__(self, block_width=8, block_height=2, coarse_z=False, perspective=True):
+        # Half-space rasteriser: each edge of the triangle is a linear function
+        # E(x, y) = A * x + B * y + C that is non-negative inside the triangle.
+        # The bounding box is swept one block at a time, and every pixel of a
+        # block is tested against all three edges in the same clock, giving one
+        # lane of coverage per pixel of the block.
+        #
+        # With coarse Z, the lower Z bound of the 8x8 tile holding each block
+        # is asked for a clock ahead, and pixels of a GEQUAL or GREATER Z
+        # tested triangle whose Z is below it are dropped as uncovered, since
+        # they would fail the Z test anyway; see CoarseZ.
+        #
+        # With perspective, blocks then pass through a PerspectiveDivider, so
+        # that each pixel leaves with U and V, from S / Q and T / Q unless the
+        # triangle gives them directly.
+        self.block_width  = block_width  # Block width in pixels; a power of two
+        self.block_height = block_height # Block height in pixels; a power of two
+        self.lanes        = block_width * block_height
+        self.coarse_z     = coarse_z     # Whether to reject pixels by coarse Z
+        self.perspective  = perspective  # Whether to divide out U and V
+
+        assert not coarse_z or (block_width <= 8 and block_height <= 8), "blocks must lie within one coarse Z tile"
+
+        # Input triangle vertices
+        self.i_x0    = Signal(16) # Q12.4; vertex 0 X coordinate
+        self.i_y0    = Signal(16) # Q12.4; vertex 0 Y coordinate
+        self.i_x1    = Signal(16) # Q12.4; vertex 1 X coordinate
+        self.i_y1    = Signal(16) # Q12.4; vertex 1 Y coordinate
+        self.i_x2    = Signal(16) # Q12.4; vertex 2 X coordinate
+        self.i_y2    = Signal(16) # Q12.4; vertex 2 Y coordinate
+
+        # XYOFFSET; subtracted from the vertices to give window coordinates
+        self.i_ofx   = Signal(16) # Q12.4; X offset
+        self.i_ofy   = Signal(16) # Q12.4; Y offset
+
+        # SCISSOR; inclusive window coordinates of the drawable area
+        self.i_scax0 = Signal(11)             # Q11.0; leftmost column
+        self.i_scax1 = Signal(11, reset=2047) # Q11.0; rightmost column
+        self.i_scay0 = Signal(11)             # Q11.0; top row
+        self.i_scay1 = Signal(11, reset=2047) # Q11.0; bottom row
+
+        # Attributes at vertex 0, and their per-pixel gradients
+        self.i_r0    = Signal(8)          # Q8.0; red channel at vertex 0
+        self.i_g0    = Signal(8)          # Q8.0; green channel at vertex 0
+        self.i_b0    = Signal(8)          # Q8.0; blue channel at vertex 0
+        self.i_a0    = Signal(8)          # Q8.0; alpha channel at vertex 0
+        self.i_f0    = Signal(8)          # Q8.0; fog coefficient at vertex 0
+        self.i_z0    = Signal(32)         # Q32.0; Z coordinate at vertex 0
+        self.i_s0    = Signal((24, True)) # Q16.8; S coordinate at vertex 0
+        self.i_t0    = Signal((24, True)) # Q16.8; T coordinate at vertex 0
+        self.i_q0    = Signal(16)         # Q4.12; Q coordinate at vertex 0
+        self.i_u0    = Signal(16)         # Q12.4; U coordinate at vertex 0
+        self.i_v0    = Signal(16)         # Q12.4; V coordinate at vertex 0
+
+        self.i_drdx  = Signal((16, True)) # Q12.4; red increment per pixel in X
+        self.i_drdy  = Signal((16, True)) # Q12.4; red increment per pixel in Y
+        self.i_dgdx  = Signal((16, True)) # Q12.4; green increment per pixel in X
+        self.i_dgdy  = Signal((16, True)) # Q12.4; green increment per pixel in Y
+        self.i_dbdx  = Signal((16, True)) # Q12.4; blue increment per pixel in X
+        self.i_dbdy  = Signal((16, True)) # Q12.4; blue increment per pixel in Y
+        self.i_dadx  = Signal((16, True)) # Q12.4; alpha increment per pixel in X
+        self.i_dady  = Signal((16, True)) # Q12.4; alpha increment per pixel in Y
+        self.i_dfdx  = Signal((16, True)) # Q12.4; fog increment per pixel in X
+        self.i_dfdy  = Signal((16, True)) # Q12.4; fog increment per pixel in Y
+        self.i_dzdx  = Signal((37, True)) # Q33.4; Z increment per pixel in X
+        self.i_dzdy  = Signal((37, True)) # Q33.4; Z increment per pixel in Y
+        self.i_dsdx  = Signal((29, True)) # Q17.12; S increment per pixel in X
+        self.i_dsdy  = Signal((29, True)) # Q17.12; S increment per pixel in Y
+        self.i_dtdx  = Signal((29, True)) # Q17.12; T increment per pixel in X
+        self.i_dtdy  = Signal((29, True)) # Q17.12; T increment per pixel in Y
+        self.i_dqdx  = Signal((21, True)) # Q5.16; Q increment per pixel in X
+        self.i_dqdy  = Signal((21, True)) # Q5.16; Q increment per pixel in Y
+        self.i_dudx  = Signal((21, True)) # Q13.8; U increment per pixel in X
+        self.i_dudy  = Signal((21, True)) # Q13.8; U increment per pixel in Y
+        self.i_dvdx  = Signal((21, True)) # Q13.8; V increment per pixel in X
+        self.i_dvdy  = Signal((21, True)) # Q13.8; V increment per pixel in Y
+
+        # TEST; the triangle's Z test, for coarse Z rejection
+        self.i_zte   = Signal()   # Z test enable
+        self.i_ztst  = Signal(2)  # Z test type
+
+        # PRIM; whether the triangle gives U and V directly rather than S, T and Q
+        self.i_fst   = Signal()
+
+        # Coarse Z bound of the tile holding a block, asked for a clock before
+        # the block is tested
+        self.o_coarse_x = Signal(12)    # Q12.0; block X coordinate
+        self.o_coarse_y = Signal(12)    # Q12.0; block Y coordinate
+        self.i_coarse_zmin = Signal(16) # No Z in the tile has less than this in the top 16 bits
+
+        self.i_valid = Signal() # Input triangle is valid
+        self.o_ready = Signal() # Input triangle is accepted this cycle
+
+        # Output block; lane k is pixel (k % block_width, k // block_width) of the block.
+        self.o_pixels = [Record(PIXEL) for i in range(self.lanes)]
+        self.o_mask  = Signal(self.lanes) # Coverage mask; bit k is o_pixels[k].valid
+
+        self.o_valid = Signal() # Output block is valid
+        self.o_last  = Signal() # Last block of the triangle
+        self.i_ready = Signal() # Output block is accepted this cycle
+
+        # Edge functions, oriented so that the inside of the triangle is non-negative.
+        self.r_a     = [Signal((18, True), name="r_a{}".format(i)) for i in range(3)]
+        self.r_b     = [Signal((18, True), name="r_b{}".format(i)) for i in range(3)]
+        self.r_c     = [Signal((36, True), name="r_c{}".format(i)) for i in range(3)]
+
+        # Edge functions at the start of the current row, and at the current block
+        self.r_e_row = [Signal((36, True), name="r_e_row{}".format(i)) for i in range(3)]
+        self.r_e     = [Signal((36, True), name="r_e{}".format(i)) for i in range(3)]
+
+        # Bounding box, in pixels, clipped to the scissor rectangle; the minimum
+        # is aligned to the block size.
+        self.r_min_x = Signal(12)
+        self.r_min_y = Signal(12)
+        self.r_max_x = Signal(12)
+        self.r_max_y = Signal(12)
+
+        # Scissor rectangle, for the pixels of blocks straddling its edge
+        self.r_scax0 = Signal(11)
+        self.r_scax1 = Signal(11)
+        self.r_scay0 = Signal(11)
+        self.r_scay1 = Signal(11)
+
+        # Current block, in pixels
+        self.r_x     = Signal(12)
+        self.r_y     = Signal(12)
+
+        # Whether pixels below the coarse Z bound fail the triangle's Z test
+        self.r_coarse = Signal()
+
+        # Whether the triangle gives U and V directly
+        self.r_fst   = Signal()
+
+        if perspective:
+            self.r_persp = PerspectiveDivider(lanes=self.lanes)
+
+        # Interpolated attributes: pixel field, vertex 0 value and gradients
+        self.channels = [
+            ("r", self.i_r0, self.i_drdx, self.i_drdy),
+            ("g", self.i_g0, self.i_dgdx, self.i_dgdy),
+            ("b", self.i_b0, self.i_dbdx, self.i_dbdy),
+            ("a", self.i_a0, self.i_dadx, self.i_dady),
+            ("f", self.i_f0, self.i_dfdx, self.i_dfdy),
+            ("z", self.i_z0, self.i_dzdx, self.i_dzdy),
+            ("s", self.i_s0, self.i_dsdx, self.i_dsdy),
+            ("t", self.i_t0, self.i_dtdx, self.i_dtdy),
+            ("q", self.i_q0, self.i_dqdx, self.i_dqdy),
+            ("u", self.i_u0, self.i_dudx, self.i_dudy),
+            ("v", self.i_v0, self.i_dvdx, self.i_dvdy)
+        ]
+
+        # Attribute gradients
+        self.r_dcdx  = [Signal.like(dx, name="r_d{}dx".format(c)) for c, _, dx, _ in self.channels]
+        self.r_dcdy  = [Signal.like(dy, name="r_d{}dy".format(c)) for c, _, _, dy in self.channels]
+
+        # Attributes at the start of the current row, and at the current block; Q.4
+        self.r_c_row = [Signal((len(c0) + 12, True), name="r_{}_row".format(c)) for c, c0, _, _ in self.channels]
+        self.r_col   = [Signal((len(c0) + 12, True), name="r_{}_col".format(c)) for c, c0, _, _ in self.channels]
+
+    @staticmethod
+    def _min(a, b, c):
+        ab = Mux(a < b, a, b)
+        return Mux(ab < c, ab, c)
+
+    @staticmethod
+    def _max(a, b, c):
+        ab = Mux(a > b, a, b)
+        return Mux(ab > c, ab, c)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        bw = self.block_width
+        bh = self.block_height
+
+        # Blocks leave through the perspective divider, if there is one.
+        if self.perspective:
+            m.submodules.persp = persp = self.r_persp
+
+            o_pixels = persp.i_pixels
+            o_valid  = Signal()
+            o_last   = Signal()
+            o_fst    = Signal()
+            i_ready  = Signal()
+            m.d.comb += [
+                persp.i_valid.eq(o_valid),
+                persp.i_last.eq(o_last),
+                persp.i_fst.eq(o_fst),
+                i_ready.eq(persp.o_ready),
+
+                self.o_valid.eq(persp.o_valid),
+                self.o_last.eq(persp.o_last),
+                persp.i_ready.eq(self.i_ready)
+            ]
+            m.d.comb += [pixel.eq(persp_pixel) for pixel, persp_pixel in zip(self.o_pixels, persp.o_pixels)]
+        else:
+            o_pixels = self.o_pixels
+            o_valid  = self.o_valid
+            o_last   = self.o_last
+            o_fst    = Signal()
+            i_ready  = self.i_ready
+
+        # Vertices in window coordinates; signed, so the edge functions can go negative.
+        xs = [Signal((17, True), name="x{}".format(i)) for i in range(3)]
+        ys = [Signal((17, True), name="y{}".format(i)) for i in range(3)]
+        m.d.comb += [
+            xs[0].eq(self.i_x0 - self.i_ofx),
+            ys[0].eq(self.i_y0 - self.i_ofy),
+            xs[1].eq(self.i_x1 - self.i_ofx),
+            ys[1].eq(self.i_y1 - self.i_ofy),
+            xs[2].eq(self.i_x2 - self.i_ofx),
+            ys[2].eq(self.i_y2 - self.i_ofy)
+        ]
+
+        # Clip the bounding box to the scissor rectangle, so that blocks outside
+        # it are never visited.
+        min_x = Signal((13, True))
+        min_y = Signal((13, True))
+        max_x = Signal((13, True))
+        max_y = Signal((13, True))
+        m.d.comb += [
+            min_x.eq(self._min(*xs) >> 4),
+            min_y.eq(self._min(*ys) >> 4),
+            max_x.eq(self._max(*xs) >> 4),
+            max_y.eq(self._max(*ys) >> 4)
+        ]
+
+        clip_min_x = Mux(min_x < self.i_scax0, self.i_scax0, min_x)
+        clip_min_y = Mux(min_y < self.i_scay0, self.i_scay0, min_y)
+        clip_max_x = Mux(max_x > self.i_scax1, self.i_scax1, max_x)
+        clip_max_y = Mux(max_y > self.i_scay1, self.i_scay1, max_y)
+
+        # Twice the signed area of the triangle; negative if the vertices are clockwise.
+        area = Signal((36, True))
+        m.d.comb += area.eq((xs[1] - xs[0]) * (ys[2] - ys[0]) - (xs[2] - xs[0]) * (ys[1] - ys[0]))
+
+        clockwise = Signal()
+        m.d.comb += clockwise.eq(area < 0)
+
+        # Output blocks are held until accepted.
+        with m.If(i_ready):
+            m.d.sync += o_valid.eq(0)
+
+        m.d.comb += self.o_mask.eq(Cat(pixel.valid for pixel in self.o_pixels))
+
+        # Degenerate triangles and those entirely outside the scissor rectangle
+        # cover nothing, so are dropped as they are accepted.
+        empty = Signal()
+        m.d.comb += empty.eq((area == 0) | (clip_min_x > clip_max_x) | (clip_min_y > clip_max_y))
+
+        with m.FSM():
+            with m.State("IDLE"):
+                m.d.comb += self.o_ready.eq(1)
+
+                with m.If(self.i_valid & ~empty):
+                    m.next = "RASTER"
+
+            with m.State("RASTER"):
+                end_of_row = Signal()
+                last = Signal()
+                m.d.comb += [
+                    end_of_row.eq(self.r_x + bw > self.r_max_x),
+                    last.eq(end_of_row & (self.r_y + bh > self.r_max_y))
+                ]
+
+                # Test every pixel of the block against all three edges, and the
+                # scissor rectangle.
+                covered = []
+                zc = [field for field, _, _, _ in self.channels].index("z")
+                for lane in range(self.lanes):
+                    i, j = lane % bw, lane // bw
+
+                    inside = Signal(name="inside{}".format(lane))
+                    m.d.comb += inside.eq((self.r_x + i >= self.r_scax0) & (self.r_x + i <= self.r_scax1) &
+                                          (self.r_y + j >= self.r_scay0) & (self.r_y + j <= self.r_scay1))
+                    for edge in range(3):
+                        e = self.r_e[edge] + self.r_a[edge] * (i << 4) + self.r_b[edge] * (j << 4)
+                        with m.If(e < 0):
+                            m.d.comb += inside.eq(0)
+
+                    if self.coarse_z:
+                        z = Signal(32, name="z{}".format(lane))
+                        m.d.comb += z.eq((self.r_col[zc] + self.r_dcdx[zc] * i + self.r_dcdy[zc] * j) >> 4)
+                        with m.If(self.r_coarse & (z[16:32] < self.i_coarse_zmin)):
+                            m.d.comb += inside.eq(0)
+
+                    covered.append(inside)
+
+                # Ask for the bound of the block tested next clock.
+                m.d.comb += [
+                    self.o_coarse_x.eq(self.r_x),
+                    self.o_coarse_y.eq(self.r_y)
+                ]
+
+                with m.If(~o_valid | i_ready):
+                    # Blocks with no coverage are skipped, except for the last one.
+                    with m.If(Cat(covered).any() | last):
+                        for lane, (inside, pixel) in enumerate(zip(covered, o_pixels)):
+                            i, j = lane % bw, lane // bw
+                            m.d.sync += [
+                                pixel.valid.eq(inside),
+
+                                pixel.x.eq(self.r_x + i),
+                                pixel.y.eq(self.r_y + j)
+                            ]
+
+                            for channel, (field, _, _, _) in enumerate(self.channels):
+                                value = self.r_col[channel] + self.r_dcdx[channel] * i + self.r_dcdy[channel] * j
+                                m.d.sync += pixel[field].eq(value >> 4)
+
+                        m.d.sync += [
+                            o_valid.eq(1),
+                            o_last.eq(last),
+                            o_fst.eq(self.r_fst)
+                        ]
+
+                    # Step to the next block
+                    with m.If(end_of_row):
+                        m.d.sync += [
+                            self.r_x.eq(self.r_min_x),
+                            self.r_y.eq(self.r_y + bh)
+                        ]
+                        m.d.comb += [
+                            self.o_coarse_x.eq(self.r_min_x),
+                            self.o_coarse_y.eq(self.r_y + bh)
+                        ]
+
+                        for edge in range(3):
+                            e_row = self.r_e_row[edge] + self.r_b[edge] * (bh << 4)
+                            m.d.sync += [
+                                self.r_e_row[edge].eq(e_row),
+                                self.r_e[edge].eq(e_row)
+                            ]
+
+                        for channel in range(len(self.channels)):
+                            c_row = self.r_c_row[channel] + self.r_dcdy[channel] * bh
+                            m.d.sync += [
+                                self.r_c_row[channel].eq(c_row),
+                                self.r_col[channel].eq(c_row)
+                            ]
+                    with m.Else():
+                        m.d.sync += self.r_x.eq(self.r_x + bw)
+                        m.d.comb += self.o_coarse_x.eq(self.r_x + bw)
+
+                        for edge in range(3):
+                            m.d.sync += self.r_e[edge].eq(self.r_e[edge] + self.r_a[edge] * (bw << 4))
+
+                        for channel in range(len(self.channels)):
+                            m.d.sync += self.r_col[channel].eq(self.r_col[channel] + self.r_dcdx[channel] * bw)
+
+                    with m.If(last):
+                        m.d.comb += self.o_ready.eq(1)
+
+                        with m.If(~self.i_valid | empty):
+                            m.next = "IDLE"
+
+        # The next triangle is accepted in the same clock as the last block of
+        # the current one, and set up in it, so its first block follows with
+        # no clock between the two.
+        origin_x = Signal(12)
+        origin_y = Signal(12)
+        m.d.comb += [
+            origin_x.eq(clip_min_x & ~(bw - 1)),
+            origin_y.eq(clip_min_y & ~(bh - 1))
+        ]
+
+        with m.If(self.o_ready):
+            for edge in range(3):
+                xa, ya = xs[edge], ys[edge]
+                xb, yb = xs[(edge + 1) % 3], ys[(edge + 1) % 3]
+
+                a = Signal((18, True), name="a{}".format(edge))
+                b = Signal((18, True), name="b{}".format(edge))
+                c = Signal((36, True), name="c{}".format(edge))
+                m.d.comb += [
+                    a.eq(Mux(clockwise, yb - ya, ya - yb)),
+                    b.eq(Mux(clockwise, xa - xb, xb - xa)),
+                    c.eq(Mux(clockwise, xb * ya - xa * yb, xa * yb - xb * ya))
+                ]
+
+                # Pixels exactly on an edge belong to only one of the two triangles
+                # sharing it: the one for which the edge faces right, or down.
+                owned = Signal(name="owned{}".format(edge))
+                m.d.comb += owned.eq((a > 0) | ((a == 0) & (b > 0)))
+
+                m.d.sync += [
+                    self.r_a[edge].eq(a),
+                    self.r_b[edge].eq(b),
+                    self.r_c[edge].eq(Mux(owned, c, c - 1))
+                ]
+
+                # The edge function at the bounding box origin
+                e = a * (origin_x << 4) + b * (origin_y << 4) + Mux(owned, c, c - 1)
+                m.d.sync += [
+                    self.r_e_row[edge].eq(e),
+                    self.r_e[edge].eq(e)
+                ]
+
+            m.d.sync += [
+                self.r_min_x.eq(origin_x),
+                self.r_min_y.eq(origin_y),
+                self.r_max_x.eq(clip_max_x),
+                self.r_max_y.eq(clip_max_y),
+
+                self.r_scax0.eq(self.i_scax0),
+                self.r_scax1.eq(self.i_scax1),
+                self.r_scay0.eq(self.i_scay0),
+                self.r_scay1.eq(self.i_scay1),
+
+                # GEQUAL (2) and GREATER (3) fail below the stored Z.
+                self.r_coarse.eq(self.i_zte & self.i_ztst[1]),
+
+                self.r_fst.eq(self.i_fst)
+            ]
+
+            # Attributes at the bounding box origin
+            dx = Signal((17, True))
+            dy = Signal((17, True))
+            m.d.comb += [
+                dx.eq((origin_x << 4) - xs[0]),
+                dy.eq((origin_y << 4) - ys[0])
+            ]
+
+            for channel, (_, c0, dcdx, dcdy) in enumerate(self.channels):
+                value = (c0 << 4) + ((dcdx * dx + dcdy * dy) >> 4)
+                m.d.sync += [
+                    self.r_dcdx[channel].eq(dcdx),
+                    self.r_dcdy[channel].eq(dcdy),
+                    self.r_c_row[channel].eq(value),
+                    self.r_col[channel].eq(value)
+                ]
+
+            # The first block is tested next clock.
+            m.d.sync += [
+                self.r_x.eq(origin_x),
+                self.r_y.eq(origin_y)
+            ]
+            m.d.comb += [
+                self.o_coarse_x.eq(origin_x),
+                self.o_coarse_y.eq(origin_y)
+            ]
+
+        return m
+
+
+class PerspectiveDivider(Elaboratable):
+    def __init__(self, lanes=16):
+        # S, T and Q interpolate linearly in screen space, but the texel
+        # coordinates S / Q and T / Q do not. Each lane has its own pipelined
+        # reciprocal of Q, so a span is accepted every clock instead of stalling
+        # on a divide per pixel; S and T then share that reciprocal.
+        #
+        # The dividers advance together with a fixed latency, so they carry no
+        # tag: the span waits in a FIFO beside them, and leaves it as its
+        # reciprocals leave the dividers.
+        self.lanes   = lanes
+        self.q_frac  = 12       # Fraction bits of Q
+        self.st_frac = 8        # Fraction bits of S and T
+        self.uv_frac = 4        # Fraction bits of U and V
+        self.div_frac = 4       # Fraction bits of the divider's operands and quotient
+        self.recip   = 20       # Fraction bits of 1 / Q
+
+        # Input span, as produced by the rasteriser
+        self.i_pixels = [Record(PIXEL) for i in range(lanes)]
+        self.i_fst   = Signal() # Span uses U and V directly rather than S, T and Q
+        self.i_valid = Signal() # Input span is valid
+        self.i_last  = Signal() # Last span of the primitive
+        self.o_ready = Signal() # Input span is accepted this cycle
+
+        # Output span, with U and V filled in
+        self.o_pixels = [Record(PIXEL) for i in range(lanes)]
+        self.o_mask  = Signal(lanes) # Coverage mask; bit k is o_pixels[k].valid
+
+        self.o_valid = Signal() # Output span is valid
+        self.o_last  = Signal() # Last span of the primitive
+        self.i_ready = Signal() # Output span is accepted this cycle
+
+        self.r_div   = [PipelinedDivider(width=self.recip + self.q_frac + 2, stages=3) for i in range(lanes)]
+
+        # Spans in the dividers; one more than they can hold, so that it never
+        # fills.
+        self.r_spans = SyncFIFO(width=lanes * len(Record(PIXEL)) + 2, depth=self.r_div[0].latency + 1)
+
+        self.latency = self.r_div[0].latency + 1
+
+    def elaborate(self, platform):
+        m = Module()
+
+        for lane, div in enumerate(self.r_div):
+            m.submodules["div{}".format(lane)] = div
+
+        m.submodules.spans = spans = self.r_spans
+
+        # Every lane's divider sees the same handshake, so they stay in step.
+        advance = Signal()
+        m.d.comb += [
+            advance.eq(~self.o_valid | self.i_ready),
+            self.o_ready.eq(self.r_div[0].o_ready),
+
+            self.o_mask.eq(Cat(pixel.valid for pixel in self.o_pixels))
+        ]
+
+        with m.If(self.i_ready):
+            m.d.sync += self.o_valid.eq(0)
+
+        # The span leaves the FIFO with its reciprocals.
+        pixels = [Record(PIXEL, name="span{}".format(lane)) for lane in range(self.lanes)]
+        last   = Signal()
+        fst    = Signal()
+        m.d.comb += [
+            spans.w_en.eq(self.i_valid & self.o_ready),
+            spans.w_data.eq(Cat(*self.i_pixels, self.i_last, self.i_fst)),
+
+            spans.r_en.eq(advance & self.r_div[0].o_valid),
+            Cat(*pixels, last, fst).eq(spans.r_data)
+        ]
+
+        for div, i_pixel, pixel, o_pixel in zip(self.r_div, self.i_pixels, pixels, self.o_pixels):
+            # The divider takes both operands, and gives the quotient, with
+            # div_frac fraction bits. So, with Q's raw value as the denominator,
+            # a numerator of 2**(recip + q_frac - div_frac) gives 1 / Q with
+            # recip fraction bits, as 2**(recip + q_frac) over the raw value.
+            # That is largest when the raw value is 1, hence the divider's width.
+            m.d.comb += [
+                div.i_valid.eq(self.i_valid),
+                div.i_n.eq(1 << (self.recip + self.q_frac - self.div_frac)),
+                div.i_d.eq(i_pixel.q),
+                div.i_ready.eq(advance)
+            ]
+
+            # U = S * (1 / Q); the product has st_frac + recip fraction bits, and
+            # is rounded to the uv_frac bits of U.
+            shift = self.st_frac + self.recip - self.uv_frac
+            u = Signal((16, True))
+            v = Signal((16, True))
+            m.d.comb += [
+                u.eq((pixel.s.as_signed() * div.o_q + (1 << (shift - 1))) >> shift),
+                v.eq((pixel.t.as_signed() * div.o_q + (1 << (shift - 1))) >> shift)
+            ]
+
+            with m.If(advance & div.o_valid):
+                m.d.sync += o_pixel.eq(pixel)
+
+                with m.If(~fst):
+                    m.d.sync += [
+                        o_pixel.u.eq(u),
+                        o_pixel.v.eq(v)
+                    ]
+
+        with m.If(advance & self.r_div[0].o_valid):
+            m.d.sync += [
+                self.o_valid.eq(1),
+                self.o_last.eq(last)
+            ]
+
+        return m
+
+
+if __name__ == "__main__":
+    import random
+
+    div = PipelinedDivider()
+
+    def divider_test(operands, stall=False):
+        # Feed one divide per clock, and check the quotients come out in order;
+        # with `stall`, the quotient is refused at random.
+        results = []
+        pending = list(operands)
+
+        while len(results) < len(operands):
+            if pending:
+                yield div.i_n.eq(pending[0][0])
+                yield div.i_d.eq(pending[0][1])
+            yield div.i_valid.eq(len(pending) > 0)
+            yield div.i_ready.eq(random.randint(0, 1) if stall else 1)
+            yield pysim.Settle()
+
+            if pending and (yield div.o_ready):
+                pending.pop(0)
+            if (yield div.o_valid) and (yield div.i_ready):
+                results.append((yield div.o_q))
+            yield
+        yield div.i_valid.eq(0)
+
+        q_max = (1 << 15) - 1
+        for (n, d), q in zip(operands, results):
+            expected = 0 if d == 0 else min(int(abs(n) * 16 / d + 0.5), q_max) * (-1 if n < 0 else 1)
+            print("// ", n / 16, "/", d / 16, "=", q / 16)
+            assert q == expected
+
+    def divides():
+        operands = [(n << 4, d << 4) for n, d in [
+            (1, 1), (1, 2), (1, 3), (255, 10), (-255, 10),
+            (100, 7), (-3, 640), (255, 0), (4, 4095), (0, 9)
+        ]]
+        yield from divider_test(operands)
+
+        # Quotients beyond the range of o_q saturate.
+        yield from divider_test([(2047 << 4, 1), (-2047 << 4, 8), (-32768, 1), (1000 << 4, 4)])
+
+        yield from divider_test(operands, stall=True)
+
+    with pysim.Simulator(div) as sim:
+        sim.add_sync_process(divides)
+        sim.add_clock(1e-6)
+        sim.run()
+
+    raster = TriangleRasteriser()
+
+    def coverage(vertices):
+        # Software model of the edge functions, including the tie-breaking rule.
+        (x0, y0), (x1, y1), (x2, y2) = vertices
+        sign = 1 if (x1 - x0) * (y2 - y0) - (x2 - x0) * (y1 - y0) > 0 else -1
+
+        pixels = set()
+        for x in range(64):
+            for y in range(64):
+                inside = True
+                for (xa, ya), (xb, yb) in zip(vertices, vertices[1:] + vertices[:1]):
+                    a, b, c = sign * (ya - yb), sign * (xb - xa), sign * (xa * yb - xb * ya)
+                    e = a * (x << 4) + b * (y << 4) + c
+                    inside &= e > 0 or (e == 0 and (a > 0 or (a == 0 and b > 0)))
+                if inside:
+                    pixels.add((x, y))
+        return pixels
+
+    def triangle_test(vertices, scissor=(0, 2047, 0, 2047)):
+        print("// ", vertices, scissor)
+        yield raster.i_scax0.eq(scissor[0])
+        yield raster.i_scax1.eq(scissor[1])
+        yield raster.i_scay0.eq(scissor[2])
+        yield raster.i_scay1.eq(scissor[3])
+        for (x, y), (i_x, i_y) in zip(vertices, [(raster.i_x0, raster.i_y0), (raster.i_x1, raster.i_y1), (raster.i_x2, raster.i_y2)]):
+            yield i_x.eq(x)
+            yield i_y.eq(y)
+        yield raster.i_valid.eq(1)
+        yield raster.i_ready.eq(1)
+        yield
+        yield raster.i_valid.eq(0)
+
+        expected = {(x, y) for x, y in coverage(vertices)
+                    if scissor[0] <= x <= scissor[1] and scissor[2] <= y <= scissor[3]}
+
+        # Fully clipped triangles should be discarded without emitting anything.
+        if not expected:
+            for i in range(4):
+                yield
+                assert not (yield raster.o_valid)
+            assert (yield raster.o_ready)
+            return set()
+
+        pixels = set()
+        while True:
+            yield
+            if (yield raster.o_valid):
+                for pixel in raster.o_pixels:
+                    if (yield pixel.valid):
+                        x, y = (yield pixel.x), (yield pixel.y)
+                        pixels.add((x, y))
+
+                        # Depth rises by 3 per pixel in X and falls by 1 per pixel in Y.
+                        z = 0x80000000 + (3 * ((x << 4) - vertices[0][0]) - ((y << 4) - vertices[0][1])) / 16
+                        assert abs((yield pixel.z) - z) <= 1
+                if (yield raster.o_last):
+                    break
+
+        assert pixels == expected
+        return pixels
+
+    def triangles():
+        yield raster.i_z0.eq(0x80000000)
+        yield raster.i_dzdx.eq(3 << 4)
+        yield raster.i_dzdy.eq(-1 << 4)
+
+        # Two triangles sharing an edge should cover each pixel exactly once.
+        upper = yield from triangle_test([(0, 0), (160, 0), (0, 160)])
+        lower = yield from triangle_test([(160, 0), (0, 160), (160, 160)])
+        assert not upper & lower
+        assert len(upper | lower) == 100
+
+        yield from triangle_test([(53, 32), (483, 151), (112, 651)])
+        yield from triangle_test([(600, 20), (35, 300), (410, 590)])
+        yield from triangle_test([(600, 20), (35, 300), (410, 590)], scissor=(5, 21, 3, 30))
+        yield from triangle_test([(600, 20), (35, 300), (410, 590)], scissor=(0, 1, 0, 30))
+
+    with pysim.Simulator(raster) as sim:
+        sim.add_sync_process(triangles)
+        sim.add_clock(1e-6)
+        sim.run()
+
+    raster = TriangleRasteriser()
+
+    # Right triangles whose bounding box origin block is covered, so that each
+    # starts with a block.
+    corners = [[(x << 4, 0), ((x + 16) << 4, 0), (x << 4, 16 << 4)] for x in range(0, 64, 16)]
+
+    def triangle_burst():
+        # Back-to-back triangles should be rasterised without an idle clock
+        # between the last block of one and the first block of the next.
+        yield raster.i_ready.eq(1)
+        for vertices in corners:
+            for (x, y), (i_x, i_y) in zip(vertices, [(raster.i_x0, raster.i_y0), (raster.i_x1, raster.i_y1), (raster.i_x2, raster.i_y2)]):
+                yield i_x.eq(x)
+                yield i_y.eq(y)
+            yield raster.i_valid.eq(1)
+            yield
+            while not (yield raster.o_ready):
+                yield
+        yield raster.i_valid.eq(0)
+
+    def triangle_burst_check():
+        while not (yield raster.o_valid):
+            yield
+
+        pixels = set()
+        lasts = 0
+        last = False
+        while lasts < len(corners):
+            assert (yield raster.o_valid) or not last
+            last = (yield raster.o_valid) and (yield raster.o_last)
+            if (yield raster.o_valid):
+                for pixel in raster.o_pixels:
+                    if (yield pixel.valid):
+                        pixels.add(((yield pixel.x), (yield pixel.y)))
+            lasts += last
+            yield
+
+        assert pixels == set().union(*(coverage(vertices) for vertices in corners))
+
+    with pysim.Simulator(raster) as sim:
+        sim.add_sync_process(triangle_burst)
+        sim.add_sync_process(triangle_burst_check)
+        sim.add_clock(1e-6)
+        sim.run()
+
+    raster = TriangleRasteriser()
+
+    def texture_test(fst):
+        # U and V leave as S / Q and T / Q, or as given with FST, while the
+        # output stalls at random.
+        print("// texture", fst)
+        vertices = [(0, 0), (320, 0), (0, 320)]
+        for (x, y), (i_x, i_y) in zip(vertices, [(raster.i_x0, raster.i_y0), (raster.i_x1, raster.i_y1), (raster.i_x2, raster.i_y2)]):
+            yield i_x.eq(x)
+            yield i_y.eq(y)
+        yield raster.i_fst.eq(fst)
+        yield raster.i_valid.eq(1)
+        yield
+        yield raster.i_valid.eq(0)
+
+        pixels = set()
+        while True:
+            ready = random.randint(0, 1)
+            yield raster.i_ready.eq(ready)
+            yield
+            if ready and (yield raster.o_valid):
+                for pixel in raster.o_pixels:
+                    if (yield pixel.valid):
+                        x, y = (yield pixel.x), (yield pixel.y)
+                        s, t, q = (yield pixel.s), (yield pixel.t), (yield pixel.q)
+                        u, v = (yield pixel.u), (yield pixel.v)
+                        pixels.add((x, y))
+                        if fst:
+                            assert (u, v) == ((7 + x) << 4, (9 + 2 * y) << 4)
+                        else:
+                            assert abs(u - s * 256 / q) <= 1 and abs(v - t * 256 / q) <= 1
+                if (yield raster.o_last):
+                    break
+
+        assert pixels == coverage(vertices)
+
+    def textured_triangles():
+        # S and T rise by one per pixel in X and Y from (4, 2), and Q by 1/32
+        # per pixel in X from 1; U and V rise by one and two.
+        yield raster.i_s0.eq(4 << 8)
+        yield raster.i_dsdx.eq(1 << 12)
+        yield raster.i_t0.eq(2 << 8)
+        yield raster.i_dtdy.eq(1 << 12)
+        yield raster.i_q0.eq(1 << 12)
+        yield raster.i_dqdx.eq(1 << 11)
+        yield raster.i_u0.eq(7 << 4)
+        yield raster.i_dudx.eq(1 << 8)
+        yield raster.i_v0.eq(9 << 4)
+        yield raster.i_dvdy.eq(2 << 8)
+
+        yield from texture_test(0)
+        yield from texture_test(1)
+
+    with pysim.Simulator(raster) as sim:
+        sim.add_sync_process(textured_triangles)
+        sim.add_clock(1e-6)
+        sim.run()
+
+    raster = TriangleRasteriser(coarse_z=True)
+
+    def coarse_z_test(zte, ztst, zmin):
+        # The table gives each 8x8 tile the lower bound in `zmin`, a clock after
+        # it is asked for, while the output stalls at random.
+        print("// coarse Z", zte, ztst)
+        vertices = [(0, 0), (320, 0), (0, 320)]
+        for (x, y), (i_x, i_y) in zip(vertices, [(raster.i_x0, raster.i_y0), (raster.i_x1, raster.i_y1), (raster.i_x2, raster.i_y2)]):
+            yield i_x.eq(x)
+            yield i_y.eq(y)
+        yield raster.i_zte.eq(zte)
+        yield raster.i_ztst.eq(ztst)
+        yield raster.i_valid.eq(1)
+        yield
+        yield raster.i_valid.eq(0)
+
+        pixels = set()
+        while True:
+            ready = random.randint(0, 1)
+            yield raster.i_ready.eq(ready)
+            yield pysim.Settle()
+            tile = ((yield raster.o_coarse_x) >> 3, (yield raster.o_coarse_y) >> 3)
+            yield
+            yield raster.i_coarse_zmin.eq(zmin.get(tile, 0))
+            if ready and (yield raster.o_valid):
+                for pixel in raster.o_pixels:
+                    if (yield pixel.valid):
+                        pixels.add(((yield pixel.x), (yield pixel.y)))
+                if (yield raster.o_last):
+                    break
+
+        # Z is 0x8000 in the top bits everywhere, so every pixel in a tile with
+        # a bound above that fails GEQUAL and GREATER.
+        rejected = {(x, y) for x, y in coverage(vertices) if ((x >> 3, y >> 3) in zmin) and zte and ztst >= 2}
+        assert pixels == coverage(vertices) - rejected
+        assert rejected or not zte or ztst < 2
+
+    def coarse_triangles():
+        yield raster.i_z0.eq(0x80000000)
+        yield raster.i_dzdx.eq(3 << 4)
+        yield raster.i_dzdy.eq(1 << 4)
+        yield raster.i_scax1.eq(2047)
+        yield raster.i_scay1.eq(2047)
+
+        zmin = {(1, 0): 0x8001, (0, 2): 0x8001, (2, 1): 0x8001}
+        for zte, ztst in [(1, 2), (1, 3), (1, 1), (0, 2)]:
+            yield from coarse_z_test(zte, ztst, zmin)
+
+    with pysim.Simulator(raster) as sim:
+        sim.add_sync_process(coarse_triangles)
+        sim.add_clock(1e-6)
+        sim.run()
+
+    sprite = SpriteGenerator()
+
+    def sprite_test(start, end, scissor=(0, 2047, 0, 2047)):
+        print("// ", start, "-> ", end, scissor)
+        yield sprite.i_scax0.eq(scissor[0])
+        yield sprite.i_scax1.eq(scissor[1])
+        yield sprite.i_scay0.eq(scissor[2])
+        yield sprite.i_scay1.eq(scissor[3])
+        yield sprite.i_x0.eq(start[0])
+        yield sprite.i_y0.eq(start[1])
+        yield sprite.i_x1.eq(end[0])
+        yield sprite.i_y1.eq(end[1])
+        yield sprite.i_valid.eq(1)
+        yield sprite.i_ready.eq(1)
+        yield
+        yield sprite.i_valid.eq(0)
+
+        # Untextured sprites go around the dividers, so the first span follows
+        # within two clocks.
+        clocks = 0
+        while not (yield sprite.o_valid):
+            clocks += 1
+            yield
+        assert clocks <= 2, clocks
+
+        # Spans should be emitted back to back, one per clock.
+        pixels = set()
+        while True:
+            assert (yield sprite.o_valid)
+            for pixel in sprite.o_pixels:
+                if (yield pixel.valid):
+                    pixels.add(((yield pixel.x), (yield pixel.y)))
+            if (yield sprite.o_last):
+                break
+            yield
+
+        xs = range((min(start[0], end[0]) + 15) >> 4, (max(start[0], end[0]) + 15) >> 4)
+        ys = range((min(start[1], end[1]) + 15) >> 4, (max(start[1], end[1]) + 15) >> 4)
+        assert pixels == {(x, y) for x in xs for y in ys
+                          if scissor[0] <= x <= scissor[1] and scissor[2] <= y <= scissor[3]}
+
+    def sprites():
+        yield from sprite_test((0, 0), (16 << 4, 4 << 4))
+        yield from sprite_test((30 << 4, 9 << 4), (3 << 4, 2 << 4))
+        yield from sprite_test((40, 17), (60, 300))
+        yield from sprite_test((0, 0), (40 << 4, 8 << 4), scissor=(5, 20, 2, 4))
+
+    def sprite_burst(textured=()):
+        # Back-to-back sprites should be swept without idle clocks between them.
+        # Those given in `textured` are textured.
+        corners = [((x << 4, 0), ((x + 2) << 4, 2 << 4)) for x in range(0, 64, 16)]
+
+        yield sprite.i_ready.eq(1)
+        for i, (start, end) in enumerate(corners):
+            yield sprite.i_tme.eq(i in textured)
+            yield sprite.i_x0.eq(start[0])
+            yield sprite.i_y0.eq(start[1])
+            yield sprite.i_x1.eq(end[0])
+            yield sprite.i_y1.eq(end[1])
+            yield sprite.i_valid.eq(1)
+            yield
+            while not (yield sprite.o_ready):
+                yield
+        yield sprite.i_valid.eq(0)
+
+    def sprite_burst_check(gaps=False):
+        # With `gaps`, idle clocks are allowed, but sprites are still swept in
+        # order.
+        while not (yield sprite.o_valid):
+            yield
+
+        pixels = set()
+        order = []
+        lasts = 0
+        while lasts < 4:
+            if gaps and not (yield sprite.o_valid):
+                yield
+                continue
+            assert (yield sprite.o_valid)
+            for pixel in sprite.o_pixels:
+                if (yield pixel.valid):
+                    pixels.add(((yield pixel.x), (yield pixel.y)))
+            order.append((yield sprite.o_pixels[0].x))
+            lasts += (yield sprite.o_last)
+            yield
+
+        assert pixels == {(x + i, y) for x in range(0, 64, 16) for i in range(2) for y in range(2)}
+        assert order == sorted(order)
+
+    with pysim.Simulator(sprite) as sim:
+        sim.add_sync_process(sprites)
+        sim.add_clock(1e-6)
+        sim.run()
+
+    sprite = SpriteGenerator()
+
+    with pysim.Simulator(sprite) as sim:
+        sim.add_sync_process(sprite_burst)
+        sim.add_sync_process(sprite_burst_check)
+        sim.add_clock(1e-6)
+        sim.run()
+
+    # An untextured sprite after textured ones waits for them to be loaded.
+    sprite = SpriteGenerator()
+
+    def mixed_burst():
+        yield from sprite_burst(textured=(1, 2))
+
+    def mixed_burst_check():
+        yield from sprite_burst_check(gaps=True)
+
+    with pysim.Simulator(sprite) as sim:
+        sim.add_sync_process(mixed_burst)
+        sim.add_sync_process(mixed_burst_check)
+        sim.add_clock(1e-6)
+        sim.run()
+
+    sprite = SpriteGenerator(lanes=4)
+
+    def textured_sprite_test(start, end, offset=(0, 0), scissor=(0, 2047, 0, 2047)):
+        # Corners are (x, y, u, v), all Q12.4; the output stalls at random.
+        print("// ", start, "-> ", end, offset, scissor)
+        for corner, (i_x, i_y, i_u, i_v) in zip([start, end], [
+                (sprite.i_x0, sprite.i_y0, sprite.i_u0, sprite.i_v0),
+                (sprite.i_x1, sprite.i_y1, sprite.i_u1, sprite.i_v1)]):
+            for value, port in zip(corner, (i_x, i_y, i_u, i_v)):
+                yield port.eq(value)
+        yield sprite.i_ofx.eq(offset[0])
+        yield sprite.i_ofy.eq(offset[1])
+        yield sprite.i_scax0.eq(scissor[0])
+        yield sprite.i_scax1.eq(scissor[1])
+        yield sprite.i_scay0.eq(scissor[2])
+        yield sprite.i_scay1.eq(scissor[3])
+        yield sprite.i_tme.eq(1)
+        yield sprite.i_valid.eq(1)
+        yield
+        yield sprite.i_valid.eq(0)
+
+        texels = {}
+        while True:
+            ready = random.randint(0, 1)
+            yield sprite.i_ready.eq(ready)
+            yield
+            if ready and (yield sprite.o_valid):
+                for pixel in sprite.o_pixels:
+                    if (yield pixel.valid):
+                        texels[((yield pixel.x), (yield pixel.y))] = ((yield pixel.u), (yield pixel.v))
+                if (yield sprite.o_last):
+                    break
+
+        # U and V are linear in X and Y between the corners.
+        (x0, y0, u0, v0), (x1, y1, u1, v1) = [(x - offset[0], y - offset[1], u, v) for x, y, u, v in [start, end]]
+        xs = range((min(x0, x1) + 15) >> 4, (max(x0, x1) + 15) >> 4)
+        ys = range((min(y0, y1) + 15) >> 4, (max(y0, y1) + 15) >> 4)
+        assert set(texels) == {(x, y) for x in xs for y in ys
+                               if scissor[0] <= x <= scissor[1] and scissor[2] <= y <= scissor[3]}
+        for (x, y), (u, v) in texels.items():
+            expected_u = u0 + ((x << 4) - x0) * (u1 - u0) / (x1 - x0)
+            expected_v = v0 + ((y << 4) - y0) * (v1 - v0) / (y1 - y0)
+            assert abs(u - expected_u) <= 1 and abs(v - expected_v) <= 1, ((x, y), (u, v), (expected_u, expected_v))
+
+    def textured_sprites():
+        yield from textured_sprite_test((0, 0, 0, 0), (16 << 4, 8 << 4, 64 << 4, 8 << 4))
+        yield from textured_sprite_test((30 << 4, 9 << 4, 0, 100 << 4), (3 << 4, 2 << 4, 256 << 4, 4 << 4))
+        yield from textured_sprite_test((40, 17, 7, 300), (500, 300, 1000, 13))
+        yield from textured_sprite_test((100 << 4, 100 << 4, 0, 0), (130 << 4, 120 << 4, 30 << 4, 10 << 4),
+                                        offset=(90 << 4, 95 << 4), scissor=(13, 30, 7, 20))
+
+    with pysim.Simulator(sprite) as sim:
+        sim.add_sync_process(textured_sprites)
+        sim.add_clock(1e-6)
+        sim.run()
+
+    persp = PerspectiveDivider(lanes=4)
+
+    def perspective_test(spans, fst=0):
+        # Feed one span per clock, stalling the output every third clock.
+        results = []
+        pending = list(spans)
+        clock = 0
+        while len(results) < len(spans):
+            if pending:
+                for (s, t, q), pixel in zip(pending[0], persp.i_pixels):
+                    yield pixel.valid.eq(1)
+                    yield pixel.s.eq(s)
+                    yield pixel.t.eq(t)
+                    yield pixel.q.eq(q)
+                    yield pixel.u.eq(0x123)
+                    yield pixel.v.eq(0x456)
+            yield persp.i_fst.eq(fst)
+            yield persp.i_valid.eq(len(pending) > 0)
+            yield persp.i_last.eq(len(pending) == 1)
+            yield persp.i_ready.eq(clock % 3 != 0)
+            yield
+            clock += 1
+
+            if pending and (yield persp.o_ready):
+                pending.pop(0)
+            if (yield persp.o_valid) and (yield persp.i_ready):
+                span = []
+                for pixel in persp.o_pixels:
+                    u, v = (yield pixel.u), (yield pixel.v)
+                    span.append((u - 0x10000 if u & 0x8000 else u, v - 0x10000 if v & 0x8000 else v))
+                results.append((span, (yield persp.o_last)))
+
+        assert results[-1][1] and not any(last for span, last in results[:-1])
+        for span, (result, last) in zip(spans, results):
+            for (s, t, q), (u, v) in zip(span, result):
+                print("// ", (s / 256, t / 256, q / 4096), "->", (u / 16, v / 16))
+                if fst:
+                    assert (u, v) == (0x123, 0x456)
+                else:
+                    assert abs(u - s * 256 / q) <= 1
+                    assert abs(v - t * 256 / q) <= 1
+
+    def perspective():
+        yield from perspective_test([
+            [(256, 512, 4096), (-256, 1024, 2048), (1 << 20, 1 << 18, 65535), (4000, -4000, 600)],
+            [(100 << 8, 300 << 8, 1 << 14), (500000, 300000, 40000), (-8000000, 8000000, 65535), (77, 99, 3)],
+            [(1 << 22, -(1 << 22), 65535), (12345, 6789, 777), (-1, 1, 4096), (0, 0, 12345)]
+        ])
+        yield from perspective_test([[(256, 256, 4096)] * 4], fst=1)
+
+    with pysim.Simulator(persp) as sim:
+        sim.add_sync_process(perspective)
+        sim.add_clock(1e-6)
+        sim.run()
+
+    print("/*** UNIT TESTS PASSED ***/")